@@ -1,28 +1,20 @@
 """Configuration et utilitaires pour la connexion à MongoDB.
 
 Utilise Motor (driver asynchrone) afin de fournir l'instance client
-partagée dans toute l'application FastAPI.
+partagée dans toute l'application FastAPI. Le client et son pool sont
+possédés par le gestionnaire de ressources (`backend.ressources`).
 """
 
-import os
-from functools import lru_cache
-
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from dotenv import load_dotenv
-from pathlib import Path
-
-# Charger les variables d'environnement depuis backend/.env s'il existe
-load_dotenv(dotenv_path=Path(__file__).parent / ".env")
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "sante_db")
+from backend.settings import MONGO_URI, MONGO_DB_NAME  # noqa: F401  (réexportés pour les scripts)
+from backend.ressources import ressources
 
 
-@lru_cache()
 def get_client() -> AsyncIOMotorClient:
-    """Retourne une instance singleton d'AsyncIOMotorClient."""
+    """Retourne l'unique AsyncIOMotorClient du worker."""
 
-    return AsyncIOMotorClient(MONGO_URI)
+    return ressources.mongo
 
 
 def get_database() -> AsyncIOMotorDatabase:  # type: ignore[return-type]
@@ -2,40 +2,98 @@
 Toutes les fonctions sont rédigées en français.
 """
 
+from dataclasses import dataclass
 from typing import Annotated, List, Optional
 
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
 
-from backend.models.utilisateur import Utilisateur, Role
+from backend.models.utilisateur import Utilisateur, Role, StatutUtilisateur
+from backend.services.revocation import RevocationIndisponible, horodatage_revocation, horodatage_revocation_durable
 from backend.settings import DEMO_MODE
-from backend.utils.auth import verifier_jwt
+from backend.utils.auth import TYPE_RAFRAICHISSEMENT, verifier_jwt
 
 # Schéma de sécurité HTTP Bearer (JWT)
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
+@dataclass(frozen=True)
+class Principal:
+    """Identité issue des claims signés du JWT (sans lecture en base).
 
-    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(bearer_scheme)] = None,
-) -> Utilisateur:
-    """Retourne l'utilisateur actuellement authentifié via le JWT dans l'en-tête Authorization.
-
-    Le JWT doit être envoyé sous la forme « Bearer <token> ».
+    Expose `id`, `role` et `username` comme `Utilisateur` : les handlers qui
+    n'utilisent que ces attributs acceptent indifféremment l'un ou l'autre.
     """
 
+    id: str
+    role: Role
+    username: str
+
+
+def _decoder_jeton(credentials: HTTPAuthorizationCredentials | None) -> dict:
+    """Décode un jeton d'accès ou lève 401."""
     if credentials is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton manquant")
 
-    token = credentials.credentials
-    payload = verifier_jwt(token)
+    payload = verifier_jwt(credentials.credentials)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton invalide ou expiré")
+    if payload.get("type") == TYPE_RAFRAICHISSEMENT or payload.get("sub") is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton invalide")
+    return payload
+
+
+def _est_revoque(payload: dict, revoque_le: Optional[float]) -> bool:
+    """Vrai si le jeton a été émis avant la dernière révocation de son titulaire."""
+    return revoque_le is not None and float(payload.get("iat", 0)) < revoque_le
+
+
+async def get_principal(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(bearer_scheme)] = None,
+) -> Principal:
+    """Identité de l'appelant d'après les claims du jeton, pour les routes en lecture.
 
-    user_id: str | None = payload.get("sub")
-    if user_id is None:
+    Seule la liste de révocation Redis est consultée. Si elle est
+    indisponible, l'utilisateur et sa révocation sont relus en base (rôle
+    et statut à jour).
+    """
+    payload = _decoder_jeton(credentials)
+    user_id = payload["sub"]
+    try:
+        if _est_revoque(payload, await horodatage_revocation(user_id)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué")
+    except RevocationIndisponible:
+        user = await Utilisateur.get(user_id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Utilisateur introuvable")
+        if user.statut == StatutUtilisateur.suspendu or _est_revoque(payload, await horodatage_revocation_durable(user_id)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué")
+        return Principal(id=str(user.id), role=user.role, username=user.username)
+
+    role = payload.get("role")
+    if role not in Role.__members__:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton invalide")
+    return Principal(id=user_id, role=Role(role), username=payload.get("username", ""))
+
+
+async def get_current_user(
+
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(bearer_scheme)] = None,
+) -> Utilisateur:
+    """Retourne l'utilisateur actuellement authentifié via le JWT dans l'en-tête Authorization.
+
+    Le JWT doit être envoyé sous la forme « Bearer <token> ».
+    """
+
+    payload = _decoder_jeton(credentials)
+    user_id: str = payload["sub"]
+    try:
+        if _est_revoque(payload, await horodatage_revocation(user_id)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué")
+    except RevocationIndisponible:
+        if _est_revoque(payload, await horodatage_revocation_durable(user_id)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué")
 
     user = await Utilisateur.get(user_id)
     if user is None:
@@ -1,45 +1,34 @@
 """Gestion simplifiée du bus d'événements Redis (asynchrone).
 
 Si Redis n'est pas disponible (tests locaux, développement sans conteneur),
-les publications sont ignorées avec un avertissement.
+les publications sont ignorées avec un avertissement. Le client Redis est
+celui du gestionnaire de ressources (un seul pool par worker).
 """
 
 from __future__ import annotations
 
 import json
 import logging
-import os
 from typing import Any, Dict
 
-try:
-    import redis.asyncio as redis  # type: ignore
-except ImportError:  # pragma: no cover
-    redis = None  # type: ignore
+from backend.ressources import ressources
+from backend.utils import tracage
 
 LOGGER = logging.getLogger("event_bus")
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
-_redis_client: "redis.Redis | None" = None  # noqa: UP007
 
 
 async def _get_client():
-    """Retourne/initialise le client Redis asynchrone."""
-    global _redis_client
-    if redis is None:
-        return None
-    if _redis_client is None:
-        try:
-            _redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-        except Exception as exc:  # pragma: no cover
-            LOGGER.warning("Redis non disponible : %s", exc)
-            _redis_client = None
-    return _redis_client
+    """Retourne le client Redis partagé (ou None si indisponible)."""
+    return ressources.redis()
 
 
 async def publish(channel: str, payload: Dict[str, Any]) -> None:  # noqa: D401
     """Publie *payload* (dict) sur le *channel* Redis.
 
     La sérialisation est effectuée en JSON. Les erreurs de connexion sont
-    attrapées et enregistrées, afin de ne pas bloquer l’API.
+    attrapées et enregistrées, afin de ne pas bloquer l’API. Si le traçage
+    est actif, le contexte W3C (`traceparent`) est ajouté au payload pour
+    que les consommateurs rattachent leur traitement à la requête.
     """
 
     client = await _get_client()
@@ -48,6 +37,8 @@ async def publish(channel: str, payload: Dict[str, Any]) -> None:  # noqa: D401
         return
 
     try:
-        await client.publish(channel, json.dumps(payload, default=str))
+        with tracage.span_publication(channel):
+            await client.publish(channel, json.dumps(tracage.injecter(payload), default=str))
     except Exception as exc:  # pragma: no cover
         LOGGER.warning("Échec publication Redis : %s", exc)
+        ressources.signaler_echec_redis(exc)
@@ -1,8 +1,25 @@
+import asyncio
+
 from fastapi import FastAPI
 from beanie import init_beanie
-from backend.models import Device, Donnee, Alerte, Utilisateur, Department, Referral, Assignment
+from backend.models import Device, Donnee, Alerte, Utilisateur, Department, Referral, Assignment, TacheAdmin
 from backend.models.recommandation import Recommandation
 from backend.db import get_client, MONGO_DB_NAME
+from backend.ressources import ressources
+from backend.services.charge_medecins import initialiser_charges
+from backend.services.orientations import annuler_doublons_en_attente
+from backend.services.ingestion import VideurIngestion
+from backend.services.deduplication import preparer_index_mesures
+from backend.services import pipeline_ia
+from backend.services.revocation import executer_propagation
+from backend.utils.auth import mots_de_passe
+from backend.utils.instrumentation import MiddlewareInstrumentation, exposition
+from backend.utils import tracage
+from backend.utils.cache_http import differes as versions_differees
+from backend.utils.surveillance_boucle import SurveillantBoucle
+from backend.utils.profilage import suivi_memoire
+from backend import settings
+from fastapi import Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.routers import (
@@ -16,11 +33,41 @@ from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialisation Beanie lors du démarrage, remplacement de on_event."""
+    """Initialisation des pools (Mongo/Redis) et de Beanie lors du démarrage."""
+    tracage.configurer("backend")
+    # Retard de la boucle et détection des appels bloquants (métriques + journaux)
+    surveillance = SurveillantBoucle() if settings.BOUCLE_SURVEILLANCE else None
+    if surveillance:
+        surveillance.demarrer()
+    # Référence tracemalloc pour /admin/profilage/memoire (si activé)
+    suivi_memoire.demarrer()
+    await ressources.demarrer()
     client = get_client()
-    await init_beanie(database=client[MONGO_DB_NAME], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur, Department, Referral, Assignment])
+    # Doublons antérieurs à l'index unique des orientations en attente
+    await annuler_doublons_en_attente(client[MONGO_DB_NAME])
+    # Index uniques de déduplication des mesures (jamais de suppression : voir deduplication.py)
+    await preparer_index_mesures(client[MONGO_DB_NAME])
+    await init_beanie(database=client[MONGO_DB_NAME], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur, Department, Referral, Assignment, TacheAdmin])
+    # Compteurs de charge des médecins antérieurs à nb_patients
+    await initialiser_charges()
+    # Écriture différée des mesures acceptées en 202 (flux Redis → donnees)
+    videur = VideurIngestion()
+    videur.demarrer()
+    # Révocations de jetons enregistrées pendant une indisponibilité de Redis
+    propagation = asyncio.create_task(executer_propagation(), name="propagation_revocations")
     yield
-    # Pas d'opérations de shutdown spécifiques pour l'instant
+    propagation.cancel()
+    await asyncio.gather(propagation, return_exceptions=True)
+    await videur.arreter()
+    if surveillance:
+        await surveillance.arreter()
+    # Incréments de version ETag encore en attente (Redis indisponible)
+    await versions_differees.arreter()
+    # Fermeture des pools du worker
+    await ressources.arreter()
+    mots_de_passe.arreter()
+    suivi_memoire.arreter()
+    tracage.arreter()
 
 
 app = FastAPI(title="Sante Platform API", version="0.1.0", lifespan=lifespan)
@@ -57,6 +104,10 @@ app.add_middleware(
     expose_headers=["Content-Length", "X-Total-Count"],
     max_age=600,  # Durée de mise en cache des pré-vérifications CORS en secondes
 )
+# Spans serveur (traçage distribué), nommés d'après le gabarit de route
+app.add_middleware(tracage.MiddlewareTracage)
+# Latence par route et commandes MongoDB attribuées à la route (GET /metrics)
+app.add_middleware(MiddlewareInstrumentation)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(appareils.router, tags=["appareils"])
@@ -111,6 +162,30 @@ async def ping():
     return {"status": "ok"}
 
 
+@app.get("/health/pools")
+async def metriques_pools():
+    """Occupation des pools MongoDB et Redis du worker courant."""
+    return ressources.metriques()
+
+
+@app.get("/health/ia")
+async def etat_pipeline_ia():
+    """Retard estimé de l'analyse IA et événements en attente (contrôle d'admission)."""
+    etat = await pipeline_ia.suivi.etat()
+    return {
+        "retard_s": etat.retard_s,
+        "en_attente": etat.en_attente,
+        "voies": {canal: {"retard_s": v.retard_s, "en_attente": v.en_attente} for canal, v in etat.voies.items()},
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metriques_prometheus():
+    """Métriques au format Prometheus (latence par route, commandes MongoDB)."""
+    corps, type_contenu = exposition()
+    return Response(content=corps, media_type=type_contenu)
+
+
 @app.get("/test-cors")
 async def test_cors():
     """Endpoint de test pour vérifier que CORS fonctionne (sans auth)."""
@@ -8,6 +8,7 @@ from .recommandation import Recommandation
 from .utilisateur import Utilisateur
 from .department import Department
 from .referral import Referral, Assignment
+from .tache_admin import TacheAdmin
 
 __all__ = [
     "Device",
@@ -18,4 +19,5 @@ __all__ = [
     "Department",
     "Referral",
     "Assignment",
+    "TacheAdmin",
 ]
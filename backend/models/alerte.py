@@ -3,6 +3,7 @@
 from datetime import datetime
 from typing import Optional
 from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pydantic import Field
 
 
@@ -24,3 +25,5 @@ class Alerte(Document):
 
     class Settings:
         name = "alertes"
+        # Listes par patient et statut, triées par date (inbox médecin)
+        indexes = [IndexModel([("user_id", ASCENDING), ("statut", ASCENDING), ("date", DESCENDING)])]
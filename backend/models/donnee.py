@@ -29,6 +29,11 @@ class Donnee(Document):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
     date: datetime = Field(default_factory=datetime.utcnow, description="Horodatage de la mesure")
+    # En-tête Idempotency-Key de la requête d'origine (renvois des passerelles)
+    cle_idempotence: Optional[str] = Field(None, description="Clé d'idempotence fournie par l'appareil")
 
     class Settings:
         name = "donnees"
+        # Index uniques de déduplication : voir backend/services/deduplication.py
+        # (créés au démarrage ; sans suppression : l'index appareil/date est ignoré
+        # tant que des doublons existent, voir la tâche `donnees_doublons`)
@@ -3,6 +3,7 @@
 from datetime import datetime
 from typing import Optional
 from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pydantic import Field
 
 
@@ -44,3 +45,5 @@ class Recommandation(Document):
 
     class Settings:
         name = "recommandations"
+        # Listes par patient et statut, triées par date (inbox médecin)
+        indexes = [IndexModel([("user_id", ASCENDING), ("statut", ASCENDING), ("date", DESCENDING)])]
@@ -7,6 +7,7 @@ from typing import Optional
 from beanie import Document
 from datetime import datetime
 from pydantic import Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 
 class ReferralStatus(str, Enum):
@@ -25,6 +26,10 @@ class ReferralSource(str, Enum):
     patient = "patient"      # Demandée par le patient
 
 
+# Priorité d'une orientation selon l'alerte qui l'a déclenchée (tri de la file)
+PRIORITES_ORIENTATION = {"faible": 0, "normale": 1, "elevee": 2, "critique": 3}
+
+
 class Referral(Document):
     """Document MongoDB représentant une orientation/demande vers un service médical."""
 
@@ -36,11 +41,29 @@ class Referral(Document):
     created_by: Optional[str] = Field(None, description="ID de l'utilisateur créateur")
     processed_by: Optional[str] = Field(None, description="ID du médecin qui a traité la demande")
     processed_at: Optional[datetime] = Field(None, description="Date de traitement")
+    # File de travail du département
+    priorite: int = Field(default=PRIORITES_ORIENTATION["normale"], description="Priorité (0 faible → 3 critique)")
+    claimed_by: Optional[str] = Field(None, description="ID du médecin ayant pris l'orientation en charge")
+    claimed_at: Optional[datetime] = Field(None, description="Date de prise en charge")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "referrals"
+        # Une seule orientation en attente par patient et département (upserts IA concurrents)
+        indexes = [
+            IndexModel(
+                [("patient_id", ASCENDING), ("proposed_department_id", ASCENDING)],
+                name="orientation_en_attente_unique",
+                unique=True,
+                partialFilterExpression={"status": ReferralStatus.pending.value},
+            ),
+            # File par département : priorité décroissante puis ancienneté
+            IndexModel([
+                ("proposed_department_id", ASCENDING), ("status", ASCENDING),
+                ("priorite", DESCENDING), ("created_at", ASCENDING),
+            ]),
+        ]
 
 
 class AssignmentStatus(str, Enum):
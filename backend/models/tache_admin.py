@@ -0,0 +1,48 @@
+"""Modèle Beanie des opérations d'administration en masse (collection 'taches_admin').
+
+Une tâche est créée à la soumission puis exécutée en arrière-plan ; l'interface
+admin interroge sa progression (`traites` / `total`).
+"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from beanie import Document
+from pydantic import Field
+from pymongo import DESCENDING, IndexModel
+
+
+class TypeTache(str, Enum):
+    approuver_medecins = "approuver_medecins"
+    suspendre_medecins = "suspendre_medecins"
+    assigner_patients = "assigner_patients"
+    importer_utilisateurs = "importer_utilisateurs"
+
+
+class StatutTache(str, Enum):
+    en_attente = "en_attente"
+    en_cours = "en_cours"
+    terminee = "terminee"
+    echouee = "echouee"
+
+
+class TacheAdmin(Document):
+    """Opération en masse et sa progression."""
+
+    type: TypeTache
+    statut: StatutTache = StatutTache.en_attente
+    total: int = Field(0, description="Nombre d'éléments soumis")
+    traites: int = Field(0, description="Éléments traités (succès ou erreur)")
+    reussis: int = Field(0, description="Éléments effectivement appliqués")
+    nb_erreurs: int = Field(0, description="Éléments rejetés")
+    erreurs: List[Dict[str, Any]] = Field(default=[], description="Premières erreurs (bornées)")
+    message: Optional[str] = Field(None, description="Cause d'un échec global")
+    cree_par: str = Field(..., description="ID de l'admin à l'origine de la tâche")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "taches_admin"
+        indexes = [IndexModel([("created_at", DESCENDING)])]
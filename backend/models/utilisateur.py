@@ -5,7 +5,8 @@ Tous les champs et commentaires sont rédigés en français.
 from enum import Enum
 from typing import Optional
 
-from beanie import Document, Indexed
+from beanie import Document, Indexed, Insert, Replace, Save, before_event
+from pymongo import ASCENDING, IndexModel
 from datetime import datetime
 from pydantic import EmailStr, Field
 
@@ -24,6 +25,12 @@ class StatutUtilisateur(str, Enum):
     suspendu = "suspendu"
 
 
+def normaliser_identifiant(identifiant: str) -> str:
+    """Clé de connexion : espaces retirés, email en minuscules (username inchangé)."""
+    identifiant = identifiant.strip()
+    return identifiant.lower() if "@" in identifiant else identifiant
+
+
 class Utilisateur(Document):
     """Document MongoDB représentant un utilisateur de la plateforme."""
 
@@ -36,12 +43,30 @@ class Utilisateur(Document):
     # Associations médecin-patient
     medecin_ids: list[str] = Field(default=[], description="IDs des médecins assignés (pour patients)")
     patient_ids: list[str] = Field(default=[], description="IDs des patients assignés (pour médecins)")
+    nb_patients: int = Field(default=0, description="Taille de patient_ids, maintenue par $inc (pour médecins)")
     # Départements/Services (NOUVEAUX CHAMPS - rétrocompatibles)
     department_id: Optional[str] = Field(None, description="ID du département/service (requis pour médecins)")
     current_assignment_id: Optional[str] = Field(None, description="ID de l'assignation active (pour patients)")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
+    # Clés de connexion normalisées (email, username) : recherche mono-champ au login
+    login_keys: list[str] = Field(default=[], description="Identifiants de connexion normalisés")
+
+    @before_event(Insert, Replace, Save)
+    def maj_login_keys(self) -> None:
+        """Recalcule les clés de connexion à chaque écriture du document complet."""
+        self.login_keys = sorted({normaliser_identifiant(str(self.email)), normaliser_identifiant(self.username)})
 
     class Settings:
         name = "utilisateurs"
+        # Rechargement de l'index médecin → patients (multikey sur medecin_ids)
+        indexes = [
+            IndexModel([("medecin_ids", ASCENDING), ("role", ASCENDING)]),
+            IndexModel([("login_keys", ASCENDING)]),
+            # Attribution automatique : médecin le moins chargé du département
+            IndexModel([
+                ("role", ASCENDING), ("department_id", ASCENDING),
+                ("is_active", ASCENDING), ("nb_patients", ASCENDING),
+            ]),
+        ]
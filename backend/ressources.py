@@ -0,0 +1,252 @@
+"""Gestionnaire unique des ressources réseau du backend (pools MongoDB et Redis).
+
+Chaque worker uvicorn possède exactement un pool par backend :
+- un `AsyncIOMotorClient` dimensionné (maxPoolSize, minPoolSize, timeouts) ;
+- un client Redis adossé à un `BlockingConnectionPool` borné ;
+- un second client Redis réservé aux abonnements pub/sub des flux SSE.
+  Un abonnement garde sa connexion tant que le flux est ouvert : sur le pool
+  partagé, une cinquantaine de tableaux de bord ouverts priveraient le bus
+  d'événements et le cache de connexions. Son pool (`REDIS_MAX_ABONNEMENTS`)
+  refuse immédiatement un abonnement de trop, sans marquer Redis indisponible.
+
+Le gestionnaire est démarré/arrêté par le `lifespan` de l'application, mais les
+clients sont aussi créés paresseusement au premier accès (scripts, tests).
+Il garde aussi les tâches de fond lancées à la demande (`lancer_tache`),
+annulées et attendues à l'arrêt du worker ou en fin de test.
+Si Redis est injoignable, `redis()` renvoie `None` pendant quelques secondes
+afin que les appelants basculent sur leur chemin dégradé sans retenter une
+connexion à chaque requête.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Coroutine, Dict, Set
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+from backend import settings
+from backend.utils.instrumentation import EcouteurCommandesMongo
+from backend.utils.tracage import EcouteurTracesMongo
+
+try:
+    import redis.asyncio as redis  # type: ignore
+except ImportError:  # pragma: no cover
+    redis = None  # type: ignore
+
+LOGGER = logging.getLogger("ressources")
+
+
+class MoniteurPoolMongo(monitoring.ConnectionPoolListener):
+    """Compteurs du pool de connexions MongoDB (événements CMAP de pymongo)."""
+
+    def __init__(self) -> None:
+        self.creees = 0
+        self.fermees = 0
+        self.empruntees = 0
+        self.rendues = 0
+        self.echecs_emprunt = 0
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def connection_created(self, event):
+        self.creees += 1
+
+    def connection_closed(self, event):
+        self.fermees += 1
+
+    def connection_check_out_failed(self, event):
+        self.echecs_emprunt += 1
+
+    def connection_checked_out(self, event):
+        self.empruntees += 1
+
+    def connection_checked_in(self, event):
+        self.rendues += 1
+
+    def metriques(self) -> Dict[str, int]:
+        return {
+            "connexions_ouvertes": self.creees - self.fermees,
+            "connexions_en_usage": self.empruntees - self.rendues,
+            "emprunts_total": self.empruntees,
+            "echecs_emprunt": self.echecs_emprunt,
+        }
+
+
+class GestionnaireRessources:
+    """Possède les pools MongoDB et Redis du processus courant."""
+
+    def __init__(self) -> None:
+        self._mongo: AsyncIOMotorClient | None = None
+        self._redis: Any = None
+        self._redis_abonnements: Any = None
+        self._redis_indisponible_jusqua = 0.0
+        self._taches: Set[asyncio.Task] = set()
+        self.moniteur_mongo = MoniteurPoolMongo()
+        self.ecouteur_commandes = EcouteurCommandesMongo()
+        self.ecouteur_traces = EcouteurTracesMongo()
+
+    # ------------------------------------------------------------------
+    # MongoDB
+    # ------------------------------------------------------------------
+    @property
+    def mongo(self) -> AsyncIOMotorClient:
+        """Client Motor partagé (créé au premier accès)."""
+        if self._mongo is None:
+            self._mongo = AsyncIOMotorClient(
+                settings.MONGO_URI,
+                maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+                minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                event_listeners=[self.moniteur_mongo, self.ecouteur_commandes, self.ecouteur_traces],
+            )
+        return self._mongo
+
+    def definir_mongo(self, client: AsyncIOMotorClient | None) -> None:
+        """Remplace le client Motor (bancs d'essai avec mongomock ou un mongod local)."""
+        self._mongo = client
+
+    def base(self) -> AsyncIOMotorDatabase:  # type: ignore[return-type]
+        """Base de données applicative."""
+        return self.mongo[settings.MONGO_DB_NAME]
+
+    # ------------------------------------------------------------------
+    # Redis
+    # ------------------------------------------------------------------
+    def redis(self) -> Any:
+        """Client Redis partagé, ou `None` si Redis est absent/injoignable."""
+        if redis is None or time.monotonic() < self._redis_indisponible_jusqua:
+            return None
+        if self._redis is None:
+            try:
+                pool = redis.BlockingConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    decode_responses=True,
+                    max_connections=settings.REDIS_MAX_CONNEXIONS,
+                    timeout=settings.REDIS_ATTENTE_POOL,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                )
+                self._redis = redis.Redis(connection_pool=pool)
+            except Exception as exc:  # pragma: no cover
+                self.signaler_echec_redis(exc)
+                return None
+        return self._redis
+
+    def redis_abonnements(self) -> Any:
+        """Client Redis des abonnements pub/sub (pool distinct), ou `None` si Redis est indisponible."""
+        if self.redis() is None:
+            return None
+        if self._redis_abonnements is None:
+            try:
+                pool = redis.ConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    decode_responses=True,
+                    max_connections=settings.REDIS_MAX_ABONNEMENTS,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                )
+                self._redis_abonnements = redis.Redis(connection_pool=pool)
+            except Exception as exc:  # pragma: no cover
+                self.signaler_echec_redis(exc)
+                return None
+        return self._redis_abonnements
+
+    def signaler_echec_redis(self, exc: BaseException) -> None:
+        """Marque Redis indisponible pendant `REDIS_DELAI_REESSAI` secondes."""
+        LOGGER.info("Redis marqué indisponible : %s", exc)
+        self._redis_indisponible_jusqua = time.monotonic() + settings.REDIS_DELAI_REESSAI
+
+    def definir_redis(self, client: Any) -> None:
+        """Remplace le client Redis (tests, bancs d'essai avec fakeredis), abonnements compris."""
+        self._redis = client
+        self._redis_abonnements = client
+        self._redis_indisponible_jusqua = 0.0
+
+    # ------------------------------------------------------------------
+    # Tâches de fond
+    # ------------------------------------------------------------------
+    def lancer_tache(self, coro: Coroutine[Any, Any, Any], nom: str) -> asyncio.Task:
+        """Lance une tâche de fond du worker, annulée par `arreter_taches`."""
+        tache = asyncio.get_running_loop().create_task(coro, name=nom)
+        self._taches.add(tache)
+        tache.add_done_callback(self._taches.discard)
+        return tache
+
+    async def arreter_taches(self) -> None:
+        """Annule et attend les tâches de fond de la boucle courante."""
+        boucle = asyncio.get_running_loop()
+        taches = [tache for tache in self._taches if tache.get_loop() is boucle]
+        for tache in taches:
+            tache.cancel()
+        await asyncio.gather(*taches, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+    async def demarrer(self) -> None:
+        """Crée les pools et vérifie la connectivité Redis (non bloquant si absent)."""
+        _ = self.mongo
+        client = self.redis()
+        if client is not None:
+            try:
+                await client.ping()
+            except Exception as exc:
+                self.signaler_echec_redis(exc)
+
+    async def arreter(self) -> None:
+        """Annule les tâches de fond puis ferme proprement les pools du worker."""
+        await self.arreter_taches()
+        if self._redis_abonnements is not None and self._redis_abonnements is not self._redis:
+            try:
+                await self._redis_abonnements.aclose()
+            except Exception:  # pragma: no cover
+                pass
+        self._redis_abonnements = None
+        if self._redis is not None:
+            try:
+                await self._redis.aclose()
+            except Exception:  # pragma: no cover
+                pass
+            self._redis = None
+        if self._mongo is not None:
+            self._mongo.close()
+            self._mongo = None
+
+    def metriques(self) -> Dict[str, Any]:
+        """Instantané de l'occupation des pools."""
+        mongo = {
+            "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+            "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+            **self.moniteur_mongo.metriques(),
+        }
+        redis_metriques: Dict[str, Any] = {
+            "max_connexions": settings.REDIS_MAX_CONNEXIONS,
+            "disponible": self._redis is not None and time.monotonic() >= self._redis_indisponible_jusqua,
+        }
+        pool = getattr(self._redis, "connection_pool", None)
+        if pool is not None and hasattr(pool, "_in_use_connections"):
+            redis_metriques["connexions_en_usage"] = len(pool._in_use_connections)
+            redis_metriques["connexions_libres"] = len(pool._available_connections)
+        pool = getattr(self._redis_abonnements, "connection_pool", None)
+        if self._redis_abonnements is not self._redis and pool is not None and hasattr(pool, "_in_use_connections"):
+            redis_metriques["abonnements"] = {
+                "max_connexions": settings.REDIS_MAX_ABONNEMENTS,
+                "connexions_en_usage": len(pool._in_use_connections),
+            }
+        return {"mongo": mongo, "redis": redis_metriques}
+
+
+# Instance unique par processus (worker)
+ressources = GestionnaireRessources()
@@ -2,11 +2,25 @@
 Routeur d'administration pour la gestion des utilisateurs et validations.
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, status, Depends, File, Query, UploadFile
+from fastapi.responses import PlainTextResponse
 from typing import List
 from beanie import PydanticObjectId
+from backend.models.tache_admin import TacheAdmin, TypeTache
 from backend.models.utilisateur import Utilisateur, Role, StatutUtilisateur
 from backend.dependencies.auth import verifier_roles, get_current_user
+from backend.schemas.operations import (
+    AssignationsEnMasse, EtatTache, MAX_ELEMENTS, SelectionUtilisateurs, TacheLancee
+)
+from backend.services import operations_masse
+from backend.services.revocation import revoquer_jetons
+from backend import settings
+from backend.utils import profilage
+
+LOGGER = logging.getLogger("admin")
 
 router = APIRouter()
 
@@ -14,55 +28,61 @@ router = APIRouter()
 async def lister_medecins_en_attente():
     """Liste tous les médecins en attente de validation."""
     try:
-        medecins_en_attente = await Utilisateur.find({
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.en_attente
-        }).to_list()
+        # Projection : seuls les champs affichés sont lus (pas d'hydratation complète)
+        medecins_en_attente = await Utilisateur.get_motor_collection().find(
+            {"role": Role.medecin.value, "statut": StatutUtilisateur.en_attente.value},
+            {"username": 1, "email": 1, "department_id": 1, "created_at": 1, "statut": 1},
+        ).to_list(None)
         
         # Formater les données pour le frontend
         result = []
         for medecin in medecins_en_attente:
             result.append({
-                "id": str(medecin.id),
-                "username": medecin.username,
-                "email": medecin.email,
-                "department_id": medecin.department_id or "Non spécifié",
-                "created_at": medecin.created_at.isoformat(),
-                "statut": medecin.statut
+                "id": str(medecin["_id"]),
+                "username": medecin["username"],
+                "email": medecin["email"],
+                "department_id": medecin.get("department_id") or "Non spécifié",
+                "created_at": medecin["created_at"].isoformat(),
+                "statut": medecin["statut"]
             })
         
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des médecins en attente: {str(e)}")
 
+async def _changer_statut(medecin_id: str, avant: StatutUtilisateur, apres: StatutUtilisateur, introuvable: str) -> dict:
+    """Passe le médecin de *avant* à *apres* ; seuls `statut` et `updated_at` sont écrits.
+
+    Le statut attendu fait partie du filtre : deux administrateurs agissant en
+    même temps ne peuvent pas enchaîner deux transitions incompatibles, et une
+    modification concurrente d'un autre champ n'est pas écrasée.
+    """
+    try:
+        object_id = PydanticObjectId(medecin_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID médecin invalide")
+    medecin = await Utilisateur.get_motor_collection().find_one_and_update(
+        {"_id": object_id, "role": Role.medecin.value, "statut": avant.value},
+        {"$set": {"statut": apres.value, "updated_at": datetime.utcnow()}},
+        projection={"username": 1},
+    )
+    if medecin is None:
+        raise HTTPException(status_code=404, detail=introuvable)
+    return medecin
+
+
 @router.patch("/medecins/{medecin_id}/approuver", dependencies=[Depends(verifier_roles([Role.admin]))])
 async def approuver_medecin(medecin_id: str):
     """Approuve un médecin en attente et l'active."""
     try:
-        # Convertir l'ID en ObjectId
-        try:
-            object_id = PydanticObjectId(medecin_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID médecin invalide")
-        
-        # Rechercher le médecin
-        medecin = await Utilisateur.find_one({
-            "_id": object_id,
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.en_attente
-        })
+        medecin = await _changer_statut(
+            medecin_id, StatutUtilisateur.en_attente, StatutUtilisateur.actif, "Médecin en attente introuvable"
+        )
         
-        if not medecin:
-            raise HTTPException(status_code=404, detail="Médecin en attente introuvable")
-        
-        # Changer le statut à actif
-        medecin.statut = StatutUtilisateur.actif
-        await medecin.save()
-        
-        print(f"[ADMIN] Médecin {medecin.username} approuvé et activé")
+        LOGGER.info("Médecin %s approuvé et activé", medecin["username"])
         
         return {
-            "message": f"Le Dr. {medecin.username} a été approuvé avec succès",
+            "message": f"Le Dr. {medecin['username']} a été approuvé avec succès",
             "medecin_id": medecin_id,
             "nouveau_statut": StatutUtilisateur.actif
         }
@@ -75,30 +95,16 @@ async def approuver_medecin(medecin_id: str):
 async def rejeter_medecin(medecin_id: str):
     """Rejette un médecin en attente et le suspend."""
     try:
-        # Convertir l'ID en ObjectId
-        try:
-            object_id = PydanticObjectId(medecin_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID médecin invalide")
-        
-        # Rechercher le médecin
-        medecin = await Utilisateur.find_one({
-            "_id": object_id,
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.en_attente
-        })
-        
-        if not medecin:
-            raise HTTPException(status_code=404, detail="Médecin en attente introuvable")
-        
-        # Changer le statut à suspendu
-        medecin.statut = StatutUtilisateur.suspendu
-        await medecin.save()
+        medecin = await _changer_statut(
+            medecin_id, StatutUtilisateur.en_attente, StatutUtilisateur.suspendu, "Médecin en attente introuvable"
+        )
+        # Les jetons déjà émis cessent d'être acceptés immédiatement
+        await revoquer_jetons(medecin_id)
         
-        print(f"[ADMIN] Médecin {medecin.username} rejeté et suspendu")
+        LOGGER.info("Médecin %s rejeté et suspendu", medecin["username"])
         
         return {
-            "message": f"Le Dr. {medecin.username} a été rejeté",
+            "message": f"Le Dr. {medecin['username']} a été rejeté",
             "medecin_id": medecin_id,
             "nouveau_statut": StatutUtilisateur.suspendu
         }
@@ -111,21 +117,22 @@ async def rejeter_medecin(medecin_id: str):
 async def lister_medecins_actifs():
     """Liste tous les médecins actifs."""
     try:
-        medecins_actifs = await Utilisateur.find({
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.actif
-        }).to_list()
+        # Projection : nb_patients remplace le chargement de patient_ids
+        medecins_actifs = await Utilisateur.get_motor_collection().find(
+            {"role": Role.medecin.value, "statut": StatutUtilisateur.actif.value},
+            {"username": 1, "email": 1, "department_id": 1, "nb_patients": 1, "created_at": 1, "statut": 1},
+        ).to_list(None)
         
         result = []
         for medecin in medecins_actifs:
             result.append({
-                "id": str(medecin.id),
-                "username": medecin.username,
-                "email": medecin.email,
-                "department_id": medecin.department_id or "Non spécifié",
-                "nb_patients": len(medecin.patient_ids),
-                "created_at": medecin.created_at.isoformat(),
-                "statut": medecin.statut
+                "id": str(medecin["_id"]),
+                "username": medecin["username"],
+                "email": medecin["email"],
+                "department_id": medecin.get("department_id") or "Non spécifié",
+                "nb_patients": medecin.get("nb_patients", 0),
+                "created_at": medecin["created_at"].isoformat(),
+                "statut": medecin["statut"]
             })
         
         return result
@@ -136,28 +143,16 @@ async def lister_medecins_actifs():
 async def suspendre_medecin(medecin_id: str):
     """Suspend un médecin actif."""
     try:
-        # Convertir l'ID en ObjectId
-        try:
-            object_id = PydanticObjectId(medecin_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID médecin invalide")
+        medecin = await _changer_statut(
+            medecin_id, StatutUtilisateur.actif, StatutUtilisateur.suspendu, "Médecin actif introuvable"
+        )
+        # Les jetons déjà émis cessent d'être acceptés immédiatement
+        await revoquer_jetons(medecin_id)
         
-        medecin = await Utilisateur.find_one({
-            "_id": object_id,
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.actif
-        })
-        
-        if not medecin:
-            raise HTTPException(status_code=404, detail="Médecin actif introuvable")
-        
-        medecin.statut = StatutUtilisateur.suspendu
-        await medecin.save()
-        
-        print(f"[ADMIN] Médecin {medecin.username} suspendu")
+        LOGGER.info("Médecin %s suspendu", medecin["username"])
         
         return {
-            "message": f"Le Dr. {medecin.username} a été suspendu",
+            "message": f"Le Dr. {medecin['username']} a été suspendu",
             "medecin_id": medecin_id,
             "nouveau_statut": StatutUtilisateur.suspendu
         }
@@ -170,28 +165,14 @@ async def suspendre_medecin(medecin_id: str):
 async def reactiver_medecin(medecin_id: str):
     """Réactive un médecin suspendu."""
     try:
-        # Convertir l'ID en ObjectId
-        try:
-            object_id = PydanticObjectId(medecin_id)
-        except Exception:
-            raise HTTPException(status_code=400, detail="ID médecin invalide")
-        
-        medecin = await Utilisateur.find_one({
-            "_id": object_id,
-            "role": Role.medecin,
-            "statut": StatutUtilisateur.suspendu
-        })
-        
-        if not medecin:
-            raise HTTPException(status_code=404, detail="Médecin suspendu introuvable")
-        
-        medecin.statut = StatutUtilisateur.actif
-        await medecin.save()
+        medecin = await _changer_statut(
+            medecin_id, StatutUtilisateur.suspendu, StatutUtilisateur.actif, "Médecin suspendu introuvable"
+        )
         
-        print(f"[ADMIN] Médecin {medecin.username} réactivé")
+        LOGGER.info("Médecin %s réactivé", medecin["username"])
         
         return {
-            "message": f"Le Dr. {medecin.username} a été réactivé",
+            "message": f"Le Dr. {medecin['username']} a été réactivé",
             "medecin_id": medecin_id,
             "nouveau_statut": StatutUtilisateur.actif
         }
@@ -199,3 +180,114 @@ async def reactiver_medecin(medecin_id: str):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la réactivation: {str(e)}")
+
+
+# -----------------------------------------------------------------------------
+# Opérations en masse (tâches de fond, progression interrogeable)
+# -----------------------------------------------------------------------------
+
+def _tache_lancee(tache: TacheAdmin) -> TacheLancee:
+    return TacheLancee(tache_id=str(tache.id), total=tache.total)
+
+
+@router.post("/operations/medecins/approuver", response_model=TacheLancee, status_code=status.HTTP_202_ACCEPTED)
+async def approuver_medecins_en_masse(
+    selection: SelectionUtilisateurs, admin=Depends(verifier_roles([Role.admin]))
+):
+    """Approuve un lot de médecins en attente (tâche de fond)."""
+    tache = await operations_masse.changer_statut_medecins(
+        selection.ids, StatutUtilisateur.en_attente, StatutUtilisateur.actif,
+        TypeTache.approuver_medecins, str(admin.id),
+    )
+    return _tache_lancee(tache)
+
+
+@router.post("/operations/medecins/suspendre", response_model=TacheLancee, status_code=status.HTTP_202_ACCEPTED)
+async def suspendre_medecins_en_masse(
+    selection: SelectionUtilisateurs, admin=Depends(verifier_roles([Role.admin]))
+):
+    """Suspend un lot de médecins actifs et révoque leurs jetons (tâche de fond)."""
+    tache = await operations_masse.changer_statut_medecins(
+        selection.ids, StatutUtilisateur.actif, StatutUtilisateur.suspendu,
+        TypeTache.suspendre_medecins, str(admin.id),
+    )
+    return _tache_lancee(tache)
+
+
+@router.post("/operations/assignations", response_model=TacheLancee, status_code=status.HTTP_202_ACCEPTED)
+async def assigner_en_masse(payload: AssignationsEnMasse, admin=Depends(verifier_roles([Role.admin]))):
+    """Lie des couples patient/médecin (tâche de fond)."""
+    couples = [(a.patient_id, a.medecin_id) for a in payload.assignations]
+    return _tache_lancee(await operations_masse.assigner_patients(couples, str(admin.id)))
+
+
+@router.post("/operations/utilisateurs/import", response_model=TacheLancee, status_code=status.HTTP_202_ACCEPTED)
+async def importer_utilisateurs(
+    fichier: UploadFile = File(..., description="CSV : email, username, mot_de_passe, role[, department_id]"),
+    admin=Depends(verifier_roles([Role.admin])),
+):
+    """Importe des comptes depuis un CSV (tâche de fond, erreurs par ligne)."""
+    try:
+        lignes = operations_masse.lire_csv(await fichier.read())
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Le fichier doit être encodé en UTF-8")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not lignes:
+        raise HTTPException(status_code=400, detail="Fichier vide")
+    if len(lignes) > MAX_ELEMENTS:
+        raise HTTPException(status_code=413, detail=f"Au plus {MAX_ELEMENTS} lignes par import")
+    return _tache_lancee(await operations_masse.importer_utilisateurs(lignes, str(admin.id)))
+
+
+def _etat(tache: TacheAdmin) -> EtatTache:
+    return EtatTache(id=str(tache.id), **tache.model_dump(exclude={"id", "revision_id", "cree_par"}))
+
+
+@router.get("/operations", response_model=List[EtatTache], dependencies=[Depends(verifier_roles([Role.admin]))])
+async def lister_operations(limite: int = Query(20, ge=1, le=100)):
+    """Dernières opérations en masse, les plus récentes d'abord."""
+    taches = await TacheAdmin.find_all().sort(-TacheAdmin.created_at).limit(limite).to_list()
+    return [_etat(t) for t in taches]
+
+
+@router.get("/operations/{tache_id}", response_model=EtatTache, dependencies=[Depends(verifier_roles([Role.admin]))])
+async def etat_operation(tache_id: str):
+    """Progression d'une opération en masse."""
+    try:
+        tache = await TacheAdmin.get(PydanticObjectId(tache_id))
+    except Exception:
+        tache = None
+    if tache is None:
+        raise HTTPException(status_code=404, detail="Opération introuvable")
+    return _etat(tache)
+
+
+# -----------------------------------------------------------------------------
+# Profilage à la demande (worker qui reçoit la requête)
+# -----------------------------------------------------------------------------
+
+@router.post("/profilage", response_class=PlainTextResponse, dependencies=[Depends(verifier_roles([Role.admin]))])
+async def profiler_processus(
+    duree: float = Query(10, gt=0, le=settings.PROFILAGE_DUREE_MAX, description="Durée du profil (s)"),
+    mode: str = Query("mur", pattern="^(mur|cpu)$", description="mur : temps réel, tous threads ; cpu : temps CPU"),
+    frequence: int = Query(100, ge=1, le=1000, description="Échantillons par seconde"),
+):
+    """Profil statistique du processus, en piles repliées (flamegraph.pl, speedscope)."""
+    try:
+        piles = await profilage.profiler(duree, mode, frequence)
+    except (profilage.ProfilageEnCours, profilage.ProfilageIndisponible) as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return PlainTextResponse(piles, headers={"Content-Disposition": f'attachment; filename="profil-{mode}.folded"'})
+
+
+@router.get("/profilage/memoire", dependencies=[Depends(verifier_roles([Role.admin]))])
+async def memoire_processus(limite: int = Query(25, ge=1, le=200), reinitialiser: bool = False):
+    """Croissance mémoire depuis la référence tracemalloc (démarrage ou dernière réinitialisation)."""
+    try:
+        # Instantané et comparaison coûteux : hors de la boucle
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profilage.suivi_memoire.comparer, limite, reinitialiser
+        )
+    except profilage.ProfilageIndisponible as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
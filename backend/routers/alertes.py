@@ -1,18 +1,24 @@
 """Routeur pour la consultation des alertes."""
 
+import logging
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 
-from backend.dependencies.auth import get_current_user
+from backend.dependencies.auth import Principal, get_current_user, get_principal
 
 
 from backend.models.alerte import Alerte
 from backend.schemas.alerte import AlerteEnDB
+from backend.services.patients_medecin import index_patients
+from backend.utils.cache_http import ReponseConditionnelle, incrementer_versions, portee
+from backend.utils.serialisation import avec_id, projection
 
 from fastapi.responses import StreamingResponse
 import json
 
+LOGGER = logging.getLogger("alertes")
+
 router = APIRouter()
 
 
@@ -20,15 +26,15 @@ router = APIRouter()
 async def stream_alertes():
     """Flux Server-Sent Events renvoyant chaque nouvelle alerte en temps réel."""
     import asyncio
-    import redis.asyncio as redis
-    import os
+    from backend.ressources import ressources
     
     async def event_generator():
-        redis_client = None
+        pubsub = None
         try:
-            # Connexion Redis pour écouter les nouvelles alertes
-            redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
-            redis_client = redis.from_url(redis_url)
+            # Pool réservé aux abonnements : un flux ouvert ne prive pas le pool partagé
+            redis_client = ressources.redis_abonnements()
+            if redis_client is None:
+                raise RuntimeError("Redis indisponible")
             
             # Envoyer un heartbeat initial
             yield "data: {\"type\": \"heartbeat\", \"timestamp\": \"" + str(asyncio.get_event_loop().time()) + "\"}\n\n"
@@ -64,7 +70,7 @@ async def stream_alertes():
                             # Ignorer les messages mal formés
                             continue
                         except Exception as e:
-                            print(f"Erreur traitement message Redis: {e}")
+                            LOGGER.warning("Erreur traitement message Redis : %s", e)
                             continue
                     
                 except asyncio.TimeoutError:
@@ -76,13 +82,6 @@ async def stream_alertes():
                     # Connexion fermée côté client
                     break
                         
-            # Nettoyage final
-            try:
-                await pubsub.unsubscribe('nouvelle_alerte')
-                await pubsub.close()
-            except Exception:
-                pass
-                
         except Exception as e:
             # En cas d'erreur, envoyer un message d'erreur et fermer proprement
             error_data = {
@@ -91,9 +90,11 @@ async def stream_alertes():
             }
             yield f"data: {json.dumps(error_data)}\n\n"
         finally:
-            if redis_client:
+            # Rend la connexion au pool des abonnements (le client reste ouvert)
+            if pubsub is not None:
                 try:
-                    await redis_client.close()
+                    await pubsub.unsubscribe('nouvelle_alerte')
+                    await pubsub.aclose()
                 except Exception:
                     pass
             
@@ -110,17 +111,19 @@ async def stream_alertes():
 
 
 @router.get("/alerts", response_model=List[AlerteEnDB])
-async def lister_alertes(current_user=Depends(get_current_user)):
+async def lister_alertes(request: Request, current_user: Principal = Depends(get_principal)):
     """Liste les alertes de l'utilisateur connecté uniquement (sécurité RGPD)."""
-    # Filtrer par user_id pour respecter la ségrégation des données
-    alertes_docs = await Alerte.find({"user_id": str(current_user.id)}).to_list()
-    return [AlerteEnDB(
-        id=str(a.id), 
-        user_id=a.user_id, 
-        message=a.message, 
-        niveau=a.niveau, 
-        date=a.date
-    ) for a in alertes_docs]
+    user_id = str(current_user.id)
+    conditionnel = await ReponseConditionnelle.preparer(request, [portee("alertes", user_id)], user_id)
+    if conditionnel.non_modifie:
+        return conditionnel.reponse_304()
+    # Filtrer par user_id pour respecter la ségrégation des données.
+    # Chemin rapide : projection Mongo + encodage orjson, sans hydratation Beanie.
+    cursor = Alerte.get_motor_collection().find(
+        {"user_id": user_id},
+        projection("user_id", "message", "niveau", "date"),
+    )
+    return conditionnel.reponse(avec_id(await cursor.to_list(None)))
 
 
 @router.patch("/alertes/{alerte_id}/marquer-vue")
@@ -139,8 +142,7 @@ async def marquer_alerte_vue(alerte_id: str, current_user=Depends(get_current_us
         # Vérifier les permissions selon le rôle
         if current_user.role == Role.medecin:
             # Pour un médecin : vérifier que le patient lui est assigné
-            patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(alerte.user_id))
-            if not patient or str(current_user.id) not in patient.medecin_ids:
+            if not await index_patients.est_patient(str(current_user.id), alerte.user_id):
                 raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
         elif current_user.role == Role.patient:
             # Pour un patient : vérifier que c'est sa propre alerte
@@ -157,6 +159,7 @@ async def marquer_alerte_vue(alerte_id: str, current_user=Depends(get_current_us
         alerte.updated_at = datetime.utcnow()
         
         await alerte.save()
+        await incrementer_versions("alertes", alerte.user_id)
         
         return {"message": "Alerte marquée comme vue"}
         
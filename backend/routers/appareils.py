@@ -10,6 +10,7 @@ from backend.schemas.appareil import AppareilCreation, AppareilEnDB
 from backend.models.device import Device
 from backend.models.utilisateur import Utilisateur
 from beanie import PydanticObjectId
+from backend.utils.cache_http import incrementer_versions
 
 
 router = APIRouter()
@@ -84,6 +85,7 @@ async def ajouter_appareil(appareil: AppareilCreation):
     """Enregistre un nouvel appareil dans la base."""
     doc = Device(**appareil.model_dump())
     await doc.insert()
+    await incrementer_versions("devices", doc.user_id)
 
     username = None
     if doc.user_id:
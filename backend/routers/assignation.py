@@ -9,6 +9,7 @@ from beanie import PydanticObjectId
 
 from backend.dependencies.auth import get_current_user, verifier_roles
 from backend.models.utilisateur import Utilisateur, Role
+from backend.services.assignation import assigner, desassigner
 from backend.schemas.assignation import (
     AssignationRequest, 
     AssignationResponse, 
@@ -69,22 +70,14 @@ async def demander_assignation_medecin(
             detail="Médecin non trouvé"
         )
     
-    # Vérifier si l'assignation existe déjà
-    if request.medecin_id in current_user.medecin_ids:
+    # Lien ajouté des deux côtés ($addToSet) ; déjà présent côté patient → 400
+    modifications = await assigner(str(current_user.id), request.medecin_id)
+    if not modifications.patient:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Vous êtes déjà assigné à ce médecin"
         )
     
-    # Ajouter l'assignation côté patient
-    current_user.medecin_ids.append(request.medecin_id)
-    await current_user.save()
-    
-    # Ajouter l'assignation côté médecin
-    if str(current_user.id) not in medecin.patient_ids:
-        medecin.patient_ids.append(str(current_user.id))
-        await medecin.save()
-    
     return AssignationResponse(
         success=True,
         message=f"Assignation réussie au Dr. {medecin.username}"
@@ -141,22 +134,14 @@ async def accepter_patient(
             detail="Patient non trouvé"
         )
     
-    # Vérifier si l'assignation existe déjà
-    if request.patient_id in current_user.patient_ids:
+    # Lien ajouté des deux côtés ($addToSet) ; déjà présent côté médecin → 400
+    modifications = await assigner(request.patient_id, str(current_user.id))
+    if not modifications.medecin:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Ce patient est déjà assigné"
         )
     
-    # Ajouter l'assignation côté médecin
-    current_user.patient_ids.append(request.patient_id)
-    await current_user.save()
-    
-    # Ajouter l'assignation côté patient
-    if str(current_user.id) not in patient.medecin_ids:
-        patient.medecin_ids.append(str(current_user.id))
-        await patient.save()
-    
     return AssignationResponse(
         success=True,
         message=f"Patient {patient.username} assigné avec succès"
@@ -204,15 +189,8 @@ async def supprimer_assignation(
             detail="Patient ou médecin non trouvé"
         )
     
-    # Supprimer l'assignation côté patient
-    if medecin_id in patient.medecin_ids:
-        patient.medecin_ids.remove(medecin_id)
-        await patient.save()
-    
-    # Supprimer l'assignation côté médecin
-    if patient_id in medecin.patient_ids:
-        medecin.patient_ids.remove(patient_id)
-        await medecin.save()
+    # Retrait du lien des deux côtés ($pull)
+    await desassigner(patient_id, medecin_id)
     
     return AssignationResponse(
         success=True,
@@ -8,6 +8,7 @@ from beanie import PydanticObjectId
 from ..models import Assignment, Utilisateur, Department
 from ..schemas.referral import AssignmentCreate, AssignmentUpdate, AssignmentResponse
 from ..dependencies.auth import get_current_user, require_role
+from ..services.assignation import definir_assignation_courante, retirer_assignation_courante
 from datetime import datetime
 
 router = APIRouter(prefix="/assignments", tags=["Assignations"])
@@ -166,8 +167,7 @@ async def create_assignment(
     await assignment.insert()
     
     # Mettre à jour le patient avec l'assignation
-    patient.current_assignment_id = str(assignment.id)
-    await patient.save()
+    await definir_assignation_courante(str(patient.id), str(assignment.id))
     
     return AssignmentResponse(
         id=str(assignment.id),
@@ -227,10 +227,7 @@ async def update_assignment(
             assignment.end_at = datetime.utcnow()
             
             # Retirer l'assignation du patient
-            patient = await Utilisateur.get(assignment.patient_id)
-            if patient:
-                patient.current_assignment_id = None
-                await patient.save()
+            await retirer_assignation_courante(assignment.patient_id, str(assignment.id))
     
     if assignment_data.notes is not None:
         assignment.notes = assignment_data.notes
@@ -282,10 +279,7 @@ async def delete_assignment(
     
     # Retirer l'assignation du patient si elle est active
     if assignment.status == "active":
-        patient = await Utilisateur.get(assignment.patient_id)
-        if patient and patient.current_assignment_id == str(assignment.id):
-            patient.current_assignment_id = None
-            await patient.save()
+        await retirer_assignation_courante(assignment.patient_id, str(assignment.id))
     
     await assignment.delete()
     
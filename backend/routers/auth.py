@@ -2,15 +2,37 @@
 Contient les points d'entrée pour l'inscription et la connexion des utilisateurs.
 """
 
-from fastapi import APIRouter, HTTPException, status, Depends
-from backend.models.utilisateur import Utilisateur, Role, StatutUtilisateur
-from backend.schemas.utilisateur import UtilisateurCreation, UtilisateurLogin, Token
-from backend.utils.auth import hacher_mot_de_passe, verifier_mot_de_passe, creer_jwt
+import logging
+import math
+
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from backend.models.utilisateur import Utilisateur, Role, StatutUtilisateur, normaliser_identifiant
+from backend.schemas.utilisateur import RafraichissementRequest, UtilisateurCreation, UtilisateurLogin, Token
+from backend.utils.auth import (
+    TYPE_RAFRAICHISSEMENT,
+    creer_jeton_rafraichissement,
+    creer_jwt,
+    hacher_mot_de_passe,
+    mots_de_passe,
+    verifier_jwt,
+)
+from backend.services.connexion import (
+    limiteur_identifiant,
+    limiteur_ip,
+    oublier_identifiants_inconnus,
+    rechercher_utilisateur,
+)
+from backend.services.assignation import assigner
+from backend.services.charge_medecins import medecin_le_moins_charge
+from backend.services.revocation import RevocationIndisponible, horodatage_revocation, horodatage_revocation_durable
+from backend.utils.cache_http import incrementer_versions
 from beanie import PydanticObjectId
 from pydantic import EmailStr
 
 
 
+LOGGER = logging.getLogger("auth")
+
 router = APIRouter()
 
 #
@@ -29,23 +51,23 @@ async def inscription_admin(utilisateur: UtilisateurCreation, user=Security(veri
         raise HTTPException(status_code=400, detail="Cet email est déjà utilisé.")
     if await Utilisateur.find_one({"username": utilisateur.username}):
         raise HTTPException(status_code=400, detail="Ce nom d'utilisateur est déjà utilisé.")
-    hash_ = hacher_mot_de_passe(utilisateur.mot_de_passe)
+    hash_ = await mots_de_passe.hacher(utilisateur.mot_de_passe)
     user_obj = Utilisateur(email=utilisateur.email, username=utilisateur.username, mot_de_passe_hache=hash_, role=utilisateur.role)
     await user_obj.insert()
-    # Ajoute username dans le JWT pour affichage frontend (nom lisible)
-    token = creer_jwt({"sub": str(user_obj.id), "role": user_obj.role, "username": user_obj.username})
-    return Token(access_token=token, token_type="bearer")
+    await oublier_identifiants_inconnus(user_obj)
+    await incrementer_versions("utilisateurs", str(user_obj.id))
+    return _emettre_jetons(user_obj)
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def inscription(utilisateur: UtilisateurCreation):
     # Log des données reçues
-    print(f"[INSCRIPTION] Tentative: email={utilisateur.email}, username={utilisateur.username}, role={utilisateur.role}")
+    LOGGER.debug("Inscription : username=%s, role=%s", utilisateur.username, utilisateur.role)
     # Contrôle explicite supplémentaire (backend): refuse username vide ou absent
     if not utilisateur.username or not isinstance(utilisateur.username, str) or len(utilisateur.username.strip()) < 3:
-        print(f"[INSCRIPTION] Échec: username vide ou trop court -> {utilisateur.username!r}")
+        LOGGER.info("Inscription refusée : username vide ou trop court (%r)", utilisateur.username)
         raise HTTPException(status_code=400, detail="Le nom d'utilisateur est obligatoire et doit comporter au moins 3 caractères.")
     if ' ' in utilisateur.username:
-        print(f"[INSCRIPTION] Échec: username contient des espaces -> {utilisateur.username!r}")
+        LOGGER.info("Inscription refusée : username avec espaces (%r)", utilisateur.username)
         raise HTTPException(status_code=400, detail="Le nom d'utilisateur ne doit pas contenir d'espace.")
     """Inscription d'un nouvel utilisateur (stockage MongoDB, mot de passe haché).
     Seuls les rôles 'patient' ou 'medecin' sont acceptés à l'inscription publique.
@@ -59,7 +81,7 @@ async def inscription(utilisateur: UtilisateurCreation):
     if utilisateur.role not in ("patient", "medecin"):
         raise HTTPException(status_code=400, detail="Le rôle doit être 'patient' ou 'medecin'.")
     # Hashage du mot de passe
-    hash_ = hacher_mot_de_passe(utilisateur.mot_de_passe)
+    hash_ = await mots_de_passe.hacher(utilisateur.mot_de_passe)
     
     # Créer l'utilisateur avec le département si fourni
     user_data = {
@@ -72,7 +94,7 @@ async def inscription(utilisateur: UtilisateurCreation):
     # Statut selon le rôle : médecins en attente de validation, patients actifs
     if utilisateur.role == "medecin":
         user_data["statut"] = StatutUtilisateur.en_attente
-        print(f"[INSCRIPTION] Médecin {utilisateur.username} créé avec statut 'en_attente' - validation admin requise")
+        LOGGER.info("Médecin %s créé en attente de validation admin", utilisateur.username)
     else:
         user_data["statut"] = StatutUtilisateur.actif
     
@@ -80,34 +102,64 @@ async def inscription(utilisateur: UtilisateurCreation):
     if utilisateur.department_id:
         user_data["department_id"] = utilisateur.department_id
         if utilisateur.role == "medecin":
-            print(f"[INSCRIPTION] Médecin assigné au département: {utilisateur.department_id}")
+            LOGGER.debug("Médecin assigné au département %s", utilisateur.department_id)
         elif utilisateur.role == "patient":
-            print(f"[INSCRIPTION] Patient assigné au département: {utilisateur.department_id}")
+            LOGGER.debug("Patient assigné au département %s", utilisateur.department_id)
     
     user = Utilisateur(**user_data)
     await user.insert()
+    await oublier_identifiants_inconnus(user)
+    await incrementer_versions("utilisateurs", str(user.id))
     
     # Attribution automatique du médecin pour les patients
     if utilisateur.role == "patient" and utilisateur.department_id:
         await _attribuer_medecin_automatiquement(user, utilisateur.department_id)
     
-    # Ajoute username dans le JWT pour affichage frontend (nom lisible)
-    token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
-    return Token(access_token=token, token_type="bearer")
+    return _emettre_jetons(user)
 
 
 @router.post("/login", response_model=Token)
-async def connexion(credentials: UtilisateurLogin):
+async def connexion(credentials: UtilisateurLogin, request: Request):
     """Connexion d'un utilisateur (vérification hash, JWT)."""
-    # Recherche par email OU username
-    user = await Utilisateur.find_one({"$or": [
-        {"email": credentials.identifiant},
-        {"username": credentials.identifiant}
-    ]})
-    if not user or not verifier_mot_de_passe(credentials.mot_de_passe, user.mot_de_passe_hache):
+    cle = normaliser_identifiant(credentials.identifiant)
+    ip = request.client.host if request.client else "inconnue"
+
+    # Limitation avant tout accès Mongo ou calcul bcrypt
+    attente = await limiteur_ip.consommer(ip)
+    if attente is None:
+        attente = await limiteur_identifiant.depasse(cle)
+    if attente is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Trop de tentatives de connexion. Réessayez plus tard.",
+            headers={"Retry-After": str(max(1, math.ceil(attente)))},
+        )
+
+    # Recherche par email OU username (clé de connexion normalisée)
+    user = await rechercher_utilisateur(credentials.identifiant)
+    if not user:
+        # Même coût qu'un mot de passe erroné : pas d'énumération des comptes
+        await mots_de_passe.verifier_factice(credentials.mot_de_passe)
+        await limiteur_identifiant.enregistrer(cle)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants invalides")
+    valide, nouveau_hash = await mots_de_passe.verifier_et_mettre_a_jour(
+        credentials.mot_de_passe, user.mot_de_passe_hache
+    )
+    if not valide:
+        await limiteur_identifiant.enregistrer(cle)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants invalides")
+    await limiteur_identifiant.reinitialiser(cle)
+    if nouveau_hash:
+        # Coût bcrypt obsolète : le hash est recalculé avec le facteur courant
+        await user.set({Utilisateur.mot_de_passe_hache: nouveau_hash})
     
     # Vérifier le statut de l'utilisateur
+    _controler_statut(user)
+    return _emettre_jetons(user)
+
+
+def _controler_statut(user: Utilisateur) -> None:
+    """Refuse les comptes médecin en attente et les comptes suspendus."""
     if hasattr(user, 'statut') and user.statut == StatutUtilisateur.en_attente:
         if user.role == Role.medecin:
             raise HTTPException(
@@ -119,50 +171,56 @@ async def connexion(credentials: UtilisateurLogin):
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Votre compte a été suspendu. Contactez un administrateur."
         )
-    
+
+
+def _emettre_jetons(user: Utilisateur) -> Token:
+    """Jeton d'accès (claims id/rôle/username) + jeton de rafraîchissement."""
     # Ajoute username dans le JWT pour affichage frontend (nom lisible)
     token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
-    return Token(access_token=token, token_type="bearer")
+    return Token(
+        access_token=token,
+        token_type="bearer",
+        refresh_token=creer_jeton_rafraichissement(str(user.id)),
+    )
+
+
+@router.post("/refresh", response_model=Token)
+async def rafraichir_jetons(demande: RafraichissementRequest):
+    """Échange un jeton de rafraîchissement contre une nouvelle paire de jetons.
+
+    Le compte est relu en base : un rôle modifié ou une suspension est pris
+    en compte au plus tard au prochain rafraîchissement.
+    """
+    claims = verifier_jwt(demande.refresh_token)
+    if not claims or claims.get("type") != TYPE_RAFRAICHISSEMENT or not claims.get("sub"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton de rafraîchissement invalide")
+    try:
+        revoque_le = await horodatage_revocation(claims["sub"])
+    except RevocationIndisponible:
+        revoque_le = await horodatage_revocation_durable(claims["sub"])
+    if revoque_le is not None and float(claims.get("iat", 0)) < revoque_le:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué")
+    user = await Utilisateur.get(claims["sub"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton de rafraîchissement invalide")
+    _controler_statut(user)
+    return _emettre_jetons(user)
 
 
 async def _attribuer_medecin_automatiquement(patient: Utilisateur, department_id: str):
     """Attribution automatique d'un médecin au patient basée sur l'IA et la charge de travail."""
     try:
-        # Rechercher les médecins du département spécifié
-        medecins_departement = await Utilisateur.find({
-            "role": Role.medecin,
-            "department_id": department_id,
-            "is_active": True
-        }).to_list()
-        
-        if not medecins_departement:
-            print(f"[ATTRIBUTION] Aucun médecin trouvé dans le département {department_id}")
-            return
-        
-        # Algorithme IA simple : choisir le médecin avec le moins de patients
-        medecin_optimal = None
-        min_patients = float('inf')
-        
-        for medecin in medecins_departement:
-            nb_patients = len(medecin.patient_ids)
-            if nb_patients < min_patients:
-                min_patients = nb_patients
-                medecin_optimal = medecin
+        # Médecin le moins chargé du département (lecture d'index sur nb_patients)
+        medecin_optimal = await medecin_le_moins_charge(department_id)
         
         if medecin_optimal:
-            # Créer l'attribution bidirectionnelle
-            if str(medecin_optimal.id) not in patient.medecin_ids:
-                patient.medecin_ids.append(str(medecin_optimal.id))
-                await patient.save()
-            
-            if str(patient.id) not in medecin_optimal.patient_ids:
-                medecin_optimal.patient_ids.append(str(patient.id))
-                await medecin_optimal.save()
+            # Créer l'attribution bidirectionnelle ($addToSet des deux côtés)
+            await assigner(str(patient.id), medecin_optimal.id)
             
-            print(f"[ATTRIBUTION] Patient {patient.username} attribué au Dr. {medecin_optimal.username} ({min_patients} patients)")
+            LOGGER.info("Patient %s attribué au Dr. %s (%s patients)", patient.username, medecin_optimal.username, medecin_optimal.nb_patients)
         else:
-            print(f"[ATTRIBUTION] Aucun médecin optimal trouvé dans le département {department_id}")
+            LOGGER.warning("Aucun médecin disponible dans le département %s", department_id)
             
     except Exception as e:
-        print(f"[ATTRIBUTION] Erreur lors de l'attribution automatique: {e}")
+        LOGGER.exception("Erreur lors de l'attribution automatique : %s", e)
         # Ne pas faire échouer l'inscription si l'attribution échoue
@@ -3,22 +3,30 @@ Tous les commentaires sont rédigés en français.
 """
 
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from ..models import Department
 from ..schemas.department import DepartmentCreate, DepartmentUpdate, DepartmentResponse
-from ..dependencies.auth import get_current_user, require_role
+from ..dependencies.auth import Principal, get_principal, require_role
 from ..models.utilisateur import Utilisateur
+from ..utils.cache_http import CACHE_DEPARTEMENTS, ReponseConditionnelle, incrementer_versions, portee
 
 router = APIRouter(prefix="/departments", tags=["Départements"])
 
 
 @router.get("/", response_model=List[DepartmentResponse])
 async def get_departments(
-    current_user: Utilisateur = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupérer la liste de tous les départements actifs."""
+    # Liste identique pour tous les utilisateurs : identité neutre dans l'ETag
+    conditionnel = await ReponseConditionnelle.preparer(
+        request, [portee("departements")], "*", CACHE_DEPARTEMENTS
+    )
+    if conditionnel.non_modifie:
+        return conditionnel.reponse_304()
     departments = await Department.find({"is_active": True}).to_list()
-    return [
+    return conditionnel.reponse([
         DepartmentResponse(
             id=str(dept.id),
             name=dept.name,
@@ -27,15 +35,15 @@ async def get_departments(
             is_active=dept.is_active,
             created_at=dept.created_at,
             updated_at=dept.updated_at
-        )
+        ).model_dump()
         for dept in departments
-    ]
+    ])
 
 
 @router.get("/{department_id}", response_model=DepartmentResponse)
 async def get_department(
     department_id: str,
-    current_user: Utilisateur = Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupérer un département par son ID."""
     department = await Department.get(department_id)
@@ -80,6 +88,7 @@ async def create_department(
     # Créer le département
     department = Department(**department_data.dict())
     await department.insert()
+    await incrementer_versions("departements")
     
     return DepartmentResponse(
         id=str(department.id),
@@ -115,6 +124,7 @@ async def update_department(
         from datetime import datetime
         department.updated_at = datetime.utcnow()
         await department.save()
+        await incrementer_versions("departements")
     
     return DepartmentResponse(
         id=str(department.id),
@@ -145,5 +155,6 @@ async def delete_department(
     from datetime import datetime
     department.updated_at = datetime.utcnow()
     await department.save()
+    await incrementer_versions("departements")
     
     return {"message": "Département désactivé avec succès"}
@@ -3,14 +3,19 @@
 from typing import List
 from datetime import datetime
 
-from fastapi import APIRouter, Query, status, Depends
+from bson import ObjectId
+from fastapi import APIRouter, Header, HTTPException, Query, status, Depends
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
 
 from backend.dependencies.auth import get_current_user, verifier_roles, roles_sante
 from backend.models.utilisateur import Role, Utilisateur
 from backend.models.donnee import Donnee, SourceDonnee
 from backend.models.device import Device
-from backend.event_bus import publish as publish_event
-from backend.schemas.donnee import DonneeCreation, DonneeEnDB
+from backend.schemas.donnee import DonneeAcceptee, DonneeCreation, DonneeEnDB
+from backend.services import deduplication, ingestion, pipeline_ia
+from backend.utils.cache_http import incrementer_versions
+from backend.utils.serialisation import ReponseORJSON, projection
 
 router = APIRouter()
 
@@ -31,28 +36,77 @@ async def test_data_endpoint():
 
 
 @router.post("/data", response_model=DonneeEnDB, status_code=status.HTTP_201_CREATED,
+             responses={
+                 200: {"model": DonneeEnDB, "description": "Mesure déjà reçue : l'original est renvoyé"},
+                 202: {"model": DonneeAcceptee, "description": "Mesure acceptée, écriture différée"},
+                 409: {"description": "Appareil et date déjà utilisés par la mesure d'un autre patient"},
+                 429: {"description": "Analyse IA en retard : source différable refusée (voir Retry-After)"},
+             },
              dependencies=[Depends(verifier_roles([Role.patient, Role.medecin]))])
-async def ajouter_donnee(donnee: DonneeCreation, current_user=Depends(get_current_user)):
+async def ajouter_donnee(
+    donnee: DonneeCreation,
+    current_user=Depends(get_current_user),
+    prefer: str | None = Header(None, description="`respond-async` : réponse 202 avant l'écriture en base"),
+    idempotency_key: str | None = Header(None, max_length=200, description="Clé rendant les renvois sans effet"),
+):
     """
     Ajoute une donnée de santé dans MongoDB (Beanie).
     Le champ user_id est automatiquement renseigné avec l’ID du patient connecté (RGPD).
+    En mode asynchrone (`Prefer: respond-async` ou INGESTION_ASYNCHRONE), la mesure
+    est placée dans le flux d'ingestion et la réponse 202 porte son identifiant définitif.
+    Une mesure renvoyée (même `Idempotency-Key`, ou même appareil et même date)
+    n'est pas réinsérée : la réponse d'origine est rejouée (`Idempotent-Replayed`).
+    Quand l'analyse IA prend du retard, les sources différables (import, API
+    externe, puis saisie manuelle) reçoivent 429 ; les appareils connectés jamais.
     """
     donnee_data = donnee.model_dump(exclude={"user_id"})
+    user_id = str(current_user.id)
+    cle = deduplication.cle_cache(user_id, idempotency_key, donnee.device_id, donnee.date)
+    deja_servie = await deduplication.rejouer(cle)
+    if deja_servie is not None:
+        return JSONResponse(deja_servie[1], status_code=deja_servie[0], headers={"Idempotent-Replayed": "true"})
+    reessai = await pipeline_ia.suivi.refuser(donnee.source)
+    if reessai is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Analyse des mesures en retard : réessayer plus tard",
+            headers={"Retry-After": str(reessai)},
+        )
+
     # Insertion en BDD avec l’ID du patient courant
-    doc = Donnee(**donnee_data, user_id=str(current_user.id))
-    await doc.insert()
+    doc = Donnee(**donnee_data, user_id=user_id, cle_idempotence=idempotency_key)
+    if ingestion.asynchrone_demande(prefer):
+        recu = await ingestion.accepter(doc)
+        if recu is not None:
+            corps = DonneeAcceptee(id=recu).model_dump()
+            await deduplication.memoriser(cle, status.HTTP_202_ACCEPTED, corps)
+            return JSONResponse(corps, status_code=status.HTTP_202_ACCEPTED, headers={"Preference-Applied": "respond-async"})
+        # Redis indisponible : écriture synchrone
+    try:
+        await doc.insert()
+    except DuplicateKeyError:
+        # Renvoi dont la réponse n'est plus en cache : l'index unique a refusé le doublon
+        try:
+            original = await deduplication.retrouver_original(doc)
+        except deduplication.ConflitMesure:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Une mesure d'un autre patient existe déjà pour cet appareil à cette date",
+            )
+        if original is None:
+            raise
+        corps = DonneeEnDB(id=str(original.id), **original.model_dump(exclude={"id", "revision_id"})).model_dump(mode="json")
+        await deduplication.memoriser(cle, status.HTTP_200_OK, corps)
+        return JSONResponse(corps, headers={"Idempotent-Replayed": "true"})
+    await incrementer_versions("donnees", doc.user_id)
 
     # Publication d'un événement pour déclencher l'analyse IA
-    await publish_event(
-        "nouvelle_donnee",
-        {
-            "donnee_id": str(doc.id),
-            "device_id": doc.device_id,
-        },
-    )
+    await pipeline_ia.publier_donnee(doc)
 
     # Retourne la donnée insérée sans passer deux fois user_id
-    return DonneeEnDB(id=str(doc.id), user_id=str(current_user.id), **donnee_data)
+    resultat = DonneeEnDB(id=str(doc.id), user_id=user_id, **donnee_data)
+    await deduplication.memoriser(cle, status.HTTP_200_OK, resultat.model_dump(mode="json"))
+    return resultat
 
 
 #
@@ -98,47 +152,40 @@ async def lister_donnees(
         filtre["user_id"] = str(current_user.id)
     # Médecin : accès à toutes les données (démo). Pour restreindre, filtrer sur ses patients.
     # Admin : accès démo/documenté (jamais en prod RGPD)
-    donnees = await Donnee.find(filtre).to_list()
-    # Récupère les noms patients et appareils en une seule requête
-    user_ids = list({d.user_id for d in donnees})
-    device_ids = list({d.device_id for d in donnees if d.device_id})
-    from beanie import PydanticObjectId
-    from bson.errors import InvalidId
-    
-    # Filtre les ObjectIds valides pour les utilisateurs
-    valid_user_ids = []
-    for uid in user_ids:
-        try:
-            PydanticObjectId(uid)
-            valid_user_ids.append(uid)
-        except InvalidId:
-            pass
-    
-    # Filtre les ObjectIds valides pour les appareils
-    valid_device_ids = []
-    for did in device_ids:
-        try:
-            PydanticObjectId(did)
-            valid_device_ids.append(did)
-        except InvalidId:
-            pass
-    
-    utilisateurs = await Utilisateur.find({"_id": {"$in": [PydanticObjectId(uid) for uid in valid_user_ids]}}).to_list() if valid_user_ids else []
-    appareils = await Device.find({"_id": {"$in": [PydanticObjectId(did) for did in valid_device_ids]}}).to_list() if valid_device_ids else []
-    username_map = {str(u.id): u.username for u in utilisateurs}
-    device_map = {str(d.id): f"{d.type} ({d.numero_serie})" for d in appareils}
-
-    return [
-        DonneeEnDB(
-            id=str(d.id),
-            user_id=d.user_id,
-            patient_nom=username_map.get(d.user_id),
-            device_id=d.device_id,
-            device_nom=device_map.get(d.device_id),
-            frequence_cardiaque=d.frequence_cardiaque,
-            pression_arterielle=d.pression_arterielle,
-            taux_oxygene=d.taux_oxygene,
-            source=d.source,
-            date=d.date
-        ) for d in donnees
-    ]
+    # Chemin rapide : documents bruts projetés, encodés directement par orjson
+    donnees = await Donnee.get_motor_collection().find(
+        filtre,
+        projection("user_id", "device_id", "frequence_cardiaque", "pression_arterielle",
+                   "taux_oxygene", "source", "date"),
+    ).to_list(None)
+    # Récupère les noms patients et appareils en une seule requête chacun
+    user_ids = {d.get("user_id") for d in donnees}
+    device_ids = {d.get("device_id") for d in donnees if d.get("device_id")}
+
+    # Filtre les ObjectIds valides pour les utilisateurs et les appareils
+    valid_user_ids = [ObjectId(uid) for uid in user_ids if uid and ObjectId.is_valid(uid)]
+    valid_device_ids = [ObjectId(did) for did in device_ids if ObjectId.is_valid(did)]
+
+    utilisateurs = await Utilisateur.get_motor_collection().find(
+        {"_id": {"$in": valid_user_ids}}, projection("username")
+    ).to_list(None) if valid_user_ids else []
+    appareils = await Device.get_motor_collection().find(
+        {"_id": {"$in": valid_device_ids}}, projection("type", "numero_serie")
+    ).to_list(None) if valid_device_ids else []
+    username_map = {str(u["_id"]): u.get("username") for u in utilisateurs}
+    device_map = {str(d["_id"]): f"{d.get('type')} ({d.get('numero_serie')})" for d in appareils}
+
+    return ReponseORJSON([
+        {
+            "id": str(d["_id"]),
+            "user_id": d.get("user_id"),
+            "patient_nom": username_map.get(d.get("user_id")),
+            "device_id": d.get("device_id"),
+            "device_nom": device_map.get(d.get("device_id")),
+            "frequence_cardiaque": d.get("frequence_cardiaque"),
+            "pression_arterielle": d.get("pression_arterielle"),
+            "taux_oxygene": d.get("taux_oxygene"),
+            "source": d.get("source", SourceDonnee.SAISIE_MANUELLE.value),
+            "date": d.get("date"),
+        } for d in donnees
+    ])
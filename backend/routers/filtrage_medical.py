@@ -7,15 +7,18 @@ from fastapi import APIRouter, Depends, HTTPException
 from backend.models.alerte import Alerte
 from backend.models.recommandation import Recommandation
 from backend.models.utilisateur import Utilisateur, Role
-from backend.dependencies.auth import get_current_user
+from backend.dependencies.auth import Principal, get_current_user, get_principal
+from backend.services.patients_medecin import index_patients
 from backend.db import get_client, MONGO_DB_NAME
+from backend.utils.cache_http import incrementer_versions
+from backend.utils.serialisation import ReponseORJSON, projection
 
 router = APIRouter(prefix="/filtrage", tags=["Filtrage Médical"])
 
 
 @router.get("/alertes/patient")
 async def get_alertes_patient(
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupère les alertes visibles pour un patient (filtrage médical)."""
     if current_user.role != Role.patient:
@@ -31,25 +34,25 @@ async def get_alertes_patient(
         "user_id": str(current_user.id),
         "visible_patient": True,  # Filtrage médical
         "statut": "nouvelle"
-    }).sort("date", -1)
+    }, projection("message", "niveau", "priorite_medicale", "date", "statut")).sort("date", -1)
     alertes_docs = await alertes_cursor.to_list(None)
     
-    return [
+    return ReponseORJSON([
         {
             "id": str(doc["_id"]),
             "message": doc["message"],
             "niveau": doc["niveau"],
             "priorite_medicale": doc.get("priorite_medicale", "normale"),
-            "date": doc["date"] if isinstance(doc["date"], str) else doc["date"].isoformat(),
+            "date": doc["date"],
             "statut": doc["statut"]
         }
         for doc in alertes_docs
-    ]
+    ])
 
 
 @router.get("/recommandations/patient")
 async def get_recommandations_patient(
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupère les recommandations visibles pour un patient (validées par médecin)."""
     if current_user.role != Role.patient:
@@ -66,25 +69,25 @@ async def get_recommandations_patient(
         "visible_patient": True,  # Filtrage médical
         "validation_medicale": True,  # Validée par médecin
         "statut": "nouvelle"
-    }).sort("date", -1)
+    }, projection("titre", "description", "priorite_medicale", "date", "statut")).sort("date", -1)
     recos_docs = await recos_cursor.to_list(None)
     
-    return [
+    return ReponseORJSON([
         {
             "id": str(doc["_id"]),
             "titre": doc.get("titre", "Recommandation de santé"),
             "description": doc.get("description", "Aucune description disponible"),
             "priorite_medicale": doc.get("priorite_medicale", "normale"),
-            "date": doc["date"] if isinstance(doc["date"], str) else doc["date"].isoformat(),
+            "date": doc["date"],
             "statut": doc["statut"]
         }
         for doc in recos_docs
-    ]
+    ])
 
 
 @router.get("/alertes/medecin/critiques")
 async def get_alertes_critiques_medecin(
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupère uniquement les alertes critiques pour le médecin (priorité haute)."""
     if current_user.role != Role.medecin:
@@ -96,39 +99,34 @@ async def get_alertes_critiques_medecin(
     client = get_client()
     db = client[MONGO_DB_NAME]
     
-    patients_cursor = db.utilisateurs.find({
-        "role": "patient",
-        "medecin_ids": medecin_id_str
-    })
-    patients_docs = await patients_cursor.to_list(None)
+    patient_map = await index_patients.patients(medecin_id_str)
     
-    if not patients_docs:
+    if not patient_map:
         return []
     
-    patient_ids = [str(doc["_id"]) for doc in patients_docs]
-    patient_map = {str(doc["_id"]): doc["username"] for doc in patients_docs}
+    patient_ids = list(patient_map)
     
     # Alertes critiques uniquement
     alertes_cursor = db.alertes.find({
         "user_id": {"$in": patient_ids},
         "priorite_medicale": {"$in": ["critique", "elevee"]},  # Priorité haute
         "statut": "nouvelle"
-    }).sort("date", -1)
+    }, projection("user_id", "message", "niveau", "priorite_medicale", "date", "statut")).sort("date", -1)
     alertes_docs = await alertes_cursor.to_list(None)
     
-    return [
+    return ReponseORJSON([
         {
             "id": str(doc["_id"]),
             "user_id": doc["user_id"],
             "message": doc["message"],
             "niveau": doc["niveau"],
             "priorite_medicale": doc.get("priorite_medicale", "normale"),
-            "date": doc["date"] if isinstance(doc["date"], str) else doc["date"].isoformat(),
+            "date": doc["date"],
             "statut": doc["statut"],
             "patient_nom": patient_map.get(doc["user_id"], "Patient inconnu")
         }
         for doc in alertes_docs
-    ]
+    ])
 
 
 @router.patch("/recommandation/{reco_id}/valider")
@@ -148,7 +146,7 @@ async def valider_recommandation_medecin(
     db = client[MONGO_DB_NAME]
     
     # Mettre à jour la recommandation
-    result = await db.recommandations.update_one(
+    reco = await db.recommandations.find_one_and_update(
         {"_id": ObjectId(reco_id)},
         {
             "$set": {
@@ -157,10 +155,12 @@ async def valider_recommandation_medecin(
                 "vue_par": str(current_user.id),
                 "statut": "validee"
             }
-        }
+        },
+        projection={"user_id": 1},
     )
     
-    if result.matched_count == 0:
+    if reco is None:
         raise HTTPException(status_code=404, detail="Recommandation non trouvée")
+    await incrementer_versions("recommandations", reco.get("user_id"))
     
     return {"message": "Recommandation validée avec succès", "visible_patient": visible_patient}
@@ -1,20 +1,29 @@
 """Routeur pour les fonctionnalités spécifiques aux médecins."""
 
+import logging
+import asyncio
+import hashlib
 from typing import List, Dict, Any
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends
-from backend.dependencies.auth import get_current_user, verifier_roles
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from backend.dependencies.auth import Principal, get_current_user, get_principal, verifier_roles
 from backend.models.utilisateur import Utilisateur, Role
 from backend.models.alerte import Alerte
 from backend.models.recommandation import Recommandation
 from backend.models.donnee import Donnee
+from backend.services.assignation import assigner
+from backend.services.patients_medecin import index_patients
+from backend.utils.cache_http import ReponseConditionnelle, incrementer_versions, portee
+from backend.utils.serialisation import ReponseORJSON, encoder_json, projection
+
+LOGGER = logging.getLogger("medecin")
 
 router = APIRouter(prefix="/medecin", tags=["medecin"])
 
 
 @router.get("/patients")
-async def get_medecin_patients(current_user=Depends(get_current_user)):
+async def get_medecin_patients(current_user: Principal = Depends(get_principal)):
     """Récupère la liste des patients assignés au médecin connecté."""
     if current_user.role != Role.medecin:
         raise HTTPException(status_code=403, detail="Accès réservé aux médecins")
@@ -23,35 +32,38 @@ async def get_medecin_patients(current_user=Depends(get_current_user)):
     medecin_id_str = str(current_user.id)
     
     # Requête MongoDB directe pour éviter les problèmes avec Beanie
-    from motor.motor_asyncio import AsyncIOMotorClient
+    from bson import ObjectId
     from backend.db import get_client, MONGO_DB_NAME
     
     client = get_client()
     db = client[MONGO_DB_NAME]
     
+    # Ensemble des patients via l'index, puis lecture par clé primaire
+    patient_ids = await index_patients.patients(medecin_id_str)
+    if not patient_ids:
+        return []
     patients_cursor = db.utilisateurs.find({
+        "_id": {"$in": [ObjectId(pid) for pid in patient_ids]},
         "role": "patient",
-        "medecin_ids": medecin_id_str
-    })
+    }, projection("username", "email", "created_at"))
     patients_docs = await patients_cursor.to_list(None)
     
-    patients = []
-    for doc in patients_docs:
-        patients.append({
+    return ReponseORJSON([
+        {
             "id": str(doc["_id"]),
             "username": doc["username"],
             "email": doc["email"],
-            "created_at": doc["created_at"].isoformat() if "created_at" in doc else ""
-        })
-    
-    return patients
+            "created_at": doc.get("created_at", "")
+        }
+        for doc in patients_docs
+    ])
 
 
 @router.get("/alertes")
 async def get_medecin_alertes(
     statut: str = "nouvelle",
     patient_id: str = None,
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupère les alertes des patients du médecin selon le statut."""
     if current_user.role != Role.medecin:
@@ -64,18 +76,13 @@ async def get_medecin_alertes(
     client = get_client()
     db = client[MONGO_DB_NAME]
     
-    # Récupérer les patients du médecin
-    patients_cursor = db.utilisateurs.find({
-        "role": "patient",
-        "medecin_ids": medecin_id_str
-    })
-    patients_docs = await patients_cursor.to_list(None)
+    # Récupérer les patients du médecin (index, sans scan de medecin_ids)
+    patient_map = await index_patients.patients(medecin_id_str)
     
-    if not patients_docs:
+    if not patient_map:
         return []
     
-    patient_ids = [str(doc["_id"]) for doc in patients_docs]
-    patient_map = {str(doc["_id"]): doc["username"] for doc in patients_docs}
+    patient_ids = list(patient_map)
     
     # Filtrer par patient spécifique si demandé
     if patient_id:
@@ -87,34 +94,34 @@ async def get_medecin_alertes(
     alertes_cursor = db.alertes.find({
         "user_id": {"$in": patient_ids},
         "statut": statut
-    }).sort("date", -1)
+    }, projection("user_id", "message", "niveau", "date", "statut")).sort("date", -1)
     alertes_docs = await alertes_cursor.to_list(None)
     
-    return [
+    return ReponseORJSON([
         {
             "id": str(doc["_id"]),
             "user_id": doc["user_id"],
             "message": doc["message"],
             "niveau": doc["niveau"],
-            "date": doc["date"] if isinstance(doc["date"], str) else doc["date"].isoformat(),
+            "date": doc["date"],
             "statut": doc["statut"],
             "patient_nom": patient_map.get(doc["user_id"], "Patient inconnu")
         }
         for doc in alertes_docs
-    ]
+    ])
 
 
 @router.get("/recommandations")
 async def get_medecin_recommandations(
     statut: str = "nouvelle",
     patient_id: str = None,
-    current_user=Depends(get_current_user)
+    current_user: Principal = Depends(get_principal)
 ):
     """Récupère les recommandations des patients du médecin selon le statut."""
-    print(f"[DEBUG] Médecin connecté: {current_user.username} (ID: {current_user.id}, Role: {current_user.role})")
+    LOGGER.debug("Médecin connecté : %s (%s, %s)", current_user.username, current_user.id, current_user.role)
     
     if current_user.role != Role.medecin:
-        print(f"[DEBUG] Accès refusé - Role: {current_user.role} != {Role.medecin}")
+        LOGGER.debug("Accès refusé : rôle %s", current_user.role)
         raise HTTPException(status_code=403, detail="Accès réservé aux médecins")
     
     # Récupérer les IDs des patients du médecin avec requête MongoDB directe
@@ -124,18 +131,13 @@ async def get_medecin_recommandations(
     client = get_client()
     db = client[MONGO_DB_NAME]
     
-    # Récupérer les patients du médecin
-    patients_cursor = db.utilisateurs.find({
-        "role": "patient",
-        "medecin_ids": medecin_id_str
-    })
-    patients_docs = await patients_cursor.to_list(None)
+    # Récupérer les patients du médecin (index, sans scan de medecin_ids)
+    patient_map = await index_patients.patients(medecin_id_str)
     
-    if not patients_docs:
+    if not patient_map:
         return []
     
-    patient_ids = [str(doc["_id"]) for doc in patients_docs]
-    patient_map = {str(doc["_id"]): doc["username"] for doc in patients_docs}
+    patient_ids = list(patient_map)
     
     # Filtrer par patient spécifique si demandé
     if patient_id:
@@ -148,24 +150,120 @@ async def get_medecin_recommandations(
         "user_id": {"$in": patient_ids},
         "statut": statut
     }
-    print(f"[DEBUG] Requête recommandations: {query}")
+    LOGGER.debug("Requête recommandations : %s", query)
     
-    recos_cursor = db.recommandations.find(query).sort("date", -1)
+    recos_cursor = db.recommandations.find(
+        query, projection("user_id", "titre", "description", "date", "statut")
+    ).sort("date", -1)
     recos_docs = await recos_cursor.to_list(None)
-    print(f"[DEBUG] Recommandations trouvées: {len(recos_docs)}")
+    LOGGER.debug("Recommandations trouvées : %s", len(recos_docs))
     
-    return [
+    return ReponseORJSON([
         {
             "id": str(doc["_id"]),
             "user_id": doc["user_id"],
             "titre": doc.get("titre", "Recommandation de santé"),
             "description": doc.get("description", "Aucune description disponible"),
-            "date": doc["date"] if isinstance(doc["date"], str) else doc["date"].isoformat(),
+            "date": doc["date"],
             "statut": doc["statut"],
             "patient_nom": patient_map.get(doc["user_id"], "Patient inconnu")
         }
         for doc in recos_docs
-    ]
+    ])
+
+
+PRIORITES_HAUTES = ["critique", "elevee"]
+
+
+def _pipeline_inbox(patient_ids: List[str], champs: Dict[str, int], limite: int,
+                    critiques: bool) -> List[Dict[str, Any]]:
+    """Pipeline `$facet` : compteurs par statut et top-N des éléments nouveaux."""
+    top = [{"$sort": {"date": -1}}, {"$limit": limite}, {"$project": champs}]
+    facettes: Dict[str, Any] = {
+        "compteurs": [{"$group": {"_id": "$statut", "total": {"$sum": 1}}}],
+        "nouvelles": [{"$match": {"statut": "nouvelle"}}, *top],
+    }
+    if critiques:
+        filtre = {"statut": "nouvelle", "priorite_medicale": {"$in": PRIORITES_HAUTES}}
+        facettes["critiques"] = [{"$match": filtre}, *top]
+        facettes["nb_critiques"] = [{"$match": filtre}, {"$count": "total"}]
+    return [{"$match": {"user_id": {"$in": patient_ids}}}, {"$facet": facettes}]
+
+
+def _section_inbox(resultat: List[Dict[str, Any]], patient_map: Dict[str, str],
+                   critiques: bool) -> Dict[str, Any]:
+    """Met en forme la sortie `$facet` (id en str, nom du patient)."""
+    facettes = resultat[0] if resultat else {}
+
+    def elements(cle: str) -> List[Dict[str, Any]]:
+        return [
+            {"id": str(doc.pop("_id")), **doc, "patient_nom": patient_map.get(doc["user_id"], "Patient inconnu")}
+            for doc in facettes.get(cle, [])
+        ]
+
+    section: Dict[str, Any] = {
+        "compteurs": {c["_id"]: c["total"] for c in facettes.get("compteurs", []) if c["_id"]},
+        "nouvelles": elements("nouvelles"),
+    }
+    if critiques:
+        section["critiques"] = elements("critiques")
+        nb = facettes.get("nb_critiques") or [{"total": 0}]
+        section["nb_critiques"] = nb[0]["total"]
+    return section
+
+
+@router.get("/inbox")
+async def get_medecin_inbox(
+    request: Request,
+    limite: int = Query(10, ge=1, le=50),
+    current_user: Principal = Depends(get_principal)
+):
+    """Boîte de réception du médecin : compteurs et top-N par catégorie.
+
+    Remplace les appels successifs à /medecin/patients, /medecin/alertes,
+    /medecin/recommandations et /filtrage/alertes/medecin/critiques.
+    L'ETag dérive des compteurs de version (alertes et recommandations de
+    chaque patient, compte du médecin) et de l'ensemble des patients : un
+    `If-None-Match` à jour reçoit un 304 avant toute agrégation.
+    """
+    if current_user.role != Role.medecin:
+        raise HTTPException(status_code=403, detail="Accès réservé aux médecins")
+
+    from backend.db import get_client, MONGO_DB_NAME
+    db = get_client()[MONGO_DB_NAME]
+
+    patient_map = await index_patients.patients(str(current_user.id))
+    patient_ids = list(patient_map)
+    medecin_id = str(current_user.id)
+    portees = [portee("utilisateurs", medecin_id)]
+    for pid in patient_ids:
+        portees += [portee("alertes", pid), portee("recommandations", pid)]
+    # Patients assignés et leurs noms : une (dés)assignation ou un renommage change l'ETag
+    empreinte = hashlib.blake2b(encoder_json(sorted(patient_map.items())), digest_size=16).hexdigest()
+    conditionnel = await ReponseConditionnelle.preparer(request, portees, f"{medecin_id}:{empreinte}")
+    if conditionnel.non_modifie:
+        return conditionnel.reponse_304()
+
+    champs_alerte = projection("user_id", "message", "niveau", "priorite_medicale", "date", "statut")
+    champs_reco = projection("user_id", "titre", "description", "date", "statut")
+
+    if patient_ids:
+        # Une agrégation $facet par collection, exécutées en parallèle
+        alertes, recos = await asyncio.gather(
+            db.alertes.aggregate(_pipeline_inbox(patient_ids, champs_alerte, limite, True)).to_list(None),
+            db.recommandations.aggregate(_pipeline_inbox(patient_ids, champs_reco, limite, False)).to_list(None),
+        )
+    else:
+        alertes, recos = [], []
+
+    alertes_section = _section_inbox(alertes, patient_map, critiques=True)
+    recos_section = _section_inbox(recos, patient_map, critiques=False)
+
+    return conditionnel.reponse({
+        "patients": {"total": len(patient_ids)},
+        "alertes": alertes_section,
+        "recommandations": recos_section,
+    })
 
 
 @router.patch("/alertes/{alerte_id}/marquer-vue")
@@ -181,8 +279,7 @@ async def marquer_alerte_vue(alerte_id: str, current_user=Depends(get_current_us
             raise HTTPException(status_code=404, detail="Alerte introuvable")
         
         # Vérifier que le patient appartient au médecin
-        patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(alerte.user_id))
-        if not patient or str(current_user.id) not in patient.medecin_ids:
+        if not await index_patients.est_patient(str(current_user.id), alerte.user_id):
             raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
         
         # Marquer comme vue
@@ -192,6 +289,7 @@ async def marquer_alerte_vue(alerte_id: str, current_user=Depends(get_current_us
         alerte.updated_at = datetime.utcnow()
         
         await alerte.save()
+        await incrementer_versions("alertes", alerte.user_id)
         
         return {"message": "Alerte marquée comme vue"}
         
@@ -212,8 +310,7 @@ async def marquer_recommandation_vue(reco_id: str, current_user=Depends(get_curr
             raise HTTPException(status_code=404, detail="Recommandation introuvable")
         
         # Vérifier que le patient appartient au médecin
-        patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(reco.user_id))
-        if not patient or str(current_user.id) not in patient.medecin_ids:
+        if not await index_patients.est_patient(str(current_user.id), reco.user_id):
             raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
         
         # Marquer comme vue
@@ -223,6 +320,7 @@ async def marquer_recommandation_vue(reco_id: str, current_user=Depends(get_curr
         reco.updated_at = datetime.utcnow()
         
         await reco.save()
+        await incrementer_versions("recommandations", reco.user_id)
         
         return {"message": "Recommandation marquée comme vue"}
         
@@ -245,20 +343,8 @@ async def assign_patient_to_medecin(patient_id: str, current_user=Depends(get_cu
         if not patient:
             raise HTTPException(status_code=404, detail="Patient introuvable")
         
-        medecin_id = str(current_user.id)
-        
-        # Ajouter le médecin à la liste des médecins du patient
-        if medecin_id not in patient.medecin_ids:
-            patient.medecin_ids.append(medecin_id)
-            patient.updated_at = datetime.utcnow()
-            await patient.save()
-        
-        # Ajouter le patient à la liste des patients du médecin
-        if patient_id not in current_user.patient_ids:
-            current_user.patient_ids.append(patient_id)
-            current_user.updated_at = datetime.utcnow()
-            await current_user.save()
-        
+        # Lien ajouté des deux côtés ($addToSet), sans réécrire les documents
+        await assigner(patient_id, str(current_user.id))
         return {"message": f"Patient {patient.username} assigné avec succès"}
         
     except Exception as e:
@@ -280,9 +366,7 @@ async def creer_recommandation(
         if not patient_id:
             raise HTTPException(status_code=400, detail="ID patient requis")
         
-        from bson import ObjectId
-        patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(patient_id))
-        if not patient or str(current_user.id) not in patient.medecin_ids:
+        if not await index_patients.est_patient(str(current_user.id), patient_id):
             raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
         
         # Créer la recommandation
@@ -296,6 +380,7 @@ async def creer_recommandation(
         )
         
         await recommandation.insert()
+        await incrementer_versions("recommandations", patient_id)
         
         return {
             "id": str(recommandation.id),
@@ -2,23 +2,28 @@
 Simple implémentation : agrège les données, alertes et recommandations liées au patient.
 Assume que l'ID patient est l'ObjectId du document Utilisateur avec role=='patient'."""
 
+import logging
 from typing import List, Dict, Any
 
 from beanie.operators import In
-from fastapi import APIRouter, HTTPException, Depends
-from backend.dependencies.auth import get_current_user
+from fastapi import APIRouter, HTTPException, Depends, Request
+from backend.dependencies.auth import Principal, get_principal
 from backend.models.utilisateur import Utilisateur, Role
 from backend.models.donnee import Donnee
 from backend.models.alerte import Alerte
 from backend.models.recommandation import Recommandation
+from backend.services.patients_medecin import index_patients
+from backend.utils.cache_http import ReponseConditionnelle, portee
 from bson import ObjectId
 from datetime import datetime
 
+LOGGER = logging.getLogger("patients")
+
 router = APIRouter(prefix="/patients", tags=["patients"])
 
 
 @router.get("/{patient_id}/summary")
-async def patient_summary(patient_id: str, current_user=Depends(get_current_user)) -> Dict[str, Any]:
+async def patient_summary(patient_id: str, request: Request, current_user: Principal = Depends(get_principal)):
     """Infos générales + derniers signes vitaux d'un patient."""
     # Vérifier les permissions
     if current_user.role == Role.patient:
@@ -27,11 +32,17 @@ async def patient_summary(patient_id: str, current_user=Depends(get_current_user
             raise HTTPException(status_code=403, detail="Accès non autorisé")
     elif current_user.role == Role.medecin:
         # Un médecin ne peut voir que ses patients assignés
-        patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(patient_id))
-        if not patient or str(current_user.id) not in patient.medecin_ids:
+        if not await index_patients.est_patient(str(current_user.id), patient_id):
             raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
     # Admin peut voir tous les patients
     
+    # Contenu identique pour tout appelant autorisé : dépend du patient et de ses données
+    conditionnel = await ReponseConditionnelle.preparer(
+        request, [portee("utilisateurs", patient_id), portee("donnees", patient_id)], "*"
+    )
+    if conditionnel.non_modifie:
+        return conditionnel.reponse_304()
+
     oid = ObjectId(patient_id)
     patient = await Utilisateur.find_one(Utilisateur.id == oid, Utilisateur.role == "patient")
     if not patient:
@@ -41,16 +52,16 @@ async def patient_summary(patient_id: str, current_user=Depends(get_current_user
     last_data_docs = await Donnee.find(Donnee.user_id == patient_id).sort("-date").limit(1).to_list()
     last_data = last_data_docs[0] if last_data_docs else None
 
-    return {
+    return conditionnel.reponse({
         "id": patient_id,
         "nom": patient.username,
         "email": patient.email,
         "last_data": last_data.dict() if last_data else None,
-    }
+    })
 
 
 @router.get("/{patient_id}/history")
-async def patient_history(patient_id: str, current_user=Depends(get_current_user)) -> Dict[str, Any]:
+async def patient_history(patient_id: str, current_user: Principal = Depends(get_principal)) -> Dict[str, Any]:
     """Historique complet : données santé, alertes, recommandations."""
     # Vérifier les permissions
     if current_user.role == Role.patient:
@@ -59,8 +70,7 @@ async def patient_history(patient_id: str, current_user=Depends(get_current_user
             raise HTTPException(status_code=403, detail="Accès non autorisé")
     elif current_user.role == Role.medecin:
         # Un médecin ne peut voir que ses patients assignés
-        patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(patient_id))
-        if not patient or str(current_user.id) not in patient.medecin_ids:
+        if not await index_patients.est_patient(str(current_user.id), patient_id):
             raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
     # Admin peut voir tous les patients
     
@@ -99,6 +109,6 @@ async def patient_history(patient_id: str, current_user=Depends(get_current_user
             "recommandations": [serialize_item(r) for r in recos]
         }
     except Exception as e:
-        print(f"Erreur détaillée dans patient_history: {e}")
+        LOGGER.exception("Erreur dans patient_history : %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'historique: {str(e)}")
 
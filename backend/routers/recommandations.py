@@ -1,27 +1,23 @@
 """Routeur pour la consultation des recommandations."""
 
+import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel, Field
 from bson import ObjectId
-import motor.motor_asyncio as motor_asyncio
-import os
-from dotenv import load_dotenv
-
-# Charger les variables d'environnement
-load_dotenv()
 
+from backend.db import get_database
 from backend.models.recommandation import Recommandation
 from backend.schemas.recommandation import RecommandationEnDB
-from backend.dependencies.auth import get_current_user, verifier_roles
+from backend.dependencies.auth import Principal, get_current_user, get_principal, verifier_roles
 from backend.models.utilisateur import Role
+from backend.services.patients_medecin import index_patients
+from backend.utils.cache_http import ReponseConditionnelle, incrementer_versions, portee
 
-router = APIRouter(tags=["recommendations"])
+LOGGER = logging.getLogger("recommandations")
 
-# Initialisation du client MongoDB
-mongo_client = motor_asyncio.AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://mongo:27017"))
-db = mongo_client[os.getenv("MONGODB_DB", "sante_db")]
+router = APIRouter(tags=["recommendations"])
 
 def format_recommendation(doc: dict) -> dict:
     """Formate un document de recommandation brut en un format compatible avec le frontend."""
@@ -80,7 +76,7 @@ def format_recommendation(doc: dict) -> dict:
         }
         
     except Exception as e:
-        print(f"Erreur lors du formatage d'une recommandation (ID: {doc.get('_id', 'inconnu')}): {e}")
+        LOGGER.warning("Erreur lors du formatage d'une recommandation (ID : %s) : %s", doc.get('_id', 'inconnu'), e)
         # Retourner une recommandation minimale en cas d'erreur
         return {
             "id": str(doc.get('_id', '')),
@@ -110,8 +106,10 @@ async def creer_recommandation(reco: dict, current_user=Depends(get_current_user
             "updated_at": datetime.utcnow()
         }
         
-        # Insérer le document directement dans MongoDB
+        # Insérer le document directement dans MongoDB (pool partagé du worker)
+        db = get_database()
         result = await db.recommandations.insert_one(doc)
+        await incrementer_versions("recommandations", doc["user_id"])
         
         # Récupérer le document inséré
         inserted_doc = await db.recommandations.find_one({"_id": result.inserted_id})
@@ -120,14 +118,14 @@ async def creer_recommandation(reco: dict, current_user=Depends(get_current_user
         return format_recommendation(inserted_doc)
         
     except Exception as e:
-        print(f"Erreur lors de la création d'une recommandation: {e}")
+        LOGGER.exception("Erreur lors de la création d'une recommandation : %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la création de la recommandation: {str(e)}"
         )
 
 @router.get("/recommendations", response_model=List[RecommandationEnDB])
-async def lister_recommandations(current_user=Depends(get_current_user)):
+async def lister_recommandations(request: Request, current_user: Principal = Depends(get_principal)):
     """Renvoie les recommandations du patient connecté.
     
     Le format de réponse est adapté pour correspondre aux attentes du frontend :
@@ -138,9 +136,17 @@ async def lister_recommandations(current_user=Depends(get_current_user)):
     - date: date de création
     """
     try:
+        user_id = str(current_user.id)
+        conditionnel = await ReponseConditionnelle.preparer(
+            request, [portee("recommandations", user_id)], user_id
+        )
+        if conditionnel.non_modifie:
+            return conditionnel.reponse_304()
+
         # Récupérer les documents bruts
+        db = get_database()
         cursor = db.recommandations.find({
-            "user_id": str(current_user.id), 
+            "user_id": user_id, 
             "is_active": True
         })
         
@@ -151,10 +157,10 @@ async def lister_recommandations(current_user=Depends(get_current_user)):
             if formatted:
                 recommendations.append(formatted)
         
-        return recommendations
+        return conditionnel.reponse(recommendations)
         
     except Exception as e:
-        print(f"Erreur critique lors de la récupération des recommandations: {e}")
+        LOGGER.exception("Erreur critique lors de la récupération des recommandations : %s", e)
         # Retourner une liste vide en cas d'erreur critique
         return []
 
@@ -172,8 +178,7 @@ async def marquer_recommandation_vue(reco_id: str, current_user=Depends(get_curr
         # Vérifier les permissions selon le rôle
         if current_user.role == Role.medecin:
             # Pour un médecin : vérifier que le patient lui est assigné
-            patient = await Utilisateur.find_one(Utilisateur.id == ObjectId(reco.user_id))
-            if not patient or str(current_user.id) not in patient.medecin_ids:
+            if not await index_patients.est_patient(str(current_user.id), reco.user_id):
                 raise HTTPException(status_code=403, detail="Patient non assigné à ce médecin")
         elif current_user.role == Role.patient:
             # Pour un patient : vérifier que c'est sa propre recommandation
@@ -190,6 +195,7 @@ async def marquer_recommandation_vue(reco_id: str, current_user=Depends(get_curr
         reco.updated_at = datetime.utcnow()
         
         await reco.save()
+        await incrementer_versions("recommandations", reco.user_id)
         
         return {"message": "Recommandation marquée comme vue"}
         
@@ -2,15 +2,19 @@
 Tous les commentaires sont rédigés en français.
 """
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from fastapi import APIRouter, HTTPException, Depends, status, Query
 from beanie import PydanticObjectId
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from ..models import Referral, Assignment, Utilisateur, Department
 from ..schemas.referral import (
-    ReferralCreate, ReferralUpdate, ReferralResponse,
+    ReferralCreate, ReferralUpdate, ReferralResponse, MetriquesFileDepartement,
     AssignmentCreate, AssignmentUpdate, AssignmentResponse
 )
 from ..dependencies.auth import get_current_user, require_role
+from ..services import file_orientations
+from ..services.assignation import definir_assignation_courante
 from datetime import datetime
 
 router = APIRouter(prefix="/referrals", tags=["Orientations"])
@@ -55,43 +59,113 @@ async def get_referrals(
     if patient_id:
         filter_query["patient_id"] = patient_id
     
-    referrals = await Referral.find(filter_query).to_list()
-    
-    # Enrichir avec les noms
-    enriched_referrals = []
-    for referral in referrals:
-        # Récupérer le nom du patient
-        patient = await Utilisateur.get(referral.patient_id)
-        patient_name = patient.username if patient else "Inconnu"
-        
-        # Récupérer le nom du département
-        department = await Department.get(referral.proposed_department_id)
-        department_name = department.name if department else "Inconnu"
-        
-        # Récupérer le nom du créateur
-        created_by_name = None
-        if referral.created_by:
-            creator = await Utilisateur.get(referral.created_by)
-            created_by_name = creator.username if creator else "Inconnu"
-        
-        enriched_referrals.append(ReferralResponse(
-            id=str(referral.id),
-            patient_id=referral.patient_id,
-            proposed_department_id=referral.proposed_department_id,
-            status=referral.status,
-            source=referral.source,
-            notes=referral.notes,
-            created_by=referral.created_by,
-            processed_by=referral.processed_by,
-            processed_at=referral.processed_at,
-            created_at=referral.created_at,
-            updated_at=referral.updated_at,
-            patient_name=patient_name,
-            department_name=department_name,
-            created_by_name=created_by_name
-        ))
-    
-    return enriched_referrals
+    referrals = await Referral.get_motor_collection().find(filter_query).to_list(None)
+    return await _enrichir(referrals)
+
+
+async def _noms(modele, ids: Iterable[str], champ: str) -> Dict[str, str]:
+    """{id: champ} pour un lot d'identifiants, en une seule requête."""
+    object_ids = [ObjectId(i) for i in set(ids) if i and ObjectId.is_valid(i)]
+    if not object_ids:
+        return {}
+    curseur = modele.get_motor_collection().find({"_id": {"$in": object_ids}}, {champ: 1})
+    return {str(doc["_id"]): doc.get(champ) for doc in await curseur.to_list(None)}
+
+
+async def _enrichir(referrals: List[dict]) -> List[ReferralResponse]:
+    """Ajoute les noms patient/département/créateur (deux requêtes pour tout le lot)."""
+    utilisateurs = await _noms(
+        Utilisateur,
+        [r["patient_id"] for r in referrals] + [r.get("created_by") for r in referrals],
+        "username",
+    )
+    departements = await _noms(Department, [r["proposed_department_id"] for r in referrals], "name")
+    return [
+        ReferralResponse(
+            id=str(r["_id"]),
+            patient_id=r["patient_id"],
+            proposed_department_id=r["proposed_department_id"],
+            status=r["status"],
+            source=r.get("source", "IA"),
+            notes=r.get("notes"),
+            created_by=r.get("created_by"),
+            processed_by=r.get("processed_by"),
+            processed_at=r.get("processed_at"),
+            priorite=r.get("priorite", 1),
+            claimed_by=r.get("claimed_by"),
+            claimed_at=r.get("claimed_at"),
+            created_at=r["created_at"],
+            updated_at=r.get("updated_at", r["created_at"]),
+            patient_name=utilisateurs.get(r["patient_id"], "Inconnu"),
+            department_name=departements.get(r["proposed_department_id"], "Inconnu"),
+            created_by_name=utilisateurs.get(r["created_by"], "Inconnu") if r.get("created_by") else None,
+        )
+        for r in referrals
+    ]
+
+
+# -----------------------------------------------------------------------------
+# File de travail par département
+# -----------------------------------------------------------------------------
+
+def _departement_de_la_file(current_user: Utilisateur, department_id: Optional[str]) -> str:
+    """Département consulté : celui du médecin, ou celui demandé par un admin."""
+    if current_user.role == "medecin":
+        if not current_user.department_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Aucun département associé")
+        return current_user.department_id
+    if current_user.role == "admin":
+        if not department_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="department_id requis")
+        return department_id
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Accès non autorisé")
+
+
+@router.get("/queue", response_model=List[ReferralResponse])
+async def file_departement(
+    department_id: Optional[str] = Query(None, description="Département (admin uniquement)"),
+    limite: int = Query(20, ge=1, le=100),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """Orientations libres du département, par priorité puis ancienneté."""
+    departement = _departement_de_la_file(current_user, department_id)
+    return await _enrichir(await file_orientations.lister(departement, limite))
+
+
+@router.get("/queue/metrics", response_model=List[MetriquesFileDepartement])
+async def metriques_file(
+    department_id: Optional[str] = Query(None, description="Département (tous pour un admin)"),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    """Profondeur de file et temps d'attente par département."""
+    if current_user.role == "admin":
+        return await file_orientations.metriques(department_id)
+    return await file_orientations.metriques(_departement_de_la_file(current_user, None))
+
+
+@router.post("/queue/claim", response_model=ReferralResponse)
+async def prendre_suivante(current_user: Utilisateur = Depends(require_role("medecin"))):
+    """Prend en charge l'orientation la plus prioritaire du département."""
+    departement = _departement_de_la_file(current_user, None)
+    referral = await file_orientations.prendre_suivante(departement, str(current_user.id))
+    if referral is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Aucune orientation en attente")
+    return (await _enrichir([referral]))[0]
+
+
+@router.post("/{referral_id}/claim", response_model=ReferralResponse)
+async def prendre_orientation(referral_id: str, current_user: Utilisateur = Depends(require_role("medecin"))):
+    """Prend en charge une orientation précise de la file."""
+    if not ObjectId.is_valid(referral_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Orientation non trouvée")
+    departement = _departement_de_la_file(current_user, None)
+    referral = await file_orientations.prendre(referral_id, departement, str(current_user.id))
+    if referral is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Orientation déjà prise en charge ou plus en attente"
+        )
+    return (await _enrichir([referral]))[0]
 
 
 @router.post("/", response_model=ReferralResponse)
@@ -127,7 +201,13 @@ async def create_referral(
         created_by=str(current_user.id)
     )
     
-    await referral.insert()
+    try:
+        await referral.insert()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Une orientation en attente existe déjà pour ce patient vers ce département"
+        )
     
     return ReferralResponse(
         id=str(referral.id),
@@ -139,6 +219,9 @@ async def create_referral(
         created_by=referral.created_by,
         processed_by=referral.processed_by,
         processed_at=referral.processed_at,
+        priorite=referral.priorite,
+        claimed_by=referral.claimed_by,
+        claimed_at=referral.claimed_at,
         created_at=referral.created_at,
         updated_at=referral.updated_at,
         patient_name=patient.username,
@@ -153,9 +236,13 @@ async def update_referral(
     referral_data: ReferralUpdate,
     current_user: Utilisateur = Depends(get_current_user)
 ):
-    """Mettre à jour une orientation (accepter, refuser, etc.)."""
+    """Mettre à jour une orientation (accepter, refuser, etc.).
+
+    Mise à jour conditionnelle (voir `file_orientations.traiter`) : 409 si
+    l'orientation n'est plus en attente ou si un autre médecin la détient.
+    """
     
-    referral = await Referral.get(referral_id)
+    referral = await Referral.get(referral_id) if ObjectId.is_valid(referral_id) else None
     if not referral:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -176,17 +263,25 @@ async def update_referral(
             detail="Seuls les médecins et admins peuvent traiter les orientations"
         )
     
-    # Mettre à jour les champs
+    # Champs mis à jour
+    maintenant = datetime.utcnow()
+    champs = {"updated_at": maintenant}
     if referral_data.status is not None:
-        referral.status = referral_data.status
-        referral.processed_by = str(current_user.id)
-        referral.processed_at = datetime.utcnow()
-    
+        champs.update(status=referral_data.status.value, processed_by=str(current_user.id), processed_at=maintenant)
     if referral_data.notes is not None:
-        referral.notes = referral_data.notes
+        champs["notes"] = referral_data.notes
     
-    referral.updated_at = datetime.utcnow()
-    await referral.save()
+    modifiee = await file_orientations.traiter(
+        referral_id, champs,
+        medecin_id=str(current_user.id) if current_user.role == "medecin" else None,
+        en_attente=referral_data.status is not None,
+    )
+    if modifiee is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Orientation déjà traitée ou prise en charge par un autre médecin"
+        )
+    referral = Referral.model_validate(modifiee)
     
     # Si acceptée, créer automatiquement une assignation
     if referral_data.status == "accepted" and current_user.role == "medecin":
@@ -207,10 +302,7 @@ async def update_referral(
             await assignment.insert()
             
             # Mettre à jour le patient avec l'assignation
-            patient = await Utilisateur.get(referral.patient_id)
-            if patient:
-                patient.current_assignment_id = str(assignment.id)
-                await patient.save()
+            await definir_assignation_courante(referral.patient_id, str(assignment.id))
     
     # Enrichir la réponse
     patient = await Utilisateur.get(referral.patient_id)
@@ -226,6 +318,9 @@ async def update_referral(
         created_by=referral.created_by,
         processed_by=referral.processed_by,
         processed_at=referral.processed_at,
+        priorite=referral.priorite,
+        claimed_by=referral.claimed_by,
+        claimed_at=referral.claimed_at,
         created_at=referral.created_at,
         updated_at=referral.updated_at,
         patient_name=patient.username if patient else "Inconnu",
@@ -1,39 +1,52 @@
 """Routeur fournissant les statistiques globales pour le tableau de bord."""
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 
-from backend.dependencies.auth import get_current_user, verifier_roles
+from backend.dependencies.auth import Principal, get_principal, verifier_roles
 from backend.models.device import Device
 from backend.models.donnee import Donnee
 from backend.models.alerte import Alerte
 from backend.models.recommandation import Recommandation
 from backend.models.utilisateur import Utilisateur, Role
 from backend.schemas.stats import StatsReponse
+from backend.utils.cache_http import CACHE_STATS, ReponseConditionnelle, portee
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 
 @router.get("", response_model=StatsReponse)
 @router.get("/", response_model=StatsReponse, include_in_schema=False)
-async def obtenir_stats(current_user=Depends(get_current_user)) -> StatsReponse:
+async def obtenir_stats(request: Request, current_user: Principal = Depends(get_principal)):
     """
     Retourne les métriques de comptage pour le tableau de bord.
     - Vue globale pour l'admin (démo/monitoring) : accès à tout (⚠️ À n'activer qu'en démo/supervision, pas en prod réelle sans justification RGPD !)
     - Vue strictement filtrée pour tous les autres (patient, médecin, technicien)
     """
-    if current_user.role == "admin":
-        return StatsReponse(
+    user_id = str(current_user.id)
+    admin = current_user.role == "admin"
+    # Vue globale : compteurs globaux ; sinon compteurs propres à l'utilisateur
+    cible = None if admin else user_id
+    collections = ["devices", "donnees", "alertes", "recommandations"] + (["utilisateurs"] if admin else [])
+    conditionnel = await ReponseConditionnelle.preparer(
+        request, [portee(c, cible) for c in collections], user_id, CACHE_STATS
+    )
+    if conditionnel.non_modifie:
+        return conditionnel.reponse_304()
+
+    if admin:
+        stats = StatsReponse(
             total_appareils=await Device.find().count(),
             total_donnees=await Donnee.find().count(),
             total_alertes=await Alerte.find().count(),
             total_recommandations=await Recommandation.find().count(),
             total_utilisateurs=await Utilisateur.find().count(),
         )
-    user_id = str(current_user.id)
-    return StatsReponse(
-        total_appareils=await Device.find({"user_id": user_id}).count(),
-        total_donnees=await Donnee.find({"user_id": user_id}).count(),
-        total_alertes=await Alerte.find({"user_id": user_id}).count(),
-        total_recommandations=await Recommandation.find({"user_id": user_id}).count(),
-        total_utilisateurs=1,
-    )
+    else:
+        stats = StatsReponse(
+            total_appareils=await Device.find({"user_id": user_id}).count(),
+            total_donnees=await Donnee.find({"user_id": user_id}).count(),
+            total_alertes=await Alerte.find({"user_id": user_id}).count(),
+            total_recommandations=await Recommandation.find({"user_id": user_id}).count(),
+            total_utilisateurs=1,
+        )
+    return conditionnel.reponse(stats.model_dump())
@@ -1,5 +1,7 @@
 """Routes liées à la gestion des utilisateurs et des rôles (RBAC)."""
 
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from beanie import PydanticObjectId
 
@@ -8,6 +10,10 @@ from backend.models.utilisateur import Utilisateur, Role
 from backend.models import Department
 from backend.schemas.utilisateur import UtilisateurPublic
 from backend.schemas.role_update import RoleUpdate
+from backend.services.connexion import oublier_identifiants_inconnus
+from backend.services.patients_medecin import index_patients
+from backend.services.revocation import revoquer_jetons
+from backend.utils.cache_http import incrementer_versions
 
 router = APIRouter(prefix="/users", tags=["utilisateurs"])  # noqa: E305
 
@@ -81,7 +87,7 @@ async def lister_utilisateurs(skip: int = 0, limit: int = 20, q: str | None = No
 
 
 from backend.schemas.utilisateur import UtilisateurAdminCreate, UtilisateurUpdate
-from backend.utils.auth import hacher_mot_de_passe
+from backend.utils.auth import mots_de_passe
 
 
 @router.post("/", response_model=UtilisateurPublic, status_code=status.HTTP_201_CREATED,
@@ -97,11 +103,13 @@ async def creer_utilisateur(payload: UtilisateurAdminCreate):
     user = Utilisateur(
         email=payload.email,
         username=payload.username,
-        mot_de_passe_hache=hacher_mot_de_passe(payload.mot_de_passe),
+        mot_de_passe_hache=await mots_de_passe.hacher(payload.mot_de_passe),
         role=payload.role,
         department_id=payload.department_id,
     )
     await user.insert()
+    await oublier_identifiants_inconnus(user)
+    await incrementer_versions("utilisateurs", str(user.id))
     return await enrichir_utilisateur_avec_departement(user)
 
 
@@ -112,21 +120,33 @@ async def mettre_a_jour_utilisateur(user_id: PydanticObjectId, payload: Utilisat
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
 
+    # $set des seuls champs modifiés : un save() complet écraserait medecin_ids,
+    # patient_ids et nb_patients écrits entre-temps (backend/services/assignation.py)
+    modifications = {}
     if payload.email is not None:
         # Conflit d'email
         if await Utilisateur.find_one({"email": payload.email, "_id": {"$ne": user.id}}):
             raise HTTPException(status_code=409, detail="Email déjà utilisé")
-        user.email = payload.email
+        modifications[Utilisateur.email] = payload.email
     if payload.username is not None:
         if await Utilisateur.find_one({"username": payload.username, "_id": {"$ne": user.id}}):
             raise HTTPException(status_code=409, detail="Nom d'utilisateur déjà utilisé")
-        user.username = payload.username
+        modifications[Utilisateur.username] = payload.username
+    role_modifie = payload.role is not None and payload.role != user.role
     if payload.role is not None:
-        user.role = payload.role
+        modifications[Utilisateur.role] = payload.role
     if payload.department_id is not None:
-        user.department_id = payload.department_id
-
-    await user.save()
+        modifications[Utilisateur.department_id] = payload.department_id
+
+    if modifications:
+        await user.set({**modifications, Utilisateur.updated_at: datetime.utcnow()})
+    await oublier_identifiants_inconnus(user)
+    if role_modifie:
+        # Le rôle porté par les jetons existants n'est plus valable
+        await revoquer_jetons(str(user.id))
+    # Nom ou rôle du patient modifié : rafraîchir l'index de ses médecins (et le sien si son rôle change)
+    await index_patients.invalider_plusieurs([*user.medecin_ids, str(user.id)] if role_modifie else user.medecin_ids)
+    await incrementer_versions("utilisateurs", str(user.id))
     return await enrichir_utilisateur_avec_departement(user)
 
 
@@ -138,6 +158,10 @@ async def supprimer_utilisateur(user_id: PydanticObjectId):
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
     await user.delete()
+    await revoquer_jetons(str(user.id))
+    # Index de ses médecins, et le sien s'il était médecin
+    await index_patients.invalider_plusieurs([*user.medecin_ids, str(user.id)])
+    await incrementer_versions("utilisateurs", str(user.id))
     return None
 
 
@@ -172,8 +196,10 @@ async def changer_role(user_id: PydanticObjectId, payload: RoleUpdate):
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
 
-    user.role = payload.role
-    await user.save()
+    await user.set({Utilisateur.role: payload.role, Utilisateur.updated_at: datetime.utcnow()})
+    await revoquer_jetons(str(user.id))
+    await index_patients.invalider_plusieurs([*user.medecin_ids, str(user.id)])
+    await incrementer_versions("utilisateurs", str(user.id))
 
     return UtilisateurPublic(
         id=str(user.id),
@@ -32,3 +32,9 @@ class DonneeEnDB(DonneeBase):
     model_config = {
         "from_attributes": True
     }
+
+
+class DonneeAcceptee(BaseModel):
+    """Reçu d'une mesure acceptée en mode asynchrone (écriture différée)."""
+    id: str = Field(..., description="Identifiant définitif de la donnée, une fois écrite")
+    statut: str = Field("acceptee", description="La mesure est en file d'écriture")
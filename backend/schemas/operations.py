@@ -0,0 +1,48 @@
+"""Schémas Pydantic des opérations d'administration en masse."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from ..models.tache_admin import StatutTache, TypeTache
+
+# Taille maximale d'une soumission (au-delà : découper côté client)
+MAX_ELEMENTS = 50000
+
+
+class SelectionUtilisateurs(BaseModel):
+    """Liste d'identifiants visés par une opération."""
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_ELEMENTS)
+
+
+class CoupleAssignation(BaseModel):
+    patient_id: str
+    medecin_id: str
+
+
+class AssignationsEnMasse(BaseModel):
+    """Couples patient/médecin à lier."""
+    assignations: List[CoupleAssignation] = Field(..., min_length=1, max_length=MAX_ELEMENTS)
+
+
+class TacheLancee(BaseModel):
+    """Réponse 202 : identifiant de la tâche à interroger."""
+    tache_id: str
+    total: int
+
+
+class EtatTache(BaseModel):
+    """Progression d'une tâche."""
+    id: str
+    type: TypeTache
+    statut: StatutTache
+    total: int
+    traites: int
+    reussis: int
+    nb_erreurs: int
+    erreurs: List[Dict[str, Any]]
+    message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
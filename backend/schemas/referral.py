@@ -36,6 +36,9 @@ class ReferralResponse(ReferralBase):
     created_by: Optional[str] = Field(None, description="ID du créateur")
     processed_by: Optional[str] = Field(None, description="ID du médecin traitant")
     processed_at: Optional[datetime] = Field(None, description="Date de traitement")
+    priorite: int = Field(1, description="Priorité (0 faible → 3 critique)")
+    claimed_by: Optional[str] = Field(None, description="ID du médecin en charge")
+    claimed_at: Optional[datetime] = Field(None, description="Date de prise en charge")
     created_at: datetime = Field(..., description="Date de création")
     updated_at: datetime = Field(..., description="Date de modification")
     # Champs enrichis (optionnels)
@@ -47,6 +50,15 @@ class ReferralResponse(ReferralBase):
         from_attributes = True
 
 
+class MetriquesFileDepartement(BaseModel):
+    """Profondeur et attente de la file d'orientations d'un département."""
+    department_id: str = Field(..., description="ID du département")
+    en_attente: int = Field(..., description="Orientations pending non prises en charge")
+    prises_en_charge: int = Field(..., description="Orientations pending prises en charge")
+    attente_max_s: float = Field(..., description="Âge de la plus ancienne orientation disponible (s)")
+    attente_moyenne_s: float = Field(..., description="Âge moyen des orientations disponibles (s)")
+
+
 class AssignmentBase(BaseModel):
     """Schéma de base pour une assignation."""
     patient_id: str = Field(..., description="ID du patient")
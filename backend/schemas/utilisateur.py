@@ -55,3 +55,11 @@ class Token(BaseModel):
 
     access_token: str
     token_type: str = "bearer"
+    # Absent pour les anciens clients ; à échanger sur /auth/refresh
+    refresh_token: str | None = None
+
+
+class RafraichissementRequest(BaseModel):
+    """Corps de la requête /auth/refresh."""
+
+    refresh_token: str
@@ -0,0 +1,82 @@
+"""Ligne de commande de l'exécuteur de tâches de maintenance.
+
+Exemples :
+    python -m backend.scripts.executer_tache --lister
+    python -m backend.scripts.executer_tache alertes_statut_manquant
+    python -m backend.scripts.executer_tache donnees_user_id_manquant --param user_id=<id>
+    python -m backend.scripts.executer_tache alertes_orphelines --param tous=1 --docs-par-seconde 200
+
+Une exécution interrompue (Ctrl+C, coupure réseau) reprend au dernier lot
+écrit lorsqu'on relance la même commande ; `--recommencer` repart du début.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.settings import MONGO_URI, MONGO_DB_NAME
+from backend.services import migrations  # noqa: F401  (enregistre les tâches)
+from backend.services.taches import REGISTRE, TAILLE_LOT_DEFAUT, ParametreManquant, etat, executer
+
+
+def _params(valeurs: List[str]) -> Dict[str, str]:
+    params = {}
+    for valeur in valeurs:
+        cle, sep, val = valeur.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--param attend cle=valeur (reçu : {valeur})")
+        params[cle] = val
+    return params
+
+
+async def _lister(db) -> None:
+    for nom, tache in sorted(REGISTRE.items()):
+        point = await etat(db, nom)
+        progression = f"{point['statut']}, {point['traites']} traité(s)" if point else "jamais exécutée"
+        print(f"{nom:36} {tache.description} [{progression}]")
+
+
+async def _executer(args) -> int:
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[MONGO_DB_NAME]
+    try:
+        if args.lister:
+            await _lister(db)
+            return 0
+        point = await executer(
+            db, args.nom,
+            params=_params(args.param),
+            taille_lot=args.taille_lot,
+            docs_par_seconde=args.docs_par_seconde,
+            recommencer=args.recommencer,
+            rapport=lambda p: print(f"  {p['traites']} traité(s), {p['modifies']} modifié(s), {p['supprimes']} supprimé(s)"),
+        )
+        print(f"{args.nom} terminée : {point['traites']} traité(s), "
+              f"{point['modifies']} modifié(s), {point['supprimes']} supprimé(s)")
+        return 0
+    except ParametreManquant as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    finally:
+        client.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Exécute une tâche de maintenance enregistrée")
+    parser.add_argument("nom", nargs="?", choices=sorted(REGISTRE), help="Nom de la tâche")
+    parser.add_argument("--param", action="append", default=[], metavar="CLE=VALEUR")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT_DEFAUT)
+    parser.add_argument("--docs-par-seconde", type=float, default=None, help="Limite de débit")
+    parser.add_argument("--recommencer", action="store_true", help="Ignore le point de reprise")
+    parser.add_argument("--lister", action="store_true", help="Liste les tâches et leur progression")
+    args = parser.parse_args(argv)
+    if not args.lister and not args.nom:
+        parser.error("nom de tâche requis (ou --lister)")
+    return asyncio.run(_executer(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Assignation patient ↔ médecin par mises à jour atomiques.
+
+Chaque lien est porté des deux côtés (`medecin_ids` du patient,
+`patient_ids` du médecin). Plutôt que de charger les documents, modifier
+les listes en Python puis tout réécrire via `save()` (deux assignations
+concurrentes s'écrasent alors), on applique `$addToSet` / `$pull` sur
+chaque côté : deux petites mises à jour, sans perte en cas de concurrence.
+Le compteur `nb_patients` du médecin suit dans la même mise à jour
+(cf. backend/services/charge_medecins.py).
+
+Les deux mises à jour sont regroupées dans une transaction lorsque le
+déploiement MongoDB en propose (replica set ou mongos) ; sinon elles sont
+appliquées l'une après l'autre, chacune restant atomique et idempotente.
+
+L'assignation courante du patient (`current_assignment_id`) est elle aussi
+écrite par un `$set` de ce seul champ, jamais par `save()` : une réécriture
+du document complet effacerait les listes et le compteur modifiés entre-temps.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from bson import ObjectId
+
+from backend.models.utilisateur import Utilisateur
+from backend.services.patients_medecin import index_patients
+
+LOGGER = logging.getLogger("assignation")
+
+# Détection des transactions, mémorisée par client Mongo
+_transactions: dict[int, bool] = {}
+
+
+class Modifications(NamedTuple):
+    """Côtés dont la liste a effectivement changé."""
+
+    patient: bool
+    medecin: bool
+
+
+async def _transactions_disponibles(client) -> bool:
+    """Vrai si le déploiement accepte les transactions multi-documents."""
+    cle = id(client)
+    if cle not in _transactions:
+        try:
+            info = await client.admin.command("hello")
+            _transactions[cle] = bool(info.get("setName")) or info.get("msg") == "isdbgrid"
+        except Exception as exc:
+            LOGGER.debug("Détection des transactions impossible : %s", exc)
+            _transactions[cle] = False
+    return _transactions[cle]
+
+
+async def _mettre_a_jour(collection, doc_id: str, champ: str, valeur: str, ajout: bool, session,
+                         compteur: Optional[str] = None) -> bool:
+    # Le filtre ne retient le document que si la liste doit changer :
+    # modified_count indique alors si l'appel a réellement ajouté/retiré le lien,
+    # et le compteur éventuel reste égal à la taille de la liste.
+    if ajout:
+        filtre = {"_id": ObjectId(doc_id), champ: {"$ne": valeur}}
+        operation = {"$addToSet": {champ: valeur}}
+    else:
+        filtre = {"_id": ObjectId(doc_id), champ: valeur}
+        operation = {"$pull": {champ: valeur}}
+    operation["$set"] = {"updated_at": datetime.utcnow()}
+    if compteur:
+        operation["$inc"] = {compteur: 1 if ajout else -1}
+    resultat = await collection.update_one(filtre, operation, session=session)
+    return resultat.modified_count == 1
+
+
+async def _lier(patient_id: str, medecin_id: str, ajout: bool) -> Modifications:
+    collection = Utilisateur.get_motor_collection()
+
+    async def _executer(session=None) -> Modifications:
+        return Modifications(
+            patient=await _mettre_a_jour(collection, patient_id, "medecin_ids", medecin_id, ajout, session),
+            medecin=await _mettre_a_jour(collection, medecin_id, "patient_ids", patient_id, ajout, session,
+                                         compteur="nb_patients"),
+        )
+
+    client = collection.database.client
+    if await _transactions_disponibles(client):
+        async with await client.start_session() as session:
+            # with_transaction rejoue le rappel sur erreur transitoire (conflit d'écriture, élection)
+            resultat = await session.with_transaction(_executer)
+    else:
+        resultat = await _executer()
+
+    await index_patients.invalider(medecin_id)
+    return resultat
+
+
+async def definir_assignation_courante(patient_id: str, assignment_id: str) -> None:
+    """Enregistre l'assignation active du patient (`$set` du seul champ)."""
+    await Utilisateur.get_motor_collection().update_one(
+        {"_id": ObjectId(patient_id)},
+        {"$set": {"current_assignment_id": assignment_id, "updated_at": datetime.utcnow()}},
+    )
+
+
+async def retirer_assignation_courante(patient_id: str, assignment_id: str) -> None:
+    """Efface l'assignation active du patient si c'est encore *assignment_id*."""
+    await Utilisateur.get_motor_collection().update_one(
+        {"_id": ObjectId(patient_id), "current_assignment_id": assignment_id},
+        {"$set": {"current_assignment_id": None, "updated_at": datetime.utcnow()}},
+    )
+
+
+async def assigner(patient_id: str, medecin_id: str) -> Modifications:
+    """Lie le patient au médecin (idempotent)."""
+    return await _lier(patient_id, medecin_id, ajout=True)
+
+
+async def desassigner(patient_id: str, medecin_id: str) -> Modifications:
+    """Supprime le lien entre le patient et le médecin (idempotent)."""
+    return await _lier(patient_id, medecin_id, ajout=False)
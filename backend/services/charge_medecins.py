@@ -0,0 +1,92 @@
+"""Charge des médecins pour l'attribution automatique des patients.
+
+Chaque médecin porte un compteur `nb_patients`, incrémenté/décrémenté par
+le service d'assignation dans la même mise à jour que `patient_ids`. Un
+index `(role, department_id, is_active, nb_patients)` permet alors de
+choisir le médecin le moins chargé d'un département par une lecture
+d'index, au lieu de charger tous les médecins et de compter en Python.
+
+Options (variables d'environnement, cf. backend/settings.py) :
+- `ATTRIBUTION_CAPACITE_MAX` : plafond de patients par médecin (0 = aucun) ;
+- `ATTRIBUTION_POIDS_CRITIQUES` : poids des alertes critiques non vues des
+  patients du médecin ; si non nul, les `ATTRIBUTION_CANDIDATS` médecins les
+  moins chargés sont départagés par `nb_patients + poids × critiques`.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional
+
+from pymongo import ASCENDING
+
+from backend import settings
+from backend.models.alerte import Alerte
+from backend.models.utilisateur import Role, Utilisateur
+
+
+class MedecinCandidat(NamedTuple):
+    id: str
+    username: str
+    nb_patients: int
+
+
+async def initialiser_charges() -> int:
+    """Calcule `nb_patients` pour les médecins créés avant ce compteur."""
+    resultat = await Utilisateur.get_motor_collection().update_many(
+        {"role": Role.medecin.value, "nb_patients": {"$exists": False}},
+        [{"$set": {"nb_patients": {"$size": {"$ifNull": ["$patient_ids", []]}}}}],
+    )
+    return resultat.modified_count
+
+
+async def _critiques_ouvertes(candidats: List[dict]) -> Dict[str, int]:
+    """Nombre d'alertes critiques non vues par médecin candidat."""
+    medecin_par_patient: Dict[str, List[str]] = {}
+    for doc in candidats:
+        for patient_id in doc.get("patient_ids", []):
+            medecin_par_patient.setdefault(patient_id, []).append(str(doc["_id"]))
+    if not medecin_par_patient:
+        return {}
+    pipeline = [
+        {"$match": {
+            "user_id": {"$in": list(medecin_par_patient)},
+            "statut": "nouvelle",
+            "priorite_medicale": "critique",
+        }},
+        {"$group": {"_id": "$user_id", "n": {"$sum": 1}}},
+    ]
+    totaux: Dict[str, int] = {}
+    async for ligne in Alerte.get_motor_collection().aggregate(pipeline):
+        for medecin_id in medecin_par_patient.get(ligne["_id"], []):
+            totaux[medecin_id] = totaux.get(medecin_id, 0) + ligne["n"]
+    return totaux
+
+
+async def medecin_le_moins_charge(department_id: str) -> Optional[MedecinCandidat]:
+    """Médecin actif du département ayant le moins de patients (ou None)."""
+    filtre: dict = {"role": Role.medecin.value, "department_id": department_id, "is_active": True}
+    if settings.ATTRIBUTION_CAPACITE_MAX > 0:
+        filtre["nb_patients"] = {"$lt": settings.ATTRIBUTION_CAPACITE_MAX}
+
+    poids = settings.ATTRIBUTION_POIDS_CRITIQUES
+    champs = {"username": 1, "nb_patients": 1}
+    if poids:
+        champs["patient_ids"] = 1
+    curseur = (
+        Utilisateur.get_motor_collection()
+        .find(filtre, champs)
+        .sort("nb_patients", ASCENDING)
+        .limit(settings.ATTRIBUTION_CANDIDATS if poids else 1)
+    )
+    candidats = await curseur.to_list(None)
+    if not candidats:
+        return None
+
+    choisi = candidats[0]
+    if poids and len(candidats) > 1:
+        critiques = await _critiques_ouvertes(candidats)
+        choisi = min(
+            candidats,
+            key=lambda d: d.get("nb_patients", 0) + poids * critiques.get(str(d["_id"]), 0),
+        )
+    return MedecinCandidat(str(choisi["_id"]), choisi["username"], choisi.get("nb_patients", 0))
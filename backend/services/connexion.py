@@ -0,0 +1,70 @@
+"""Protection et recherche de compte pour le point de connexion.
+
+- Limitation par IP (toutes tentatives) et par identifiant (échecs seulement),
+  en fenêtre glissante ; au-delà, la connexion répond 429 sans calcul bcrypt.
+- Recherche du compte sur le champ unique `login_keys` (index dédié) ;
+  les documents antérieurs à ce champ sont retrouvés par l'ancienne requête
+  `$or` puis complétés au passage.
+- Cache négatif : un identifiant inconnu est mémorisé quelques secondes dans
+  Redis pour qu'une rafale sur des comptes inexistants ne touche pas MongoDB.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from backend import settings
+from backend.models.utilisateur import Utilisateur, normaliser_identifiant
+from backend.ressources import ressources
+from backend.utils.limiteur import LimiteurFenetreGlissante
+
+CLE_INCONNU = "login:inconnu:{}"
+
+limiteur_ip = LimiteurFenetreGlissante("login:ip", settings.LOGIN_LIMITE_IP, settings.LOGIN_FENETRE_IP)
+limiteur_identifiant = LimiteurFenetreGlissante(
+    "login:identifiant", settings.LOGIN_LIMITE_IDENTIFIANT, settings.LOGIN_FENETRE_IDENTIFIANT
+)
+
+
+async def rechercher_utilisateur(identifiant: str) -> Optional[Utilisateur]:
+    """Compte correspondant à un email ou username, ou None."""
+    cle = normaliser_identifiant(identifiant)
+    client = ressources.redis()
+    if client is not None:
+        try:
+            if await client.exists(CLE_INCONNU.format(cle)):
+                return None
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+            client = None
+
+    user = await Utilisateur.find_one({"login_keys": cle})
+    if user is None:
+        # Comptes créés avant l'ajout de login_keys : ancienne recherche puis rattrapage
+        brut = identifiant.strip()
+        user = await Utilisateur.find_one({
+            "$or": [{"email": brut}, {"username": brut}],
+            "login_keys": {"$exists": False},
+        })
+        if user is not None:
+            user.maj_login_keys()
+            await user.set({Utilisateur.login_keys: user.login_keys})
+
+    if user is None and client is not None:
+        try:
+            await client.set(CLE_INCONNU.format(cle), "1", ex=settings.LOGIN_CACHE_INCONNU_TTL)
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+    return user
+
+
+async def oublier_identifiants_inconnus(*users: Utilisateur) -> None:
+    """Retire du cache négatif les identifiants de comptes créés ou renommés."""
+    client = ressources.redis()
+    if client is None or not users:
+        return
+    cles = {normaliser_identifiant(str(u.email)) for u in users} | {normaliser_identifiant(u.username) for u in users}
+    try:
+        await client.delete(*[CLE_INCONNU.format(c) for c in cles])
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
@@ -0,0 +1,140 @@
+"""Déduplication des mesures renvoyées par les appareils.
+
+Les passerelles renvoient une mesure après un délai dépassé ; la même
+mesure est reconnue par :
+
+- l'en-tête `Idempotency-Key` (unique par patient) ;
+- à défaut, le couple (`device_id`, `date`) d'une mesure d'appareil.
+
+Les clés de cache et la relecture sont restreintes au patient courant : un
+`device_id` étant fourni par le client, le couple (`device_id`, `date`)
+d'un autre patient est un conflit (`ConflitMesure`), jamais un rejeu.
+
+Chemin rapide : la réponse de la première écriture est gardée dans Redis
+(`IDEMPOTENCE_TTL`) et rejouée telle quelle, sans requête MongoDB. Si la
+clé a expiré (ou Redis est absent), les index uniques partiels de
+`donnees` rejettent le doublon et l'original est relu en base.
+
+`preparer_index_mesures` crée ces index au démarrage. Il ne supprime
+jamais de données : si des doublons (`device_id`, `date`) existent déjà,
+l'index correspondant n'est pas créé et un avertissement indique de lancer
+explicitement la tâche de nettoyage, qui supprime aussi leurs alertes :
+
+    python -m backend.scripts.executer_tache donnees_doublons
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from os import getenv
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel
+
+from backend.models.donnee import Donnee
+from backend.ressources import ressources
+
+LOGGER = logging.getLogger("deduplication")
+
+IDEMPOTENCE_TTL = int(getenv("IDEMPOTENCE_TTL", "86400"))
+PREFIXE_CACHE = "dedup:donnee:"
+
+INDEX_MESURES = [
+    IndexModel(
+        [("device_id", ASCENDING), ("date", ASCENDING)], name="mesure_appareil_unique", unique=True,
+        partialFilterExpression={"device_id": {"$type": "string"}},
+    ),
+    IndexModel(
+        [("user_id", ASCENDING), ("cle_idempotence", ASCENDING)], name="cle_idempotence_unique", unique=True,
+        partialFilterExpression={"cle_idempotence": {"$type": "string"}},
+    ),
+]
+
+
+class ConflitMesure(Exception):
+    """Le couple (`device_id`, `date`) est déjà pris par une mesure d'un autre patient."""
+
+
+def cle_cache(user_id: str, cle_idempotence: Optional[str], device_id: Optional[str], date: datetime) -> Optional[str]:
+    """Clé Redis de la mesure, ou None si elle n'est pas déduplicable (saisie sans clé ni appareil)."""
+    if cle_idempotence:
+        return f"{PREFIXE_CACHE}{user_id}:cle:{cle_idempotence}"
+    if device_id:
+        return f"{PREFIXE_CACHE}{user_id}:appareil:{device_id}:{date.isoformat()}"
+    return None
+
+
+async def rejouer(cle: Optional[str]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Réponse (statut, corps) déjà servie pour *cle*, si elle est en cache."""
+    client = ressources.redis()
+    if cle is None or client is None:
+        return None
+    try:
+        valeur = await client.get(cle)
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        return None
+    if valeur is None:
+        return None
+    reponse = json.loads(valeur)
+    return reponse["statut"], reponse["corps"]
+
+
+async def memoriser(cle: Optional[str], statut: int, corps: Dict[str, Any]) -> None:
+    """Garde la réponse servie pour *cle* pendant `IDEMPOTENCE_TTL` secondes."""
+    client = ressources.redis()
+    if cle is None or client is None:
+        return
+    try:
+        await client.set(cle, json.dumps({"statut": statut, "corps": corps}, default=str), ex=IDEMPOTENCE_TTL)
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+
+
+async def retrouver_original(doc: Donnee) -> Optional[Donnee]:
+    """Mesure du même patient dont *doc* est un doublon (après un refus d'index unique).
+
+    Lève `ConflitMesure` si le couple (`device_id`, `date`) appartient à un
+    autre patient.
+    """
+    if doc.cle_idempotence:
+        original = await Donnee.find_one({"user_id": doc.user_id, "cle_idempotence": doc.cle_idempotence})
+        if original is not None:
+            return original
+    if doc.device_id:
+        original = await Donnee.find_one({"user_id": doc.user_id, "device_id": doc.device_id, "date": doc.date})
+        if original is not None:
+            return original
+        if await Donnee.find_one({"device_id": doc.device_id, "date": doc.date}) is not None:
+            raise ConflitMesure(doc.device_id)
+    return None
+
+
+async def _doublons_appareil(db) -> Optional[Dict[str, Any]]:
+    """Un couple (`device_id`, `date`) présent plusieurs fois, s'il en existe."""
+    doublons = await db["donnees"].aggregate([
+        {"$match": {"device_id": {"$type": "string"}}},
+        {"$group": {"_id": {"device_id": "$device_id", "date": "$date"}, "nombre": {"$sum": 1}}},
+        {"$match": {"nombre": {"$gt": 1}}},
+        {"$limit": 1},
+    ]).to_list(1)
+    return doublons[0] if doublons else None
+
+
+async def preparer_index_mesures(db) -> None:
+    """Crée les index uniques de déduplication manquants, sauf si des doublons l'empêchent."""
+    existants = await db["donnees"].index_information()
+    manquants = [index for index in INDEX_MESURES if index.document["name"] not in existants]
+    if any(index.document["name"] == "mesure_appareil_unique" for index in manquants):
+        exemple = await _doublons_appareil(db)
+        if exemple is not None:
+            LOGGER.warning(
+                "Index mesure_appareil_unique non créé : mesures en double (ex. %s, %s fois). "
+                "Lancer `python -m backend.scripts.executer_tache donnees_doublons` puis redémarrer.",
+                exemple["_id"], exemple["nombre"],
+            )
+            manquants = [index for index in manquants if index.document["name"] != "mesure_appareil_unique"]
+    if manquants:
+        await db["donnees"].create_indexes(manquants)
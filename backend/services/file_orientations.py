@@ -0,0 +1,141 @@
+"""File de travail des orientations en attente, par département.
+
+Les orientations `pending` d'un département sont servies par priorité
+décroissante (niveau de l'alerte déclenchante) puis par ancienneté, via
+l'index `(proposed_department_id, status, priorite, created_at)`.
+
+Un médecin « prend » une orientation par `find_one_and_update` : le filtre
+n'accepte qu'une orientation libre, donc deux médecins ne peuvent pas obtenir
+la même. Une prise en charge non traitée expire après
+`ORIENTATION_PRISE_EN_CHARGE_TTL` secondes et l'orientation revient en file.
+
+Le traitement (acceptation, refus) est lui aussi conditionnel (`traiter`) :
+seule une orientation encore en attente, libre ou détenue par le médecin,
+change de statut ; deux médecins ne peuvent donc pas traiter la même.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from os import getenv
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from backend.models.referral import Referral, ReferralStatus
+
+ORIENTATION_PRISE_EN_CHARGE_TTL = int(getenv("ORIENTATION_PRISE_EN_CHARGE_TTL", "900"))
+
+ORDRE_FILE = [("priorite", DESCENDING), ("created_at", ASCENDING)]
+# Borne basse pour comparer une date de prise en charge absente (null)
+_JAMAIS = datetime(1970, 1, 1)
+
+
+def _seuil_expiration(maintenant: datetime) -> datetime:
+    return maintenant - timedelta(seconds=ORIENTATION_PRISE_EN_CHARGE_TTL)
+
+
+def _libre(maintenant: datetime) -> Dict[str, Any]:
+    """Filtre : orientation sans prise en charge, ou prise en charge expirée."""
+    return {"$or": [{"claimed_by": None}, {"claimed_at": {"$lt": _seuil_expiration(maintenant)}}]}
+
+
+async def lister(department_id: str, limite: int) -> List[dict]:
+    """Tête de file du département (orientations libres uniquement)."""
+    filtre = {
+        "proposed_department_id": department_id,
+        "status": ReferralStatus.pending.value,
+        **_libre(datetime.utcnow()),
+    }
+    curseur = Referral.get_motor_collection().find(filtre).sort(ORDRE_FILE).limit(limite)
+    return await curseur.to_list(None)
+
+
+async def _prendre(filtre: Dict[str, Any], medecin_id: str, maintenant: datetime) -> Optional[dict]:
+    return await Referral.get_motor_collection().find_one_and_update(
+        filtre,
+        {"$set": {"claimed_by": medecin_id, "claimed_at": maintenant, "updated_at": maintenant}},
+        sort=ORDRE_FILE,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def prendre_suivante(department_id: str, medecin_id: str) -> Optional[dict]:
+    """Prend atomiquement l'orientation la plus prioritaire du département."""
+    maintenant = datetime.utcnow()
+    filtre = {
+        "proposed_department_id": department_id,
+        "status": ReferralStatus.pending.value,
+        **_libre(maintenant),
+    }
+    return await _prendre(filtre, medecin_id, maintenant)
+
+
+async def prendre(referral_id: str, department_id: str, medecin_id: str) -> Optional[dict]:
+    """Prend une orientation précise du département (ou la reprend si déjà à ce médecin).
+
+    Retourne None si elle n'est plus en attente ou si un autre médecin la détient.
+    """
+    maintenant = datetime.utcnow()
+    filtre = {
+        "_id": ObjectId(referral_id),
+        "proposed_department_id": department_id,
+        "status": ReferralStatus.pending.value,
+        "$or": _libre(maintenant)["$or"] + [{"claimed_by": medecin_id}],
+    }
+    return await _prendre(filtre, medecin_id, maintenant)
+
+
+async def traiter(
+    referral_id: str,
+    champs: Dict[str, Any],
+    medecin_id: Optional[str] = None,
+    en_attente: bool = True,
+) -> Optional[dict]:
+    """Applique *champs* ($set) si l'orientation est traitable ; None sinon.
+
+    *en_attente* : l'orientation doit encore être `pending` (changement de
+    statut). *medecin_id* : elle doit être libre ou détenue par ce médecin
+    (None pour un admin, qui passe outre les prises en charge).
+    """
+    filtre: Dict[str, Any] = {"_id": ObjectId(referral_id)}
+    if en_attente:
+        filtre["status"] = ReferralStatus.pending.value
+    if medecin_id is not None:
+        filtre["$or"] = _libre(datetime.utcnow())["$or"] + [{"claimed_by": medecin_id}]
+    return await Referral.get_motor_collection().find_one_and_update(
+        filtre, {"$set": champs}, return_document=ReturnDocument.AFTER,
+    )
+
+
+async def metriques(department_id: Optional[str] = None) -> List[dict]:
+    """Profondeur de file et attente (s) par département, en une agrégation."""
+    maintenant = datetime.utcnow()
+    filtre: Dict[str, Any] = {"status": ReferralStatus.pending.value}
+    if department_id:
+        filtre["proposed_department_id"] = department_id
+    prise = {"$gt": [{"$ifNull": ["$claimed_at", _JAMAIS]}, _seuil_expiration(maintenant)]}
+    age_ms = {"$subtract": [maintenant, "$created_at"]}
+    pipeline = [
+        {"$match": filtre},
+        {"$group": {
+            "_id": "$proposed_department_id",
+            "total": {"$sum": 1},
+            "prises_en_charge": {"$sum": {"$cond": [prise, 1, 0]}},
+            "attente_max_ms": {"$max": {"$cond": [prise, None, age_ms]}},
+            "attente_moyenne_ms": {"$avg": {"$cond": [prise, None, age_ms]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    lignes = await Referral.get_motor_collection().aggregate(pipeline).to_list(None)
+    return [
+        {
+            "department_id": ligne["_id"],
+            "en_attente": ligne["total"] - ligne["prises_en_charge"],
+            "prises_en_charge": ligne["prises_en_charge"],
+            "attente_max_s": round((ligne.get("attente_max_ms") or 0) / 1000, 1),
+            "attente_moyenne_s": round((ligne.get("attente_moyenne_ms") or 0) / 1000, 1),
+        }
+        for ligne in lignes
+    ]
@@ -0,0 +1,272 @@
+"""Ingestion asynchrone des mesures (write-behind via un flux Redis).
+
+En mode asynchrone, `POST /data` valide la mesure, lui attribue son
+identifiant définitif puis l'ajoute au flux `INGESTION_FLUX` et répond
+202 avec cet identifiant (le reçu). La latence d'ingestion ne dépend plus
+de celle de MongoDB et les rafales sont absorbées par le flux.
+
+`VideurIngestion` (une tâche par worker, groupe de consommateurs Redis)
+draine le flux par fenêtres de `INGESTION_TAILLE_LOT` entrées ou
+`INGESTION_FENETRE_MS` millisecondes : un `insert_many` par lot, un
+incrément des compteurs de version, puis les événements `nouvelle_donnee`
+pour l'IA. Les entrées ne sont acquittées qu'après l'écriture :
+
+- à l'arrêt, le lot en cours est terminé avant la sortie de la boucle
+  (`INGESTION_DELAI_ARRET`) ;
+- un worker tué en plein lot laisse ses entrées en attente ; elles sont
+  reprises par un autre worker après `INGESTION_REPRISE_MS` (XAUTOCLAIM) ;
+- l'identifiant étant fixé à l'acceptation, une entrée rejouée se heurte à
+  l'index `_id` : elle n'est pas réécrite mais son événement est republié
+  (il a pu être perdu avec le worker ; l'analyse IA est idempotente par
+  `donnee_id`) ;
+- une entrée refusée par un index de déduplication (même appareil et même
+  date, ou même `Idempotency-Key`) n'est jamais écrite : son reçu 202 est
+  remplacé dans le cache de déduplication par la mesure d'origine, que
+  reçoit tout renvoi de la requête.
+
+La durabilité dépend de la persistance Redis (AOF conseillé). Si Redis est
+indisponible, ou si le flux contient déjà `INGESTION_FLUX_MAX` entrées non
+écrites (les entrées écrites en sont supprimées), la route revient à
+l'écriture synchrone (201) : le flux n'est jamais tronqué, un reçu 202
+n'est donc jamais perdu.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import socket
+import time
+from os import getenv, getpid
+from typing import Any, List, Optional, Sequence, Tuple
+
+from beanie import PydanticObjectId
+from prometheus_client import Counter, Histogram
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from backend.models.donnee import Donnee
+from backend.ressources import ressources
+from backend.services import deduplication
+from backend.schemas.donnee import DonneeEnDB
+from backend.services.pipeline_ia import publier_donnee
+from backend.utils.cache_http import incrementer_versions
+
+try:
+    from redis.exceptions import ResponseError  # type: ignore
+except ImportError:  # pragma: no cover
+    ResponseError = Exception  # type: ignore
+
+LOGGER = logging.getLogger("ingestion")
+
+# Réponse 202 par défaut ; sinon uniquement sur `Prefer: respond-async`
+INGESTION_ASYNCHRONE = getenv("INGESTION_ASYNCHRONE", "false").lower() in {"1", "true", "yes"}
+INGESTION_FLUX = getenv("INGESTION_FLUX", "ingestion:donnees")
+INGESTION_GROUPE = getenv("INGESTION_GROUPE", "ecriture_donnees")
+INGESTION_TAILLE_LOT = int(getenv("INGESTION_TAILLE_LOT", "500"))
+INGESTION_FENETRE_MS = int(getenv("INGESTION_FENETRE_MS", "200"))
+# Entrées non écrites au-delà desquelles la route revient au 201 : borne la mémoire Redis
+INGESTION_FLUX_MAX = int(getenv("INGESTION_FLUX_MAX", "1000000"))
+INGESTION_REPRISE_MS = int(getenv("INGESTION_REPRISE_MS", "60000"))
+# Attente maximale de la fin du lot en cours à l'arrêt du worker
+INGESTION_DELAI_ARRET = float(getenv("INGESTION_DELAI_ARRET", "10"))
+
+ACCEPTEES = Counter("ingestion_donnees_acceptees_total", "Mesures acceptées dans le flux d'ingestion")
+FLUX_PLEIN = Counter("ingestion_flux_plein_total", "Mesures écrites en synchrone faute de place dans le flux")
+ECRITES = Counter("ingestion_donnees_ecrites_total", "Mesures écrites depuis le flux", ["resultat"])
+TAILLE_LOTS = Histogram(
+    "ingestion_lot_taille", "Entrées par lot drainé du flux d'ingestion",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+Entree = Tuple[str, Any]
+
+
+def asynchrone_demande(prefer: Optional[str]) -> bool:
+    """Vrai si la requête (en-tête `Prefer`) ou la configuration demande le mode 202."""
+    return INGESTION_ASYNCHRONE or (prefer is not None and "respond-async" in prefer.lower())
+
+
+async def accepter(doc: Donnee) -> Optional[str]:
+    """Attribue son identifiant à *doc* et l'ajoute au flux ; None si Redis est indisponible ou le flux plein."""
+    client = ressources.redis()
+    if client is None:
+        return None
+    try:
+        # Pas de MAXLEN : la troncature supprimerait des entrées acceptées mais pas encore écrites
+        if await client.xlen(INGESTION_FLUX) >= INGESTION_FLUX_MAX:
+            FLUX_PLEIN.inc()
+            return None
+        doc.id = PydanticObjectId()
+        await client.xadd(INGESTION_FLUX, {"donnee": doc.model_dump_json()})
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        doc.id = None
+        return None
+    ACCEPTEES.inc()
+    return str(doc.id)
+
+
+class VideurIngestion:
+    """Draine le flux d'ingestion vers la collection `donnees`, par lots."""
+
+    def __init__(self, taille_lot: int = INGESTION_TAILLE_LOT, fenetre_ms: int = INGESTION_FENETRE_MS,
+                 consommateur: Optional[str] = None) -> None:
+        self.taille_lot = taille_lot
+        self.fenetre_ms = fenetre_ms
+        self.consommateur = consommateur or f"{socket.gethostname()}-{getpid()}"
+        self._groupe_pret = False
+        self._tache: Optional[asyncio.Task] = None
+        self._arret = asyncio.Event()
+
+    async def _preparer_groupe(self, client: Any) -> None:
+        if self._groupe_pret:
+            return
+        try:
+            await client.xgroup_create(INGESTION_FLUX, INGESTION_GROUPE, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._groupe_pret = True
+
+    async def _lire(self, client: Any) -> List[Entree]:
+        """Entrées d'un lot : jusqu'à `taille_lot`, au plus `fenetre_ms` après la première."""
+        # Entrées abandonnées par un worker arrêté en cours de lot
+        reprise = await client.xautoclaim(
+            INGESTION_FLUX, INGESTION_GROUPE, self.consommateur,
+            min_idle_time=INGESTION_REPRISE_MS, start_id="0-0", count=self.taille_lot,
+        )
+        entrees: List[Entree] = [e for e in reprise[1] if e[1]]
+        echeance: Optional[float] = None
+        while len(entrees) < self.taille_lot:
+            attente = self.fenetre_ms if echeance is None else int((echeance - time.monotonic()) * 1000)
+            if attente <= 0:
+                break
+            reponse = await client.xreadgroup(
+                INGESTION_GROUPE, self.consommateur, {INGESTION_FLUX: ">"},
+                count=self.taille_lot - len(entrees), block=attente,
+            )
+            lues = reponse[0][1] if reponse else []
+            if not lues:
+                break
+            entrees.extend(lues)
+            if echeance is None:
+                echeance = time.monotonic() + self.fenetre_ms / 1000
+        return entrees
+
+    async def _ecrire(self, entrees: Sequence[Entree]) -> int:
+        """Écrit un lot puis publie les événements des mesures nouvellement insérées."""
+        docs: List[Donnee] = []
+        for identifiant, champs in entrees:
+            try:
+                docs.append(Donnee.model_validate_json(champs["donnee"]))
+            except (KeyError, ValidationError) as exc:
+                LOGGER.error("Entrée d'ingestion %s illisible, ignorée : %s", identifiant, exc)
+                ECRITES.labels("illisible").inc()
+        if not docs:
+            return 0
+        refusees: List[Donnee] = []
+        try:
+            await Donnee.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            erreurs = exc.details.get("writeErrors", [])
+            if any(e.get("code") != 11000 for e in erreurs):
+                raise
+            refusees = [docs[e["index"]] for e in erreurs]
+        rejouees, doublons = await self._trier_refus(refusees)
+        ids_refuses = {doc.id for doc in refusees}
+        nouvelles = [doc for doc in docs if doc.id not in ids_refuses]
+        ECRITES.labels("ok").inc(len(nouvelles))
+        ECRITES.labels("rejouee").inc(len(rejouees))
+        await incrementer_versions("donnees", *{doc.user_id for doc in nouvelles})
+        # Entrées rejouées : déjà écrites, mais leur publication a pu être interrompue
+        for doc in nouvelles + rejouees:
+            await publier_donnee(doc)
+        for doc in doublons:
+            await self._signaler_doublon(doc)
+        return len(nouvelles)
+
+    @staticmethod
+    async def _trier_refus(refusees: List[Donnee]) -> Tuple[List[Donnee], List[Donnee]]:
+        """Sépare les entrées rejouées (même `_id` en base) des doublons d'une autre mesure."""
+        if not refusees:
+            return [], []
+        ecrits = {
+            doc["_id"] for doc in await Donnee.get_motor_collection().find(
+                {"_id": {"$in": [doc.id for doc in refusees]}}, {"_id": 1},
+            ).to_list(None)
+        }
+        return [d for d in refusees if d.id in ecrits], [d for d in refusees if d.id not in ecrits]
+
+    @staticmethod
+    async def _signaler_doublon(doc: Donnee) -> None:
+        """Reçu 202 d'une mesure déjà enregistrée : le cache de déduplication renvoie désormais l'original."""
+        try:
+            original = await deduplication.retrouver_original(doc)
+        except deduplication.ConflitMesure:
+            original = None
+        if original is None:
+            ECRITES.labels("conflit").inc()
+            LOGGER.warning("Reçu %s abandonné : appareil %s déjà utilisé à cette date par un autre patient",
+                           doc.id, doc.device_id)
+            return
+        ECRITES.labels("doublon").inc()
+        LOGGER.info("Reçu %s : mesure déjà enregistrée sous %s", doc.id, original.id)
+        cle = deduplication.cle_cache(doc.user_id, doc.cle_idempotence, doc.device_id, doc.date)
+        corps = DonneeEnDB(id=str(original.id), **original.model_dump(exclude={"id", "revision_id"})).model_dump(mode="json")
+        await deduplication.memoriser(cle, 200, corps)
+
+    async def vider_lot(self) -> int:
+        """Draine un lot ; retourne le nombre de mesures écrites (0 si Redis est indisponible)."""
+        client = ressources.redis()
+        if client is None:
+            await asyncio.sleep(self.fenetre_ms / 1000)
+            return 0
+        await self._preparer_groupe(client)
+        entrees = await self._lire(client)
+        if not entrees:
+            return 0
+        TAILLE_LOTS.observe(len(entrees))
+        ecrites = await self._ecrire(entrees)
+        identifiants = [identifiant for identifiant, _ in entrees]
+        await client.xack(INGESTION_FLUX, INGESTION_GROUPE, *identifiants)
+        await client.xdel(INGESTION_FLUX, *identifiants)
+        return ecrites
+
+    async def executer(self) -> None:
+        """Boucle de drainage jusqu'à `arreter` ; les erreurs sont réessayées avec attente croissante."""
+        attente = 1.0
+        while not self._arret.is_set():
+            try:
+                await self.vider_lot()
+                attente = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                LOGGER.exception("Drainage du flux d'ingestion en échec : %s", exc)
+                self._groupe_pret = False
+                try:
+                    await asyncio.wait_for(self._arret.wait(), attente)
+                except asyncio.TimeoutError:
+                    pass
+                attente = min(attente * 2, 30.0)
+
+    def demarrer(self) -> None:
+        self._arret.clear()
+        self._tache = asyncio.create_task(self.executer(), name="videur_ingestion")
+
+    async def arreter(self, delai: float = INGESTION_DELAI_ARRET) -> None:
+        """Termine le lot en cours puis arrête la boucle (annulation au-delà de *delai*)."""
+        if self._tache is None:
+            return
+        self._arret.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._tache), delai)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Lot d'ingestion non terminé après %s s : annulé, il sera repris", delai)
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+        self._tache = None
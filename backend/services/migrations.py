@@ -0,0 +1,174 @@
+"""Tâches de maintenance enregistrées (reprises des anciens scripts ponctuels).
+
+| Nom                               | Ancien script                                   |
+|-----------------------------------|-------------------------------------------------|
+| alertes_statut_manquant           | fix_alerts_status.py                            |
+| recommandations_statut_manquant   | fix_recommandations_statut.py                   |
+| recommandations_titre_description | backend/scripts/migrate_recommandations.py      |
+| donnees_source_manquante          | migrate_source.py                               |
+| donnees_user_id_manquant          | backend/scripts/migrer_ajout_user_id_donnees.py |
+| alertes_orphelines                | clean_orphan_alerts.py                          |
+| liens_patient_medecin             | fix_patient_medecin_mapping.py                  |
+| donnees_doublons                  | (avant l'index unique device_id/date)           |
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+from backend.services.taches import ParametreManquant, TacheMaintenance, enregistrer
+
+# Champ absent, null ou vide
+_STATUT_MANQUANT = {"$or": [{"statut": {"$exists": False}}, {"statut": None}, {"statut": ""}]}
+
+
+@enregistrer
+class AlertesStatutManquant(TacheMaintenance):
+    nom = "alertes_statut_manquant"
+    description = "Alertes sans statut → 'nouvelle'"
+    collection = "alertes"
+    projection = {"_id": 1}
+
+    def filtre(self, params):
+        return _STATUT_MANQUANT
+
+    def operation(self, doc, params):
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {"statut": "nouvelle"}})
+
+
+@enregistrer
+class RecommandationsStatutManquant(AlertesStatutManquant):
+    nom = "recommandations_statut_manquant"
+    description = "Recommandations sans statut → 'nouvelle'"
+    collection = "recommandations"
+
+
+@enregistrer
+class RecommandationsTitreDescription(TacheMaintenance):
+    nom = "recommandations_titre_description"
+    description = "Complète titre/description des recommandations à partir de l'ancien champ contenu"
+    collection = "recommandations"
+    projection = {"titre": 1, "description": 1, "contenu": 1}
+
+    def filtre(self, params):
+        return {"$or": [{"titre": {"$exists": False}}, {"description": {"$exists": False}}]}
+
+    def operation(self, doc, params):
+        contenu = doc.get("contenu")
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "titre": doc.get("titre") or (contenu[:50] if contenu else "Recommandation de santé"),
+            "description": doc.get("description") or contenu or "Aucune description disponible",
+            "updated_at": datetime.utcnow(),
+        }})
+
+
+@enregistrer
+class DonneesSourceManquante(TacheMaintenance):
+    nom = "donnees_source_manquante"
+    description = "Données de santé sans source → 'saisie_manuelle'"
+    collection = "donnees"
+    projection = {"_id": 1}
+
+    def filtre(self, params):
+        return {"source": {"$exists": False}}
+
+    def operation(self, doc, params):
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {"source": params.get("source", "saisie_manuelle")}})
+
+
+@enregistrer
+class DonneesUserIdManquant(TacheMaintenance):
+    nom = "donnees_user_id_manquant"
+    description = "Rattache les données de santé sans user_id à l'utilisateur donné (param user_id)"
+    collection = "donnees"
+    projection = {"_id": 1}
+    parametres = ("user_id",)
+
+    def filtre(self, params):
+        return {"user_id": {"$exists": False}}
+
+    def operation(self, doc, params):
+        return UpdateOne({"_id": doc["_id"]}, {"$set": {"user_id": params["user_id"]}})
+
+
+@enregistrer
+class AlertesOrphelines(TacheMaintenance):
+    nom = "alertes_orphelines"
+    description = "Supprime les alertes des patients sans aucune donnée de santé (param user_id, ou tous=1)"
+    collection = "alertes"
+    projection = {"user_id": 1}
+
+    def verifier(self, params):
+        # Suppression : la portée globale doit être demandée explicitement
+        if not params.get("user_id") and params.get("tous") != "1":
+            raise ParametreManquant(f"{self.nom} : préciser --param user_id=<id> ou --param tous=1")
+
+    def filtre(self, params):
+        if params.get("user_id"):
+            return {"user_id": params["user_id"]}
+        # Les alertes sans user_id ne sont rattachées à aucun patient : jamais supprimées
+        return {"user_id": {"$type": "string", "$ne": ""}}
+
+    async def operations(self, docs: List[Dict[str, Any]], params, db) -> List[Any]:
+        # Une seule requête par lot : quels patients du lot ont des données ?
+        user_ids = list({doc.get("user_id") for doc in docs if doc.get("user_id")})
+        avec_donnees = set(await db["donnees"].distinct("user_id", {"user_id": {"$in": user_ids}}))
+        return [
+            DeleteOne({"_id": doc["_id"]}) for doc in docs
+            if doc.get("user_id") and doc["user_id"] not in avec_donnees
+        ]
+
+
+@enregistrer
+class LiensPatientMedecin(TacheMaintenance):
+    nom = "liens_patient_medecin"
+    description = "Rétablit le lien médecin → patient manquant (patient_ids, nb_patients)"
+    collection = "utilisateurs"
+    projection = {"medecin_ids": 1}
+
+    def filtre(self, params):
+        return {"role": "patient", "medecin_ids.0": {"$exists": True}}
+
+    async def operations(self, docs, params, db) -> List[Any]:
+        # Mise à jour conditionnelle : nb_patients n'est incrémenté que si le lien manquait
+        operations = []
+        for doc in docs:
+            patient_id = str(doc["_id"])
+            for medecin_id in doc.get("medecin_ids", []):
+                if ObjectId.is_valid(medecin_id):
+                    operations.append(UpdateOne(
+                        {"_id": ObjectId(medecin_id), "role": "medecin", "patient_ids": {"$ne": patient_id}},
+                        {"$addToSet": {"patient_ids": patient_id}, "$inc": {"nb_patients": 1}},
+                    ))
+        return operations
+
+
+@enregistrer
+class DonneesDoublons(TacheMaintenance):
+    nom = "donnees_doublons"
+    description = "Supprime les mesures d'appareil en double (même device_id et date) et leurs alertes"
+    collection = "donnees"
+    projection = {"device_id": 1, "date": 1}
+
+    def filtre(self, params):
+        return {"device_id": {"$type": "string"}}
+
+    async def operations(self, docs, params, db) -> List[Any]:
+        # Une requête par lot : plus ancien _id de chaque couple (device_id, date) du lot
+        couples = {(doc["device_id"], doc["date"]) for doc in docs}
+        originaux: Dict[tuple, Any] = {}
+        async for doc in db["donnees"].find(
+            {"$or": [{"device_id": d, "date": date} for d, date in couples]}, {"device_id": 1, "date": 1},
+        ):
+            couple = (doc["device_id"], doc["date"])
+            if couple not in originaux or doc["_id"] < originaux[couple]:
+                originaux[couple] = doc["_id"]
+        doublons = [doc["_id"] for doc in docs if doc["_id"] != originaux[(doc["device_id"], doc["date"])]]
+        if doublons:
+            # Alertes générées par l'IA pour ces doublons
+            await db["alertes"].delete_many({"donnee_id": {"$in": [str(i) for i in doublons]}})
+        return [DeleteOne({"_id": i}) for i in doublons]
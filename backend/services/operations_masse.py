@@ -0,0 +1,289 @@
+"""Opérations d'administration en masse, exécutées en tâche de fond.
+
+La route valide la forme de la requête, crée un document `TacheAdmin` et
+répond 202 immédiatement ; le traitement se poursuit dans une tâche asyncio
+du worker, par lots de `OPERATIONS_TAILLE_LOT` éléments :
+
+- une requête `$in` par lot valide les identifiants (existence, rôle, statut) ;
+- une seule écriture par lot applique les changements (`update_many` pour un
+  changement de statut, `bulk_write` pour les assignations, `insert_many`
+  pour l'import) ;
+- la progression (`traites`, `reussis`, premières erreurs) est enregistrée
+  après chaque lot, pour que l'interface admin l'interroge sans attendre.
+
+Les opérations sont idempotentes : une tâche interrompue (redémarrage du
+worker) peut être soumise à nouveau sans effet de bord.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import logging
+from datetime import datetime
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from backend.models.tache_admin import StatutTache, TacheAdmin, TypeTache
+from backend.models.utilisateur import Role, StatutUtilisateur, Utilisateur, normaliser_identifiant
+from backend.schemas.utilisateur import UtilisateurAdminCreate
+from backend.services.connexion import oublier_identifiants_inconnus
+from backend.services.patients_medecin import index_patients
+from backend.services.revocation import revoquer_plusieurs
+from backend.utils.auth import mots_de_passe
+from backend.utils.cache_http import incrementer_versions
+
+LOGGER = logging.getLogger("operations_masse")
+
+OPERATIONS_TAILLE_LOT = int(getenv("OPERATIONS_TAILLE_LOT", "500"))
+# Erreurs détaillées conservées dans la tâche (le total reste dans nb_erreurs)
+MAX_ERREURS_CONSERVEES = 100
+# Rôles acceptés à l'import (pas de création d'admin par fichier)
+ROLES_IMPORTABLES = {Role.patient.value, Role.medecin.value, Role.technicien.value}
+COLONNES_IMPORT = {"email", "username", "mot_de_passe", "role"}
+
+# Références fortes : une tâche asyncio sans référence peut être collectée
+_taches_actives: set[asyncio.Task] = set()
+
+
+class Progression:
+    """Enregistre l'avancement d'une tâche après chaque lot."""
+
+    def __init__(self, tache_id: Any) -> None:
+        self.tache_id = tache_id
+
+    async def avancer(self, traites: int, reussis: int, erreurs: Sequence[Dict[str, Any]] = ()) -> None:
+        operation: Dict[str, Any] = {"$inc": {"traites": traites, "reussis": reussis, "nb_erreurs": len(erreurs)}}
+        if erreurs:
+            operation["$push"] = {"erreurs": {"$each": list(erreurs), "$slice": MAX_ERREURS_CONSERVEES}}
+        await TacheAdmin.get_motor_collection().update_one({"_id": self.tache_id}, operation)
+
+
+Travail = Callable[[Progression], Awaitable[None]]
+
+
+async def soumettre(type_tache: TypeTache, total: int, cree_par: str, travail: Travail) -> TacheAdmin:
+    """Enregistre la tâche puis lance *travail* en arrière-plan."""
+    tache = TacheAdmin(type=type_tache, total=total, cree_par=cree_par)
+    await tache.insert()
+    execution = asyncio.create_task(_executer(tache.id, travail))
+    _taches_actives.add(execution)
+    execution.add_done_callback(_taches_actives.discard)
+    return tache
+
+
+async def _executer(tache_id: Any, travail: Travail) -> None:
+    collection = TacheAdmin.get_motor_collection()
+    await collection.update_one(
+        {"_id": tache_id}, {"$set": {"statut": StatutTache.en_cours.value, "started_at": datetime.utcnow()}}
+    )
+    fin: Dict[str, Any] = {"statut": StatutTache.terminee.value}
+    try:
+        await travail(Progression(tache_id))
+    except Exception as exc:
+        LOGGER.exception("Tâche %s échouée", tache_id)
+        fin = {"statut": StatutTache.echouee.value, "message": str(exc)}
+    fin["finished_at"] = datetime.utcnow()
+    await collection.update_one({"_id": tache_id}, {"$set": fin})
+
+
+def _lots(elements: Sequence, taille: int = 0) -> Iterator[Sequence]:
+    taille = taille or OPERATIONS_TAILLE_LOT
+    for debut in range(0, len(elements), taille):
+        yield elements[debut:debut + taille]
+
+
+def _separer_ids(ids: Iterable[str]) -> Tuple[List[ObjectId], List[Dict[str, Any]]]:
+    """Dédoublonne et convertit les identifiants ; les invalides deviennent des erreurs."""
+    valides, erreurs = [], []
+    for brut in dict.fromkeys(ids):
+        if ObjectId.is_valid(brut):
+            valides.append(ObjectId(brut))
+        else:
+            erreurs.append({"id": brut, "erreur": "Identifiant invalide"})
+    return valides, erreurs
+
+
+# ----------------------------------------------------------------------
+# Statut des médecins
+# ----------------------------------------------------------------------
+async def changer_statut_medecins(
+    ids: List[str], depuis: StatutUtilisateur, vers: StatutUtilisateur, type_tache: TypeTache, cree_par: str
+) -> TacheAdmin:
+    """Approuve (en_attente → actif) ou suspend (actif → suspendu) des médecins."""
+    valides, invalides = _separer_ids(ids)
+
+    async def travail(progression: Progression) -> None:
+        collection = Utilisateur.get_motor_collection()
+        if invalides:
+            await progression.avancer(len(invalides), 0, invalides)
+        for lot in _lots(valides):
+            filtre = {"_id": {"$in": list(lot)}, "role": Role.medecin.value, "statut": depuis.value}
+            trouves = [doc["_id"] for doc in await collection.find(filtre, {"_id": 1}).to_list(None)]
+            connus = set(trouves)
+            erreurs = [
+                {"id": str(oid), "erreur": f"Médecin introuvable ou non {depuis.value}"}
+                for oid in lot if oid not in connus
+            ]
+            reussis = 0
+            if trouves:
+                resultat = await collection.update_many(
+                    {"_id": {"$in": trouves}, "statut": depuis.value},
+                    {"$set": {"statut": vers.value, "updated_at": datetime.utcnow()}},
+                )
+                reussis = resultat.modified_count
+                if vers == StatutUtilisateur.suspendu:
+                    await revoquer_plusieurs(str(oid) for oid in trouves)
+            await progression.avancer(len(lot), reussis, erreurs)
+        await incrementer_versions("utilisateurs")
+
+    return await soumettre(type_tache, len(valides) + len(invalides), cree_par, travail)
+
+
+# ----------------------------------------------------------------------
+# Assignations patient ↔ médecin
+# ----------------------------------------------------------------------
+def _operations_assignation(patient_id: str, medecin_id: str, maintenant: datetime) -> List[UpdateOne]:
+    # Mêmes mises à jour conditionnelles que backend/services/assignation.py :
+    # le compteur nb_patients n'est incrémenté que si le lien est nouveau.
+    return [
+        UpdateOne(
+            {"_id": ObjectId(patient_id), "medecin_ids": {"$ne": medecin_id}},
+            {"$addToSet": {"medecin_ids": medecin_id}, "$set": {"updated_at": maintenant}},
+        ),
+        UpdateOne(
+            {"_id": ObjectId(medecin_id), "patient_ids": {"$ne": patient_id}},
+            {"$addToSet": {"patient_ids": patient_id}, "$set": {"updated_at": maintenant},
+             "$inc": {"nb_patients": 1}},
+        ),
+    ]
+
+
+async def assigner_patients(couples: List[Tuple[str, str]], cree_par: str) -> TacheAdmin:
+    """Lie des couples (patient_id, medecin_id) par lots de `bulk_write`."""
+    couples = list(dict.fromkeys(couples))
+
+    async def travail(progression: Progression) -> None:
+        collection = Utilisateur.get_motor_collection()
+        for lot in _lots(couples):
+            ids = {i for couple in lot for i in couple if ObjectId.is_valid(i)}
+            roles = {
+                str(doc["_id"]): doc.get("role")
+                for doc in await collection.find(
+                    {"_id": {"$in": [ObjectId(i) for i in ids]}}, {"role": 1}
+                ).to_list(None)
+            }
+            operations: List[UpdateOne] = []
+            erreurs: List[Dict[str, Any]] = []
+            medecins: set[str] = set()
+            maintenant = datetime.utcnow()
+            for patient_id, medecin_id in lot:
+                if roles.get(patient_id) != Role.patient.value:
+                    erreurs.append({"patient_id": patient_id, "medecin_id": medecin_id, "erreur": "Patient introuvable"})
+                elif roles.get(medecin_id) != Role.medecin.value:
+                    erreurs.append({"patient_id": patient_id, "medecin_id": medecin_id, "erreur": "Médecin introuvable"})
+                else:
+                    operations.extend(_operations_assignation(patient_id, medecin_id, maintenant))
+                    medecins.add(medecin_id)
+            if operations:
+                await collection.bulk_write(operations, ordered=False)
+                await index_patients.invalider_plusieurs(medecins)
+            await progression.avancer(len(lot), len(operations) // 2, erreurs)
+
+    return await soumettre(TypeTache.assigner_patients, len(couples), cree_par, travail)
+
+
+# ----------------------------------------------------------------------
+# Import CSV
+# ----------------------------------------------------------------------
+def lire_csv(contenu: bytes) -> List[Dict[str, str]]:
+    """Lit un CSV (séparateur `,` ou `;`) ; lève ValueError si l'en-tête est incomplet."""
+    texte = contenu.decode("utf-8-sig")
+    entete = texte.split("\n", 1)[0]
+    separateur = ";" if entete.count(";") > entete.count(",") else ","
+    lecteur = csv.DictReader(io.StringIO(texte), delimiter=separateur)
+    manquantes = COLONNES_IMPORT - set(lecteur.fieldnames or [])
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes : {', '.join(sorted(manquantes))}")
+    return [{k: (v or "").strip() for k, v in ligne.items() if k} for ligne in lecteur]
+
+
+def _valider_ligne(numero: int, ligne: Dict[str, str], vues: set[str]) -> Tuple[UtilisateurAdminCreate | None, Dict[str, Any] | None]:
+    try:
+        donnees = UtilisateurAdminCreate(**{k: v for k, v in ligne.items() if v != ""})
+    except ValidationError as exc:
+        champs = ", ".join(str(e["loc"][0]) for e in exc.errors() if e.get("loc"))
+        return None, {"ligne": numero, "erreur": f"Champs invalides : {champs}"}
+    if donnees.role not in ROLES_IMPORTABLES:
+        return None, {"ligne": numero, "erreur": f"Rôle non importable : {donnees.role}"}
+    cles = {normaliser_identifiant(str(donnees.email)), normaliser_identifiant(donnees.username)}
+    if cles & vues:
+        return None, {"ligne": numero, "erreur": "Email ou nom d'utilisateur en double dans le fichier"}
+    vues.update(cles)
+    return donnees, None
+
+
+async def importer_utilisateurs(lignes: List[Dict[str, str]], cree_par: str) -> TacheAdmin:
+    """Crée des comptes depuis les lignes d'un CSV (ligne 1 = en-tête)."""
+
+    async def travail(progression: Progression) -> None:
+        collection = Utilisateur.get_motor_collection()
+        vues: set[str] = set()
+        for debut, lot in zip(range(0, len(lignes), OPERATIONS_TAILLE_LOT), _lots(lignes)):
+            candidats: List[Tuple[int, UtilisateurAdminCreate]] = []
+            erreurs: List[Dict[str, Any]] = []
+            for decalage, ligne in enumerate(lot):
+                numero = debut + decalage + 2
+                donnees, erreur = _valider_ligne(numero, ligne, vues)
+                if erreur:
+                    erreurs.append(erreur)
+                else:
+                    candidats.append((numero, donnees))
+
+            # Comptes déjà existants : une requête sur l'index login_keys
+            cles = [normaliser_identifiant(str(d.email)) for _, d in candidats] + [
+                normaliser_identifiant(d.username) for _, d in candidats
+            ]
+            existantes = {
+                cle
+                for doc in await collection.find({"login_keys": {"$in": cles}}, {"login_keys": 1}).to_list(None)
+                for cle in doc.get("login_keys", [])
+            }
+            nouveaux: List[Tuple[int, UtilisateurAdminCreate]] = []
+            for numero, d in candidats:
+                if {normaliser_identifiant(str(d.email)), normaliser_identifiant(d.username)} & existantes:
+                    erreurs.append({"ligne": numero, "erreur": "Compte déjà existant"})
+                else:
+                    nouveaux.append((numero, d))
+
+            # Hachage borné par le pool bcrypt, puis une seule insertion pour le lot
+            hashes = await asyncio.gather(*(mots_de_passe.hacher(d.mot_de_passe) for _, d in nouveaux))
+            utilisateurs = []
+            for (_, d), hash_ in zip(nouveaux, hashes):
+                user = Utilisateur(
+                    email=d.email, username=d.username, mot_de_passe_hache=hash_,
+                    role=d.role, department_id=d.department_id, statut=StatutUtilisateur.actif,
+                )
+                user.maj_login_keys()
+                utilisateurs.append(user)
+            reussis = 0
+            if utilisateurs:
+                try:
+                    await Utilisateur.insert_many(utilisateurs, ordered=False)
+                    reussis = len(utilisateurs)
+                except BulkWriteError as exc:
+                    # Conflit d'unicité concurrent (email/username créés entre-temps)
+                    reussis = exc.details.get("nInserted", 0)
+                    for erreur in exc.details.get("writeErrors", []):
+                        erreurs.append({"ligne": nouveaux[erreur["index"]][0], "erreur": "Compte déjà existant"})
+                await oublier_identifiants_inconnus(*utilisateurs)
+            await progression.avancer(len(lot), reussis, erreurs)
+        await incrementer_versions("utilisateurs")
+
+    return await soumettre(TypeTache.importer_utilisateurs, len(lignes), cree_par, travail)
@@ -0,0 +1,43 @@
+"""Unicité des orientations en attente.
+
+Un index unique partiel sur (`patient_id`, `proposed_department_id`) pour
+`status = pending` garantit qu'un patient n'a qu'une orientation en attente
+par département, même si plusieurs alertes IA arrivent en même temps.
+
+Les doublons créés avant cet index empêcheraient sa création : au démarrage,
+`annuler_doublons_en_attente` conserve la plus ancienne orientation de chaque
+groupe et passe les autres au statut `cancelled` (rien n'est supprimé).
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+LOGGER = logging.getLogger("orientations")
+
+
+async def annuler_doublons_en_attente(db) -> int:
+    """Annule les orientations pending en double ; retourne le nombre annulé."""
+    pipeline = [
+        {"$match": {"status": "pending"}},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": {"patient_id": "$patient_id", "department_id": "$proposed_department_id"},
+            "ids": {"$push": "$_id"},
+            "n": {"$sum": 1},
+        }},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    doublons = []
+    async for groupe in db["referrals"].aggregate(pipeline, allowDiskUse=True):
+        doublons.extend(groupe["ids"][1:])
+    if not doublons:
+        return 0
+    resultat = await db["referrals"].update_many(
+        {"_id": {"$in": doublons}},
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow(),
+                  "notes": "Doublon d'une orientation en attente (annulé automatiquement)"}},
+    )
+    LOGGER.warning("%s orientation(s) en attente en double annulée(s)", resultat.modified_count)
+    return resultat.modified_count
@@ -0,0 +1,170 @@
+"""Index d'appartenance médecin → patients.
+
+Évite de rescanner `utilisateurs` (`{"role": "patient", "medecin_ids": id}`)
+à chaque appel des tableaux de bord médecin et à chaque contrôle d'accès.
+
+- Avec Redis : un hash par médecin `medecin:{id}:patients` (patient_id → username)
+  avec un TTL.
+- Sans Redis : cache LRU local au worker, borné et à TTL court.
+
+Toute mutation d'assignation incrémente la version du médecin dans MongoDB
+(collection `versions_patients_medecin`), puis supprime l'entrée Redis et
+locale. Chaque entrée porte la version lue avant son chargement et n'est
+servie que si elle est toujours à jour : une suppression Redis manquée
+(Redis indisponible) ou le LRU d'un autre worker ne peuvent donc pas
+accorder un accès retiré. Le coût est une lecture par `_id` par appel, au
+lieu du parcours des patients.
+
+Les médecins ayant plus de `INDEX_PATIENTS_MAX_PAR_MEDECIN` patients ne sont
+pas mis en cache (taille bornée) : la requête Mongo reste alors la source.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Dict, Iterable, Tuple
+
+from backend.models.utilisateur import Utilisateur
+from backend.ressources import ressources
+
+LOGGER = logging.getLogger("patients_medecin")
+
+INDEX_PATIENTS_TTL = int(getenv("INDEX_PATIENTS_TTL", "600"))
+INDEX_PATIENTS_TTL_LOCAL = int(getenv("INDEX_PATIENTS_TTL_LOCAL", "30"))
+INDEX_PATIENTS_MAX_MEDECINS = int(getenv("INDEX_PATIENTS_MAX_MEDECINS", "1000"))
+INDEX_PATIENTS_MAX_PAR_MEDECIN = int(getenv("INDEX_PATIENTS_MAX_PAR_MEDECIN", "5000"))
+
+CLE_PATIENTS = "medecin:{}:patients"
+# Champ témoin : distingue « médecin sans patient » de « entrée absente » et porte la version chargée
+SENTINELLE = "__charge__"
+COLLECTION_VERSIONS = "versions_patients_medecin"
+
+
+class IndexPatientsMedecin:
+    """Ensemble des patients de chaque médecin, maintenu sur les mutations."""
+
+    def __init__(self) -> None:
+        self._local: "OrderedDict[str, tuple[float, int, Dict[str, str]]]" = OrderedDict()
+        self._base = None
+        self._collection_versions = None
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+    async def patients(self, medecin_id: str) -> Dict[str, str]:
+        """Retourne {patient_id: username} pour les patients du médecin."""
+        version = await self._version(medecin_id)
+        client = ressources.redis()
+        if client is not None:
+            try:
+                entree = await client.hgetall(CLE_PATIENTS.format(medecin_id))
+                if entree.pop(SENTINELLE, None) == str(version):
+                    return entree
+                return await self._recharger_redis(client, medecin_id, version)
+            except Exception as exc:
+                ressources.signaler_echec_redis(exc)
+        return await self._patients_local(medecin_id, version)
+
+    async def est_patient(self, medecin_id: str, patient_id: str) -> bool:
+        """Contrôle d'accès : le patient est-il assigné à ce médecin ?"""
+        version = await self._version(medecin_id)
+        client = ressources.redis()
+        if client is not None:
+            try:
+                charge, present = await client.hmget(CLE_PATIENTS.format(medecin_id), SENTINELLE, patient_id)
+                if charge == str(version):
+                    return present is not None
+                return patient_id in await self._recharger_redis(client, medecin_id, version)
+            except Exception as exc:
+                ressources.signaler_echec_redis(exc)
+        return patient_id in await self._patients_local(medecin_id, version)
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+    async def invalider(self, medecin_id: str) -> None:
+        """À appeler après toute modification des patients d'un médecin (ou sa suppression).
+
+        La version MongoDB suffit à écarter les entrées périmées ; la
+        suppression Redis ne fait que libérer la mémoire au plus tôt.
+        """
+        await self._versions().update_one({"_id": medecin_id}, {"$inc": {"version": 1}}, upsert=True)
+        self._local.pop(medecin_id, None)
+        client = ressources.redis()
+        if client is None:
+            return
+        try:
+            await client.delete(CLE_PATIENTS.format(medecin_id))
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+
+    async def invalider_plusieurs(self, medecin_ids: Iterable[str]) -> None:
+        """Invalide l'entrée de chaque médecin (ex : patient renommé ou supprimé)."""
+        for medecin_id in set(medecin_ids):
+            await self.invalider(medecin_id)
+
+    # ------------------------------------------------------------------
+    # Chargement
+    # ------------------------------------------------------------------
+    async def _charger_mongo(self, medecin_id: str) -> Tuple[Dict[str, str], bool]:
+        """Lit les patients du médecin ; le booléen indique si la liste dépasse la borne (pas de cache)."""
+        cursor = Utilisateur.get_motor_collection().find(
+            {"role": "patient", "medecin_ids": medecin_id}, {"username": 1}
+        )
+        patients = {str(d["_id"]): d.get("username", "") async for d in cursor}
+        return patients, len(patients) > INDEX_PATIENTS_MAX_PAR_MEDECIN
+
+    def _versions(self):
+        # Même base que les utilisateurs (initialisée par Beanie), collection gardée
+        base = Utilisateur.get_motor_collection().database
+        if self._base is not base:
+            self._base, self._collection_versions = base, base[COLLECTION_VERSIONS]
+        return self._collection_versions
+
+    async def _version(self, medecin_id: str) -> int:
+        """Version courante des patients du médecin (0 si jamais modifiés)."""
+        doc = await self._versions().find_one({"_id": medecin_id}, {"version": 1})
+        return int(doc["version"]) if doc else 0
+
+    async def _recharger_redis(self, client, medecin_id: str, version: int) -> Dict[str, str]:
+        """Recharge l'entrée Redis, étiquetée par la version lue *avant* la lecture Mongo.
+
+        Une mutation concurrente incrémente la version : l'entrée écrite ici
+        est alors écartée à la lecture suivante.
+        """
+        patients, hors_borne = await self._charger_mongo(medecin_id)
+        if hors_borne:
+            return patients
+        cle = CLE_PATIENTS.format(medecin_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(cle)
+                pipe.hset(cle, mapping={SENTINELLE: str(version), **patients})
+                pipe.expire(cle, INDEX_PATIENTS_TTL)
+                await pipe.execute()
+        except Exception as exc:
+            LOGGER.debug("Entrée non mise en cache pour %s : %s", medecin_id, exc)
+        return patients
+
+    async def _patients_local(self, medecin_id: str, version: int) -> Dict[str, str]:
+        """Chemin dégradé sans Redis : LRU borné, TTL court."""
+        maintenant = time.monotonic()
+        entree = self._local.get(medecin_id)
+        if entree is not None and entree[0] > maintenant and entree[1] == version:
+            self._local.move_to_end(medecin_id)
+            return entree[2]
+        patients, hors_borne = await self._charger_mongo(medecin_id)
+        if hors_borne:
+            return patients
+        self._local[medecin_id] = (maintenant + INDEX_PATIENTS_TTL_LOCAL, version, patients)
+        self._local.move_to_end(medecin_id)
+        while len(self._local) > INDEX_PATIENTS_MAX_MEDECINS:
+            self._local.popitem(last=False)
+        return patients
+
+
+# Instance partagée par le worker
+index_patients = IndexPatientsMedecin()
@@ -0,0 +1,190 @@
+"""Publication des mesures vers l'IA et contrôle d'admission selon son retard.
+
+Chaque événement `nouvelle_donnee` porte son instant de publication
+(`publie_a`) et incrémente le compteur `publies` de sa voie ; l'événement
+publié alors que plus rien n'était en attente sur sa voie note aussi son
+instant dans `debut_attente` (script Lua, atomique). Le service IA tient
+dans la clé d'état de chaque voie le nombre d'événements traités et
+l'instant de publication du dernier traité (`CLES_VOIES`). Les voies étant
+servies dans le désordre l'une par rapport à l'autre, chacune a sa propre
+file : le plus ancien événement en attente d'une voie a été publié après
+ces deux instants ; le backend en déduit :
+
+- `en_attente` = publiés − traités, sommé sur les voies ;
+- `retard_s` = âge du plus récent des deux instants s'il reste des
+  événements en attente, sinon 0 — le plus grand des retards des voies.
+  Un service IA arrêté fait croître le retard ; un service IA inactif
+  puis sollicité part de 0.
+
+`POST /data` refuse alors (429 + Retry-After) les sources différables
+d'abord — import de fichier et API externe au-delà de
+`ADMISSION_RETARD_DIFFERABLES` secondes, saisie manuelle au-delà de
+`ADMISSION_RETARD_SAISIE` —, les mesures d'appareils connectés n'étant
+jamais refusées. L'état est relu au plus toutes les
+`ADMISSION_RAFRAICHISSEMENT` secondes par worker.
+
+Les messages publiés sans abonné étant perdus (pub/sub), le service IA
+recale `traites` sur `publies` de chaque voie à chaque (ré)abonnement.
+
+Priorité : une mesure d'appareil connecté ou de saisie manuelle dont les
+constantes franchissent les seuils de l'IA (`FC_MAX`, `SPO2_MIN`) part sur
+la voie `CANAL_HAUTE`, que le service IA sert avant l'arriéré de la voie
+normale (voir services/ia_service/voies_ia.py). Les imports et API
+externes restent sur la voie normale, quelles que soient leurs valeurs.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from os import getenv
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge
+
+from backend.event_bus import publish as publish_event
+from backend.models.donnee import Donnee, SourceDonnee
+from backend.ressources import ressources
+
+CANAL = "nouvelle_donnee"
+CANAL_HAUTE = "nouvelle_donnee:haute"
+CLE_PUBLIES = "ia:nouvelle_donnee:publies"
+CLE_ETAT = "ia:nouvelle_donnee:etat"
+# (compteur publiés, état tenu par l'IA) de chaque voie
+CLES_VOIES = {
+    CANAL: (CLE_PUBLIES, CLE_ETAT),
+    CANAL_HAUTE: ("ia:nouvelle_donnee:haute:publies", "ia:nouvelle_donnee:haute:etat"),
+}
+
+ADMISSION_ACTIVE = getenv("ADMISSION_ACTIVE", "true").lower() in {"1", "true", "yes"}
+ADMISSION_RETARD_DIFFERABLES = float(getenv("ADMISSION_RETARD_DIFFERABLES", "10"))
+ADMISSION_RETARD_SAISIE = float(getenv("ADMISSION_RETARD_SAISIE", "60"))
+ADMISSION_RAFRAICHISSEMENT = float(getenv("ADMISSION_RAFRAICHISSEMENT", "1"))
+# Délai de nouvel essai annoncé (Retry-After), borné
+RETRY_AFTER_MAX = 120
+# Mêmes seuils par défaut que le service IA : pré-tri, le diagnostic reste à l'IA
+FC_MAX = int(getenv("FC_MAX", "100"))
+SPO2_MIN = int(getenv("SPO2_MIN", "92"))
+
+# Incrémente `publies` ; premier événement d'une attente : note son instant
+_SCRIPT_PUBLICATION = """
+local publies = redis.call('INCR', KEYS[1])
+local traites = tonumber(redis.call('HGET', KEYS[2], 'traites') or '0')
+if publies - traites <= 1 then
+    redis.call('HSET', KEYS[2], 'debut_attente', ARGV[1])
+end
+return publies
+"""
+
+SOURCES_DIFFERABLES = {SourceDonnee.IMPORT_FICHIER, SourceDonnee.API_EXTERNE}
+
+RETARD = Gauge("pipeline_ia_retard_secondes", "Retard estimé de l'analyse IA", multiprocess_mode="max")
+EN_ATTENTE = Gauge("pipeline_ia_evenements_en_attente", "Événements nouvelle_donnee non traités", multiprocess_mode="max")
+REFUS = Counter("donnees_refusees_total", "Mesures refusées par le contrôle d'admission", ["source"])
+PUBLIES = Counter("pipeline_ia_evenements_publies_total", "Événements nouvelle_donnee publiés", ["priorite"])
+
+
+@dataclass(frozen=True)
+class EtatPipeline:
+    retard_s: float
+    en_attente: int
+    # Détail par canal de voie (retard, en attente)
+    voies: Dict[str, "EtatPipeline"] = field(default_factory=dict, compare=False)
+
+
+class SuiviPipeline:
+    """État du pipeline IA, relu dans Redis au plus toutes les `rafraichissement` secondes."""
+
+    def __init__(self, rafraichissement: float = ADMISSION_RAFRAICHISSEMENT) -> None:
+        self.rafraichissement = rafraichissement
+        self._etat = EtatPipeline(0.0, 0)
+        self._lu_a = 0.0
+        # Attente observée sans aucun événement traité (service IA jamais démarré), par voie
+        self._attente_depuis: Dict[str, float] = {}
+
+    async def etat(self) -> EtatPipeline:
+        maintenant = time.monotonic()
+        if maintenant - self._lu_a < self.rafraichissement:
+            return self._etat
+        self._lu_a = maintenant
+        client = ressources.redis()
+        if client is None:
+            return self._etat
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for cle_publies, cle_etat in CLES_VOIES.values():
+                    pipe.get(cle_publies)
+                    pipe.hmget(cle_etat, "traites", "dernier_publie_a", "debut_attente")
+                lus = await pipe.execute()
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+            return self._etat
+        voies = {
+            canal: self._etat_voie(canal, lus[2 * i], *lus[2 * i + 1])
+            for i, canal in enumerate(CLES_VOIES)
+        }
+        self._etat = EtatPipeline(
+            max(etat.retard_s for etat in voies.values()),
+            sum(etat.en_attente for etat in voies.values()),
+            voies,
+        )
+        RETARD.set(self._etat.retard_s)
+        EN_ATTENTE.set(self._etat.en_attente)
+        return self._etat
+
+    def _etat_voie(self, canal: str, publies, traites, dernier_publie_a, debut_attente) -> EtatPipeline:
+        en_attente = max(0, int(publies or 0) - int(traites or 0))
+        retard = 0.0
+        if en_attente and (dernier_publie_a or debut_attente):
+            # Le plus ancien en attente est postérieur au dernier traité et au début de l'attente
+            plus_ancien = max(float(dernier_publie_a or 0), float(debut_attente or 0))
+            retard = max(0.0, time.time() - plus_ancien)
+            self._attente_depuis.pop(canal, None)
+        elif en_attente:
+            # Aucun événement jamais traité : âge compté depuis la première observation
+            retard = time.time() - self._attente_depuis.setdefault(canal, time.time())
+        else:
+            self._attente_depuis.pop(canal, None)
+        return EtatPipeline(round(retard, 3), en_attente)
+
+    async def refuser(self, source: SourceDonnee) -> Optional[int]:
+        """Délai Retry-After (s) si une mesure de *source* doit être refusée, sinon None."""
+        if not ADMISSION_ACTIVE or source == SourceDonnee.APPAREIL_CONNECTE:
+            return None
+        seuil = ADMISSION_RETARD_DIFFERABLES if source in SOURCES_DIFFERABLES else ADMISSION_RETARD_SAISIE
+        etat = await self.etat()
+        if etat.retard_s < seuil:
+            return None
+        REFUS.labels(source.value).inc()
+        return min(RETRY_AFTER_MAX, max(1, math.ceil(etat.retard_s - seuil)))
+
+
+suivi = SuiviPipeline()
+
+
+def priorite(doc: Donnee) -> str:
+    """`haute` pour une mesure en direct hors seuils, `normale` sinon."""
+    if doc.source in SOURCES_DIFFERABLES:
+        return "normale"
+    fc, spo2 = doc.frequence_cardiaque, doc.taux_oxygene
+    if (fc is not None and fc > FC_MAX) or (spo2 is not None and spo2 < SPO2_MIN):
+        return "haute"
+    return "normale"
+
+
+async def publier_donnee(doc: Donnee) -> None:
+    """Publie `nouvelle_donnee` pour *doc* sur la voie de sa priorité (compteur incrémenté avant)."""
+    publie_a = time.time()
+    niveau = priorite(doc)
+    canal = CANAL_HAUTE if niveau == "haute" else CANAL
+    client = ressources.redis()
+    if client is not None:
+        try:
+            await client.eval(_SCRIPT_PUBLICATION, 2, *CLES_VOIES[canal], repr(publie_a))
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+    PUBLIES.labels(niveau).inc()
+    await publish_event(canal, {
+        "donnee_id": str(doc.id), "device_id": doc.device_id, "priorite": niveau, "publie_a": publie_a,
+    })
@@ -0,0 +1,148 @@
+"""Liste de révocation des jetons (suspension, changement de rôle, suppression).
+
+Une clé Redis par utilisateur, `auth:revocation:{user_id}`, contient
+l'horodatage de la dernière révocation : tout jeton émis avant (`iat`) est
+refusé. La clé expire après la durée de vie maximale d'un jeton de
+rafraîchissement, au-delà de laquelle plus aucun jeton antérieur n'est valide.
+
+Chaque révocation est d'abord enregistrée durablement dans la collection
+`revocations_jetons` (`revoque_le`, `propage`), puis recopiée dans Redis.
+Si Redis est indisponible à ce moment, le document reste `propage: false`
+et `propager_en_attente` (boucle `executer_propagation` du lifespan) le
+recopie dès que Redis répond : une révocation n'est jamais perdue.
+
+Si Redis est indisponible, `horodatage_revocation` lève `RevocationIndisponible`
+et l'appelant revient à la vérification en base (`horodatage_revocation_durable`
+et statut de l'utilisateur : chemin lent mais sûr).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from os import getenv
+from typing import Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from backend.models.utilisateur import Utilisateur
+from backend.ressources import ressources
+from backend.utils.auth import REFRESH_TOKEN_EXPIRE_DAYS
+
+LOGGER = logging.getLogger("revocation")
+
+CLE_REVOCATION = "auth:revocation:{}"
+DUREE_CONSERVATION = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+COLLECTION_REVOCATIONS = "revocations_jetons"
+# Intervalle de reprise des révocations non recopiées dans Redis
+REVOCATION_PROPAGATION_S = float(getenv("REVOCATION_PROPAGATION_S", "5"))
+
+# N'écrase jamais une révocation plus récente (propagations concurrentes)
+_SCRIPT_MAX = """
+local actuel = redis.call('GET', KEYS[1])
+if (not actuel) or tonumber(actuel) < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+
+class RevocationIndisponible(Exception):
+    """La liste de révocation ne peut pas être consultée (Redis absent)."""
+
+
+def _collection():
+    # Même base que les utilisateurs (initialisée par Beanie)
+    return Utilisateur.get_motor_collection().database[COLLECTION_REVOCATIONS]
+
+
+async def _copier_dans_redis(revocations: List[tuple[str, float]]) -> bool:
+    """Recopie (user_id, horodatage) dans Redis ; faux si Redis est indisponible."""
+    client = ressources.redis()
+    if client is None:
+        return False
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for user_id, horodatage in revocations:
+                restant = max(1, int(horodatage + DUREE_CONSERVATION - time.time()))
+                pipe.eval(_SCRIPT_MAX, 1, CLE_REVOCATION.format(user_id), repr(horodatage), restant)
+            await pipe.execute()
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        return False
+    return True
+
+
+async def _marquer_propagees(revocations: List[tuple[str, float]]) -> None:
+    # Une révocation plus récente arrivée entre-temps reste à propager
+    await _collection().bulk_write([
+        UpdateOne({"_id": user_id, "revoque_le": horodatage}, {"$set": {"propage": True}})
+        for user_id, horodatage in revocations
+    ], ordered=False)
+
+
+async def revoquer_jetons(user_id: str) -> None:
+    """Invalide tous les jetons déjà émis pour *user_id*."""
+    await revoquer_plusieurs([user_id])
+
+
+async def revoquer_plusieurs(user_ids: Iterable[str]) -> None:
+    """Invalide les jetons d'un lot d'utilisateurs : écriture durable, puis copie Redis."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    horodatage = time.time()
+    await _collection().bulk_write([
+        UpdateOne({"_id": user_id}, {"$max": {"revoque_le": horodatage}, "$set": {"propage": False}}, upsert=True)
+        for user_id in user_ids
+    ], ordered=False)
+    revocations = [(user_id, horodatage) for user_id in user_ids]
+    if await _copier_dans_redis(revocations):
+        await _marquer_propagees(revocations)
+    else:
+        LOGGER.warning("Révocation de %s utilisateur(s) en attente de Redis (reprise automatique)", len(user_ids))
+
+
+async def propager_en_attente(limite: int = 1000) -> int:
+    """Recopie dans Redis les révocations enregistrées pendant une indisponibilité."""
+    revocations = [
+        (doc["_id"], doc["revoque_le"])
+        async for doc in _collection().find({"propage": False}, {"revoque_le": 1}).limit(limite)
+    ]
+    if not revocations or not await _copier_dans_redis(revocations):
+        return 0
+    await _marquer_propagees(revocations)
+    LOGGER.info("%s révocation(s) recopiée(s) dans Redis", len(revocations))
+    return len(revocations)
+
+
+async def executer_propagation(intervalle: float = REVOCATION_PROPAGATION_S) -> None:
+    """Boucle de reprise des révocations non propagées (une tâche par worker)."""
+    while True:
+        try:
+            await propager_en_attente()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            LOGGER.warning("Reprise des révocations en échec : %s", exc)
+        await asyncio.sleep(intervalle)
+
+
+async def horodatage_revocation_durable(user_id: str) -> Optional[float]:
+    """Comme `horodatage_revocation`, lu en base (repli quand Redis est indisponible)."""
+    doc = await _collection().find_one({"_id": user_id}, {"revoque_le": 1})
+    return doc["revoque_le"] if doc else None
+
+
+async def horodatage_revocation(user_id: str) -> Optional[float]:
+    """Horodatage de la dernière révocation de *user_id* (None si aucune)."""
+    client = ressources.redis()
+    if client is None:
+        raise RevocationIndisponible()
+    try:
+        valeur = await client.get(CLE_REVOCATION.format(user_id))
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        raise RevocationIndisponible() from exc
+    return float(valeur) if valeur is not None else None
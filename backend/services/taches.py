@@ -0,0 +1,154 @@
+"""Exécuteur de tâches de maintenance (migrations, corrections de données).
+
+Une tâche est une sous-classe de `TacheMaintenance` enregistrée sous un nom
+(`@enregistrer`). L'exécuteur la déroule par lots :
+
+- parcours par `_id` croissant (pagination par clé, pas de `skip`) sur le
+  filtre de la tâche, avec projection ;
+- une écriture `bulk_write` non ordonnée par lot ;
+- point de reprise après chaque lot dans `taches_maintenance`
+  (`dernier_id`, compteurs) : une exécution interrompue reprend là où elle
+  s'est arrêtée ;
+- limitation optionnelle du débit (documents/seconde) pour ne pas saturer
+  la base en production ;
+- progression journalisée et lisible dans le document de reprise.
+
+Les tâches concrètes sont dans backend/services/migrations.py ; la ligne de
+commande est backend/scripts/executer_tache.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, ClassVar, Dict, List, Optional
+
+LOGGER = logging.getLogger("taches")
+
+COLLECTION_REPRISE = "taches_maintenance"
+TAILLE_LOT_DEFAUT = 500
+
+REGISTRE: Dict[str, "TacheMaintenance"] = {}
+
+
+class TacheMaintenance:
+    """Tâche de maintenance : quels documents, et quelle écriture pour chacun."""
+
+    nom: ClassVar[str]
+    description: ClassVar[str] = ""
+    collection: ClassVar[str]
+    projection: ClassVar[Optional[Dict[str, int]]] = None
+    # Paramètres obligatoires (passés en --param cle=valeur)
+    parametres: ClassVar[tuple[str, ...]] = ()
+
+    def verifier(self, params: Dict[str, str]) -> None:
+        """Lève ParametreManquant avant toute écriture si *params* est incomplet."""
+        manquants = [p for p in self.parametres if not params.get(p)]
+        if manquants:
+            raise ParametreManquant(f"Paramètre(s) requis pour {self.nom} : {', '.join(manquants)}")
+
+    def filtre(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Documents à traiter."""
+        return {}
+
+    def operation(self, doc: Dict[str, Any], params: Dict[str, str]) -> Any:
+        """Écriture (UpdateOne, DeleteOne…) pour un document, ou None."""
+        raise NotImplementedError
+
+    async def operations(self, docs: List[Dict[str, Any]], params: Dict[str, str], db) -> List[Any]:
+        """Écritures d'un lot ; à surcharger quand un lot demande une requête commune."""
+        return [op for op in (self.operation(doc, params) for doc in docs) if op is not None]
+
+
+def enregistrer(classe: type[TacheMaintenance]) -> type[TacheMaintenance]:
+    """Décorateur : rend la tâche exécutable par son nom."""
+    REGISTRE[classe.nom] = classe()
+    return classe
+
+
+class ParametreManquant(ValueError):
+    """Un paramètre obligatoire de la tâche n'a pas été fourni."""
+
+
+async def etat(db, nom: str) -> Optional[Dict[str, Any]]:
+    """Document de reprise (progression) d'une tâche, s'il existe."""
+    return await db[COLLECTION_REPRISE].find_one({"_id": nom})
+
+
+async def executer(
+    db,
+    nom: str,
+    params: Optional[Dict[str, str]] = None,
+    taille_lot: int = TAILLE_LOT_DEFAUT,
+    docs_par_seconde: Optional[float] = None,
+    recommencer: bool = False,
+    rapport: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Exécute (ou reprend) la tâche *nom* ; retourne le document de reprise final."""
+    tache = REGISTRE[nom]
+    params = dict(params or {})
+    tache.verifier(params)
+
+    reprises = db[COLLECTION_REPRISE]
+    maintenant = datetime.utcnow()
+    point = await reprises.find_one({"_id": nom})
+    if recommencer or point is None or point.get("statut") == "terminee" or point.get("params") != params:
+        point = {
+            "_id": nom, "statut": "en_cours", "params": params, "dernier_id": None,
+            "traites": 0, "modifies": 0, "supprimes": 0, "started_at": maintenant,
+        }
+        await reprises.replace_one({"_id": nom}, point, upsert=True)
+    else:
+        LOGGER.info("%s : reprise après %s document(s)", nom, point["traites"])
+        await reprises.update_one({"_id": nom}, {"$set": {"statut": "en_cours"}})
+
+    collection = db[tache.collection]
+    filtre = tache.filtre(params)
+    debut = time.monotonic()
+    traites_session = 0
+    try:
+        while True:
+            requete = dict(filtre)
+            if point["dernier_id"] is not None:
+                requete = {"$and": [filtre, {"_id": {"$gt": point["dernier_id"]}}]} if filtre else {"_id": {"$gt": point["dernier_id"]}}
+            lot = await collection.find(requete, tache.projection).sort("_id", 1).limit(taille_lot).to_list(None)
+            if not lot:
+                break
+
+            operations = await tache.operations(lot, params, db)
+            modifies = supprimes = 0
+            if operations:
+                resultat = await collection.bulk_write(operations, ordered=False)
+                modifies = resultat.modified_count + resultat.upserted_count
+                supprimes = resultat.deleted_count
+
+            point["dernier_id"] = lot[-1]["_id"]
+            point["traites"] += len(lot)
+            point["modifies"] += modifies
+            point["supprimes"] += supprimes
+            await reprises.update_one(
+                {"_id": nom},
+                {"$set": {"dernier_id": point["dernier_id"], "updated_at": datetime.utcnow()},
+                 "$inc": {"traites": len(lot), "modifies": modifies, "supprimes": supprimes}},
+            )
+            if rapport:
+                rapport(point)
+            LOGGER.info("%s : %s traité(s), %s modifié(s), %s supprimé(s)",
+                        nom, point["traites"], point["modifies"], point["supprimes"])
+
+            traites_session += len(lot)
+            if docs_par_seconde:
+                # Débit limité : attendre que le temps écoulé corresponde au volume traité
+                retard = traites_session / docs_par_seconde - (time.monotonic() - debut)
+                if retard > 0:
+                    await asyncio.sleep(retard)
+    except BaseException:
+        await reprises.update_one({"_id": nom}, {"$set": {"statut": "interrompue"}})
+        raise
+
+    point["statut"] = "terminee"
+    point["finished_at"] = datetime.utcnow()
+    await reprises.update_one({"_id": nom}, {"$set": {"statut": "terminee", "finished_at": point["finished_at"]}})
+    return point
@@ -20,10 +20,70 @@ Utilisation
 """
 
 from os import getenv
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement depuis backend/.env s'il existe
+load_dotenv(dotenv_path=Path(__file__).parent / ".env")
 
 # Lis la variable d'environnement DEMO_MODE ("true"/"false", case-insensible)
 DEMO_MODE: bool = getenv("DEMO_MODE", "false").lower() in {"1", "true", "yes"}
 
-# Configuration MongoDB
-MONGODB_URL: str = getenv("MONGODB_URL", "mongodb://mongo:27017")
-DATABASE_NAME: str = getenv("DATABASE_NAME", "sante_db")
+# Configuration MongoDB (MONGO_URI fait foi ; MONGODB_URL reste accepté)
+MONGO_URI: str = getenv("MONGO_URI") or getenv("MONGODB_URL") or "mongodb://localhost:27017"
+MONGO_DB_NAME: str = getenv("MONGO_DB_NAME") or getenv("DATABASE_NAME") or "sante_db"
+# Alias conservés pour rétrocompatibilité
+MONGODB_URL: str = MONGO_URI
+DATABASE_NAME: str = MONGO_DB_NAME
+
+# Dimensionnement du pool MongoDB (un seul pool par worker)
+MONGO_MAX_POOL_SIZE: int = int(getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE: int = int(getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS: int = int(getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS: int = int(getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Configuration Redis (pool partagé par le bus d'événements et le cache)
+REDIS_URL: str = getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNEXIONS: int = int(getenv("REDIS_MAX_CONNEXIONS", "50"))
+REDIS_ATTENTE_POOL: float = float(getenv("REDIS_ATTENTE_POOL", "5"))
+REDIS_SOCKET_TIMEOUT: float = float(getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_CONNECT_TIMEOUT: float = float(getenv("REDIS_CONNECT_TIMEOUT", "2"))
+# Pool distinct des abonnements SSE : chaque flux ouvert garde sa connexion
+# pour toute sa durée et ne doit pas épuiser le pool partagé
+REDIS_MAX_ABONNEMENTS: int = int(getenv("REDIS_MAX_ABONNEMENTS", "500"))
+# Délai avant une nouvelle tentative lorsque Redis est injoignable
+REDIS_DELAI_REESSAI: float = float(getenv("REDIS_DELAI_REESSAI", "5"))
+
+# Protection du point de connexion (fenêtres glissantes, en secondes)
+LOGIN_LIMITE_IP: int = int(getenv("LOGIN_LIMITE_IP", "30"))
+LOGIN_FENETRE_IP: float = float(getenv("LOGIN_FENETRE_IP", "60"))
+# Échecs tolérés par identifiant avant blocage temporaire
+LOGIN_LIMITE_IDENTIFIANT: int = int(getenv("LOGIN_LIMITE_IDENTIFIANT", "5"))
+LOGIN_FENETRE_IDENTIFIANT: float = float(getenv("LOGIN_FENETRE_IDENTIFIANT", "900"))
+# Durée de mémorisation d'un identifiant inconnu (cache négatif)
+LOGIN_CACHE_INCONNU_TTL: int = int(getenv("LOGIN_CACHE_INCONNU_TTL", "60"))
+
+# Attribution automatique médecin (cf. backend/services/charge_medecins.py)
+ATTRIBUTION_CAPACITE_MAX: int = int(getenv("ATTRIBUTION_CAPACITE_MAX", "0"))  # 0 = sans plafond
+ATTRIBUTION_POIDS_CRITIQUES: float = float(getenv("ATTRIBUTION_POIDS_CRITIQUES", "0"))
+ATTRIBUTION_CANDIDATS: int = int(getenv("ATTRIBUTION_CANDIDATS", "5"))
+
+# Traçage distribué (OpenTelemetry, optionnel) : "" (désactivé), "otlp" ou "fichier".
+# En mode otlp, le collecteur est désigné par OTEL_EXPORTER_OTLP_ENDPOINT.
+TRACES_EXPORTEUR: str = getenv("TRACES_EXPORTEUR", "").lower()
+TRACES_FICHIER: str = getenv("TRACES_FICHIER", "traces.jsonl")
+
+# Surveillance de la boucle asyncio (retard, blocages avec pile d'appels)
+BOUCLE_SURVEILLANCE: bool = getenv("BOUCLE_SURVEILLANCE", "true").lower() in {"1", "true", "yes"}
+BOUCLE_INTERVALLE: float = float(getenv("BOUCLE_INTERVALLE", "0.5"))  # période d'échantillonnage (s)
+BOUCLE_SEUIL_BLOCAGE: float = float(getenv("BOUCLE_SEUIL_BLOCAGE", "0.1"))  # blocage signalé au-delà (s)
+# Mode debug asyncio : nomme la tâche/coroutine de chaque callback lent (coûteux, hors production)
+BOUCLE_DEBUG: bool = getenv("BOUCLE_DEBUG", "false").lower() in {"1", "true", "yes"}
+
+# Profilage à la demande (routes /admin/profilage)
+PROFILAGE_DUREE_MAX: float = float(getenv("PROFILAGE_DUREE_MAX", "60"))  # secondes
+# Cadres de pile conservés par allocation tracemalloc (0 = suivi mémoire désactivé, coût ~x1.3 en mémoire)
+TRACEMALLOC_CADRES: int = int(getenv("TRACEMALLOC_CADRES", "0"))
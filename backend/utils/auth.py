@@ -2,9 +2,13 @@
 Tout est rédigé en français.
 """
 
+import asyncio
 import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -16,31 +20,110 @@ load_dotenv(".env")
 SECRET_KEY = os.getenv("JWT_SECRET", "secret-demo")
 # Algorithme de signature : HS256 par défaut (HMAC + SHA-256)
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-# Durée de vie par défaut d’un token (60 minutes)
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+# Durée de vie par défaut d’un token (15 minutes, renouvelé via /auth/refresh) :
+# borne la validité d'un jeton dont la révocation n'a pas encore atteint Redis
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+# Durée de vie d'un jeton de rafraîchissement (permet des jetons d'accès courts)
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+
+# Type de jeton (claim "type") : un jeton de rafraîchissement n'ouvre aucune route
+TYPE_ACCES = "access"
+TYPE_RAFRAICHISSEMENT = "refresh"
+
+# Facteur de travail bcrypt (2^rounds itérations) ; un hash stocké avec un autre
+# coût est recalculé de façon transparente à la connexion suivante.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads dédiés au hashage : bcrypt relâche le GIL, un pool de threads suffit.
+# Borné pour qu'un pic de connexions ne sature pas tous les cœurs du worker.
+MOT_DE_PASSE_THREADS = int(os.getenv("MOT_DE_PASSE_THREADS", min(4, os.cpu_count() or 1)))
 
 # Contexte Passlib configuré pour bcrypt (salage et facteur de travail automatique)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 
 def hacher_mot_de_passe(mot_de_passe: str) -> str:
-    """Retourne le hash bcrypt d'un mot de passe."""
+    """Retourne le hash bcrypt d'un mot de passe (synchrone : scripts, tests)."""
     return pwd_context.hash(mot_de_passe)
 
 
 def verifier_mot_de_passe(mot_de_passe: str, hash_: str) -> bool:
-    """Vérifie qu'un mot de passe correspond à son hash."""
+    """Vérifie qu'un mot de passe correspond à son hash (synchrone : scripts, tests)."""
     return pwd_context.verify(mot_de_passe, hash_)
 
 
+class ServiceMotsDePasse:
+    """Hashage/vérification bcrypt hors de la boucle asyncio.
+
+    Chaque appel bcrypt prend 100 à 300 ms de CPU : exécuté dans un handler
+    `async`, il bloquerait toutes les autres requêtes du worker. Les calculs
+    sont donc délégués à un pool de threads dédié et borné.
+    """
+
+    def __init__(self, threads: int = MOT_DE_PASSE_THREADS) -> None:
+        self._threads = threads
+        self._executeur: Optional[ThreadPoolExecutor] = None
+        self._hash_factice: Optional[str] = None
+
+    def _executer(self, fonction, *args):
+        if self._executeur is None:
+            self._executeur = ThreadPoolExecutor(
+                max_workers=self._threads, thread_name_prefix="bcrypt"
+            )
+        return asyncio.get_running_loop().run_in_executor(self._executeur, fonction, *args)
+
+    async def hacher(self, mot_de_passe: str) -> str:
+        """Hash bcrypt calculé dans le pool dédié."""
+        return await self._executer(pwd_context.hash, mot_de_passe)
+
+    async def verifier(self, mot_de_passe: str, hash_: str) -> bool:
+        """Vérification calculée dans le pool dédié."""
+        return await self._executer(pwd_context.verify, mot_de_passe, hash_)
+
+    async def verifier_et_mettre_a_jour(self, mot_de_passe: str, hash_: str) -> Tuple[bool, Optional[str]]:
+        """Vérifie le mot de passe ; renvoie aussi un nouveau hash si le coût stocké est obsolète."""
+        return await self._executer(pwd_context.verify_and_update, mot_de_passe, hash_)
+
+    async def verifier_factice(self, mot_de_passe: str) -> None:
+        """Vérification au même coût qu'une vraie, pour un compte inconnu.
+
+        Sans elle, la réponse rapide sur un identifiant inexistant révélerait
+        quels comptes existent (oracle temporel).
+        """
+        if self._hash_factice is None:
+            self._hash_factice = await self.hacher(secrets.token_urlsafe(16))
+        await self.verifier(mot_de_passe, self._hash_factice)
+
+    def arreter(self) -> None:
+        """Libère les threads (arrêt du worker)."""
+        if self._executeur is not None:
+            self._executeur.shutdown(wait=False)
+            self._executeur = None
+
+
+# Instance partagée par le worker
+mots_de_passe = ServiceMotsDePasse()
+
+
 def creer_jwt(data: dict, expire_delta: Optional[timedelta] = None) -> str:
-    """Crée un JWT signé avec expiration."""
-    to_encode = data.copy()
+    """Crée un JWT d'accès signé avec expiration.
+
+    `iat` est fractionnaire : il est comparé à l'horodatage de révocation
+    de l'utilisateur (cf. backend/services/revocation.py).
+    """
+    to_encode = {"type": TYPE_ACCES, **data}
     expire = datetime.utcnow() + (expire_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def creer_jeton_rafraichissement(user_id: str) -> str:
+    """Crée un jeton de rafraîchissement (échangeable contre un jeton d'accès)."""
+    return creer_jwt(
+        {"sub": user_id, "type": TYPE_RAFRAICHISSEMENT, "jti": secrets.token_urlsafe(12)},
+        timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+
+
 def verifier_jwt(token: str) -> Optional[dict]:
     """Décode le JWT et retourne le payload si valide, None sinon."""
     try:
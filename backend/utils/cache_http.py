@@ -0,0 +1,203 @@
+"""Réponses conditionnelles (ETag / If-None-Match) pilotées par des compteurs de version.
+
+Chaque écriture incrémente dans Redis un compteur par collection et par
+portée (`version:{collection}:{user_id}`) ainsi qu'un compteur global
+(`version:{collection}:global`). L'ETag d'une réponse est dérivé de la route,
+de l'identité de l'appelant et des compteurs dont elle dépend : un
+`If-None-Match` identique reçoit un 304 sans aucune requête MongoDB.
+
+Règles :
+- les écrivains incrémentent APRÈS l'écriture Mongo (jamais de 304 périmé) ;
+- une époque aléatoire est incluse : un `FLUSHALL` Redis invalide tous les ETags ;
+- sans Redis, aucun ETag n'est émis (les workers ne partageraient pas les
+  compteurs) et la réponse complète est toujours renvoyée ;
+- un incrément perdu (Redis indisponible ou en erreur) est mémorisé par le
+  worker et rejoué dès que Redis répond ; tant qu'il reste en attente, ce
+  worker n'émet plus d'ETag. Au-delà de `VERSIONS_DIFFEREES_MAX` portées en
+  attente, l'époque est changée à la place (tous les ETags invalidés) ;
+- les écritures hors API (scripts, shell Mongo) doivent appeler
+  `incrementer_versions` ou patienter jusqu'à la prochaine écriture.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import uuid
+from os import getenv
+from typing import Any, Iterable, List, Optional, Set
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from backend.ressources import ressources
+from backend.utils.serialisation import ReponseORJSON, encoder_json
+
+CLE_VERSION = "version:{}:{}"
+CLE_EPOQUE = "version:epoque"
+PORTEE_GLOBALE = "global"
+
+# Politiques Cache-Control par type de ressource
+CACHE_PRIVE_REVALIDER = "private, no-cache"
+CACHE_MAX_AGE_STATS = int(getenv("CACHE_MAX_AGE_STATS", "10"))
+CACHE_MAX_AGE_DEPARTEMENTS = int(getenv("CACHE_MAX_AGE_DEPARTEMENTS", "300"))
+CACHE_STATS = f"private, max-age={CACHE_MAX_AGE_STATS}, must-revalidate"
+CACHE_DEPARTEMENTS = f"private, max-age={CACHE_MAX_AGE_DEPARTEMENTS}, must-revalidate"
+
+VERSIONS_DIFFEREES_MAX = int(getenv("VERSIONS_DIFFEREES_MAX", "10000"))
+VERSIONS_REPRISE_S = float(getenv("VERSIONS_REPRISE_S", "1"))
+
+
+def portee(collection: str, cible: Optional[str] = None) -> str:
+    """Clé du compteur de *collection* pour *cible* (utilisateur) ou global."""
+    return CLE_VERSION.format(collection, cible or PORTEE_GLOBALE)
+
+
+class IncrementsDifferes:
+    """Incréments de version non appliqués, rejoués dès que Redis répond."""
+
+    def __init__(self, maximum: int = VERSIONS_DIFFEREES_MAX) -> None:
+        self.maximum = maximum
+        self._cles: Set[str] = set()
+        # Trop de portées en attente : changer l'époque plutôt que tout incrémenter
+        self._epoque = False
+        self._reprise: Optional[asyncio.Task] = None
+
+    def __bool__(self) -> bool:
+        return bool(self._cles) or self._epoque
+
+    def ajouter(self, cles: Iterable[str], epoque: bool = False) -> None:
+        self._cles.update(cles)
+        self._epoque = self._epoque or epoque
+        if len(self._cles) > self.maximum:
+            self._cles.clear()
+            self._epoque = True
+        boucle = asyncio.get_running_loop()
+        if self._reprise is None or self._reprise.done() or self._reprise.get_loop() is not boucle:
+            # Tenue par le gestionnaire de ressources : annulée à l'arrêt du worker
+            self._reprise = ressources.lancer_tache(self._reprendre(), "reprise_versions")
+
+    async def rejouer(self) -> bool:
+        """Applique les incréments en attente ; False s'ils restent en attente."""
+        if not self:
+            return True
+        client = ressources.redis()
+        if client is None:
+            return False
+        cles, epoque = self._cles, self._epoque
+        self._cles, self._epoque = set(), False
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                if epoque:
+                    pipe.set(CLE_EPOQUE, uuid.uuid4().hex)
+                for cle in cles:
+                    pipe.incr(cle)
+                await pipe.execute()
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+            self._cles |= cles
+            self._epoque = self._epoque or epoque
+            return False
+        return True
+
+    async def _reprendre(self) -> None:
+        while not await self.rejouer():
+            await asyncio.sleep(VERSIONS_REPRISE_S)
+
+    async def arreter(self) -> None:
+        """Dernière tentative, puis arrêt de la reprise (arrêt du worker)."""
+        await self.rejouer()
+        if self._reprise is not None and self._reprise.get_loop() is asyncio.get_running_loop():
+            self._reprise.cancel()
+            await asyncio.gather(self._reprise, return_exceptions=True)
+        self._reprise = None
+
+
+# Instance partagée par le worker
+differes = IncrementsDifferes()
+
+
+async def incrementer_versions(collection: str, *cibles: Optional[str]) -> None:
+    """Signale une écriture sur *collection* pour chaque utilisateur de *cibles*."""
+    cles = [portee(collection), *(portee(collection, c) for c in {c for c in cibles if c})]
+    client = ressources.redis()
+    if client is None:
+        differes.ajouter(cles)
+        return
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for cle in cles:
+                pipe.incr(cle)
+            await pipe.execute()
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        differes.ajouter(cles)
+
+
+async def _lire_versions(portees: List[str]) -> Optional[List[str]]:
+    """Époque + valeur de chaque compteur, ou None si Redis est indisponible.
+
+    None aussi tant que des incréments de ce worker restent en attente :
+    ses propres écritures ne sont pas encore visibles dans les compteurs.
+    """
+    if differes and not await differes.rejouer():
+        return None
+    client = ressources.redis()
+    if client is None:
+        return None
+    try:
+        epoque = await client.get(CLE_EPOQUE)
+        if epoque is None:
+            await client.set(CLE_EPOQUE, uuid.uuid4().hex, nx=True)
+            epoque = await client.get(CLE_EPOQUE)
+        valeurs = await client.mget(portees) if portees else []
+    except Exception as exc:
+        ressources.signaler_echec_redis(exc)
+        return None
+    return [epoque] + [v or "0" for v in valeurs]
+
+
+class ReponseConditionnelle:
+    """Prépare l'ETag d'une requête GET et construit la réponse (200 ou 304).
+
+    Usage dans un handler :
+        conditionnel = await ReponseConditionnelle.preparer(request, [...], identite)
+        if conditionnel.non_modifie:
+            return conditionnel.reponse_304()
+        ...
+        return conditionnel.reponse(contenu)
+    """
+
+    def __init__(self, etag: Optional[str], cache_control: str, non_modifie: bool) -> None:
+        self.etag = etag
+        self.cache_control = cache_control
+        self.non_modifie = non_modifie
+
+    @classmethod
+    async def preparer(
+        cls,
+        request: Request,
+        portees: Iterable[str],
+        identite: str,
+        cache_control: str = CACHE_PRIVE_REVALIDER,
+    ) -> "ReponseConditionnelle":
+        versions = await _lire_versions(list(portees))
+        if versions is None:
+            return cls(None, cache_control, False)
+        jeton = "|".join([request.url.path, request.url.query, identite, *versions])
+        etag = 'W/"' + hashlib.blake2b(jeton.encode(), digest_size=16).hexdigest() + '"'
+        candidats = {c.strip() for c in request.headers.get("if-none-match", "").split(",")}
+        return cls(etag, cache_control, etag in candidats)
+
+    def _entetes(self) -> dict:
+        entetes = {"Cache-Control": self.cache_control, "Vary": "Authorization"}
+        if self.etag:
+            entetes["ETag"] = self.etag
+        return entetes
+
+    def reponse_304(self) -> Response:
+        return Response(status_code=304, headers=self._entetes())
+
+    def reponse(self, contenu: Any, status_code: int = 200) -> Response:
+        corps = contenu if isinstance(contenu, bytes) else encoder_json(contenu)
+        return ReponseORJSON(corps, status_code=status_code, headers=self._entetes())
@@ -0,0 +1,163 @@
+"""Instrumentation du backend : latence par route et commandes MongoDB.
+
+- `MiddlewareInstrumentation` (ASGI) : histogramme de latence, compteur de
+  requêtes par statut et requêtes en cours, étiquetés par *gabarit* de route
+  (`/patients/{patient_id}/summary`, pas l'URL réelle : cardinalité bornée) ;
+- `EcouteurCommandesMongo` (pymongo `CommandListener`) : chaque commande est
+  attribuée à la route en cours via un `ContextVar` (Motor exécute pymongo
+  dans un thread en copiant le contexte), avec sa durée et le nombre de
+  documents renvoyés ; l'histogramme `mongo_commandes_par_requete` fait
+  ressortir les schémas N+1 ;
+- `exposition()` : texte au format Prometheus pour `GET /metrics`.
+
+Les commandes émises hors requête (démarrage, tâches de fond) sont
+étiquetées `hors_requete`. Avec plusieurs workers uvicorn, définir
+PROMETHEUS_MULTIPROC_DIR pour agréger les métriques de tous les processus.
+`_documents_renvoyes` et `exposition` sont repris à l'identique dans
+services/commun/instrumentation.py (tests/test_commun_synchronise.py).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from starlette.routing import Match
+
+HORS_REQUETE = "hors_requete"
+ROUTE_INCONNUE = "inconnue"
+
+REQUETES = Counter("http_requetes_total", "Requêtes HTTP traitées", ["route", "methode", "statut"])
+DUREE_REQUETES = Histogram(
+    "http_duree_secondes", "Durée des requêtes HTTP", ["route", "methode"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EN_COURS = Gauge("http_requetes_en_cours", "Requêtes HTTP en cours", ["route", "methode"], multiprocess_mode="livesum")
+COMMANDES = Counter("mongo_commandes_total", "Commandes MongoDB", ["route", "commande", "collection"])
+ECHECS = Counter("mongo_commandes_echecs_total", "Commandes MongoDB en échec", ["route", "commande", "collection"])
+DUREE_COMMANDES = Histogram(
+    "mongo_duree_secondes", "Durée des commandes MongoDB", ["route", "commande", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DOCUMENTS = Counter("mongo_documents_renvoyes_total", "Documents renvoyés par MongoDB", ["route", "commande", "collection"])
+COMMANDES_PAR_REQUETE = Histogram(
+    "mongo_commandes_par_requete", "Commandes MongoDB émises par requête HTTP", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+
+
+class _ContexteRequete:
+    """Route de la requête en cours et nombre de commandes Mongo émises."""
+
+    __slots__ = ("route", "commandes")
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.commandes = 0
+
+
+_requete: ContextVar[Optional[_ContexteRequete]] = ContextVar("requete_instrumentee", default=None)
+
+
+class MiddlewareInstrumentation:
+    """Middleware ASGI : latence, statut et requêtes en cours par route."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    def _gabarit(self, scope: Dict[str, Any]) -> str:
+        """Gabarit de la route correspondant à la requête (même résolution que le routeur)."""
+        for route in scope["app"].router.routes:
+            correspondance, _ = route.matches(scope)
+            if correspondance == Match.FULL:
+                return getattr(route, "path", ROUTE_INCONNUE)
+        return ROUTE_INCONNUE
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        methode = scope["method"]
+        route = self._gabarit(scope)
+        # Réutilisé par le middleware de traçage (nom des spans serveur)
+        scope["gabarit_route"] = route
+        contexte = _ContexteRequete(route)
+        jeton = _requete.set(contexte)
+        statut = {"code": 500}
+
+        async def envoyer(message) -> None:
+            if message["type"] == "http.response.start":
+                statut["code"] = message["status"]
+            await send(message)
+
+        en_cours = EN_COURS.labels(route, methode)
+        en_cours.inc()
+        debut = time.perf_counter()
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            DUREE_REQUETES.labels(route, methode).observe(time.perf_counter() - debut)
+            REQUETES.labels(route, methode, str(statut["code"])).inc()
+            COMMANDES_PAR_REQUETE.labels(route).observe(contexte.commandes)
+            en_cours.dec()
+            _requete.reset(jeton)
+
+
+def _documents_renvoyes(reponse: Dict[str, Any]) -> int:
+    curseur = reponse.get("cursor")
+    if isinstance(curseur, dict):
+        return len(curseur.get("firstBatch") or curseur.get("nextBatch") or [])
+    if "values" in reponse:  # distinct
+        return len(reponse["values"])
+    if "value" in reponse:  # findAndModify
+        return 1 if reponse["value"] is not None else 0
+    return 0
+
+
+class EcouteurCommandesMongo(monitoring.CommandListener):
+    """Attribue chaque commande MongoDB à la route en cours."""
+
+    def __init__(self) -> None:
+        # (connexion, request_id) → collection, le temps de la commande
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = (
+            collection if isinstance(collection, str) else ""
+        )
+
+    def _terminer(self, event) -> Tuple[str, str, str]:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        contexte = _requete.get()
+        if contexte is not None:
+            contexte.commandes += 1
+        route = contexte.route if contexte else HORS_REQUETE
+        etiquettes = (route, event.command_name, collection)
+        COMMANDES.labels(*etiquettes).inc()
+        DUREE_COMMANDES.labels(*etiquettes).observe(event.duration_micros / 1_000_000)
+        return etiquettes
+
+    def succeeded(self, event) -> None:
+        etiquettes = self._terminer(event)
+        documents = _documents_renvoyes(event.reply)
+        if documents:
+            DOCUMENTS.labels(*etiquettes).inc(documents)
+
+    def failed(self, event) -> None:
+        ECHECS.labels(*self._terminer(event)).inc()
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Corps et type de contenu de la réponse `/metrics`."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registre = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registre)
+        return generate_latest(registre), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,114 @@
+"""Limitation de débit par fenêtre glissante (Redis, repli en mémoire).
+
+Chaque clé correspond à un sorted set Redis `limite:{prefixe}:{cle}` dont les
+membres sont les horodatages des événements ; les événements plus anciens que
+la fenêtre sont purgés à chaque appel (ZREMRANGEBYSCORE), le décompte est un
+ZCARD. Sans Redis, un dictionnaire local borné prend le relais : la limite
+devient alors propre à chaque worker.
+"""
+
+from __future__ import annotations
+
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+from backend.ressources import ressources
+
+# Nombre maximal de clés suivies localement quand Redis est indisponible
+MAX_CLES_LOCALES = 10_000
+
+
+class LimiteurFenetreGlissante:
+    """Au plus `limite` événements par `fenetre` secondes pour une même clé."""
+
+    def __init__(self, prefixe: str, limite: int, fenetre: float) -> None:
+        self.prefixe = prefixe
+        self.limite = limite
+        self.fenetre = fenetre
+        self._local: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def _cle(self, cle: str) -> str:
+        return f"limite:{self.prefixe}:{cle}"
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    async def consommer(self, cle: str) -> Optional[float]:
+        """Enregistre un événement ; renvoie le délai d'attente (s) si la limite est dépassée.
+
+        Les tentatives refusées sont aussi comptées : un client qui insiste
+        reste bloqué tant qu'il ne ralentit pas.
+        """
+        return await self._appliquer(cle, enregistrer=True)
+
+    async def depasse(self, cle: str) -> Optional[float]:
+        """Délai d'attente (s) si la limite est déjà atteinte, sans rien enregistrer."""
+        return await self._appliquer(cle, enregistrer=False)
+
+    async def enregistrer(self, cle: str) -> None:
+        """Enregistre un événement sans contrôle (ex : échec de connexion)."""
+        await self._appliquer(cle, enregistrer=True)
+
+    async def reinitialiser(self, cle: str) -> None:
+        """Oublie l'historique de la clé (ex : connexion réussie)."""
+        self._local.pop(cle, None)
+        client = ressources.redis()
+        if client is None:
+            return
+        try:
+            await client.delete(self._cle(cle))
+        except Exception as exc:
+            ressources.signaler_echec_redis(exc)
+
+    # ------------------------------------------------------------------
+    # Implémentations
+    # ------------------------------------------------------------------
+    async def _appliquer(self, cle: str, enregistrer: bool) -> Optional[float]:
+        maintenant = time.time()
+        client = ressources.redis()
+        if client is not None:
+            try:
+                return await self._appliquer_redis(client, cle, maintenant, enregistrer)
+            except Exception as exc:
+                ressources.signaler_echec_redis(exc)
+        return self._appliquer_local(cle, maintenant, enregistrer)
+
+    async def _appliquer_redis(self, client, cle: str, maintenant: float, enregistrer: bool) -> Optional[float]:
+        cle_redis = self._cle(cle)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(cle_redis, 0, maintenant - self.fenetre)
+            pipe.zcard(cle_redis)
+            pipe.zrange(cle_redis, 0, 0, withscores=True)
+            if enregistrer:
+                # Membre unique : deux événements simultanés ne se confondent pas
+                pipe.zadd(cle_redis, {f"{maintenant}:{uuid.uuid4().hex[:8]}": maintenant})
+                pipe.expire(cle_redis, int(self.fenetre) + 1)
+            resultats = await pipe.execute()
+        nombre, plus_ancien = resultats[1], resultats[2]
+        if nombre < self.limite:
+            return None
+        debut = plus_ancien[0][1] if plus_ancien else maintenant
+        return max(debut + self.fenetre - maintenant, 0.0)
+
+    def _appliquer_local(self, cle: str, maintenant: float, enregistrer: bool) -> Optional[float]:
+        evenements = self._local.get(cle)
+        if evenements is None:
+            evenements = deque()
+            self._local[cle] = evenements
+        self._local.move_to_end(cle)
+        while evenements and evenements[0] <= maintenant - self.fenetre:
+            evenements.popleft()
+        nombre = len(evenements)
+        debut = evenements[0] if evenements else maintenant
+        if enregistrer:
+            evenements.append(maintenant)
+            # Seuls les `limite` derniers événements comptent pour la décision
+            while len(evenements) > self.limite:
+                evenements.popleft()
+        while len(self._local) > MAX_CLES_LOCALES:
+            self._local.popitem(last=False)
+        if nombre < self.limite:
+            return None
+        return max(debut + self.fenetre - maintenant, 0.0)
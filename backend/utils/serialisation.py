@@ -0,0 +1,55 @@
+"""Chemin rapide de sérialisation pour les endpoints en lecture intensive.
+
+Les documents sont lus bruts avec une projection MongoDB (seuls les champs
+utiles transitent), puis encodés directement en octets JSON par orjson.
+Renvoyer une `ReponseORJSON` depuis un handler court-circuite la validation
+`response_model` de FastAPI : à réserver aux formes internes de confiance.
+Le `response_model` reste déclaré sur la route pour la documentation OpenAPI.
+"""
+
+from enum import Enum
+from typing import Any, Dict, Iterable, List
+
+import orjson
+from bson import ObjectId
+from starlette.responses import Response
+
+
+def _encoder_defaut(valeur: Any) -> Any:
+    """Types BSON/Python non gérés nativement par orjson."""
+    if isinstance(valeur, ObjectId):
+        return str(valeur)
+    if isinstance(valeur, Enum):
+        return valeur.value
+    raise TypeError(f"Type non sérialisable : {type(valeur).__name__}")
+
+
+def encoder_json(contenu: Any) -> bytes:
+    """Encode *contenu* en JSON (datetime au format ISO 8601, ObjectId en str)."""
+    return orjson.dumps(contenu, default=_encoder_defaut, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ReponseORJSON(Response):
+    """Réponse JSON encodée par orjson (équivalent d'`ORJSONResponse`)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return encoder_json(content)
+
+
+def projection(*champs: str) -> Dict[str, int]:
+    """Construit une projection MongoDB n'incluant que *champs* (et `_id`)."""
+    return {champ: 1 for champ in champs}
+
+
+def avec_id(docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Remplace `_id` (ObjectId) par `id` (str) dans chaque document brut."""
+    resultat = []
+    for doc in docs:
+        doc["id"] = str(doc.pop("_id"))
+        resultat.append(doc)
+    return resultat
+
@@ -0,0 +1,140 @@
+"""Santé de la boucle asyncio : retard d'ordonnancement et appels bloquants.
+
+- Une tâche d'échantillonnage dort `intervalle` secondes et mesure le retard
+  au réveil (histogramme `boucle_retard_secondes`) : c'est le temps qu'une
+  requête prête attend avant d'être servie.
+- Un thread chien de garde surveille le battement de cette tâche. S'il
+  s'arrête plus de `seuil` secondes, la boucle exécute du code bloquant
+  (bcrypt synchrone, sérialisation lourde…) : la pile du thread de la
+  boucle est journalisée *pendant* le blocage, ce qui désigne la ligne
+  fautive, et `boucle_blocages_total` est incrémenté.
+- Mode debug (`BOUCLE_DEBUG`) : active le mode debug d'asyncio, qui journalise
+  chaque callback plus long que le seuil avec la tâche et la coroutine
+  concernées (logger `asyncio`). Coûteux : à réserver au diagnostic.
+
+Les services reprennent ce module dans services/commun/ avec un préfixe de
+métriques (`ia_`, `notifications_`) ; `_metriques` et `SurveillantBoucle`
+y sont identiques (tests/test_commun_synchronise.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, NamedTuple, Optional
+
+from prometheus_client import Counter, Histogram
+
+from backend import settings
+
+LOGGER = logging.getLogger("surveillance_boucle")
+
+# Réglages du backend sous les noms du module commun des services
+BOUCLE_INTERVALLE = settings.BOUCLE_INTERVALLE
+BOUCLE_SEUIL_BLOCAGE = settings.BOUCLE_SEUIL_BLOCAGE
+BOUCLE_DEBUG = settings.BOUCLE_DEBUG
+
+
+class _Metriques(NamedTuple):
+    retard: Histogram
+    blocages: Counter
+    duree_blocages: Histogram
+
+
+_METRIQUES: Dict[str, _Metriques] = {}
+
+
+def _metriques(prefixe: str) -> _Metriques:
+    """Métriques du service *prefixe* (sans préfixe : backend), enregistrées une seule fois par processus."""
+    if prefixe not in _METRIQUES:
+        nom = (prefixe + "_boucle_") if prefixe else "boucle_"
+        _METRIQUES[prefixe] = _Metriques(
+            Histogram(
+                nom + "retard_secondes", "Retard de la boucle asyncio au réveil de l'échantillonneur",
+                buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+            ),
+            Counter(nom + "blocages_total", "Blocages de la boucle asyncio au-delà du seuil"),
+            Histogram(
+                nom + "blocage_duree_secondes", "Durée des blocages de la boucle asyncio",
+                buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+            ),
+        )
+    return _METRIQUES[prefixe]
+
+
+class SurveillantBoucle:
+    """Échantillonneur de retard (tâche) et chien de garde (thread) d'une boucle."""
+
+    def __init__(self, prefixe: str = "", intervalle: float = BOUCLE_INTERVALLE, seuil: float = BOUCLE_SEUIL_BLOCAGE,
+                 debug: bool = BOUCLE_DEBUG) -> None:
+        self.metriques = _metriques(prefixe)
+        self.intervalle = intervalle
+        self.seuil = seuil
+        self.debug = debug
+        self.blocages = 0
+        self._battement = time.monotonic()
+        self._thread_boucle: Optional[int] = None
+        self._tache: Optional[asyncio.Task] = None
+        self._chien: Optional[threading.Thread] = None
+        self._arret = threading.Event()
+
+    def demarrer(self) -> None:
+        """À appeler depuis la boucle à surveiller (lifespan)."""
+        boucle = asyncio.get_running_loop()
+        if self.debug:
+            boucle.set_debug(True)
+            boucle.slow_callback_duration = self.seuil
+        self._thread_boucle = threading.get_ident()
+        self._battement = time.monotonic()
+        self._arret.clear()
+        self._tache = boucle.create_task(self._echantillonner(), name="surveillance_boucle")
+        self._chien = threading.Thread(target=self._garder, name="chien-de-garde-boucle", daemon=True)
+        self._chien.start()
+
+    async def arreter(self) -> None:
+        self._arret.set()
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+        if self._chien is not None:
+            self._chien.join(timeout=1)
+        self._tache = self._chien = None
+
+    async def _echantillonner(self) -> None:
+        while True:
+            prevu = time.monotonic() + self.intervalle
+            await asyncio.sleep(self.intervalle)
+            maintenant = time.monotonic()
+            self.metriques.retard.observe(max(0.0, maintenant - prevu))
+            self._battement = maintenant
+
+    def _pile_boucle(self) -> str:
+        cadre = sys._current_frames().get(self._thread_boucle)  # noqa: SLF001
+        return "".join(traceback.format_stack(cadre)) if cadre is not None else "(pile indisponible)"
+
+    def _garder(self) -> None:
+        debut_blocage: Optional[float] = None
+        while not self._arret.wait(max(self.seuil / 2, 0.005)):
+            # Le battement est attendu toutes les `intervalle` secondes
+            echeance = self._battement + self.intervalle
+            retard = time.monotonic() - echeance
+            if debut_blocage is None and retard > self.seuil:
+                debut_blocage = echeance
+                self.blocages += 1
+                self.metriques.blocages.inc()
+                LOGGER.warning(
+                    "Boucle asyncio bloquée depuis %.0f ms, pile du thread de la boucle :\n%s",
+                    retard * 1000, self._pile_boucle(),
+                )
+            elif debut_blocage is not None and retard <= self.seuil:
+                duree = self._battement - debut_blocage
+                self.metriques.duree_blocages.observe(duree)
+                LOGGER.warning("Boucle asyncio débloquée après %.0f ms", duree * 1000)
+                debut_blocage = None
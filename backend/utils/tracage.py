@@ -0,0 +1,178 @@
+"""Traçage distribué (W3C traceparent) : backend → Redis → IA → notifications.
+
+Le contexte de trace voyage *dans* les payloads d'événements (`traceparent`,
+`tracestate`) : `injecter()` à la publication, `extraire()` à la réception.
+Chaque étape ouvre ses spans : requête HTTP (`MiddlewareTracage`),
+publication Redis (`span_publication`) et commandes MongoDB
+(`EcouteurTracesMongo`, enfant du span courant grâce au contexte copié
+par Motor dans son thread).
+
+OpenTelemetry est optionnel : sans le paquet, ou sans exporteur configuré
+(`TRACES_EXPORTEUR`), toutes ces fonctions sont neutres. Exporteurs :
+- `otlp` : collecteur OTLP/HTTP local (OTEL_EXPORTER_OTLP_ENDPOINT) ;
+- `fichier` : un span JSON par ligne dans `TRACES_FICHIER`.
+
+services/commun/tracage.py en est la version des services : les fonctions
+de configuration, de propagation et `EcouteurTracesMongo` y sont identiques
+(tests/test_commun_synchronise.py).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from backend import settings
+
+try:
+    from opentelemetry import propagate, trace  # type: ignore
+    from opentelemetry.trace import SpanKind, Status, StatusCode  # type: ignore
+except ImportError:  # pragma: no cover
+    trace = None  # type: ignore
+
+try:
+    from pymongo import monitoring
+except ImportError:  # pragma: no cover
+    monitoring = None  # type: ignore
+
+LOGGER = logging.getLogger("tracage")
+CHAMPS_CONTEXTE = ("traceparent", "tracestate")
+
+# Réglages du backend sous les noms du module commun des services
+TRACES_EXPORTEUR = settings.TRACES_EXPORTEUR
+TRACES_FICHIER = settings.TRACES_FICHIER
+
+_actif = False
+_nom_service = "backend"
+
+
+def actif() -> bool:
+    return _actif
+
+
+def configurer(nom_service: str, exporteur: Optional[str] = None, fichier: Optional[str] = None) -> bool:
+    """Installe le fournisseur de traces du processus ; retourne vrai si le traçage est actif."""
+    global _actif, _nom_service
+    _nom_service = nom_service
+    exporteur = TRACES_EXPORTEUR if exporteur is None else exporteur
+    if trace is None or not exporteur:
+        return False
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporteur == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        export = OTLPSpanExporter()
+    elif exporteur == "fichier":
+        sortie = open(fichier or TRACES_FICHIER, "a", encoding="utf-8")
+        export = ConsoleSpanExporter(out=sortie, formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        LOGGER.warning("Exporteur de traces inconnu : %s (traçage désactivé)", exporteur)
+        return False
+    fournisseur = TracerProvider(resource=Resource.create({"service.name": nom_service}))
+    fournisseur.add_span_processor(BatchSpanProcessor(export))
+    trace.set_tracer_provider(fournisseur)
+    _actif = True
+    LOGGER.info("Traçage actif (%s) pour %s", exporteur, nom_service)
+    return True
+
+
+def arreter() -> None:
+    """Vide les spans en attente d'export (arrêt du processus)."""
+    if _actif:
+        trace.get_tracer_provider().shutdown()
+
+
+def _traceur():
+    return trace.get_tracer(f"sante.{_nom_service}")
+
+
+def injecter(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie de *payload* portant le contexte de trace courant."""
+    if not _actif:
+        return payload
+    porteur: Dict[str, str] = {}
+    propagate.inject(porteur)
+    return {**payload, **porteur}
+
+
+def extraire(porteur: Dict[str, Any]) -> Any:
+    """Contexte OpenTelemetry d'un payload ou d'en-têtes (None si inactif)."""
+    if not _actif:
+        return None
+    return propagate.extract({c: porteur[c] for c in CHAMPS_CONTEXTE if isinstance(porteur.get(c), str)})
+
+
+@contextmanager
+def span_publication(canal: str) -> Iterator[None]:
+    """Span producteur autour d'une publication Redis."""
+    if not _actif:
+        yield
+        return
+    with _traceur().start_as_current_span(
+        f"publier {canal}", kind=SpanKind.PRODUCER,
+        attributes={"messaging.system": "redis", "messaging.destination.name": canal},
+    ):
+        yield
+
+
+class MiddlewareTracage:
+    """Span serveur par requête HTTP, rattaché au `traceparent` entrant s'il existe."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not _actif:
+            await self.app(scope, receive, send)
+            return
+        entetes = {cle.decode("latin-1"): valeur.decode("latin-1") for cle, valeur in scope["headers"]}
+        # Gabarit renseigné par MiddlewareInstrumentation (placé avant celui-ci)
+        route = scope.get("gabarit_route", scope["path"])
+        with _traceur().start_as_current_span(
+            f"{scope['method']} {route}", context=extraire(entetes), kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "http.route": route},
+        ) as span:
+            async def envoyer(message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, envoyer)
+
+
+class EcouteurTracesMongo(monitoring.CommandListener if monitoring else object):  # type: ignore[misc]
+    """Un span client par commande MongoDB, enfant du span courant."""
+
+    def __init__(self) -> None:
+        self._spans: Dict[Tuple[Any, int], Any] = {}
+
+    def started(self, event) -> None:
+        if not _actif:
+            return
+        collection = event.command.get(event.command_name)
+        self._spans[(event.connection_id, event.request_id)] = _traceur().start_span(
+            f"mongo {event.command_name}", kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation.name": event.command_name,
+                "db.collection.name": collection if isinstance(collection, str) else "",
+            },
+        )
+
+    def succeeded(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.set_status(Status(StatusCode.ERROR, json.dumps(event.failure, default=str)[:200]))
+            span.end()
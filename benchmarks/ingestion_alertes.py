@@ -0,0 +1,323 @@
+"""Banc d'essai de bout en bout : ingestion → alerte, et tableaux de bord médecin.
+
+Mesure, sur la pile complète démarrée en processus (voir `pile.py`) :
+- le débit de `POST /data` (requêtes/s) et sa latence par requête ;
+- la latence mesure → alerte : de l'envoi de `POST /data` à la réception de
+  l'alerte par le service de notifications (p50/p95/p99) ;
+- p50/p99 des endpoints de tableau de bord médecin sur la population créée.
+
+Les résultats sont écrits en JSON dans benchmarks/resultats/ (ou `--sortie`)
+pour comparaison dans le temps (`--comparer ancien.json`).
+
+Exemples :
+    python -m benchmarks.ingestion_alertes
+    python -m benchmarks.ingestion_alertes --patients 500 --historique 200 --requetes 2000
+    python -m benchmarks.ingestion_alertes --binaires-locaux --comparer benchmarks/resultats/ref.json
+    python -m benchmarks.ingestion_alertes --arriere 20000   # alertes critiques derrière un import massif
+    MONGO_DB_NAME=sante_population python -m benchmarks.ingestion_alertes \
+        --mongo-uri mongodb://localhost:27017 --population-existante
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks import mesures, pile as pile_applicative
+
+# Endpoints lus à l'ouverture des tableaux de bord médecin
+TABLEAUX_DE_BORD = [
+    "/medecin/patients",
+    "/medecin/alertes",
+    "/medecin/recommandations",
+    "/medecin/inbox",
+    "/filtrage/alertes/medecin/critiques",
+    "/patients/{patient_id}/summary",
+    "/patients/{patient_id}/history",
+]
+
+
+def _entete(user) -> Dict[str, str]:
+    from backend.utils.auth import creer_jwt
+    token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def peupler(db, nb_medecins: int, nb_patients: int, historique: int, graine: int) -> Dict[str, Any]:
+    """Crée départements, médecins, patients assignés, historique de mesures et alertes."""
+    from backend.models import Department, Utilisateur
+    from backend.models.utilisateur import Role
+    from backend.utils.auth import hacher_mot_de_passe
+
+    aleatoire = random.Random(graine)
+    hache = hacher_mot_de_passe("banc-essai")
+    await Department.insert_many([
+        Department(name="Médecine Générale", code="GENERAL"),
+        Department(name="Cardiologie", code="CARDIO"),
+    ])
+    medecins = [
+        Utilisateur(email=f"medecin{i}@banc-essai.fr", username=f"medecin{i}", mot_de_passe_hache=hache, role=Role.medecin)
+        for i in range(nb_medecins)
+    ]
+    await Utilisateur.insert_many(medecins)
+    medecins = await Utilisateur.find(Utilisateur.role == Role.medecin).to_list()
+    patients = [
+        Utilisateur(email=f"patient{i}@banc-essai.fr", username=f"patient{i}", mot_de_passe_hache=hache,
+                    role=Role.patient, medecin_ids=[str(medecins[i % nb_medecins].id)])
+        for i in range(nb_patients)
+    ]
+    await Utilisateur.insert_many(patients)
+    patients = await Utilisateur.find(Utilisateur.role == Role.patient).to_list()
+
+    # Liens médecin → patients en une écriture par médecin
+    par_medecin: Dict[str, List[str]] = {}
+    for patient in patients:
+        par_medecin.setdefault(patient.medecin_ids[0], []).append(str(patient.id))
+    for medecin in medecins:
+        ids = par_medecin.get(str(medecin.id), [])
+        await db["utilisateurs"].update_one({"_id": medecin.id}, {"$set": {"patient_ids": ids, "nb_patients": len(ids)}})
+
+    debut = datetime.utcnow() - timedelta(days=30)
+    donnees, alertes = [], []
+    for patient in patients:
+        for j in range(historique):
+            date = debut + timedelta(minutes=j * 30)
+            fc = aleatoire.gauss(75, 10)
+            donnees.append({
+                "user_id": str(patient.id), "device_id": None, "frequence_cardiaque": round(fc, 1),
+                "taux_oxygene": round(min(100.0, aleatoire.gauss(97, 1.5)), 1), "pression_arterielle": "120/80",
+                "source": "appareil_connecte", "date": date, "created_at": date, "updated_at": date, "is_active": True,
+            })
+            if fc > 100:
+                alertes.append({
+                    "user_id": str(patient.id), "message": "Tachycardie détectée", "niveau": "warning",
+                    "date": date, "priorite_medicale": "elevee", "visible_patient": True, "statut": "nouvelle",
+                    "vue_par": "", "created_at": date, "updated_at": date, "is_active": True,
+                })
+    for i in range(0, len(donnees), 10_000):
+        await db["donnees"].insert_many(donnees[i:i + 10_000])
+    if alertes:
+        await db["alertes"].insert_many(alertes)
+    return {"medecins": medecins, "patients": patients, "donnees": len(donnees), "alertes": len(alertes)}
+
+
+async def population_existante(db, nb_patients: int) -> Dict[str, Any]:
+    """Population déjà en base (cf. benchmarks/population.py) : médecin le plus chargé et ses patients."""
+    from backend.models import Utilisateur
+    from backend.models.utilisateur import Role
+
+    medecins = await Utilisateur.find(Utilisateur.role == Role.medecin).sort("-nb_patients").limit(1).to_list()
+    medecin = medecins[0] if medecins else None
+    if medecin is None or not medecin.patient_ids:
+        raise SystemExit("Aucun médecin avec patients dans la base : générer d'abord une population")
+    patients = await Utilisateur.find(
+        Utilisateur.role == Role.patient, {"medecin_ids": str(medecin.id)}
+    ).limit(nb_patients).to_list()
+    return {
+        "medecins": [medecin], "patients": patients,
+        "donnees": await db["donnees"].estimated_document_count(),
+        "alertes": await db["alertes"].estimated_document_count(),
+    }
+
+
+async def creer_arriere(pile, nombre: int) -> int:
+    """Publie *nombre* événements sur la voie normale, comme un import massif en cours d'analyse.
+
+    Ils désignent des mesures existantes sans anomalie : l'arriéré occupe
+    l'IA sans produire d'alertes qui fausseraient la latence mesurée.
+    """
+    from ia_service.main import FC_MAX, SOURCE_CHANNEL, SPO2_MIN
+
+    ids = [str(d["_id"]) async for d in pile.db["donnees"].find(
+        {"frequence_cardiaque": {"$lte": FC_MAX}, "taux_oxygene": {"$gte": SPO2_MIN}}, {"_id": 1},
+    ).limit(nombre)]
+    if not ids:
+        return 0
+    for i in range(nombre):
+        await pile.redis.publish(SOURCE_CHANNEL, json.dumps(
+            {"donnee_id": ids[i % len(ids)], "priorite": "normale", "publie_a": time.time()}
+        ))
+    return nombre
+
+
+async def mesurer_ingestion(pile, patients, nb_requetes: int, concurrence: int, taux_anomalies: float,
+                            graine: int, delai_alertes: float, asynchrone: bool = False) -> Dict[str, Any]:
+    """Débit de POST /data et latence mesure → alerte (via le service de notifications).
+
+    En mode *asynchrone*, les mesures sont envoyées avec `Prefer: respond-async` (réponse 202,
+    écriture différée) : la latence mesure → alerte inclut alors l'attente dans le flux.
+    """
+    from ia_service.main import FC_MAX
+
+    aleatoire = random.Random(graine + 1)
+    entetes = [{**_entete(p), **({"Prefer": "respond-async"} if asynchrone else {})} for p in patients]
+    attendu = 202 if asynchrone else 201
+    envois: Dict[str, float] = {}
+    # L'alerte peut arriver avant que la réponse HTTP ne soit lue : appariement à la fin
+    receptions: Dict[str, float] = {}
+    attendues = 0
+    toutes_recues = asyncio.Event()
+
+    def sur_alerte(payload: Dict[str, Any], instant: float) -> None:
+        donnee_id = payload.get("donnee_id")
+        if donnee_id:
+            receptions.setdefault(donnee_id, instant)
+            if len(receptions) >= attendues:
+                toutes_recues.set()
+
+    pile.sur_alerte.append(sur_alerte)
+    corps = []
+    for i in range(nb_requetes):
+        anomalie = aleatoire.random() < taux_anomalies
+        corps.append({
+            "frequence_cardiaque": FC_MAX + 30 if anomalie else 72,
+            "taux_oxygene": 97,
+            "pression_arterielle": "120/80",
+            "date": datetime.utcnow().isoformat(),
+        })
+        attendues += anomalie
+
+    durees: List[float] = []
+    erreurs = 0
+    file = iter(range(nb_requetes))
+
+    async def client_http() -> None:
+        nonlocal erreurs
+        for i in file:
+            t0 = time.perf_counter()
+            reponse = await pile.client.post("/data", json=corps[i], headers=entetes[i % len(entetes)])
+            durees.append(time.perf_counter() - t0)
+            if reponse.status_code != attendu:
+                erreurs += 1
+                continue
+            envois[reponse.json()["id"]] = t0
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client_http() for _ in range(concurrence)))
+    ecoule = time.perf_counter() - debut
+
+    if attendues:
+        try:
+            await asyncio.wait_for(toutes_recues.wait(), delai_alertes)
+        except asyncio.TimeoutError:
+            pass
+    pile.sur_alerte.remove(sur_alerte)
+    latences_alerte = [receptions[i] - envois[i] for i in receptions if i in envois]
+    return {
+        "post_data": {
+            "requetes": nb_requetes,
+            "erreurs": erreurs,
+            "debit_rps": round(nb_requetes / ecoule, 1) if ecoule else 0.0,
+            **mesures.resume(durees),
+        },
+        "latence_alerte": {
+            "attendues": attendues,
+            "recues": len(latences_alerte),
+            **mesures.resume(latences_alerte),
+        },
+    }
+
+
+async def mesurer_tableaux_de_bord(pile, medecin, patient_id: str, iterations: int) -> Dict[str, Any]:
+    """p50/p99 des endpoints de tableau de bord pour un médecin donné."""
+    entete = _entete(medecin)
+    resultats = {}
+    for modele in TABLEAUX_DE_BORD:
+        chemin = modele.format(patient_id=patient_id)
+        durees, statuts = [], {}
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            reponse = await pile.client.get(chemin, headers=entete)
+            durees.append(time.perf_counter() - t0)
+            statuts[str(reponse.status_code)] = statuts.get(str(reponse.status_code), 0) + 1
+        resultats[modele] = {"statuts": statuts, **mesures.resume(durees)}
+    return resultats
+
+
+async def executer(args) -> Dict[str, Any]:
+    parametres = {
+        "medecins": args.medecins, "patients": args.patients, "historique": args.historique,
+        "requetes": args.requetes, "concurrence": args.concurrence, "taux_anomalies": args.taux_anomalies,
+        "iterations": args.iterations, "graine": args.graine, "population_existante": args.population_existante,
+        "asynchrone": args.asynchrone, "arriere": args.arriere,
+    }
+    async with pile_applicative.demarrer(args.mongo_uri, args.redis_url, args.binaires_locaux) as pile:
+        t0 = time.perf_counter()
+        if args.population_existante:
+            population = await population_existante(pile.db, args.patients)
+        else:
+            population = await peupler(pile.db, args.medecins, args.patients, args.historique, args.graine)
+        peuplement_s = time.perf_counter() - t0
+        if args.arriere:
+            await creer_arriere(pile, args.arriere)
+        ingestion = await mesurer_ingestion(
+            pile, population["patients"], args.requetes, args.concurrence, args.taux_anomalies,
+            args.graine, args.delai_alertes, args.asynchrone,
+        )
+        medecin = population["medecins"][0]
+        patient_id = next(str(p.id) for p in population["patients"] if str(medecin.id) in p.medecin_ids)
+        tableaux = await mesurer_tableaux_de_bord(pile, medecin, patient_id, args.iterations)
+        moteurs = {"mongo": pile.moteur_mongo, "redis": pile.moteur_redis}
+
+    resultats = {
+        "peuplement": {"donnees": population["donnees"], "alertes": population["alertes"], "duree_s": round(peuplement_s, 2)},
+        **ingestion,
+        "tableaux_de_bord": tableaux,
+    }
+    return {"parametres": parametres, "moteurs": moteurs, "resultats": resultats}
+
+
+def _afficher(resultats: Dict[str, Any]) -> None:
+    post, alerte = resultats["post_data"], resultats["latence_alerte"]
+    print(f"POST /data        : {post['debit_rps']} req/s, p50 {post['p50_ms']} ms, p99 {post['p99_ms']} ms, {post['erreurs']} erreur(s)")
+    print(f"mesure → alerte   : {alerte['recues']}/{alerte['attendues']}, p50 {alerte['p50_ms']} ms, p99 {alerte['p99_ms']} ms")
+    for chemin, res in resultats["tableaux_de_bord"].items():
+        print(f"GET {chemin:34}: p50 {res['p50_ms']} ms, p99 {res['p99_ms']} ms {res['statuts']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai ingestion → alerte et tableaux de bord médecin")
+    parser.add_argument("--medecins", type=int, default=5)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--historique", type=int, default=50, help="Mesures existantes par patient")
+    parser.add_argument("--requetes", type=int, default=500, help="Nombre de POST /data")
+    parser.add_argument("--concurrence", type=int, default=10)
+    parser.add_argument("--taux-anomalies", type=float, default=0.2, help="Part des mesures déclenchant une alerte")
+    parser.add_argument("--iterations", type=int, default=50, help="Appels par endpoint de tableau de bord")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--delai-alertes", type=float, default=30.0, help="Attente maximale des alertes (s)")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--binaires-locaux", action="store_true", help="Lance mongod/redis-server s'ils sont installés")
+    parser.add_argument("--population-existante", action="store_true",
+                        help="Utilise la population de la base (python -m benchmarks.population) au lieu d'en créer une")
+    parser.add_argument("--asynchrone", action="store_true",
+                        help="POST /data en mode 202 (Prefer: respond-async, écriture différée par lots)")
+    parser.add_argument("--arriere", type=int, default=0,
+                        help="Événements publiés sur la voie normale avant la mesure (arriéré d'import ; "
+                             "quelques centaines au plus avec mongomock, davantage avec --binaires-locaux)")
+    parser.add_argument("--sortie", type=Path, default=None, help="Fichier JSON de résultats")
+    parser.add_argument("--comparer", type=Path, default=None, help="Résultats de référence à comparer")
+    args = parser.parse_args(argv)
+
+    execution = asyncio.run(executer(args))
+    chemin = mesures.enregistrer("ingestion_alertes", execution["parametres"], execution["moteurs"],
+                                 execution["resultats"], args.sortie)
+    _afficher(execution["resultats"])
+    print(f"Résultats : {chemin}")
+    if args.comparer:
+        reference = json.loads(args.comparer.read_text(encoding="utf-8"))
+        for ligne in mesures.comparer(reference["resultats"], execution["resultats"]):
+            print(ligne)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Statistiques et format des résultats des bancs d'essai."""
+
+from __future__ import annotations
+
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+DOSSIER_RESULTATS = Path(__file__).resolve().parent / "resultats"
+
+
+def percentile(valeurs: Sequence[float], p: float) -> float:
+    """Percentile par interpolation linéaire (p entre 0 et 100)."""
+    if not valeurs:
+        return 0.0
+    tries = sorted(valeurs)
+    rang = (len(tries) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(tries) - 1)
+    return tries[bas] + (tries[haut] - tries[bas]) * (rang - bas)
+
+
+def resume(durees_s: Sequence[float]) -> Dict[str, Any]:
+    """Résumé d'une série de durées (secondes) en millisecondes."""
+    ms = [d * 1000 for d in durees_s]
+    return {
+        "n": len(ms),
+        "moyenne_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def enregistrer(banc: str, parametres: Dict[str, Any], moteurs: Dict[str, str],
+                resultats: Dict[str, Any], sortie: Optional[Path] = None) -> Path:
+    """Écrit les résultats en JSON (un fichier par exécution) et retourne son chemin."""
+    maintenant = datetime.now(timezone.utc)
+    commit = _commit()
+    document = {
+        "banc": banc,
+        "horodatage": maintenant.isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "machine": platform.platform(),
+        "moteurs": moteurs,
+        "parametres": parametres,
+        "resultats": resultats,
+    }
+    if sortie is None:
+        DOSSIER_RESULTATS.mkdir(exist_ok=True)
+        sortie = DOSSIER_RESULTATS / f"{banc}-{maintenant:%Y%m%dT%H%M%S}-{commit or 'inconnu'}.json"
+    sortie.write_text(json.dumps(document, indent=2, ensure_ascii=False), encoding="utf-8")
+    return sortie
+
+
+def comparer(reference: Dict[str, Any], actuel: Dict[str, Any], prefixe: str = "") -> List[str]:
+    """Lignes « métrique : référence → actuel (écart %) » pour les valeurs numériques communes."""
+    lignes = []
+    for cle, valeur in actuel.items():
+        ancien = reference.get(cle)
+        nom = f"{prefixe}{cle}"
+        if isinstance(valeur, dict) and isinstance(ancien, dict):
+            lignes.extend(comparer(ancien, valeur, f"{nom}."))
+        elif isinstance(valeur, (int, float)) and isinstance(ancien, (int, float)) and not isinstance(valeur, bool):
+            ecart = f"{(valeur - ancien) / ancien * 100:+.1f} %" if ancien else "n/a"
+            lignes.append(f"{nom} : {ancien} → {valeur} ({ecart})")
+    return lignes
@@ -0,0 +1,200 @@
+"""Pile applicative complète dans un seul processus, pour les bancs d'essai.
+
+- backend : `backend.main:app` servi par httpx (ASGITransport), sans réseau ;
+- worker IA : `analyser_donnee` abonné aux voies `nouvelle_donnee:haute` et
+  `nouvelle_donnee`, servies par le même ordonnanceur que le service ;
+- consommateur de notifications : `handle_notification` abonné à `notify` ;
+- videur d'ingestion : écriture différée des mesures acceptées en 202.
+
+MongoDB et Redis sont, au choix :
+- mongomock-motor / fakeredis (par défaut, aucune dépendance externe) ;
+- des URI fournies (`--mongo-uri`, `--redis-url`) ;
+- des binaires `mongod` / `redis-server` locaux lancés sur un port libre
+  (`--binaires-locaux`), arrêtés en fin de banc.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+RACINE = Path(__file__).resolve().parent.parent
+# Les services importent leurs modules voisins sans paquet (`from models import …`)
+for chemin in (RACINE / "services", RACINE / "services" / "ia_service", RACINE / "services" / "notification_service"):
+    if str(chemin) not in sys.path:
+        sys.path.append(str(chemin))
+
+
+@dataclass
+class Pile:
+    """Clients et hooks de la pile démarrée."""
+
+    client: Any  # httpx.AsyncClient sur l'application backend
+    db: Any
+    redis: Any
+    moteur_mongo: str
+    moteur_redis: str
+    # Appelé à chaque alerte reçue par le service de notifications (payload, instant)
+    sur_alerte: List[Callable[[Dict[str, Any], float], None]] = field(default_factory=list)
+
+
+def _port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _attendre_port(port: int, delai: float = 20.0) -> None:
+    limite = time.monotonic() + delai
+    while time.monotonic() < limite:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Aucun service n'écoute sur le port {port}")
+
+
+@asynccontextmanager
+async def _binaire(commande: List[str], port: int):
+    processus = subprocess.Popen(commande, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await _attendre_port(port)
+        yield
+    finally:
+        processus.terminate()
+        processus.wait(timeout=10)
+
+
+async def _mongo(pile: AsyncExitStack, uri: Optional[str], binaires: bool):
+    if not uri and binaires and shutil.which("mongod"):
+        port = _port_libre()
+        dossier = pile.enter_context(tempfile.TemporaryDirectory(prefix="bench-mongod-"))
+        await pile.enter_async_context(_binaire(
+            ["mongod", "--port", str(port), "--dbpath", dossier, "--bind_ip", "127.0.0.1", "--quiet"], port
+        ))
+        uri = f"mongodb://127.0.0.1:{port}"
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(uri)
+        pile.callback(client.close)
+        return client, uri
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient(), "mongomock"
+
+
+async def _redis(pile: AsyncExitStack, url: Optional[str], binaires: bool):
+    if not url and binaires and shutil.which("redis-server"):
+        port = _port_libre()
+        await pile.enter_async_context(_binaire(
+            ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"], port
+        ))
+        url = f"redis://127.0.0.1:{port}"
+    if url:
+        import redis.asyncio as redis
+        client = redis.from_url(url, decode_responses=True)
+        pile.push_async_callback(client.aclose)
+        return client, url
+    import fakeredis.aioredis
+    return fakeredis.aioredis.FakeRedis(decode_responses=True), "fakeredis"
+
+
+async def _abonner(redis_client: Any, canal: str, traiter) -> None:
+    """Boucle d'abonnement identique à celle des services (un message à la fois)."""
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(canal)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                await traiter(json.loads(message["data"]))
+            except Exception as exc:  # pragma: no cover
+                print(f"[banc] erreur sur {canal} : {exc}", file=sys.stderr)
+    finally:
+        await pubsub.aclose()
+
+
+async def _abonner_voies(redis_client: Any, ordonnanceur: Any) -> None:
+    """Abonnement du service IA : un abonnement par voie, consommation pondérée."""
+    abonnements = await ordonnanceur.abonner(redis_client)
+    consommateur = asyncio.create_task(ordonnanceur.executer())
+    try:
+        await ordonnanceur.lire_voies(abonnements)
+    finally:
+        consommateur.cancel()
+        await asyncio.gather(consommateur, return_exceptions=True)
+
+
+@asynccontextmanager
+async def demarrer(mongo_uri: Optional[str] = None, redis_url: Optional[str] = None, binaires_locaux: bool = False):
+    """Démarre la pile et la rend sous forme de `Pile` ; tout est arrêté en sortie."""
+    from beanie import init_beanie
+    from httpx import ASGITransport, AsyncClient
+
+    from backend.db import MONGO_DB_NAME
+    from backend.main import app
+    from backend.models import Alerte, Assignment, Department, Device, Donnee, Recommandation, Referral, TacheAdmin, Utilisateur
+    from backend.ressources import ressources
+    from backend.services.charge_medecins import initialiser_charges
+    from backend.services.ingestion import VideurIngestion
+    from ia_service import main as ia
+    from notification_service import main as notifications
+
+    async with AsyncExitStack() as pile:
+        mongo, moteur_mongo = await _mongo(pile, mongo_uri, binaires_locaux)
+        redis_client, moteur_redis = await _redis(pile, redis_url, binaires_locaux)
+        db = mongo[MONGO_DB_NAME]
+
+        # Même initialisation que le lifespan du backend, sur les clients choisis
+        ressources.definir_mongo(mongo)
+        ressources.definir_redis(redis_client)
+        pile.callback(ressources.definir_redis, None)
+        pile.callback(ressources.definir_mongo, None)
+        await init_beanie(database=db, document_models=[
+            Device, Donnee, Alerte, Recommandation, Utilisateur, Department, Referral, Assignment, TacheAdmin,
+        ])
+        await initialiser_charges()
+        ia._DEPARTEMENTS.clear()
+
+        client = await pile.enter_async_context(
+            AsyncClient(transport=ASGITransport(app=app), base_url="http://banc")
+        )
+        resultat = Pile(client=client, db=db, redis=redis_client, moteur_mongo=moteur_mongo, moteur_redis=moteur_redis)
+
+        async def notifier(payload: Dict[str, Any]) -> None:
+            instant = time.perf_counter()
+            await notifications.handle_notification(payload)
+            for rappel in resultat.sur_alerte:
+                rappel(payload, instant)
+
+        ordonnanceur = ia.OrdonnanceurVoies(
+            lambda _, p: ia.analyser_donnee(p, db, redis_client), ia.SOURCE_CHANNEL_HAUTE, ia.SOURCE_CHANNEL,
+        )
+        taches = [
+            asyncio.create_task(_abonner_voies(redis_client, ordonnanceur)),
+            asyncio.create_task(_abonner(redis_client, ia.ALERT_CHANNEL, notifier)),
+            asyncio.create_task(VideurIngestion().executer()),
+        ]
+        try:
+            # Laisse les abonnements s'établir avant la première publication
+            while not all(n for _, n in await redis_client.pubsub_numsub(
+                ia.SOURCE_CHANNEL_HAUTE, ia.SOURCE_CHANNEL, ia.ALERT_CHANNEL,
+            )):
+                await asyncio.sleep(0.01)
+            yield resultat
+        finally:
+            for tache in taches:
+                tache.cancel()
+            await asyncio.gather(*taches, return_exceptions=True)
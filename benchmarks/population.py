@@ -0,0 +1,371 @@
+"""Générateur de population synthétique pour les tests à l'échelle.
+
+Crée N départements, médecins et patients (graphe d'assignation réaliste :
+charge inégale entre médecins, une partie des patients suivis par deux
+services), leurs appareils, et des mois de mesures FC / SpO2 / tension
+physiologiquement plausibles (rythme circadien, bruit autocorrélé, épisodes
+de tachycardie, d'hypoxie et d'hypertension avec les alertes correspondantes).
+
+Tout est déterminé par `--graine` et `--fin` : deux exécutions identiques
+produisent les mêmes comptes, les mêmes identifiants et les mêmes séries.
+Les mesures sont écrites par `insert_many` non ordonnés, en lots, depuis
+plusieurs processus (un client MongoDB par processus).
+
+Exemples :
+    python -m benchmarks.population --patients 1000 --jours 30
+    # ~100 M mesures : 20 000 patients × 365 jours × 1 mesure / 5 min
+    python -m benchmarks.population --patients 20000 --medecins 400 --jours 365 \\
+        --intervalle-min 5 --processus 8 --vider
+
+Les comptes ont tous le mot de passe « population ». Les index applicatifs
+sont créés au démarrage du backend (init_beanie) : charger d'abord, puis
+démarrer l'API sur la base générée (MONGO_DB_NAME).
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import multiprocessing
+import random
+import struct
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+# Mêmes seuils par défaut que le service IA (FC_MAX, SPO2_MIN)
+SEUIL_FC = 100
+SEUIL_SPO2 = 92
+MOT_DE_PASSE = "population"
+BASE_DEFAUT = "sante_population"
+
+DEPARTEMENTS = [
+    ("GENERAL", "Médecine Générale"),
+    ("CARDIO", "Cardiologie"),
+    ("PNEUMO", "Pneumologie"),
+    ("OPHTALMO", "Ophtalmologie"),
+    ("NEURO", "Neurologie"),
+    ("ENDOC", "Endocrinologie"),
+]
+TYPES_APPAREILS = ["cardiofrequencemetre", "oxymetre", "tensiometre"]
+
+# Préfixes d'ObjectId par type de document (identifiants reproductibles)
+_DEPARTEMENT, _MEDECIN, _PATIENT, _APPAREIL = 1, 2, 3, 4
+
+
+def _minuit() -> datetime:
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass(frozen=True)
+class Parametres:
+    departements: int = 3
+    medecins: int = 20
+    patients: int = 1000
+    jours: int = 90
+    intervalle_min: int = 15
+    # Probabilité qu'une journée d'un patient contienne un épisode anormal
+    taux_anomalies: float = 0.05
+    # Part des patients suivis par un second service
+    double_suivi: float = 0.15
+    graine: int = 42
+    fin: datetime = field(default_factory=_minuit)
+
+    @property
+    def mesures_par_patient(self) -> int:
+        return self.jours * 24 * 60 // self.intervalle_min
+
+
+def oid(type_doc: int, index: int, fin: datetime) -> ObjectId:
+    """ObjectId reproductible : horodatage de fin, type de document, index."""
+    horodatage = int((fin - datetime(1970, 1, 1)).total_seconds())
+    return ObjectId(struct.pack(">IB", horodatage, type_doc) + index.to_bytes(7, "big"))
+
+
+def _departement_de(index: int, params: Parametres) -> int:
+    return index % params.departements
+
+
+def graphe(params: Parametres) -> List[List[int]]:
+    """Médecins (index) de chaque patient.
+
+    Médecine générale plus fréquente que les spécialités ; dans un service,
+    charge décroissante selon le rang du médecin (loi de type Zipf).
+    """
+    aleatoire = random.Random(f"{params.graine}:graphe")
+    par_departement: Dict[int, List[int]] = {}
+    for m in range(params.medecins):
+        par_departement.setdefault(_departement_de(m, params), []).append(m)
+    services = sorted(par_departement)
+    poids_services = [3.0 if d == 0 else 1.0 for d in services]
+    poids_medecins = {d: [1 / (rang + 1) ** 0.8 for rang in range(len(ms))] for d, ms in par_departement.items()}
+
+    def choisir(service: int) -> int:
+        return aleatoire.choices(par_departement[service], poids_medecins[service])[0]
+
+    liens = []
+    for _ in range(params.patients):
+        service = aleatoire.choices(services, poids_services)[0]
+        medecins = [choisir(service)]
+        if len(services) > 1 and aleatoire.random() < params.double_suivi:
+            autre = aleatoire.choice([s for s in services if s != service])
+            medecins.append(choisir(autre))
+        liens.append(medecins)
+    return liens
+
+
+def comptes(params: Parametres, mot_de_passe_hache: str) -> Tuple[List[dict], List[dict], List[dict]]:
+    """Départements, médecins et patients (documents prêts à insérer)."""
+    from backend.models.utilisateur import normaliser_identifiant
+
+    fin = params.fin
+    departements = []
+    for d in range(params.departements):
+        code, nom = DEPARTEMENTS[d] if d < len(DEPARTEMENTS) else (f"SERVICE{d}", f"Service {d}")
+        departements.append({
+            "_id": oid(_DEPARTEMENT, d, fin), "name": nom, "code": code, "description": None,
+            "is_active": True, "created_at": fin, "updated_at": fin,
+        })
+
+    def utilisateur(type_doc: int, index: int, role: str, nom: str, **champs) -> dict:
+        email = f"{nom}@population.sante"
+        return {
+            "_id": oid(type_doc, index, fin), "email": email, "username": nom,
+            "mot_de_passe_hache": mot_de_passe_hache, "role": role, "statut": "actif",
+            "medecin_ids": [], "patient_ids": [], "nb_patients": 0, "department_id": None,
+            "current_assignment_id": None, "created_at": fin, "updated_at": fin, "is_active": True,
+            "login_keys": sorted({normaliser_identifiant(email), normaliser_identifiant(nom)}), **champs,
+        }
+
+    medecins = [
+        utilisateur(_MEDECIN, m, "medecin", f"medecin{m:05d}",
+                    department_id=str(oid(_DEPARTEMENT, _departement_de(m, params), fin)))
+        for m in range(params.medecins)
+    ]
+    patients = []
+    for p, liens in enumerate(graphe(params)):
+        patients.append(utilisateur(_PATIENT, p, "patient", f"patient{p:07d}",
+                                    medecin_ids=[str(medecins[m]["_id"]) for m in liens]))
+        for m in liens:
+            medecins[m]["patient_ids"].append(str(patients[-1]["_id"]))
+    for medecin in medecins:
+        medecin["nb_patients"] = len(medecin["patient_ids"])
+    return departements, medecins, patients
+
+
+def donnees_patient(params: Parametres, index: int) -> Tuple[List[dict], Iterator[dict], List[dict]]:
+    """Appareils, mesures (itérateur) et alertes d'un patient.
+
+    Les alertes sont calculées en même temps que les mesures : la liste est
+    complète une fois l'itérateur épuisé.
+    """
+    aleatoire = random.Random(f"{params.graine}:patient:{index}")
+    user_id = str(oid(_PATIENT, index, params.fin))
+    debut = params.fin - timedelta(days=params.jours)
+
+    appareils = []
+    for a, type_appareil in enumerate(aleatoire.sample(TYPES_APPAREILS, 1 + (aleatoire.random() < 0.3))):
+        appareils.append({
+            "_id": oid(_APPAREIL, index * 4 + a, params.fin), "type": type_appareil,
+            "numero_serie": f"SN-{index:07d}-{a}", "user_id": user_id, "nom": None, "modele": None,
+            "statut": "actif", "date_installation": debut, "derniere_maintenance": None,
+            "created_at": debut, "updated_at": debut, "is_active": True,
+        })
+    device_id = str(appareils[0]["_id"])
+
+    fc_base = aleatoire.gauss(72, 8)
+    spo2_base = min(99.0, aleatoire.gauss(97, 1))
+    sys_base = aleatoire.gauss(122, 12)
+    # Épisodes anormaux : (début, fin, type) en minutes depuis `debut`
+    episodes = []
+    for jour in range(params.jours):
+        if aleatoire.random() < params.taux_anomalies:
+            depart = jour * 1440 + aleatoire.randrange(1440)
+            episodes.append((depart, depart + aleatoire.randint(60, 240),
+                             aleatoire.choice(("tachycardie", "hypoxie", "hypertension"))))
+    alertes: List[dict] = []
+
+    def mesures() -> Iterator[dict]:
+        bruit_fc = 0.0
+        episode = 0
+        alerte_emise = -1
+        for n in range(params.mesures_par_patient):
+            minute = n * params.intervalle_min
+            date = debut + timedelta(minutes=minute)
+            heure = minute % 1440 / 60
+            bruit_fc = 0.8 * bruit_fc + aleatoire.gauss(0, 2.5)
+            fc = fc_base + 6 * math.sin(2 * math.pi * (heure - 10) / 24) + bruit_fc
+            spo2 = spo2_base + aleatoire.gauss(0, 0.6)
+            systolique = sys_base + aleatoire.gauss(0, 6)
+            while episode < len(episodes) and episodes[episode][1] <= minute:
+                episode += 1
+            en_cours = episode < len(episodes) and episodes[episode][0] <= minute
+            if en_cours:
+                nature = episodes[episode][2]
+                if nature == "tachycardie":
+                    fc += 45
+                elif nature == "hypoxie":
+                    spo2 -= 9
+                else:
+                    systolique += 45
+            fc, spo2 = round(fc, 1), round(min(100.0, spo2), 1)
+            diastolique = round(systolique * 0.65 + aleatoire.gauss(0, 4))
+            # Une alerte par épisode, à la première mesure hors seuil (comme le service IA)
+            if en_cours and alerte_emise != episode and (fc > SEUIL_FC or spo2 < SEUIL_SPO2):
+                alerte_emise = episode
+                critique = spo2 < SEUIL_SPO2
+                alertes.append({
+                    "user_id": user_id,
+                    "message": "Hypoxie détectée" if critique else "Tachycardie détectée",
+                    "niveau": "critical" if critique else "warning",
+                    "date": date, "priorite_medicale": "critique" if critique else "elevee",
+                    "visible_patient": not critique, "statut": "nouvelle", "vue_par": "",
+                    "date_vue": None, "created_at": date, "updated_at": date, "is_active": True,
+                })
+            yield {
+                "device_id": device_id, "user_id": user_id, "frequence_cardiaque": fc,
+                "pression_arterielle": f"{round(systolique)}/{diastolique}", "taux_oxygene": spo2,
+                "source": "appareil_connecte", "created_at": date, "updated_at": date,
+                "is_active": True, "date": date,
+            }
+
+    return appareils, mesures(), alertes
+
+
+def ecrire_patients(db, params: Parametres, debut: int, fin: int, taille_lot: int) -> Dict[str, int]:
+    """Écrit appareils, mesures et alertes des patients [debut, fin[ par lots."""
+    totaux = {"appareils": 0, "donnees": 0, "alertes": 0}
+    lot: List[dict] = []
+    appareils: List[dict] = []
+    alertes: List[dict] = []
+
+    def vider() -> None:
+        if lot:
+            db["donnees"].insert_many(lot, ordered=False)
+            totaux["donnees"] += len(lot)
+            lot.clear()
+
+    for index in range(debut, fin):
+        appareils_patient, mesures, alertes_patient = donnees_patient(params, index)
+        appareils.extend(appareils_patient)
+        for mesure in mesures:
+            lot.append(mesure)
+            if len(lot) >= taille_lot:
+                vider()
+        alertes.extend(alertes_patient)
+    vider()
+    if appareils:
+        db["appareils"].insert_many(appareils, ordered=False)
+        totaux["appareils"] = len(appareils)
+    if alertes:
+        db["alertes"].insert_many(alertes, ordered=False)
+        totaux["alertes"] = len(alertes)
+    return totaux
+
+
+# Client MongoDB propre à chaque processus de travail
+_BASE_PROCESSUS: Any = None
+
+
+def _initialiser_processus(uri: str, base: str) -> None:
+    global _BASE_PROCESSUS
+    from pymongo import MongoClient
+    _BASE_PROCESSUS = MongoClient(uri)[base]
+
+
+def _travail(tache: Tuple[Parametres, int, int, int]) -> Dict[str, int]:
+    params, debut, fin, taille_lot = tache
+    return ecrire_patients(_BASE_PROCESSUS, params, debut, fin, taille_lot)
+
+
+def generer(db, params: Parametres, mot_de_passe_hache: str, processus: int = 1,
+            taille_lot: int = 10_000, uri: Optional[str] = None, rapport=print) -> Dict[str, int]:
+    """Écrit toute la population dans *db* (base pymongo synchrone).
+
+    Avec `processus > 1`, les mesures sont écrites par un pool de processus
+    qui ouvrent chacun un client sur *uri*.
+    """
+    departements, medecins, patients = comptes(params, mot_de_passe_hache)
+    db["departments"].insert_many(departements, ordered=False)
+    utilisateurs = medecins + patients
+    for i in range(0, len(utilisateurs), taille_lot):
+        db["utilisateurs"].insert_many(utilisateurs[i:i + taille_lot], ordered=False)
+    totaux = {"departements": len(departements), "medecins": len(medecins), "patients": len(patients),
+              "appareils": 0, "donnees": 0, "alertes": 0}
+
+    # Plusieurs tâches par processus pour équilibrer la charge
+    pas = max(1, params.patients // (processus * 8))
+    taches = [(params, d, min(d + pas, params.patients), taille_lot) for d in range(0, params.patients, pas)]
+    debut = time.monotonic()
+
+    def cumuler(resultat: Dict[str, int], faits: int) -> None:
+        for cle, valeur in resultat.items():
+            totaux[cle] += valeur
+        ecoule = time.monotonic() - debut
+        rapport(f"  {faits}/{len(taches)} lots, {totaux['donnees']} mesures "
+                f"({totaux['donnees'] / ecoule if ecoule else 0:,.0f}/s)")
+
+    if processus <= 1:
+        for faits, (_, d, f, t) in enumerate(taches, 1):
+            cumuler(ecrire_patients(db, params, d, f, t), faits)
+    else:
+        contexte = multiprocessing.get_context("spawn")
+        with contexte.Pool(processus, initializer=_initialiser_processus, initargs=(uri, db.name)) as pool:
+            for faits, resultat in enumerate(pool.imap_unordered(_travail, taches), 1):
+                cumuler(resultat, faits)
+    return totaux
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaut = Parametres()
+    parser = argparse.ArgumentParser(description="Génère une population synthétique reproductible")
+    parser.add_argument("--departements", type=int, default=defaut.departements)
+    parser.add_argument("--medecins", type=int, default=defaut.medecins)
+    parser.add_argument("--patients", type=int, default=defaut.patients)
+    parser.add_argument("--jours", type=int, default=defaut.jours, help="Profondeur d'historique")
+    parser.add_argument("--intervalle-min", type=int, default=defaut.intervalle_min, help="Minutes entre deux mesures")
+    parser.add_argument("--taux-anomalies", type=float, default=defaut.taux_anomalies)
+    parser.add_argument("--double-suivi", type=float, default=defaut.double_suivi)
+    parser.add_argument("--graine", type=int, default=defaut.graine)
+    parser.add_argument("--fin", type=datetime.fromisoformat, default=None,
+                        help="Date de fin des séries (défaut : aujourd'hui 00:00 UTC)")
+    parser.add_argument("--mongo-uri", default=None, help="Défaut : MONGO_URI du backend")
+    parser.add_argument("--base", default=BASE_DEFAUT)
+    parser.add_argument("--processus", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--taille-lot", type=int, default=10_000)
+    parser.add_argument("--vider", action="store_true", help="Supprime d'abord les collections générées")
+    args = parser.parse_args(argv)
+    if args.departements > args.medecins:
+        parser.error("il faut au moins un médecin par département")
+
+    from pymongo import MongoClient
+
+    from backend.settings import MONGO_URI
+    from backend.utils.auth import hacher_mot_de_passe
+
+    params = Parametres(
+        departements=args.departements, medecins=args.medecins, patients=args.patients, jours=args.jours,
+        intervalle_min=args.intervalle_min, taux_anomalies=args.taux_anomalies,
+        double_suivi=args.double_suivi, graine=args.graine, fin=args.fin or _minuit(),
+    )
+    uri = args.mongo_uri or MONGO_URI
+    client = MongoClient(uri)
+    db = client[args.base]
+    if args.vider:
+        for collection in ("departments", "utilisateurs", "appareils", "donnees", "alertes"):
+            db.drop_collection(collection)
+    print(f"Population {asdict(params)} → {args.base} "
+          f"(~{params.patients * params.mesures_par_patient:,} mesures, {args.processus} processus)")
+    debut = time.monotonic()
+    totaux = generer(db, params, hacher_mot_de_passe(MOT_DE_PASSE), args.processus, args.taille_lot, uri)
+    client.close()
+    print(f"Terminé en {time.monotonic() - debut:.1f} s : {totaux}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
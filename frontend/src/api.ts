@@ -7,6 +7,7 @@ import axios from 'axios';
  * - Base URL définie via VITE_API_URL ou localhost:8000 par défaut
  * - En-tête Content-Type défini sur application/json
  * - Intercepteur pour ajouter automatiquement le token JWT
+ * - Jeton d'accès court renouvelé via /auth/refresh sur une réponse 401
  * - Gestion des erreurs de base
  */
 const api = axios.create({
@@ -31,10 +32,44 @@ api.interceptors.request.use(
   }
 );
 
+// Renouvellement partagé : une seule requête /auth/refresh pour les 401 simultanés
+let renouvellement: Promise<string | null> | null = null;
+
+const renouvelerJeton = (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return Promise.resolve(null);
+  }
+  if (!renouvellement) {
+    renouvellement = axios
+      .post(`${api.defaults.baseURL}/auth/refresh`, { refresh_token: refreshToken })
+      .then(({ data }) => {
+        localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
+        return data.access_token as string;
+      })
+      .catch(() => null)
+      .finally(() => {
+        renouvellement = null;
+      });
+  }
+  return renouvellement;
+};
+
 // Intercepteur pour gérer les erreurs globales
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const requete = error.config;
+    if (error.response?.status === 401 && requete && !requete._renouvele) {
+      // Jeton d'accès expiré : un essai avec un jeton renouvelé
+      requete._renouvele = true;
+      const jeton = await renouvelerJeton();
+      if (jeton) {
+        requete.headers.Authorization = `Bearer ${jeton}`;
+        return api(requete);
+      }
+    }
     if (error.response) {
       // Erreurs 4xx/5xx
       console.error('Erreur API:', error.response.status, error.response.data);
@@ -44,6 +79,7 @@ api.interceptors.response.use(
         // Rediriger vers la page de connexion si le token est invalide/expiré
         if (window.location.pathname !== '/login') {
           localStorage.removeItem('token');
+          localStorage.removeItem('refresh_token');
           window.location.href = '/login';
         }
       }
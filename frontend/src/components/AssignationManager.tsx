@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
+import api from '../api';
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { 
   faUserMd, 
@@ -66,21 +67,11 @@ const AssignationManager: React.FC = () => {
   const [statusFilter, setStatusFilter] = useState<string>('');
   const [activeTab, setActiveTab] = useState<'assignments' | 'referrals' | 'auto-assignments'>('assignments');
 
-  const apiHeaders = {
-    'Authorization': `Bearer ${token}`,
-    'Content-Type': 'application/json'
-  };
-
   // Charger les départements
   const loadDepartments = async () => {
     try {
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/departments`, {
-        headers: apiHeaders
-      });
-      if (response.ok) {
-        const data = await response.json();
-        setDepartments(data);
-      }
+      const { data } = await api.get('/departments');
+      setDepartments(data);
     } catch (error) {
       console.error('Erreur lors du chargement des départements:', error);
     }
@@ -93,13 +84,8 @@ const AssignationManager: React.FC = () => {
       if (statusFilter) params.append('status_filter', statusFilter);
       if (selectedDepartment) params.append('department_id', selectedDepartment);
       
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/referrals?${params}`, {
-        headers: apiHeaders
-      });
-      if (response.ok) {
-        const data = await response.json();
-        setReferrals(data);
-      }
+      const { data } = await api.get(`/referrals?${params}`);
+      setReferrals(data);
     } catch (error) {
       console.error('Erreur lors du chargement des orientations:', error);
     }
@@ -112,13 +98,8 @@ const AssignationManager: React.FC = () => {
       if (statusFilter) params.append('status_filter', statusFilter);
       if (selectedDepartment) params.append('department_id', selectedDepartment);
       
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/assignments?${params}`, {
-        headers: apiHeaders
-      });
-      if (response.ok) {
-        const data = await response.json();
-        setAssignments(data);
-      }
+      const { data } = await api.get(`/assignments?${params}`);
+      setAssignments(data);
     } catch (error) {
       console.error('Erreur lors du chargement des assignations:', error);
     }
@@ -128,25 +109,15 @@ const AssignationManager: React.FC = () => {
   const handleReferralAction = async (referralId: string, action: 'accepted' | 'rejected', notes?: string) => {
     try {
       setLoading(true);
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/referrals/${referralId}`, {
-        method: 'PATCH',
-        headers: apiHeaders,
-        body: JSON.stringify({
-          status: action,
-          notes: notes
-        })
+      await api.patch(`/referrals/${referralId}`, {
+        status: action,
+        notes: notes
       });
-      
-      if (response.ok) {
-        setSuccess(`Orientation ${action === 'accepted' ? 'acceptée' : 'refusée'} avec succès`);
-        await loadReferrals();
-        await loadAssignments();
-      } else {
-        const errorData = await response.json();
-        setError(errorData.detail || 'Erreur lors du traitement de l\'orientation');
-      }
-    } catch (error) {
-      setError('Erreur lors du traitement de l\'orientation');
+      setSuccess(`Orientation ${action === 'accepted' ? 'acceptée' : 'refusée'} avec succès`);
+      await loadReferrals();
+      await loadAssignments();
+    } catch (error: any) {
+      setError(error.response?.data?.detail || 'Erreur lors du traitement de l\'orientation');
     } finally {
       setLoading(false);
     }
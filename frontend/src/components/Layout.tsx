@@ -157,6 +157,7 @@ export const useAuth = (): readonly [AuthState, () => void] => {
 
   const logout = useCallback(() => {
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     setAuthState({ isAuthenticated: false, role: '', username: '', token: undefined });
   }, []);
 
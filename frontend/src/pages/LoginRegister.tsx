@@ -68,6 +68,7 @@ export default function LoginRegister() {
         });
         // Stocker le JWT pour les prochains appels protégés
         localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
       } else {
         const registerData: any = {
           email: form.email,
@@ -84,6 +85,7 @@ export default function LoginRegister() {
         const { data } = await api.post('/auth/register', registerData);
         // Stocker le JWT pour les prochains appels protégés
         localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
       }
       navigate('/');
     } catch (err: any) {
@@ -1,6 +1,4 @@
-import axios from 'axios';
-
-const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+import api from '../api';
 
 export interface Department {
   id: string;
@@ -20,57 +18,31 @@ export interface DepartmentCreate {
 }
 
 class DepartmentService {
-  private baseURL = `${API_URL}/departments`;
+  // Client partagé : jeton ajouté et renouvelé par ses intercepteurs
+  private baseURL = '/departments';
 
   async getDepartments(): Promise<Department[]> {
-    const token = localStorage.getItem('token');
-    const response = await axios.get(this.baseURL, {
-      headers: {
-        Authorization: `Bearer ${token}`
-      }
-    });
+    const response = await api.get(this.baseURL);
     return response.data;
   }
 
   async getDepartment(id: string): Promise<Department> {
-    const token = localStorage.getItem('token');
-    const response = await axios.get(`${this.baseURL}/${id}`, {
-      headers: {
-        Authorization: `Bearer ${token}`
-      }
-    });
+    const response = await api.get(`${this.baseURL}/${id}`);
     return response.data;
   }
 
   async createDepartment(department: DepartmentCreate): Promise<Department> {
-    const token = localStorage.getItem('token');
-    const response = await axios.post(this.baseURL, department, {
-      headers: {
-        Authorization: `Bearer ${token}`,
-        'Content-Type': 'application/json'
-      }
-    });
+    const response = await api.post(this.baseURL, department);
     return response.data;
   }
 
   async updateDepartment(id: string, department: Partial<DepartmentCreate>): Promise<Department> {
-    const token = localStorage.getItem('token');
-    const response = await axios.put(`${this.baseURL}/${id}`, department, {
-      headers: {
-        Authorization: `Bearer ${token}`,
-        'Content-Type': 'application/json'
-      }
-    });
+    const response = await api.put(`${this.baseURL}/${id}`, department);
     return response.data;
   }
 
   async deleteDepartment(id: string): Promise<void> {
-    const token = localStorage.getItem('token');
-    await axios.delete(`${this.baseURL}/${id}`, {
-      headers: {
-        Authorization: `Bearer ${token}`
-      }
-    });
+    await api.delete(`${this.baseURL}/${id}`);
   }
 }
 
@@ -0,0 +1,9 @@
+"""Modules communs aux services IA et notifications.
+
+Reprises de backend/utils/ paramétrées par service (préfixe des métriques,
+nom du service), au lieu d'une copie par service. Les Dockerfile des
+services copient ce paquet à côté de leur `main.py` (`import commun`).
+Le contexte de build du backend (`./backend`) ne contient pas ce paquet :
+les fonctions et classes partagées sont donc gardées identiques des deux
+côtés, et tests/test_commun_synchronise.py échoue dès qu'elles divergent.
+"""
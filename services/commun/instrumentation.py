@@ -0,0 +1,76 @@
+"""Instrumentation Prometheus commune aux services (exposition, commandes MongoDB).
+
+`EcouteurCommandesMongo` (pymongo `CommandListener`) attribue chaque
+commande à l'étape de traitement en cours, lue par la fonction `etape`
+(en pratique un `ContextVar` : Motor exécute pymongo dans un thread en
+copiant le contexte, l'étape suit donc la commande).
+
+`_documents_renvoyes` et `exposition` sont identiques à ceux de
+backend/utils/instrumentation.py (tests/test_commun_synchronise.py) ; le
+backend garde son propre écouteur, qui compte aussi les commandes par requête.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+try:
+    from pymongo import monitoring
+except ImportError:  # pragma: no cover
+    monitoring = None  # type: ignore
+
+
+def _documents_renvoyes(reponse: Dict[str, Any]) -> int:
+    curseur = reponse.get("cursor")
+    if isinstance(curseur, dict):
+        return len(curseur.get("firstBatch") or curseur.get("nextBatch") or [])
+    if "values" in reponse:  # distinct
+        return len(reponse["values"])
+    if "value" in reponse:  # findAndModify
+        return 1 if reponse["value"] is not None else 0
+    return 0
+
+
+class EcouteurCommandesMongo(monitoring.CommandListener if monitoring else object):  # type: ignore[misc]
+    """Durée et volume des commandes MongoDB, étiquetés (étape, commande, collection)."""
+
+    def __init__(self, etape: Callable[[], str], commandes: Counter, echecs: Counter,
+                 duree: Histogram, documents: Counter) -> None:
+        self._etape = etape
+        self._commandes = commandes
+        self._echecs = echecs
+        self._duree = duree
+        self._documents = documents
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _etiquettes(self, event) -> Tuple[str, str, str]:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        etiquettes = (self._etape(), event.command_name, collection)
+        self._commandes.labels(*etiquettes).inc()
+        self._duree.labels(*etiquettes).observe(event.duration_micros / 1_000_000)
+        return etiquettes
+
+    def succeeded(self, event) -> None:
+        etiquettes = self._etiquettes(event)
+        documents = _documents_renvoyes(event.reply)
+        if documents:
+            self._documents.labels(*etiquettes).inc(documents)
+
+    def failed(self, event) -> None:
+        self._echecs.labels(*self._etiquettes(event)).inc()
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Corps et type de contenu de la réponse `/metrics`."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registre = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registre)
+        return generate_latest(registre), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,182 @@
+"""Profilage à la demande des services IA et notifications.
+
+- profil statistique `mur` / `cpu` au format piles repliées (flamegraph) ;
+- différences d'instantanés tracemalloc pour suivre la croissance mémoire
+  du worker de longue durée (TRACEMALLOC_CADRES > 0).
+
+Les services n'ayant pas d'authentification, leurs routes `/debug/*` n'existent
+que si PROFILAGE_JETON est défini et exigent l'en-tête `X-Jeton-Profilage`.
+Profils et `SuiviMemoire` sont identiques à backend/utils/profilage.py
+(tests/test_commun_synchronise.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from fastapi import Header, HTTPException
+
+MODES = ("mur", "cpu")
+
+_verrou = threading.Lock()
+
+
+class ProfilageEnCours(RuntimeError):
+    """Un profil est déjà en cours dans ce processus."""
+
+
+class ProfilageIndisponible(RuntimeError):
+    """Mode de profilage non disponible dans ce contexte."""
+
+
+def _libelle(cadre) -> str:
+    code = cadre.f_code
+    fichier = os.sep.join(code.co_filename.rsplit(os.sep, 2)[-2:])
+    return f"{code.co_name} ({fichier}:{cadre.f_lineno})"
+
+
+def _pile(cadre) -> str:
+    """Pile repliée, de la racine vers le cadre courant."""
+    libelles = []
+    while cadre is not None:
+        libelles.append(_libelle(cadre))
+        cadre = cadre.f_back
+    return ";".join(reversed(libelles))
+
+
+def _replier(echantillons: Counter) -> str:
+    return "".join(f"{pile} {n}\n" for pile, n in sorted(echantillons.items()))
+
+
+def _echantillonner_mur(duree: float, periode: float) -> Counter:
+    """Échantillonne les piles de tous les threads (sauf celui-ci) pendant *duree*."""
+    soi = threading.get_ident()
+    echantillons: Counter = Counter()
+    fin = time.monotonic() + duree
+    while time.monotonic() < fin:
+        noms = {t.ident: t.name for t in threading.enumerate()}
+        for ident, cadre in sys._current_frames().items():  # noqa: SLF001
+            if ident != soi:
+                echantillons[f"{noms.get(ident, ident)};{_pile(cadre)}"] += 1
+        time.sleep(periode)
+    return echantillons
+
+
+async def _echantillonner_cpu(duree: float, periode: float) -> Counter:
+    """Échantillonne le thread principal à chaque *periode* de temps CPU consommé."""
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+        raise ProfilageIndisponible("Le mode cpu exige la boucle dans le thread principal (POSIX)")
+    echantillons: Counter = Counter()
+
+    def _sur_signal(_signum, cadre) -> None:
+        echantillons[f"MainThread;{_pile(cadre)}"] += 1
+
+    precedent = signal.signal(signal.SIGPROF, _sur_signal)
+    signal.setitimer(signal.ITIMER_PROF, periode, periode)
+    try:
+        await asyncio.sleep(duree)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, precedent)
+    return echantillons
+
+
+async def profiler(duree: float, mode: str = "mur", frequence: int = 100) -> str:
+    """Profil statistique de *duree* secondes, au format piles repliées."""
+    if mode not in MODES:
+        raise ValueError(f"Mode inconnu : {mode} (attendu : {', '.join(MODES)})")
+    if not _verrou.acquire(blocking=False):
+        raise ProfilageEnCours("Un profilage est déjà en cours")
+    try:
+        periode = 1 / frequence
+        if mode == "cpu":
+            echantillons = await _echantillonner_cpu(duree, periode)
+        else:
+            echantillons = await asyncio.get_running_loop().run_in_executor(
+                None, _echantillonner_mur, duree, periode
+            )
+    finally:
+        _verrou.release()
+    return _replier(echantillons)
+
+
+class SuiviMemoire:
+    """Différences d'instantanés tracemalloc par rapport à une référence."""
+
+    FILTRES = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self, cadres: int) -> None:
+        self.cadres = cadres
+        self._reference: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def actif(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def demarrer(self) -> None:
+        """Démarre tracemalloc (si *cadres* > 0) et prend l'instantané de référence."""
+        if self.cadres <= 0:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.cadres)
+        self._reference = self._instantane()
+
+    def arreter(self) -> None:
+        if self.cadres > 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._reference = None
+
+    def _instantane(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self.FILTRES)
+
+    def comparer(self, limite: int = 25, reinitialiser: bool = False) -> Dict[str, Any]:
+        """Allocations qui ont le plus grossi depuis la référence (opération synchrone, coûteuse)."""
+        if not tracemalloc.is_tracing() or self._reference is None:
+            raise ProfilageIndisponible("Suivi mémoire désactivé (TRACEMALLOC_CADRES=0)")
+        actuel = self._instantane()
+        ecarts = actuel.compare_to(self._reference, "traceback")
+        courante, pic = tracemalloc.get_traced_memory()
+        resultat = {
+            "memoire_suivie_octets": courante,
+            "pic_octets": pic,
+            "croissance": [
+                {
+                    "ecart_octets": ecart.size_diff,
+                    "taille_octets": ecart.size,
+                    "ecart_blocs": ecart.count_diff,
+                    "pile": [f"{cadre.filename}:{cadre.lineno}" for cadre in ecart.traceback],
+                }
+                for ecart in ecarts[:limite]
+            ],
+        }
+        if reinitialiser:
+            self._reference = actuel
+        return resultat
+
+
+PROFILAGE_JETON = os.getenv("PROFILAGE_JETON", "")
+PROFILAGE_DUREE_MAX = float(os.getenv("PROFILAGE_DUREE_MAX", "60"))
+
+# Suivi mémoire du service, démarré par le lifespan si TRACEMALLOC_CADRES > 0
+suivi_memoire = SuiviMemoire(int(os.getenv("TRACEMALLOC_CADRES", "0")))
+
+
+def verifier_jeton(x_jeton_profilage: Optional[str] = Header(None)) -> None:
+    """Routes /debug/* : absentes sans PROFILAGE_JETON, sinon jeton exigé."""
+    if not PROFILAGE_JETON:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_jeton_profilage or not hmac.compare_digest(x_jeton_profilage, PROFILAGE_JETON):
+        raise HTTPException(status_code=403, detail="Jeton de profilage invalide")
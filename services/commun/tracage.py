@@ -0,0 +1,143 @@
+"""Traçage distribué des services IA et notifications (OpenTelemetry, optionnel).
+
+Le contexte W3C (`traceparent`, `tracestate`) voyage dans les payloads
+Redis : le backend le place dans `nouvelle_donnee`, le service IA ouvre un
+span consommateur rattaché à cette trace (commandes MongoDB comprises,
+`EcouteurTracesMongo`) et le réinjecte dans les alertes publiées sur
+`notify`, dont le traitement par le service de notifications forme le
+dernier span.
+
+Configuration, propagation et `EcouteurTracesMongo` sont identiques à
+backend/utils/tracage.py (tests/test_commun_synchronise.py).
+
+Variables : TRACES_EXPORTEUR ("" désactivé, "otlp" ou "fichier"),
+TRACES_FICHIER, OTEL_EXPORTER_OTLP_ENDPOINT. Sans le paquet
+opentelemetry ou sans exporteur, tout est neutre.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    from opentelemetry import propagate, trace  # type: ignore
+    from opentelemetry.trace import SpanKind, Status, StatusCode  # type: ignore
+except ImportError:  # pragma: no cover
+    trace = None  # type: ignore
+
+# pymongo : seulement dans les services qui utilisent MongoDB
+try:
+    from pymongo import monitoring
+except ImportError:  # pragma: no cover
+    monitoring = None  # type: ignore
+
+LOGGER = logging.getLogger("commun.tracage")
+CHAMPS_CONTEXTE = ("traceparent", "tracestate")
+
+TRACES_EXPORTEUR = os.getenv("TRACES_EXPORTEUR", "").lower()
+TRACES_FICHIER = os.getenv("TRACES_FICHIER", "traces.jsonl")
+
+_actif = False
+_nom_service = "services"
+
+
+def configurer(nom_service: str, exporteur: Optional[str] = None, fichier: Optional[str] = None) -> bool:
+    """Installe le fournisseur de traces du processus ; retourne vrai si le traçage est actif."""
+    global _actif, _nom_service
+    _nom_service = nom_service
+    exporteur = TRACES_EXPORTEUR if exporteur is None else exporteur
+    if trace is None or not exporteur:
+        return False
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporteur == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        export = OTLPSpanExporter()
+    elif exporteur == "fichier":
+        sortie = open(fichier or TRACES_FICHIER, "a", encoding="utf-8")
+        export = ConsoleSpanExporter(out=sortie, formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        LOGGER.warning("Exporteur de traces inconnu : %s (traçage désactivé)", exporteur)
+        return False
+    fournisseur = TracerProvider(resource=Resource.create({"service.name": nom_service}))
+    fournisseur.add_span_processor(BatchSpanProcessor(export))
+    trace.set_tracer_provider(fournisseur)
+    _actif = True
+    LOGGER.info("Traçage actif (%s) pour %s", exporteur, nom_service)
+    return True
+
+
+def arreter() -> None:
+    """Vide les spans en attente d'export (arrêt du processus)."""
+    if _actif:
+        trace.get_tracer_provider().shutdown()
+
+
+def _traceur():
+    return trace.get_tracer(f"sante.{_nom_service}")
+
+
+def injecter(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie de *payload* portant le contexte de trace courant."""
+    if not _actif:
+        return payload
+    porteur: Dict[str, str] = {}
+    propagate.inject(porteur)
+    return {**payload, **porteur}
+
+
+def extraire(porteur: Dict[str, Any]) -> Any:
+    """Contexte OpenTelemetry d'un payload ou d'en-têtes (None si inactif)."""
+    if not _actif:
+        return None
+    return propagate.extract({c: porteur[c] for c in CHAMPS_CONTEXTE if isinstance(porteur.get(c), str)})
+
+
+@contextmanager
+def span_consommateur(canal: str, payload: Dict[str, Any]) -> Iterator[None]:
+    """Span de traitement d'un message reçu sur *canal*, enfant du contexte porté par *payload*."""
+    if not _actif:
+        yield
+        return
+    with _traceur().start_as_current_span(
+        f"traiter {canal}", context=extraire(payload), kind=SpanKind.CONSUMER,
+        attributes={"messaging.system": "redis", "messaging.destination.name": canal},
+    ):
+        yield
+
+
+class EcouteurTracesMongo(monitoring.CommandListener if monitoring else object):  # type: ignore[misc]
+    """Un span client par commande MongoDB, enfant du span courant."""
+
+    def __init__(self) -> None:
+        self._spans: Dict[Tuple[Any, int], Any] = {}
+
+    def started(self, event) -> None:
+        if not _actif:
+            return
+        collection = event.command.get(event.command_name)
+        self._spans[(event.connection_id, event.request_id)] = _traceur().start_span(
+            f"mongo {event.command_name}", kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation.name": event.command_name,
+                "db.collection.name": collection if isinstance(collection, str) else "",
+            },
+        )
+
+    def succeeded(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event) -> None:
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.set_status(Status(StatusCode.ERROR, json.dumps(event.failure, default=str)[:200]))
+            span.end()
@@ -0,0 +1,14 @@
+"""Configuration pytest des services : rend `commun` et les services importables depuis la racine."""
+
+import sys
+from pathlib import Path
+
+# Dossier `services` (paquets `commun`, `notification_service`, `ia_service`)
+SERVICES = Path(__file__).resolve().parent
+if str(SERVICES) not in sys.path:
+    sys.path.insert(0, str(SERVICES))
+
+# Les services importent leurs modules voisins sans paquet (`from models import …`, `import digest`)
+for service in ("ia_service", "notification_service"):
+    if str(SERVICES / service) not in sys.path:
+        sys.path.append(str(SERVICES / service))
@@ -0,0 +1,63 @@
+"""Métriques Prometheus du service IA (exposées sur `GET /metrics`).
+
+- traitement des événements `nouvelle_donnee` : nombre, durée, échecs ;
+- alertes générées par niveau ;
+- retard des événements (publication → fin de traitement) ;
+- commandes MongoDB attribuées à l'étape en cours (canal de l'événement),
+  voir commun/instrumentation.py.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram
+
+from commun import instrumentation as commun
+from commun.instrumentation import exposition  # noqa: F401  (réexportée pour main.py)
+
+HORS_EVENEMENT = "hors_evenement"
+
+EVENEMENTS = Counter("ia_evenements_total", "Événements Redis traités", ["canal", "resultat"])
+DUREE_EVENEMENTS = Histogram(
+    "ia_evenement_duree_secondes", "Durée de traitement d'un événement", ["canal"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ALERTES = Counter("ia_alertes_total", "Alertes générées", ["niveau"])
+RETARD_EVENEMENTS = Histogram(
+    "ia_evenement_retard_secondes", "Délai entre la publication d'un événement et la fin de son traitement",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+COMMANDES = Counter("ia_mongo_commandes_total", "Commandes MongoDB", ["etape", "commande", "collection"])
+ECHECS = Counter("ia_mongo_commandes_echecs_total", "Commandes MongoDB en échec", ["etape", "commande", "collection"])
+DUREE_COMMANDES = Histogram(
+    "ia_mongo_duree_secondes", "Durée des commandes MongoDB", ["etape", "commande", "collection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DOCUMENTS = Counter("ia_mongo_documents_renvoyes_total", "Documents renvoyés par MongoDB", ["etape", "commande", "collection"])
+
+_etape: ContextVar[str] = ContextVar("etape_ia", default=HORS_EVENEMENT)
+
+
+@contextmanager
+def mesurer_evenement(canal: str) -> Iterator[None]:
+    """Chronomètre le traitement d'un événement et y rattache les commandes Mongo."""
+    jeton = _etape.set(canal)
+    debut = time.perf_counter()
+    resultat = "erreur"
+    try:
+        yield
+        resultat = "ok"
+    finally:
+        DUREE_EVENEMENTS.labels(canal).observe(time.perf_counter() - debut)
+        EVENEMENTS.labels(canal, resultat).inc()
+        _etape.reset(jeton)
+
+
+class EcouteurCommandesMongo(commun.EcouteurCommandesMongo):
+    """Commandes MongoDB étiquetées par le canal de l'événement en cours."""
+
+    def __init__(self) -> None:
+        super().__init__(_etape.get, COMMANDES, ECHECS, DUREE_COMMANDES, DOCUMENTS)
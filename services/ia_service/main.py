@@ -1,6 +1,7 @@
 """Microservice IA/ML minimal.
 
-- Écoute le canal Redis `nouvelle_donnee`.
+- Écoute les canaux Redis `nouvelle_donnee:haute` et `nouvelle_donnee`
+  (voies de priorité, voir `voies_ia.py`).
 - Récupère la donnée dans MongoDB.
 - Applique des règles simples (ex : tachycardie > 100 bpm, hypoxie < 92 %).
 - Insère une Alerte et publie un événement `notify`.
@@ -14,16 +15,25 @@ import asyncio
 import json
 import logging
 import os
+import time
 from contextlib import asynccontextmanager
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Optional
 from bson import ObjectId
 
 import motor.motor_asyncio
 import redis.asyncio as redis  # type: ignore
-from fastapi import FastAPI
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 from beanie import init_beanie
 from models import Recommandation
+from instrumentation import ALERTES, RETARD_EVENEMENTS, EcouteurCommandesMongo, exposition, mesurer_evenement
+from commun import profilage, tracage
+from commun.surveillance_boucle import BOUCLE_SURVEILLANCE, SurveillantBoucle
+from voies_ia import OrdonnanceurVoies
 
 LOGGER = logging.getLogger("ia_service")
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
@@ -32,11 +42,30 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 
 ALERT_CHANNEL = "notify"
 SOURCE_CHANNEL = "nouvelle_donnee"
+# Mesures potentiellement critiques, classées par le backend à la publication
+SOURCE_CHANNEL_HAUTE = "nouvelle_donnee:haute"
+# Compteurs de version lus par le backend pour ses réponses conditionnelles (ETag)
+CLE_VERSION = "version:{}:{}"
+# Avancement du pipeline par voie, lu par le contrôle d'admission du backend (backend/services/pipeline_ia.py)
+CLE_PUBLIES = "ia:nouvelle_donnee:publies"
+CLE_ETAT = "ia:nouvelle_donnee:etat"
+CLES_VOIES = {
+    SOURCE_CHANNEL: (CLE_PUBLIES, CLE_ETAT),
+    SOURCE_CHANNEL_HAUTE: ("ia:nouvelle_donnee:haute:publies", "ia:nouvelle_donnee:haute:etat"),
+}
 
 # Seuils paramétrables via variables d’environnement
 FC_MAX = int(os.getenv("FC_MAX", "100"))  # Tachycardie au-delà de X bpm
 SPO2_MIN = int(os.getenv("SPO2_MIN", "92"))  # Hypoxie en-dessous de X %
 
+# Cache code → id des départements (rarement modifiés)
+DEPARTEMENTS_TTL = float(os.getenv("DEPARTEMENTS_TTL", "300"))
+_DEPARTEMENTS: Dict[str, tuple[float, Optional[str]]] = {}
+# Alertes idempotentes par donnée : un événement rejoué ne double pas l'alerte
+INDEX_ALERTE_DONNEE = "alerte_donnee_unique"
+# Priorité des orientations (même échelle que backend/models/referral.py)
+PRIORITES_ORIENTATION = {"faible": 0, "normale": 1, "elevee": 2, "critique": 3}
+
 
 class Alerte(BaseModel):
     user_id: str = Field(...)
@@ -48,6 +77,8 @@ class Alerte(BaseModel):
     visible_patient: bool = Field(default=True)
     # Champ pour la proposition de département
     suggested_department_code: str = Field(default="GENERAL")
+    # Donnée à l'origine de l'alerte (traçabilité, latence mesure → alerte)
+    donnee_id: Optional[str] = Field(default=None)
 
 
 @asynccontextmanager
@@ -56,33 +87,42 @@ async def lifespan(app: FastAPI):
     mongo_client = None
     redis_client = None
     task = None
-    
+    consommateur = None
+    surveillance = SurveillantBoucle("ia") if BOUCLE_SURVEILLANCE else None
+
     try:
-        mongo_client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+        tracage.configurer("ia_service")
+        if surveillance:
+            surveillance.demarrer()
+        profilage.suivi_memoire.demarrer()
+        mongo_client = motor.motor_asyncio.AsyncIOMotorClient(
+            MONGO_URI, event_listeners=[EcouteurCommandesMongo(), tracage.EcouteurTracesMongo()]
+        )
         redis_client = await redis.from_url(REDIS_URL, decode_responses=True)
         db = mongo_client[MONGO_DB_NAME]
+        await preparer_index_alertes(db)
         # Initialiser Beanie pour la collection recommandations
         await init_beanie(database=db, document_models=[Recommandation])
 
+        async def traiter(canal: str, payload: Dict[str, Any]) -> None:
+            LOGGER.info("Message Redis reçu (%s) : %s", canal, payload)
+            with mesurer_evenement(canal):
+                await analyser_donnee(payload, db, redis_client)
+
+        ordonnanceur = OrdonnanceurVoies(traiter, SOURCE_CHANNEL_HAUTE, SOURCE_CHANNEL)
+
         async def worker():
             LOGGER.info("Démarrage du worker Redis IA...")
             backoff = 1
             while True:
                 try:
                     LOGGER.info("Tentative de connexion Redis...")
-                    pubsub = redis_client.pubsub()
-                    await pubsub.subscribe(SOURCE_CHANNEL)
-                    LOGGER.info("IA Service : abonné à %s", SOURCE_CHANNEL)
-                    
-                    async for message in pubsub.listen():
-                        if message["type"] != "message":
-                            continue
-                        try:
-                            LOGGER.info("Message Redis reçu : %s", message["data"])
-                            payload: Dict[str, Any] = json.loads(message["data"])
-                            await analyser_donnee(payload, db, redis_client)
-                        except Exception as exc:  # pragma: no cover
-                            LOGGER.exception("Erreur traitement IA: %s", exc)
+                    abonnements = await ordonnanceur.abonner(redis_client)
+                    LOGGER.info("IA Service : abonné à %s et %s", SOURCE_CHANNEL_HAUTE, SOURCE_CHANNEL)
+                    await recaler_avancement(redis_client, {canal: ordonnanceur.en_file(canal) for canal in CLES_VOIES})
+
+                    # Lecture seule : les traitements sont ordonnés par le consommateur
+                    await ordonnanceur.lire_voies(abonnements)
                     # Si la boucle se termine sans exception, reset backoff
                     backoff = 1
                 except Exception as exc:
@@ -92,21 +132,27 @@ async def lifespan(app: FastAPI):
 
         LOGGER.info("Création de la tâche worker Redis...")
         task = asyncio.create_task(worker())
+        consommateur = asyncio.create_task(ordonnanceur.executer())
         LOGGER.info("Worker Redis créé, démarrage de l'application...")
         yield
         
     finally:
         # Cleanup propre
-        if task:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+        for tache in (task, consommateur):
+            if tache:
+                tache.cancel()
+                try:
+                    await tache
+                except asyncio.CancelledError:
+                    pass
+        if surveillance:
+            await surveillance.arreter()
+        profilage.suivi_memoire.arreter()
         if mongo_client:
             mongo_client.close()
         if redis_client:
             await redis_client.aclose()
+        tracage.arreter()
 
 
 aapp = FastAPI(title="IA Service", lifespan=lifespan)  # noqa: N818 (alias évite conflit)
@@ -118,6 +164,39 @@ async def health():  # noqa: D401
     return {"status": "ok"}
 
 
+@aapp.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques Prometheus (événements traités, alertes, commandes MongoDB)."""
+    corps, type_contenu = exposition()
+    return Response(content=corps, media_type=type_contenu)
+
+
+@aapp.post("/debug/profilage", response_class=PlainTextResponse, include_in_schema=False,
+            dependencies=[Depends(profilage.verifier_jeton)])
+async def profiler_processus(
+    duree: float = Query(10, gt=0, le=profilage.PROFILAGE_DUREE_MAX),
+    mode: str = Query("mur", pattern="^(mur|cpu)$"),
+    frequence: int = Query(100, ge=1, le=1000),
+):
+    """Profil statistique du service, en piles repliées (flamegraph.pl, speedscope)."""
+    try:
+        piles = await profilage.profiler(duree, mode, frequence)
+    except (profilage.ProfilageEnCours, profilage.ProfilageIndisponible) as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return PlainTextResponse(piles)
+
+
+@aapp.get("/debug/memoire", include_in_schema=False, dependencies=[Depends(profilage.verifier_jeton)])
+async def memoire_processus(limite: int = Query(25, ge=1, le=200), reinitialiser: bool = False):
+    """Croissance mémoire depuis la référence tracemalloc (démarrage ou dernière réinitialisation)."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profilage.suivi_memoire.comparer, limite, reinitialiser
+        )
+    except profilage.ProfilageIndisponible as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
 def proposer_departement(alerte_message: str, fc: float = None, spo2: float = None) -> str:
     """Propose un département médical basé sur l'analyse IA des symptômes."""
     
@@ -139,54 +218,159 @@ def proposer_departement(alerte_message: str, fc: float = None, spo2: float = No
         return "GENERAL"
 
 
+async def _departements_par_code(db: Any, codes: set[str]) -> Dict[str, str]:
+    """Résout code → id de département (actif), avec un cache local à TTL."""
+    maintenant = time.monotonic()
+    manquants = {c for c in codes if c not in _DEPARTEMENTS or _DEPARTEMENTS[c][0] < maintenant}
+    if manquants:
+        trouves = {
+            doc["code"]: str(doc["_id"])
+            async for doc in db["departments"].find(
+                {"code": {"$in": list(manquants)}, "is_active": True}, {"code": 1}
+            )
+        }
+        for code in manquants:
+            _DEPARTEMENTS[code] = (maintenant + DEPARTEMENTS_TTL, trouves.get(code))
+    return {c: _DEPARTEMENTS[c][1] for c in codes if _DEPARTEMENTS[c][1]}
+
+
+async def preparer_index_alertes(db: Any) -> None:
+    """Index unique (`donnee_id`, `message`) des alertes : sert l'upsert idempotent et
+    empêche deux livraisons concurrentes du même événement d'insérer chacune l'alerte.
+
+    Jamais de suppression : si des alertes en double existent déjà, l'index
+    n'est pas créé et un avertissement est journalisé.
+    """
+    try:
+        await db["alertes"].create_index(
+            [("donnee_id", 1), ("message", 1)], name=INDEX_ALERTE_DONNEE, unique=True,
+            partialFilterExpression={"donnee_id": {"$type": "string"}},
+        )
+    except OperationFailure as exc:
+        LOGGER.warning("Index %s non créé (alertes en double ?) : %s", INDEX_ALERTE_DONNEE, exc)
+
+
+async def creer_referrals(demandes: list[tuple[str, str, str, str]], db: Any) -> int:
+    """Crée en une écriture les orientations IA (user_id, code département, message, priorité).
+
+    Upsert sur (patient, département, pending) avec `$setOnInsert` : une
+    orientation en attente existante est laissée intacte, hormis sa priorité
+    relevée par `$max` si l'alerte est plus grave. L'index unique partiel du
+    backend empêche les doublons entre lots concurrents.
+    Retourne le nombre d'orientations créées.
+    """
+    if not demandes:
+        return 0
+    departements = await _departements_par_code(db, {d[1] for d in demandes} | {"GENERAL"})
+
+    operations: Dict[tuple[str, str], UpdateOne] = {}
+    priorites: Dict[tuple[str, str], int] = {}
+    maintenant = datetime.utcnow()
+    for user_id, code, message, priorite_medicale in demandes:
+        department_id = departements.get(code)
+        if department_id is None:
+            LOGGER.warning("Département %s non trouvé, utilisation de GENERAL", code)
+            department_id = departements.get("GENERAL")
+            if department_id is None:
+                LOGGER.error("Aucun département par défaut trouvé")
+                continue
+        cle = (user_id, department_id)
+        priorite = PRIORITES_ORIENTATION.get(priorite_medicale, PRIORITES_ORIENTATION["normale"])
+        if cle in operations and priorites[cle] >= priorite:
+            continue  # une seule orientation par patient et département dans le lot
+        priorites[cle] = priorite
+        operations[cle] = UpdateOne(
+            {"patient_id": user_id, "proposed_department_id": department_id, "status": "pending"},
+            {"$setOnInsert": {
+                "source": "IA",
+                "notes": f"Orientation automatique générée par l'IA suite à : {message}",
+                "created_by": None,  # Créé par l'IA
+                "processed_by": None,
+                "processed_at": None,
+                "created_at": maintenant,
+                "updated_at": maintenant,
+            }, "$max": {"priorite": priorite}},
+            upsert=True,
+        )
+    if not operations:
+        return 0
+
+    try:
+        resultat = await db["referrals"].bulk_write(list(operations.values()), ordered=False)
+        crees = resultat.upserted_count
+    except BulkWriteError as exc:
+        # Upsert concurrent sur la même clé : l'orientation existe déjà, rien à faire
+        autres = [e for e in exc.details.get("writeErrors", []) if e.get("code") != 11000]
+        if autres:
+            LOGGER.error("Erreur lors de la création des orientations automatiques : %s", autres)
+        crees = exc.details.get("nUpserted", 0)
+    LOGGER.info("Orientations IA : %s créée(s) sur %s demandée(s)", crees, len(operations))
+    return crees
+
+
 async def creer_referral_automatique(user_id: str, suggested_department_code: str, alerte_message: str, db: Any) -> None:
     """Crée automatiquement une orientation (referral) vers le département suggéré par l'IA."""
-    
     try:
-        # Récupérer l'ID du département suggéré
-        department = await db["departments"].find_one({"code": suggested_department_code, "is_active": True})
-        if not department:
-            LOGGER.warning(f"Département {suggested_department_code} non trouvé, utilisation de GENERAL")
-            department = await db["departments"].find_one({"code": "GENERAL", "is_active": True})
-            if not department:
-                LOGGER.error("Aucun département par défaut trouvé")
-                return
-        
-        # Vérifier si le patient a déjà une orientation pending vers ce département
-        existing_referral = await db["referrals"].find_one({
-            "patient_id": user_id,
-            "proposed_department_id": str(department["_id"]),
-            "status": "pending"
-        })
-        
-        if existing_referral:
-            LOGGER.info(f"Orientation existante pour patient {user_id} vers {suggested_department_code}")
-            return
-        
-        # Créer une nouvelle orientation
-        from datetime import datetime
-        referral_data = {
-            "patient_id": user_id,
-            "proposed_department_id": str(department["_id"]),
-            "status": "pending",
-            "source": "IA",
-            "notes": f"Orientation automatique générée par l'IA suite à : {alerte_message}",
-            "created_by": None,  # Créé par l'IA
-            "processed_by": None,
-            "processed_at": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
-        await db["referrals"].insert_one(referral_data)
-        LOGGER.info(f"Orientation IA créée : patient {user_id} → département {suggested_department_code}")
-        
+        await creer_referrals([(user_id, suggested_department_code, alerte_message, "normale")], db)
     except Exception as e:
         LOGGER.error(f"Erreur lors de la création de l'orientation automatique : {e}")
 
 
+async def incrementer_versions(redis_client: Any, collection: str, user_id: str) -> None:
+    """Signale au backend une écriture sur *collection* (invalide ses ETags)."""
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.incr(CLE_VERSION.format(collection, "global"))
+            pipe.incr(CLE_VERSION.format(collection, user_id))
+            await pipe.execute()
+    except Exception as exc:
+        LOGGER.warning("Compteur de version non incrémenté (%s) : %s", collection, exc)
+
+
 async def analyser_donnee(payload: Dict[str, Any], db: Any, redis_client: Any) -> None:  # type: ignore
-    """Analyse la nouvelle donnée puis crée une alerte si nécessaire."""
+    """Analyse la nouvelle donnée puis crée une alerte si nécessaire.
+
+    Le traitement est rattaché à la trace de la requête d'origine
+    (`traceparent` du payload), propagée ensuite aux alertes publiées.
+    """
+    canal = SOURCE_CHANNEL_HAUTE if payload.get("priorite") == "haute" else SOURCE_CHANNEL
+    with tracage.span_consommateur(canal, payload):
+        try:
+            await _analyser_donnee(payload, db, redis_client)
+        finally:
+            await signaler_traitement(redis_client, payload)
+
+
+async def signaler_traitement(redis_client: Any, payload: Dict[str, Any]) -> None:
+    """Compte l'événement comme traité dans sa voie et note son instant de publication (retard vu du backend)."""
+    _, cle_etat = CLES_VOIES[SOURCE_CHANNEL_HAUTE if payload.get("priorite") == "haute" else SOURCE_CHANNEL]
+    publie_a = payload.get("publie_a")
+    if isinstance(publie_a, (int, float)):
+        RETARD_EVENEMENTS.observe(max(0.0, time.time() - publie_a))
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(cle_etat, "traites", 1)
+            if isinstance(publie_a, (int, float)):
+                pipe.hset(cle_etat, "dernier_publie_a", publie_a)
+            await pipe.execute()
+    except Exception as exc:
+        LOGGER.warning("Avancement du pipeline non enregistré : %s", exc)
+
+
+async def recaler_avancement(redis_client: Any, en_file: Optional[Dict[str, int]] = None) -> None:
+    """Au (ré)abonnement : les événements publiés sans abonné sont perdus, seuls *en_file* (par voie) restent à traiter."""
+    en_file = en_file or {}
+    try:
+        for canal, (cle_publies, cle_etat) in CLES_VOIES.items():
+            publies = await redis_client.get(cle_publies)
+            await redis_client.hset(cle_etat, mapping={
+                "traites": max(0, int(publies or 0) - en_file.get(canal, 0)), "dernier_publie_a": time.time(),
+            })
+    except Exception as exc:
+        LOGGER.warning("Avancement du pipeline non recalé : %s", exc)
+
+
+async def _analyser_donnee(payload: Dict[str, Any], db: Any, redis_client: Any) -> None:  # type: ignore
     donnee_id = payload.get("donnee_id")
     if not donnee_id:
         return
@@ -217,7 +401,8 @@ async def analyser_donnee(payload: Dict[str, Any], db: Any, redis_client: Any) -
                 date=donnee["date"].isoformat() if hasattr(donnee["date"], 'isoformat') else str(donnee["date"]),
                 priorite_medicale="elevee",
                 visible_patient=True,  # Patient peut voir cette alerte
-                suggested_department_code=suggested_dept
+                suggested_department_code=suggested_dept,
+                donnee_id=donnee_id,
             )
         )
     if spo2 is not None and spo2 < SPO2_MIN:
@@ -231,22 +416,30 @@ async def analyser_donnee(payload: Dict[str, Any], db: Any, redis_client: Any) -
                 date=donnee["date"].isoformat() if hasattr(donnee["date"], 'isoformat') else str(donnee["date"]),
                 priorite_medicale="critique",
                 visible_patient=False,  # Masqué au patient pour éviter la panique
-                suggested_department_code=suggested_dept
+                suggested_department_code=suggested_dept,
+                donnee_id=donnee_id,
             )
         )
 
+    nouvelles: list[Alerte] = []
     for alerte in alerts:
-        await db["alertes"].insert_one(alerte.model_dump())
-        await redis_client.publish(ALERT_CHANNEL, alerte.model_dump_json())
+        # Idempotent par donnée : un événement republié (reprise d'ingestion) ne double pas l'alerte
+        try:
+            resultat = await db["alertes"].update_one(
+                {"donnee_id": donnee_id, "message": alerte.message}, {"$setOnInsert": alerte.model_dump()}, upsert=True,
+            )
+            inseree = resultat.upserted_id is not None
+        except DuplicateKeyError:
+            # Livraison concurrente du même événement : l'autre a inséré l'alerte
+            inseree = False
+        if not inseree:
+            LOGGER.info("Alerte déjà générée pour la donnée %s : %s", donnee_id, alerte.message)
+            continue
+        nouvelles.append(alerte)
+        await incrementer_versions(redis_client, "alertes", alerte.user_id)
+        await redis_client.publish(ALERT_CHANNEL, json.dumps(tracage.injecter(alerte.model_dump()), default=str))
+        ALERTES.labels(alerte.niveau).inc()
         LOGGER.info("Alerte générée et publiée : %s (département suggéré: %s)", alerte.message, alerte.suggested_department_code)
-        
-        # Créer automatiquement une orientation vers le département suggéré
-        await creer_referral_automatique(
-            user_id=alerte.user_id,
-            suggested_department_code=alerte.suggested_department_code,
-            alerte_message=alerte.message,
-            db=db
-        )
 
         # Génération automatique d'une recommandation médicale (Beanie)
         titre = None
@@ -289,3 +482,13 @@ async def analyser_donnee(payload: Dict[str, Any], db: Any, redis_client: Any) -
         #     LOGGER.info("Recommandation IA générée pour user %s : %s (priorité: %s, visible patient: %s)", 
         #                alerte.user_id, titre, priorite, visible_patient)
         # Les recommandations seront désormais créées et validées exclusivement par un médecin via l'interface dédiée.
+
+    # Orientations vers les départements suggérés : une seule écriture pour le lot.
+    # Alertes déjà présentes exclues : leur orientation, peut-être traitée depuis, n'est pas recréée.
+    if nouvelles:
+        try:
+            await creer_referrals(
+                [(a.user_id, a.suggested_department_code, a.message, a.priorite_medicale) for a in nouvelles], db
+            )
+        except Exception as e:
+            LOGGER.error(f"Erreur lors de la création de l'orientation automatique : {e}")
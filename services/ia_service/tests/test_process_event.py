@@ -1,34 +1,42 @@
-import asyncio
 import json
 from datetime import datetime
 
 import fakeredis.aioredis
 import mongomock_motor
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 import pytest
 
-from ia_service.main import process_event, FC_MAX, SPO2_MIN, ALERT_CHANNEL
+from ia_service import main
+from ia_service.main import analyser_donnee, FC_MAX, SPO2_MIN, ALERT_CHANNEL
 
 
 @pytest.mark.asyncio
-async def test_process_event_generates_alerts(monkeypatch):
+async def test_analyser_donnee_genere_alertes(monkeypatch):
     """Vérifie qu'une alerte est créée et publiée lorsque les seuils sont dépassés."""
+    monkeypatch.setattr(main, "_DEPARTEMENTS", {})
 
     # --- DB mock ---
     client = mongomock_motor.AsyncMongoMockClient()
     db = client["test_db"]
+    await main.preparer_index_alertes(db)
+    await db["departments"].insert_many([
+        {"code": "CARDIO", "is_active": True},
+        {"code": "GENERAL", "is_active": True},
+    ])
 
     # Insère une donnée dépassant les deux seuils
     donnee = {
-        "_id": mongomock_motor.ObjectId(),
-        "utilisateur_id": "user123",
+        "_id": ObjectId(),
+        "user_id": "user123",
         "frequence_cardiaque": FC_MAX + 10,
         "taux_oxygene": SPO2_MIN - 2,
-        "date": datetime.utcnow().isoformat(),
+        "date": datetime.utcnow(),
     }
     await db["donnees"].insert_one(donnee)
 
     # --- Redis mock ---
-    redis_client = await fakeredis.aioredis.create_redis_pool()
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
 
     published = []
 
@@ -40,7 +48,7 @@ async def test_process_event_generates_alerts(monkeypatch):
     monkeypatch.setattr(redis_client, "publish", fake_publish)
 
     # --- Exécution ---
-    await process_event({"donnee_id": str(donnee["_id"])}, db, redis_client)
+    await analyser_donnee({"donnee_id": str(donnee["_id"])}, db, redis_client)
 
     # --- Vérifications ---
     alerts_in_db = await db["alertes"].find().to_list(length=10)
@@ -51,25 +59,43 @@ async def test_process_event_generates_alerts(monkeypatch):
     msg = {a["message"] for a in published}
     assert "Tachycardie détectée" in msg
     assert "Hypoxie détectée" in msg
+    assert {a["donnee_id"] for a in published} == {str(donnee["_id"])}
+    assert await db["referrals"].count_documents({"patient_id": "user123"}) == 2
+
+    # Événement republié (reprise de l'ingestion) : ni nouvelle alerte, ni nouvelle notification
+    await analyser_donnee({"donnee_id": str(donnee["_id"])}, db, redis_client)
+    assert await db["alertes"].count_documents({}) == 2
+    assert len(published) == 2
+    assert await db["referrals"].count_documents({"patient_id": "user123"}) == 2
+
+    # Orientations traitées entre-temps : un nouveau rejeu ne les repropose pas
+    await db["referrals"].update_many({}, {"$set": {"status": "accepted"}})
+    await analyser_donnee({"donnee_id": str(donnee["_id"])}, db, redis_client)
+    assert await db["referrals"].count_documents({"patient_id": "user123"}) == 2
+    assert await db["referrals"].count_documents({"status": "pending"}) == 0
+
+    # L'index unique refuse une seconde alerte pour la même donnée
+    with pytest.raises(DuplicateKeyError):
+        await db["alertes"].insert_one({"donnee_id": str(donnee["_id"]), "message": "Hypoxie détectée"})
 
 
 @pytest.mark.asyncio
-async def test_process_event_no_alert(monkeypatch):
+async def test_analyser_donnee_sans_alerte(monkeypatch):
     """Aucune alerte si les valeurs sont dans les limites."""
 
     client = mongomock_motor.AsyncMongoMockClient()
     db = client["test_db"]
 
     donnee = {
-        "_id": mongomock_motor.ObjectId(),
-        "utilisateur_id": "user123",
+        "_id": ObjectId(),
+        "user_id": "user123",
         "frequence_cardiaque": FC_MAX - 10,
         "taux_oxygene": SPO2_MIN + 1,
-        "date": datetime.utcnow().isoformat(),
+        "date": datetime.utcnow(),
     }
     await db["donnees"].insert_one(donnee)
 
-    redis_client = await fakeredis.aioredis.create_redis_pool()
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
 
     published = []
 
@@ -79,7 +105,7 @@ async def test_process_event_no_alert(monkeypatch):
 
     monkeypatch.setattr(redis_client, "publish", fake_publish)
 
-    await process_event({"donnee_id": str(donnee["_id"])}, db, redis_client)
+    await analyser_donnee({"donnee_id": str(donnee["_id"])}, db, redis_client)
 
     alerts_in_db = await db["alertes"].find().to_list(length=10)
     assert not alerts_in_db
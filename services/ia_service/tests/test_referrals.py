@@ -0,0 +1,45 @@
+import asyncio
+
+import mongomock_motor
+import pytest
+
+from ia_service import main
+from ia_service.main import creer_referrals
+
+
+@pytest.mark.asyncio
+async def test_referrals_dedupliques(monkeypatch):
+    """Lots concurrents et doublons dans un lot : une seule orientation pending."""
+    monkeypatch.setattr(main, "_DEPARTEMENTS", {})
+    db = mongomock_motor.AsyncMongoMockClient()["test_db"]
+    await db["departments"].insert_many([
+        {"code": "CARDIO", "is_active": True},
+        {"code": "GENERAL", "is_active": True},
+    ])
+    await db["referrals"].create_index(
+        [("patient_id", 1), ("proposed_department_id", 1)],
+        unique=True,
+        partialFilterExpression={"status": "pending"},
+    )
+
+    lot = [
+        ("user1", "CARDIO", "Tachycardie détectée", "elevee"),
+        ("user1", "CARDIO", "Tachycardie détectée", "elevee"),
+        ("user1", "INCONNU", "Hypoxie détectée", "critique"),  # → GENERAL
+    ]
+    crees = await asyncio.gather(creer_referrals(lot, db), creer_referrals(lot, db))
+    assert sum(crees) == 2
+
+    referrals = await db["referrals"].find().to_list(None)
+    assert len(referrals) == 2
+    assert {r["status"] for r in referrals} == {"pending"}
+    assert all(r["source"] == "IA" for r in referrals)
+
+    # Une alerte plus grave relève la priorité de l'orientation existante
+    await creer_referrals([("user1", "CARDIO", "Tachycardie détectée", "critique")], db)
+    cardio = await db["referrals"].find_one({"notes": {"$regex": "Tachycardie"}})
+    assert cardio["priorite"] == 3
+
+    # Une orientation traitée n'empêche pas d'en proposer une nouvelle
+    await db["referrals"].update_many({}, {"$set": {"status": "accepted"}})
+    assert await creer_referrals(lot[:1], db) == 1
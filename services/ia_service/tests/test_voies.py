@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import fakeredis.aioredis
+import pytest
+
+from ia_service.main import (
+    CLES_VOIES, SOURCE_CHANNEL, SOURCE_CHANNEL_HAUTE, OrdonnanceurVoies, recaler_avancement, signaler_traitement,
+)
+
+
+async def _rien(canal, payload):  # noqa: D401
+    return None
+
+
+@pytest.mark.asyncio
+async def test_tourniquet_pondere():
+    """Jusqu'à `poids_haute` événements prioritaires par événement normal, sans affamer la voie normale."""
+    ordonnanceur = OrdonnanceurVoies(_rien, SOURCE_CHANNEL_HAUTE, SOURCE_CHANNEL, poids_haute=2)
+    for i in range(4):
+        await ordonnanceur.deposer(SOURCE_CHANNEL, {"n": f"normal-{i}"})
+    for i in range(5):
+        await ordonnanceur.deposer(SOURCE_CHANNEL_HAUTE, {"n": f"haute-{i}"})
+    await ordonnanceur.deposer("canal_inconnu", {"n": "normal-4"})
+
+    ordre = []
+    while (element := ordonnanceur.suivant()) is not None:
+        ordre.append(element[1]["n"])
+
+    assert ordre == [
+        "haute-0", "haute-1", "normal-0", "haute-2", "haute-3", "normal-1", "haute-4",
+        "normal-2", "normal-3", "normal-4",
+    ]
+    assert ordonnanceur.en_file() == 0
+
+
+@pytest.mark.asyncio
+async def test_mesure_critique_devant_l_arriere():
+    """Un événement prioritaire publié derrière un arriéré est traité juste après l'événement en cours."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    traites = []
+    premier = asyncio.Event()
+
+    async def traiter(canal, payload):
+        traites.append(payload["donnee_id"])
+        premier.set()
+        await asyncio.sleep(0.01)
+
+    ordonnanceur = OrdonnanceurVoies(traiter, SOURCE_CHANNEL_HAUTE, SOURCE_CHANNEL)
+    lecteur = asyncio.create_task(ordonnanceur.lire_voies(await ordonnanceur.abonner(redis_client)))
+    consommateur = asyncio.create_task(ordonnanceur.executer())
+    try:
+        for i in range(50):
+            await redis_client.publish(SOURCE_CHANNEL, json.dumps({"donnee_id": f"import-{i}"}))
+        await premier.wait()
+        await redis_client.publish(SOURCE_CHANNEL_HAUTE, json.dumps({"donnee_id": "critique"}))
+        for _ in range(400):
+            if "critique" in traites:
+                break
+            await asyncio.sleep(0.005)
+    finally:
+        lecteur.cancel()
+        consommateur.cancel()
+        await asyncio.gather(lecteur, consommateur, return_exceptions=True)
+
+    assert "critique" in traites
+    # Seul le délai de lecture de l'abonnement le sépare de l'événement en cours
+    assert traites.index("critique") < 20
+
+
+async def _attendre(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_file_pleine_freine_le_lecteur_de_sa_voie():
+    """File normale pleine : sa lecture s'arrête, la voie haute continue d'être lue, rien n'est perdu."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    traites = []
+
+    async def traiter(canal, payload):
+        traites.append(payload["donnee_id"])
+
+    ordonnanceur = OrdonnanceurVoies(traiter, SOURCE_CHANNEL_HAUTE, SOURCE_CHANNEL, capacite=3)
+    lecteur = asyncio.create_task(ordonnanceur.lire_voies(await ordonnanceur.abonner(redis_client)))
+    consommateur = None
+    try:
+        for i in range(10):
+            await redis_client.publish(SOURCE_CHANNEL, json.dumps({"donnee_id": f"import-{i}"}))
+        await redis_client.publish(SOURCE_CHANNEL_HAUTE, json.dumps({"donnee_id": "critique"}))
+        await _attendre(lambda: ordonnanceur.en_file(SOURCE_CHANNEL_HAUTE) == 1)
+        assert ordonnanceur.en_file(SOURCE_CHANNEL_HAUTE) == 1
+        assert ordonnanceur.en_file(SOURCE_CHANNEL) == 3
+
+        consommateur = asyncio.create_task(ordonnanceur.executer())
+        await _attendre(lambda: len(traites) == 11)
+    finally:
+        for tache in (lecteur, consommateur):
+            if tache:
+                tache.cancel()
+        await asyncio.gather(*(t for t in (lecteur, consommateur) if t), return_exceptions=True)
+
+    assert traites[0] == "critique"
+    assert traites[1:] == [f"import-{i}" for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_avancement_par_voie():
+    """Un événement de la voie haute fait avancer l'état de sa voie, instant de publication compris."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    publies_haute, etat_haute = CLES_VOIES[SOURCE_CHANNEL_HAUTE]
+    publies_normal, etat_normal = CLES_VOIES[SOURCE_CHANNEL]
+    await redis_client.set(publies_haute, 4)
+    await redis_client.set(publies_normal, 10)
+
+    await recaler_avancement(redis_client, {SOURCE_CHANNEL_HAUTE: 2, SOURCE_CHANNEL: 5})
+    assert await redis_client.hget(etat_haute, "traites") == "2"
+    assert await redis_client.hget(etat_normal, "traites") == "5"
+
+    await signaler_traitement(redis_client, {"donnee_id": "x", "priorite": "haute", "publie_a": 1234.5})
+    assert await redis_client.hget(etat_haute, "traites") == "3"
+    assert float(await redis_client.hget(etat_haute, "dernier_publie_a")) == 1234.5
+    assert await redis_client.hget(etat_normal, "traites") == "5"
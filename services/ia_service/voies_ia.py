@@ -0,0 +1,144 @@
+"""Voies de priorité des événements `nouvelle_donnee` du service IA.
+
+Le backend publie les mesures potentiellement critiques (appareil connecté
+ou saisie manuelle hors seuils) sur `nouvelle_donnee:haute`, les autres sur
+`nouvelle_donnee`. Le lecteur vide l'abonnement sans attendre le traitement
+et range chaque événement dans la file de sa voie ; le consommateur sert
+les deux files en tourniquet pondéré : jusqu'à `POIDS_VOIE_HAUTE`
+événements prioritaires pour un normal quand les deux voies attendent,
+la seule voie non vide sinon. Une mesure critique n'attend donc que
+l'événement en cours, quel que soit l'arriéré normal (import massif), et la
+voie normale n'est jamais affamée.
+
+Chaque file est bornée à `VOIE_CAPACITE` événements : au-delà, le lecteur
+de la voie cesse de lire son abonnement et l'arriéré reste côté Redis
+(tampon de sortie du client), au lieu de croître sans limite dans le
+processus. Chaque voie a son propre abonnement (`abonner`), si bien qu'une
+voie normale pleine ne freine pas la lecture de la voie haute. Si Redis
+coupe un abonnement dont le tampon déborde (`client-output-buffer-limit
+pubsub`), le worker se réabonne et recale l'avancement (voir main.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from prometheus_client import Gauge
+
+LOGGER = logging.getLogger("ia_service.voies")
+
+POIDS_VOIE_HAUTE = int(os.getenv("POIDS_VOIE_HAUTE", "4"))
+# Événements reçus gardés en mémoire par voie avant de freiner la lecture
+VOIE_CAPACITE = int(os.getenv("VOIE_CAPACITE", "10000"))
+
+EN_FILE = Gauge("ia_voie_evenements_en_file", "Événements reçus en attente de traitement", ["canal"])
+
+Traitement = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class OrdonnanceurVoies:
+    """Files locales des voies haute et normale, servies en tourniquet pondéré."""
+
+    def __init__(self, traiter: Traitement, canal_haute: str, canal_normal: str,
+                 poids_haute: int = POIDS_VOIE_HAUTE, capacite: int = VOIE_CAPACITE) -> None:
+        self.traiter = traiter
+        self.canal_haute = canal_haute
+        self.canal_normal = canal_normal
+        self.poids_haute = max(1, poids_haute)
+        self.capacite = max(1, capacite)
+        self._files: Dict[str, Deque[Dict[str, Any]]] = {canal_haute: deque(), canal_normal: deque()}
+        # Signalé quand une file pleine libère une place
+        self._place: Dict[str, asyncio.Event] = {canal: asyncio.Event() for canal in self._files}
+        self._credit = self.poids_haute
+        self._disponible = asyncio.Event()
+
+    def en_file(self, canal: Optional[str] = None) -> int:
+        """Événements reçus non traités, d'une voie ou des deux."""
+        if canal is not None:
+            return len(self._files[canal])
+        return sum(len(file) for file in self._files.values())
+
+    async def deposer(self, canal: str, payload: Dict[str, Any]) -> None:
+        """Range *payload* dans la file de *canal* (voie normale pour un canal inconnu).
+
+        Attend une place si la file est pleine : le lecteur de la voie est freiné.
+        """
+        if canal not in self._files:
+            canal = self.canal_normal
+        file = self._files[canal]
+        while len(file) >= self.capacite:
+            self._place[canal].clear()
+            await self._place[canal].wait()
+        file.append(payload)
+        EN_FILE.labels(canal).set(len(self._files[canal]))
+        self._disponible.set()
+
+    def suivant(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Prochain événement à traiter, ou None si les deux files sont vides."""
+        haute, normale = self._files[self.canal_haute], self._files[self.canal_normal]
+        if haute and (self._credit > 0 or not normale):
+            canal = self.canal_haute
+            if normale:
+                self._credit -= 1
+        elif normale:
+            canal = self.canal_normal
+            self._credit = self.poids_haute
+        else:
+            return None
+        payload = self._files[canal].popleft()
+        EN_FILE.labels(canal).set(len(self._files[canal]))
+        self._place[canal].set()
+        return canal, payload
+
+    async def abonner(self, redis_client: Any) -> List[Any]:
+        """Un abonnement par voie, à passer à `lire_voies`."""
+        abonnements = []
+        for canal in (self.canal_haute, self.canal_normal):
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(canal)
+            abonnements.append(pubsub)
+        return abonnements
+
+    async def lire_voies(self, abonnements: List[Any]) -> None:
+        """Lit les abonnements de `abonner` jusqu'à la fin ou l'erreur de l'un d'eux, puis les ferme."""
+        taches = [asyncio.create_task(self.lire(pubsub)) for pubsub in abonnements]
+        try:
+            finies, _ = await asyncio.wait(taches, return_when=asyncio.FIRST_COMPLETED)
+            for tache in finies:
+                tache.result()  # propage l'erreur de connexion (reconnexion par l'appelant)
+        finally:
+            for tache in taches:
+                tache.cancel()
+            await asyncio.gather(*taches, return_exceptions=True)
+            for pubsub in abonnements:
+                await pubsub.aclose()
+
+    async def lire(self, pubsub: Any) -> None:
+        """Vide l'abonnement dans les files, sans attendre les traitements (sauf file pleine)."""
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                payload = json.loads(message["data"])
+            except ValueError:
+                LOGGER.warning("Message illisible sur %s : %s", message["channel"], message["data"])
+                continue
+            await self.deposer(message["channel"], payload)
+
+    async def executer(self) -> None:
+        """Traite les événements un à un, dans l'ordre du tourniquet."""
+        while True:
+            element = self.suivant()
+            if element is None:
+                self._disponible.clear()
+                await self._disponible.wait()
+                continue
+            canal, payload = element
+            try:
+                await self.traiter(canal, payload)
+            except Exception as exc:  # pragma: no cover
+                LOGGER.exception("Erreur traitement IA (%s) : %s", canal, exc)
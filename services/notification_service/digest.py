@@ -0,0 +1,245 @@
+"""Regroupement des notifications (digests) et limitation de débit par destinataire.
+
+- Les alertes non critiques sont mises en tampon dans Redis, une liste par
+  destinataire, puis envoyées en un seul digest à l'échéance de la fenêtre
+  (ex : toutes les 15 min) ou dès que le tampon atteint sa taille maximale.
+- Les alertes `critical` passent par un chemin rapide et partent immédiatement.
+- Chaque destinataire dispose d'un seau à jetons (token bucket) stocké dans
+  Redis : un digest refusé par le limiteur reste en tampon et est reprogrammé.
+
+Tout l'état vit dans Redis : un redémarrage du service ne perd aucun message,
+les tampons et les digests en cours d'envoi sont repris au démarrage.
+
+Un seul envoi à la fois par destinataire : un bail Redis (`SET NX PX`,
+`DIGEST_BAIL_MS`) est pris avant de toucher au tampon figé. Sans lui, un
+flush concurrent prendrait un envoi en cours pour un envoi interrompu et le
+renverrait. Le bail doit donc dépasser la durée d'un envoi ; celui d'une
+instance arrêtée brutalement expire et le tampon figé est alors repris.
+Un envoi en échec garde son tampon figé et est reprogrammé
+(`NOTIF_DELAI_REESSAI`).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from redis.exceptions import ResponseError  # type: ignore
+
+LOGGER = logging.getLogger("notification_service.digest")
+
+# Paramètres du regroupement
+DIGEST_FENETRE_SECONDES = int(os.getenv("DIGEST_FENETRE_SECONDES", "900"))  # 15 min
+DIGEST_TAILLE_MAX = int(os.getenv("DIGEST_TAILLE_MAX", "20"))
+DIGEST_INTERVALLE_SCRUTATION = float(os.getenv("DIGEST_INTERVALLE_SCRUTATION", "5"))
+# Durée du bail d'envoi d'un destinataire (doit dépasser la durée d'un envoi)
+DIGEST_BAIL_MS = int(os.getenv("DIGEST_BAIL_MS", "120000"))
+# Paramètres du seau à jetons (par destinataire)
+NOTIF_CAPACITE_JETONS = float(os.getenv("NOTIF_CAPACITE_JETONS", "5"))
+NOTIF_JETONS_PAR_MINUTE = float(os.getenv("NOTIF_JETONS_PAR_MINUTE", "1"))
+NOTIF_DELAI_REESSAI = int(os.getenv("NOTIF_DELAI_REESSAI", "60"))
+
+NIVEAU_CRITIQUE = "critical"
+
+# Clés Redis
+CLE_TAMPON = "digest:tampon:{}"        # liste des notifications en attente
+CLE_ENVOI = "digest:envoi:{}"          # tampon figé pendant l'envoi (reprise après crash)
+CLE_ECHEANCES = "digest:echeances"     # zset destinataire -> date limite de flush
+CLE_JETONS = "notif:jetons:{}"         # hash {jetons, ts} du seau à jetons
+CLE_BAIL = "digest:bail:{}"            # bail de l'envoi en cours (une instance à la fois)
+
+# Script Lua : consomme un jeton de façon atomique (recharge continue).
+SCRIPT_SEAU_JETONS = """
+local capacite = tonumber(ARGV[1])
+local debit = tonumber(ARGV[2])
+local maintenant = tonumber(ARGV[3])
+local etat = redis.call('HMGET', KEYS[1], 'jetons', 'ts')
+local jetons = tonumber(etat[1]) or capacite
+local ts = tonumber(etat[2]) or maintenant
+jetons = math.min(capacite, jetons + math.max(0, maintenant - ts) * debit)
+local autorise = 0
+if jetons >= 1 then
+    jetons = jetons - 1
+    autorise = 1
+end
+redis.call('HSET', KEYS[1], 'jetons', tostring(jetons), 'ts', tostring(maintenant))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacite / debit) + 60)
+return autorise
+"""
+
+# Script Lua : rend le bail seulement s'il est encore détenu (pas expiré puis repris)
+SCRIPT_RENDRE_BAIL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+Expediteur = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class PlanificateurDigest:
+    """Met en tampon les notifications non critiques et les envoie par lots."""
+
+    def __init__(
+        self,
+        redis_client: Any,
+        expediteur: Expediteur,
+        fenetre: int = DIGEST_FENETRE_SECONDES,
+        taille_max: int = DIGEST_TAILLE_MAX,
+        intervalle: float = DIGEST_INTERVALLE_SCRUTATION,
+    ) -> None:
+        self.redis = redis_client
+        self.expediteur = expediteur
+        self.fenetre = fenetre
+        self.taille_max = taille_max
+        self.intervalle = intervalle
+        self._seau = redis_client.register_script(SCRIPT_SEAU_JETONS)
+        self._rendre = redis_client.register_script(SCRIPT_RENDRE_BAIL)
+
+    async def soumettre(self, destinataire: str, notification: Dict[str, Any]) -> None:
+        """Point d'entrée : envoi immédiat si critique, sinon mise en tampon."""
+        if notification.get("niveau") == NIVEAU_CRITIQUE:
+            # Chemin rapide : une alerte critique n'attend jamais un digest
+            await self.expediteur(destinataire, [notification])
+            return
+
+        taille = await self.redis.rpush(CLE_TAMPON.format(destinataire), json.dumps(notification))
+        # NX : la première notification du tampon fixe l'échéance de la fenêtre
+        await self.redis.zadd(CLE_ECHEANCES, {destinataire: time.time() + self.fenetre}, nx=True)
+        if taille >= self.taille_max:
+            try:
+                await self.vider(destinataire)
+            except Exception as exc:
+                # La notification est conservée et l'envoi reprogrammé
+                LOGGER.warning("Digest de %s non envoyé, nouvel essai prévu : %s", destinataire, exc)
+
+    async def autoriser(self, destinataire: str) -> bool:
+        """Consomme un jeton du seau du destinataire ; False si le débit est dépassé."""
+        debit = NOTIF_JETONS_PAR_MINUTE / 60.0
+        resultat = await self._seau(
+            keys=[CLE_JETONS.format(destinataire)],
+            args=[NOTIF_CAPACITE_JETONS, debit, time.time()],
+        )
+        return bool(int(resultat))
+
+    async def _prendre_bail(self, destinataire: str) -> Optional[str]:
+        """Jeton du bail d'envoi du destinataire ; None si un envoi est déjà en cours."""
+        jeton = uuid.uuid4().hex
+        if await self.redis.set(CLE_BAIL.format(destinataire), jeton, nx=True, px=DIGEST_BAIL_MS):
+            return jeton
+        return None
+
+    async def _rendre_bail(self, destinataire: str, jeton: str) -> None:
+        await self._rendre(keys=[CLE_BAIL.format(destinataire)], args=[jeton])
+
+    async def _reprogrammer(self, destinataire: str, delai: float) -> None:
+        """Échéance dans *delai* secondes, sauf si une échéance plus proche existe (LT)."""
+        await self.redis.zadd(CLE_ECHEANCES, {destinataire: time.time() + delai}, lt=True)
+
+    async def vider(self, destinataire: str) -> int:
+        """Envoie le digest d'un destinataire. Retourne le nombre de notifications envoyées."""
+        jeton = await self._prendre_bail(destinataire)
+        if jeton is None:
+            # Envoi en cours (autre flush ou autre instance) : nouvel essai à la prochaine scrutation
+            await self._reprogrammer(destinataire, 0)
+            return 0
+        try:
+            return await self._vider(destinataire)
+        finally:
+            await self._rendre_bail(destinataire, jeton)
+
+    async def _vider(self, destinataire: str) -> int:
+        """Corps de `vider`, bail détenu."""
+        cle_tampon = CLE_TAMPON.format(destinataire)
+        cle_envoi = CLE_ENVOI.format(destinataire)
+        envoi_en_cours = await self.redis.exists(cle_envoi)
+        if not envoi_en_cours and not await self.redis.exists(cle_tampon):
+            await self.redis.zrem(CLE_ECHEANCES, destinataire)
+            return 0
+
+        if not await self.autoriser(destinataire):
+            # Débit dépassé : on garde le tampon et on reprogramme l'envoi
+            await self.redis.zadd(CLE_ECHEANCES, {destinataire: time.time() + NOTIF_DELAI_REESSAI})
+            LOGGER.info("Digest de %s reporté (limitation de débit)", destinataire)
+            return 0
+
+        # Retire l'échéance avant de figer le tampon : une notification arrivant
+        # ensuite ouvre une nouvelle fenêtre.
+        await self.redis.zrem(CLE_ECHEANCES, destinataire)
+        if not envoi_en_cours:
+            # RENAMENX fige le tampon de façon atomique (les nouvelles
+            # notifications repartent dans un tampon vierge).
+            try:
+                fige = await self.redis.renamenx(cle_tampon, cle_envoi)
+            except ResponseError as exc:
+                if "no such key" not in str(exc).lower():
+                    raise
+                return 0
+            # Refus : un tampon figé est apparu depuis la lecture, il part d'abord
+            envoi_en_cours = not fige
+        try:
+            envoyees = await self._envoyer_fige(destinataire)
+        except Exception:
+            # Le tampon figé est conservé ; sans échéance, il attendrait un redémarrage
+            await self._reprogrammer(destinataire, NOTIF_DELAI_REESSAI)
+            raise
+        if envoi_en_cours and await self.redis.exists(cle_tampon):
+            # Un envoi interrompu a été terminé : le tampon courant reste à traiter
+            await self.redis.zadd(CLE_ECHEANCES, {destinataire: time.time()}, nx=True)
+        return envoyees
+
+    async def _envoyer_fige(self, destinataire: str) -> int:
+        """Envoie puis supprime le tampon figé d'un destinataire."""
+        cle_envoi = CLE_ENVOI.format(destinataire)
+        brutes = await self.redis.lrange(cle_envoi, 0, -1)
+        if not brutes:
+            return 0
+        notifications = [json.loads(b) for b in brutes]
+        await self.expediteur(destinataire, notifications)
+        await self.redis.delete(cle_envoi)
+        return len(notifications)
+
+    async def vider_echus(self) -> int:
+        """Envoie tous les digests dont la fenêtre est écoulée."""
+        echus = await self.redis.zrangebyscore(CLE_ECHEANCES, "-inf", time.time())
+        total = 0
+        for destinataire in echus:
+            try:
+                total += await self.vider(destinataire)
+            except Exception as exc:
+                LOGGER.exception("Digest de %s non envoyé, nouvel essai dans %s s : %s",
+                                 destinataire, NOTIF_DELAI_REESSAI, exc)
+        return total
+
+    async def reprendre(self) -> None:
+        """Au démarrage : termine les envois interrompus par un arrêt brutal."""
+        async for cle in self.redis.scan_iter(match=CLE_ENVOI.format("*")):
+            destinataire = cle.split(":", 2)[2]
+            jeton = await self._prendre_bail(destinataire)
+            if jeton is None:
+                # Envoi en cours ailleurs, ou bail d'une instance arrêtée pas encore expiré
+                await self._reprogrammer(destinataire, 0)
+                continue
+            LOGGER.info("Reprise d'un digest interrompu pour %s", destinataire)
+            try:
+                await self._envoyer_fige(destinataire)
+            except Exception as exc:
+                LOGGER.exception("Reprise du digest de %s en échec : %s", destinataire, exc)
+                await self._reprogrammer(destinataire, NOTIF_DELAI_REESSAI)
+            finally:
+                await self._rendre_bail(destinataire, jeton)
+
+    async def executer(self) -> None:
+        """Boucle de scrutation des échéances (tâche de fond du service)."""
+        await self.reprendre()
+        while True:
+            try:
+                await self.vider_echus()
+            except Exception as exc:  # pragma: no cover
+                LOGGER.exception("Erreur lors du flush des digests : %s", exc)
+            await asyncio.sleep(self.intervalle)
@@ -2,6 +2,9 @@
 
 Écoute le canal Redis `notify` et simule l'envoi d'alertes (courriel/SMS).
 Pour l'instant, il écrit simplement dans les logs.
+
+Les alertes non critiques sont regroupées en digests par destinataire
+(voir `digest.py`) ; les alertes critiques sont envoyées immédiatement.
 """
 from __future__ import annotations
 
@@ -10,19 +13,36 @@ import json
 import logging
 import os
 from contextlib import asynccontextmanager
+from typing import Any, Dict, List
 
 import redis.asyncio as redis  # type: ignore
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from digest import PlanificateurDigest
+from metriques import compter_envoi, exposition, mesurer_notification
+from commun import profilage, tracage
+from commun.surveillance_boucle import BOUCLE_SURVEILLANCE, SurveillantBoucle
 
 LOGGER = logging.getLogger("notification_service")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 CHANNEL = "notify"
 
+# Planificateur des digests, initialisé au démarrage du service
+_planificateur: PlanificateurDigest | None = None
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialise le client Redis et lance le consumer."""
+    global _planificateur
+    tracage.configurer("notification_service")
+    surveillance = SurveillantBoucle("notifications") if BOUCLE_SURVEILLANCE else None
+    if surveillance:
+        surveillance.demarrer()
+    profilage.suivi_memoire.demarrer()
     redis_client = await redis.from_url(REDIS_URL, decode_responses=True)
+    _planificateur = PlanificateurDigest(redis_client, envoyer_notifications)
 
     async def worker():
         pubsub = redis_client.pubsub()
@@ -33,14 +53,22 @@ async def lifespan(app: FastAPI):
                 continue
             try:
                 payload = json.loads(message["data"])
-                await handle_notification(payload)
+                with mesurer_notification(str(payload.get("niveau", "inconnu"))):
+                    await handle_notification(payload)
             except Exception as exc:  # pragma: no cover
                 LOGGER.exception("Erreur notification : %s", exc)
 
     task = asyncio.create_task(worker())
+    task_digest = asyncio.create_task(_planificateur.executer())
     yield
     task.cancel()
+    task_digest.cancel()
+    _planificateur = None
+    if surveillance:
+        await surveillance.arreter()
+    profilage.suivi_memoire.arreter()
     await redis_client.close()
+    tracage.arreter()
 
 
 app = FastAPI(title="Notification Service", lifespan=lifespan)
@@ -52,8 +80,59 @@ async def health():  # noqa: D401
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques Prometheus (alertes reçues, envois et digests)."""
+    corps, type_contenu = exposition()
+    return Response(content=corps, media_type=type_contenu)
+
+
+@app.post("/debug/profilage", response_class=PlainTextResponse, include_in_schema=False,
+          dependencies=[Depends(profilage.verifier_jeton)])
+async def profiler_processus(
+    duree: float = Query(10, gt=0, le=profilage.PROFILAGE_DUREE_MAX),
+    mode: str = Query("mur", pattern="^(mur|cpu)$"),
+    frequence: int = Query(100, ge=1, le=1000),
+):
+    """Profil statistique du service, en piles repliées (flamegraph.pl, speedscope)."""
+    try:
+        piles = await profilage.profiler(duree, mode, frequence)
+    except (profilage.ProfilageEnCours, profilage.ProfilageIndisponible) as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return PlainTextResponse(piles)
+
+
+@app.get("/debug/memoire", include_in_schema=False, dependencies=[Depends(profilage.verifier_jeton)])
+async def memoire_processus(limite: int = Query(25, ge=1, le=200), reinitialiser: bool = False):
+    """Croissance mémoire depuis la référence tracemalloc (démarrage ou dernière réinitialisation)."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profilage.suivi_memoire.comparer, limite, reinitialiser
+        )
+    except profilage.ProfilageIndisponible as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+async def envoyer_notifications(utilisateur_id: str, notifications: List[Dict[str, Any]]) -> None:
+    """Simule l'envoi d'une notification ou d'un digest (pour l'instant, log)."""
+    compter_envoi(len(notifications))
+    if len(notifications) == 1:
+        LOGGER.info("[NOTIFY] Utilisateur %s: %s", utilisateur_id, notifications[0].get("message", ""))
+        return
+    messages = "; ".join(n.get("message", "") for n in notifications)
+    LOGGER.info("[DIGEST] Utilisateur %s (%d alertes): %s", utilisateur_id, len(notifications), messages)
+
+
 async def handle_notification(payload):  # type: ignore
-    """Simule l'envoi de notification (pour l'instant, log)."""
-    utilisateur_id = payload.get("utilisateur_id", "inconnu")
-    message = payload.get("message", "")
-    LOGGER.info("[NOTIFY] Utilisateur %s: %s", utilisateur_id, message)
+    """Route la notification : envoi immédiat si critique, sinon digest."""
+    with tracage.span_consommateur(CHANNEL, payload):
+        await _router_notification(payload)
+
+
+async def _router_notification(payload: Dict[str, Any]) -> None:
+    # L'IA publie `user_id` ; `utilisateur_id` est conservé pour compatibilité
+    utilisateur_id = payload.get("user_id") or payload.get("utilisateur_id", "inconnu")
+    if _planificateur is None:
+        await envoyer_notifications(utilisateur_id, [payload])
+        return
+    await _planificateur.soumettre(utilisateur_id, payload)
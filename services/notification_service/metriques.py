@@ -0,0 +1,36 @@
+"""Métriques Prometheus du service de notifications (exposées sur `GET /metrics`)."""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram
+
+from commun.instrumentation import exposition  # noqa: F401  (réexportée pour main.py)
+
+NOTIFICATIONS = Counter("notifications_recues_total", "Alertes reçues sur le canal notify", ["niveau", "resultat"])
+DUREE_NOTIFICATIONS = Histogram(
+    "notification_duree_secondes", "Durée de traitement d'une alerte reçue",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+ENVOIS = Counter("notifications_envois_total", "Envois effectués (alerte seule ou digest)", ["type"])
+ALERTES_ENVOYEES = Counter("notifications_alertes_envoyees_total", "Alertes transmises aux destinataires")
+
+
+@contextmanager
+def mesurer_notification(niveau: str) -> Iterator[None]:
+    """Chronomètre le traitement d'une alerte reçue."""
+    debut = time.perf_counter()
+    resultat = "erreur"
+    try:
+        yield
+        resultat = "ok"
+    finally:
+        DUREE_NOTIFICATIONS.observe(time.perf_counter() - debut)
+        NOTIFICATIONS.labels(niveau, resultat).inc()
+
+
+def compter_envoi(nb_alertes: int) -> None:
+    ENVOIS.labels("alerte" if nb_alertes == 1 else "digest").inc()
+    ALERTES_ENVOYEES.inc(nb_alertes)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import fakeredis.aioredis
+import pytest
+
+from notification_service import digest
+from notification_service.digest import CLE_ECHEANCES, CLE_ENVOI, CLE_TAMPON, PlanificateurDigest
+
+
+class Boite:
+    """Expéditeur de test : garde les envois, peut simuler une panne."""
+
+    def __init__(self) -> None:
+        self.envois = []
+        self.panne = False
+
+    async def __call__(self, destinataire, notifications):
+        if self.panne:
+            raise RuntimeError("service d'envoi indisponible")
+        self.envois.append((destinataire, [n["message"] for n in notifications]))
+
+
+def _alerte(message, niveau="warning"):
+    return {"message": message, "niveau": niveau}
+
+
+@pytest.mark.asyncio
+async def test_digest_a_l_echeance_de_la_fenetre():
+    """Rien ne part avant l'échéance ; à l'échéance, un seul digest regroupe le tampon."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    boite = Boite()
+    planificateur = PlanificateurDigest(redis_client, boite, fenetre=60)
+
+    await planificateur.soumettre("medecin1", _alerte("a"))
+    await planificateur.soumettre("medecin1", _alerte("b"))
+    assert await planificateur.vider_echus() == 0
+    assert boite.envois == []
+
+    # Fenêtre écoulée
+    await redis_client.zadd(CLE_ECHEANCES, {"medecin1": time.time() - 1})
+    assert await planificateur.vider_echus() == 2
+    assert boite.envois == [("medecin1", ["a", "b"])]
+    assert not await redis_client.exists(CLE_TAMPON.format("medecin1"))
+    assert await redis_client.zscore(CLE_ECHEANCES, "medecin1") is None
+
+
+@pytest.mark.asyncio
+async def test_digest_des_que_le_tampon_est_plein():
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    boite = Boite()
+    planificateur = PlanificateurDigest(redis_client, boite, fenetre=900, taille_max=3)
+
+    for message in ("a", "b", "c", "d"):
+        await planificateur.soumettre("medecin1", _alerte(message))
+
+    assert boite.envois == [("medecin1", ["a", "b", "c"])]
+    # La notification suivante ouvre une nouvelle fenêtre
+    assert await redis_client.lrange(CLE_TAMPON.format("medecin1"), 0, -1) != []
+    assert await redis_client.zscore(CLE_ECHEANCES, "medecin1") is not None
+
+
+@pytest.mark.asyncio
+async def test_alerte_critique_sans_digest():
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    boite = Boite()
+    planificateur = PlanificateurDigest(redis_client, boite, fenetre=900)
+
+    await planificateur.soumettre("medecin1", _alerte("normale"))
+    await planificateur.soumettre("medecin1", _alerte("hypoxie", niveau="critical"))
+
+    assert boite.envois == [("medecin1", ["hypoxie"])]
+    assert await redis_client.llen(CLE_TAMPON.format("medecin1")) == 1
+
+
+@pytest.mark.asyncio
+async def test_digest_limite_reprogramme(monkeypatch):
+    """Seau vide : le tampon est conservé et l'envoi reporté de NOTIF_DELAI_REESSAI."""
+    monkeypatch.setattr(digest, "NOTIF_CAPACITE_JETONS", 1)
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    boite = Boite()
+    planificateur = PlanificateurDigest(redis_client, boite, fenetre=900)
+
+    await planificateur.soumettre("medecin1", _alerte("a"))
+    assert await planificateur.vider("medecin1") == 1
+    await planificateur.soumettre("medecin1", _alerte("b"))
+    avant = time.time()
+    assert await planificateur.vider("medecin1") == 0
+
+    assert boite.envois == [("medecin1", ["a"])]
+    assert await redis_client.lrange(CLE_TAMPON.format("medecin1"), 0, -1) != []
+    echeance = await redis_client.zscore(CLE_ECHEANCES, "medecin1")
+    assert echeance >= avant + digest.NOTIF_DELAI_REESSAI - 1
+
+
+@pytest.mark.asyncio
+async def test_reprise_d_un_tampon_fige_apres_redemarrage():
+    """Envoi interrompu après RENAMENX : le tampon figé part au redémarrage, le nouveau tampon reste intact."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    boite = Boite()
+    planificateur = PlanificateurDigest(redis_client, boite, fenetre=900)
+
+    await planificateur.soumettre("medecin1", _alerte("a"))
+    await planificateur.soumettre("medecin1", _alerte("b"))
+    boite.panne = True
+    avant = time.time()
+    with pytest.raises(RuntimeError):
+        await planificateur.vider("medecin1")
+    assert await redis_client.llen(CLE_ENVOI.format("medecin1")) == 2
+    # Échec d'envoi : reprogrammé, le tampon figé n'attend pas un redémarrage
+    assert await redis_client.zscore(CLE_ECHEANCES, "medecin1") >= avant + digest.NOTIF_DELAI_REESSAI - 1
+    # Arrivée pendant l'arrêt : nouveau tampon
+    await planificateur.soumettre("medecin1", _alerte("c"))
+
+    # Redémarrage du service
+    boite.panne = False
+    await PlanificateurDigest(redis_client, boite, fenetre=900).reprendre()
+
+    assert boite.envois == [("medecin1", ["a", "b"])]
+    assert not await redis_client.exists(CLE_ENVOI.format("medecin1"))
+    assert await redis_client.lrange(CLE_TAMPON.format("medecin1"), 0, -1) != []
+
+
+@pytest.mark.asyncio
+async def test_flush_concurrent_n_envoie_pas_deux_fois():
+    """Un flush pendant un envoi en cours ne le prend pas pour un envoi interrompu."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    en_cours, liberer = asyncio.Event(), asyncio.Event()
+    envois = []
+
+    async def expediteur_lent(destinataire, notifications):
+        en_cours.set()
+        await liberer.wait()
+        envois.append([n["message"] for n in notifications])
+
+    planificateur = PlanificateurDigest(redis_client, expediteur_lent, fenetre=900)
+    await planificateur.soumettre("medecin1", _alerte("a"))
+    envoi = asyncio.create_task(planificateur.vider("medecin1"))
+    await en_cours.wait()
+
+    assert await planificateur.vider("medecin1") == 0
+    liberer.set()
+    assert await envoi == 1
+
+    assert envois == [["a"]]
+    # Un seul jeton consommé
+    jetons = float(await redis_client.hget(digest.CLE_JETONS.format("medecin1"), "jetons"))
+    assert jetons > digest.NOTIF_CAPACITE_JETONS - 2
+    assert not await redis_client.exists(digest.CLE_BAIL.format("medecin1"))
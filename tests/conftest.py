@@ -3,7 +3,18 @@
 import sys
 from pathlib import Path
 
+import pytest_asyncio
+
 # Ajoute la racine du projet (dossier contenant 'backend') au path
 ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def _taches_de_fond():
+    """Annule les tâches de fond lancées pendant le test (ex. reprise des versions ETag)."""
+    yield
+    from backend.ressources import ressources
+
+    await ressources.arreter_taches()
@@ -0,0 +1,153 @@
+"""Tests du contrôle d'admission de POST /data selon le retard de l'analyse IA."""
+
+import json
+import time
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.ressources import ressources
+from backend.services import pipeline_ia
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+@pytest.mark.asyncio
+async def test_sources_differables_refusees_quand_l_ia_est_en_retard(monkeypatch):
+    """Import refusé (429 + Retry-After) ; appareil connecté et saisie manuelle acceptés."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="admission@example.com", username="admission", mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {"Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': 'admission'})}"}
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    monkeypatch.setattr(pipeline_ia, "suivi", pipeline_ia.SuiviPipeline(rafraichissement=0))
+    # 50 événements en attente, le dernier traité publié il y a 30 s
+    await redis_client.set(pipeline_ia.CLE_PUBLIES, 150)
+    await redis_client.hset(pipeline_ia.CLE_ETAT, mapping={"traites": 100, "dernier_publie_a": time.time() - 30})
+    mesure = {"frequence_cardiaque": 80, "taux_oxygene": 97, "date": "2025-03-01T08:30:00"}
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                sante = await client.get("/health/ia")
+                importee = await client.post("/data", json={**mesure, "source": "import_fichier"}, headers=entetes)
+                appareil = await client.post("/data", json={**mesure, "source": "appareil_connecte"}, headers=entetes)
+                manuelle = await client.post("/data", json={**mesure, "source": "saisie_manuelle"}, headers=entetes)
+
+                # L'IA a rattrapé son retard : l'import est de nouveau accepté
+                await redis_client.hset(pipeline_ia.CLE_ETAT, "traites", await redis_client.get(pipeline_ia.CLE_PUBLIES))
+                rattrape = await client.post("/data", json={**mesure, "source": "import_fichier"}, headers=entetes)
+
+        assert sante.json()["en_attente"] == 50 and sante.json()["retard_s"] >= 30
+        assert importee.status_code == 429
+        assert 20 <= int(importee.headers["retry-after"]) <= pipeline_ia.RETRY_AFTER_MAX
+        assert appareil.status_code == 201
+        assert manuelle.status_code == 201
+        assert rattrape.status_code == 201
+        assert await Donnee.find(Donnee.user_id == str(patient.id)).count() == 3
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_service_ia_jamais_demarre():
+    """Sans aucun événement traité, le retard est compté depuis la première observation."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    suivi = pipeline_ia.SuiviPipeline(rafraichissement=0)
+    try:
+        assert await suivi.etat() == pipeline_ia.EtatPipeline(0.0, 0)
+        await redis_client.set(pipeline_ia.CLE_PUBLIES, 3)
+        assert (await suivi.etat()).en_attente == 3
+        suivi._attente_depuis[pipeline_ia.CANAL] -= 45
+        assert await suivi.refuser(pipeline_ia.SourceDonnee.API_EXTERNE) is not None
+        assert await suivi.refuser(pipeline_ia.SourceDonnee.SAISIE_MANUELLE) is None
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_mesures_critiques_publiees_sur_la_voie_haute():
+    """Constantes hors seuils en direct → voie haute ; import hors seuils ou mesure normale → voie normale."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe(pipeline_ia.CANAL, pipeline_ia.CANAL_HAUTE)
+    S = pipeline_ia.SourceDonnee
+    mesures = [
+        Donnee(user_id="u1", taux_oxygene=80, source=S.APPAREIL_CONNECTE),
+        Donnee(user_id="u1", frequence_cardiaque=pipeline_ia.FC_MAX + 1, source=S.SAISIE_MANUELLE),
+        Donnee(user_id="u1", taux_oxygene=80, source=S.IMPORT_FICHIER),
+        Donnee(user_id="u1", frequence_cardiaque=70, taux_oxygene=97, source=S.APPAREIL_CONNECTE),
+    ]
+    try:
+        for doc in mesures:
+            await pipeline_ia.publier_donnee(doc)
+        recus = []
+        for _ in range(20):
+            message = await pubsub.get_message(timeout=0.01)
+            if message and message["type"] == "message":
+                recus.append((message["channel"], json.loads(message["data"])["priorite"]))
+        assert recus == [
+            (pipeline_ia.CANAL_HAUTE, "haute"), (pipeline_ia.CANAL_HAUTE, "haute"),
+            (pipeline_ia.CANAL, "normale"), (pipeline_ia.CANAL, "normale"),
+        ]
+        # Chaque voie compte ses propres publications
+        assert await redis_client.get(pipeline_ia.CLE_PUBLIES) == "2"
+        assert await redis_client.get(pipeline_ia.CLES_VOIES[pipeline_ia.CANAL_HAUTE][0]) == "2"
+    finally:
+        await pubsub.aclose()
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_ia_inactive_puis_rafale():
+    """IA à jour depuis 10 min : l'événement publié ensuite ne compte pas 10 min de retard."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    suivi = pipeline_ia.SuiviPipeline(rafraichissement=0)
+    await redis_client.set(pipeline_ia.CLE_PUBLIES, 100)
+    await redis_client.hset(pipeline_ia.CLE_ETAT, mapping={"traites": 100, "dernier_publie_a": time.time() - 600})
+    try:
+        await pipeline_ia.publier_donnee(Donnee(user_id="u1", frequence_cardiaque=70))
+        etat = await suivi.etat()
+        assert etat.en_attente == 1 and etat.retard_s < 5
+        assert await suivi.refuser(pipeline_ia.SourceDonnee.IMPORT_FICHIER) is None
+        assert await suivi.refuser(pipeline_ia.SourceDonnee.SAISIE_MANUELLE) is None
+
+        # Les publications suivantes ne repoussent pas le début de l'attente
+        debut = await redis_client.hget(pipeline_ia.CLE_ETAT, "debut_attente")
+        await pipeline_ia.publier_donnee(Donnee(user_id="u1", frequence_cardiaque=71))
+        assert await redis_client.hget(pipeline_ia.CLE_ETAT, "debut_attente") == debut
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_retard_de_la_voie_haute():
+    """Voie normale à jour, voie haute en retard : le retard global est celui de la voie haute."""
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    suivi = pipeline_ia.SuiviPipeline(rafraichissement=0)
+    publies_haute, etat_haute = pipeline_ia.CLES_VOIES[pipeline_ia.CANAL_HAUTE]
+    await redis_client.set(pipeline_ia.CLE_PUBLIES, 100)
+    await redis_client.hset(pipeline_ia.CLE_ETAT, mapping={"traites": 100, "dernier_publie_a": time.time() - 1})
+    await redis_client.set(publies_haute, 5)
+    await redis_client.hset(etat_haute, mapping={"traites": 3, "dernier_publie_a": time.time() - 20})
+    try:
+        etat = await suivi.etat()
+        assert etat.en_attente == 2 and etat.retard_s >= 20
+        assert etat.voies[pipeline_ia.CANAL].en_attente == 0
+        assert etat.voies[pipeline_ia.CANAL_HAUTE].retard_s >= 20
+    finally:
+        ressources.definir_redis(None)
@@ -0,0 +1,104 @@
+"""Tests du service d'assignation patient ↔ médecin ($addToSet / $pull)."""
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.services.assignation import assigner, desassigner
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+async def _utilisateur(nom: str, role: Role) -> Utilisateur:
+    user = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH, role=role)
+    await user.insert()
+    return user
+
+
+@pytest.mark.asyncio
+async def test_assignations_concurrentes_sans_perte():
+    """Des assignations simultanées au même médecin sont toutes conservées."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    medecin = await _utilisateur("doc", Role.medecin)
+    patients = [await _utilisateur(f"patient{i}", Role.patient) for i in range(10)]
+    medecin_id = str(medecin.id)
+
+    await asyncio.gather(*(assigner(str(p.id), medecin_id) for p in patients))
+    modifications = await assigner(str(patients[0].id), medecin_id)
+    assert not modifications.patient and not modifications.medecin
+
+    doc = await Utilisateur.get(medecin.id)
+    assert sorted(doc.patient_ids) == sorted(str(p.id) for p in patients)
+    assert (await Utilisateur.get(patients[3].id)).medecin_ids == [medecin_id]
+
+    modifications = await desassigner(str(patients[3].id), medecin_id)
+    assert modifications.patient and modifications.medecin
+    assert str(patients[3].id) not in (await Utilisateur.get(medecin.id)).patient_ids
+    assert (await Utilisateur.get(patients[3].id)).medecin_ids == []
+
+
+@pytest.mark.asyncio
+async def test_demande_assignation_en_double():
+    """Une seconde demande vers le même médecin est refusée (400)."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    medecin = await _utilisateur("doc", Role.medecin)
+    patient = await _utilisateur("patient", Role.patient)
+    token = creer_jwt({"sub": str(patient.id), "role": patient.role, "username": patient.username})
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            entetes = {"Authorization": f"Bearer {token}"}
+            corps = {"medecin_id": str(medecin.id)}
+            resp = await client.post("/assignation/demander-assignation", json=corps, headers=entetes)
+            assert resp.status_code == 200
+            resp = await client.post("/assignation/demander-assignation", json=corps, headers=entetes)
+            assert resp.status_code == 400
+
+    assert (await Utilisateur.get(medecin.id)).patient_ids == [str(patient.id)]
+
+
+@pytest.mark.asyncio
+async def test_mise_a_jour_admin_sans_ecraser_les_liens():
+    """PATCH utilisateur / changement de rôle : $set des champs modifiés, liens et compteur préservés."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    admin = await _utilisateur("admin", Role.admin)
+    medecin = await _utilisateur("doc", Role.medecin)
+    patient = await _utilisateur("patient", Role.patient)
+    # Document lu avant une assignation concurrente
+    perime = await Utilisateur.get(medecin.id)
+    await assigner(str(patient.id), str(medecin.id))
+    lire = Utilisateur.get
+
+    async def lire_perime(identifiant, *args, **kwargs):
+        if str(identifiant) == str(medecin.id):
+            return perime.model_copy(deep=True)
+        return await lire(identifiant, *args, **kwargs)
+
+    token = creer_jwt({"sub": str(admin.id), "role": admin.role, "username": admin.username})
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            entetes = {"Authorization": f"Bearer {token}"}
+            with patch.object(Utilisateur, "get", side_effect=lire_perime):
+                resp = await client.patch(f"/users/{medecin.id}", json={"username": "docteur"}, headers=entetes)
+                assert resp.status_code == 200
+                resp = await client.patch(f"/users/{medecin.id}/role", json={"role": "medecin"}, headers=entetes)
+                assert resp.status_code == 200
+
+    doc = await Utilisateur.get(medecin.id)
+    assert doc.username == "docteur"
+    assert doc.patient_ids == [str(patient.id)] and doc.nb_patients == 1
@@ -44,6 +44,8 @@ async def test_inscription_et_connexion():
             resp = await client.post("/auth/register", json=payload_register)
             assert resp.status_code == 201
             assert resp.json()["access_token"]
+            # Jeton de rafraîchissement dès l'inscription (jetons d'accès courts)
+            assert resp.json()["refresh_token"]
 
             # Connexion via nom d'utilisateur
             payload_login_username = {
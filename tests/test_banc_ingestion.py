@@ -0,0 +1,23 @@
+"""Exécution réduite du banc d'essai ingestion → alerte (pile en processus)."""
+
+import json
+
+from benchmarks import ingestion_alertes
+
+
+def test_banc_ingestion_alertes(tmp_path):
+    """Chaque mesure anormale produit une alerte reçue par les notifications."""
+    sortie = tmp_path / "resultats.json"
+    assert ingestion_alertes.main([
+        "--medecins", "2", "--patients", "6", "--historique", "5", "--requetes", "30",
+        "--concurrence", "3", "--taux-anomalies", "0.5", "--iterations", "2", "--sortie", str(sortie),
+    ]) == 0
+
+    document = json.loads(sortie.read_text(encoding="utf-8"))
+    assert document["moteurs"] == {"mongo": "mongomock", "redis": "fakeredis"}
+    resultats = document["resultats"]
+    assert resultats["post_data"]["erreurs"] == 0
+    assert resultats["latence_alerte"]["attendues"] > 0
+    assert resultats["latence_alerte"]["recues"] == resultats["latence_alerte"]["attendues"]
+    for chemin, mesure in resultats["tableaux_de_bord"].items():
+        assert mesure["statuts"] == {"200": 2}, chemin
@@ -0,0 +1,137 @@
+"""Tests des réponses conditionnelles (ETag par compteurs de version)."""
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Alerte, Department, Device, Donnee, Recommandation, Utilisateur  # type: ignore
+from backend.ressources import ressources
+from backend.utils.cache_http import incrementer_versions
+
+
+async def _inscrire(client: AsyncClient, nom: str) -> dict:
+    resp = await client.post(
+        "/auth/register",
+        json={"email": f"{nom}@example.com", "username": nom, "mot_de_passe": "pass123"},
+    )
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_etag_suit_les_ecritures():
+    """304 tant que rien n'est écrit, 200 après une écriture de la bonne portée."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Alerte, Department, Device, Donnee, Recommandation, Utilisateur])
+    ressources.definir_redis(fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                headers = await _inscrire(client, "etag_a")
+                autre = await _inscrire(client, "etag_b")
+                patient = await Utilisateur.find_one({"username": "etag_a"})
+
+                resp = await client.get("/alerts", headers=headers)
+                etag = resp.headers["etag"]
+                assert resp.headers["cache-control"] == "private, no-cache"
+
+                resp = await client.get("/alerts", headers={**headers, "If-None-Match": etag})
+                assert resp.status_code == 304
+
+                # Écriture pour un autre utilisateur : l'ETag reste valide
+                await incrementer_versions("alertes", "quelqu_un_d_autre")
+                resp = await client.get("/alerts", headers={**headers, "If-None-Match": etag})
+                assert resp.status_code == 304
+                # Même ressource, autre identité : pas de réutilisation de l'ETag
+                resp = await client.get("/alerts", headers={**autre, "If-None-Match": etag})
+                assert resp.status_code == 200
+
+                # Écriture (côté service IA) pour ce patient
+                await Alerte(user_id=str(patient.id), message="Hypoxie", niveau="critical").insert()
+                await incrementer_versions("alertes", str(patient.id))
+                resp = await client.get("/alerts", headers={**headers, "If-None-Match": etag})
+                assert resp.status_code == 200
+                assert len(resp.json()) == 1
+
+                # Statistiques : invalidées par l'ajout d'une donnée
+                resp = await client.get("/stats", headers=headers)
+                assert "max-age" in resp.headers["cache-control"]
+                etag_stats = resp.headers["etag"]
+                await client.post(
+                    "/data",
+                    json={"frequence_cardiaque": 70, "taux_oxygene": 98, "date": "2025-07-07T00:00:00"},
+                    headers=headers,
+                )
+                resp = await client.get("/stats", headers={**headers, "If-None-Match": etag_stats})
+                assert resp.status_code == 200
+                assert resp.json()["total_donnees"] == 1
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_sans_redis_pas_d_etag():
+    """Redis indisponible : réponse complète, sans ETag (compteurs non partagés)."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Alerte, Department, Device, Donnee, Recommandation, Utilisateur])
+    ressources.signaler_echec_redis(RuntimeError("test sans Redis"))
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                headers = await _inscrire(client, "sans_redis")
+                resp = await client.get("/departments/", headers={**headers, "If-None-Match": "*"})
+                assert resp.status_code == 200
+                assert "etag" not in resp.headers
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_increment_manque_pendant_une_panne():
+    """Écriture pendant une panne Redis : l'ancien ETag n'obtient pas de 304 au retour de Redis."""
+    from backend.utils.cache_http import differes
+
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Alerte, Department, Device, Donnee, Recommandation, Utilisateur])
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                headers = await _inscrire(client, "etag_panne")
+                patient = await Utilisateur.find_one({"username": "etag_panne"})
+                etag = (await client.get("/alerts", headers=headers)).headers["etag"]
+
+                ressources.signaler_echec_redis(RuntimeError("redis hors service"))
+                await Alerte(user_id=str(patient.id), message="Hypoxie", niveau="critical").insert()
+                await incrementer_versions("alertes", str(patient.id))
+                assert differes
+                # Reprise tenue par le gestionnaire de ressources (annulée à l'arrêt)
+                assert differes._reprise in ressources._taches
+
+                # Redis revenu : l'incrément manqué est rejoué avant de comparer l'ETag
+                ressources.definir_redis(redis_client)
+                resp = await client.get("/alerts", headers={**headers, "If-None-Match": etag})
+                assert resp.status_code == 200
+                assert len(resp.json()) == 1
+                assert not differes
+                resp = await client.get("/alerts", headers={**headers, "If-None-Match": resp.headers["etag"]})
+                assert resp.status_code == 304
+    finally:
+        ressources.definir_redis(None)
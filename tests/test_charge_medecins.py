@@ -0,0 +1,74 @@
+"""Tests de l'attribution automatique au médecin le moins chargé."""
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from backend import settings
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.services.assignation import assigner, desassigner
+from backend.services.charge_medecins import initialiser_charges, medecin_le_moins_charge
+from backend.utils.auth import hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+async def _utilisateur(nom: str, role: Role, **champs) -> Utilisateur:
+    user = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH, role=role, **champs)
+    await user.insert()
+    return user
+
+
+async def _init():
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+
+
+@pytest.mark.asyncio
+async def test_choix_du_moins_charge(monkeypatch):
+    """Le compteur suit les assignations ; plafond et poids des critiques respectés."""
+    await _init()
+    doc_a = await _utilisateur("doc_a", Role.medecin, department_id="cardio")
+    doc_b = await _utilisateur("doc_b", Role.medecin, department_id="cardio")
+    await _utilisateur("doc_c", Role.medecin, department_id="neuro")
+    patients = [await _utilisateur(f"p{i}", Role.patient) for i in range(3)]
+
+    await assigner(str(patients[0].id), str(doc_a.id))
+    await assigner(str(patients[1].id), str(doc_a.id))
+    await assigner(str(patients[1].id), str(doc_a.id))  # idempotent : pas de double comptage
+    await assigner(str(patients[2].id), str(doc_b.id))
+    assert (await Utilisateur.get(doc_a.id)).nb_patients == 2
+
+    choisi = await medecin_le_moins_charge("cardio")
+    assert choisi.id == str(doc_b.id) and choisi.nb_patients == 1
+
+    # Alertes critiques non vues chez le patient de doc_b : doc_a redevient prioritaire
+    monkeypatch.setattr(settings, "ATTRIBUTION_POIDS_CRITIQUES", 2.0)
+    for _ in range(2):
+        await Alerte(user_id=str(patients[2].id), message="x", niveau="haut", priorite_medicale="critique").insert()
+    assert (await medecin_le_moins_charge("cardio")).id == str(doc_a.id)
+    monkeypatch.setattr(settings, "ATTRIBUTION_POIDS_CRITIQUES", 0.0)
+
+    await desassigner(str(patients[0].id), str(doc_a.id))
+    await desassigner(str(patients[1].id), str(doc_a.id))
+    assert (await Utilisateur.get(doc_a.id)).nb_patients == 0
+
+    monkeypatch.setattr(settings, "ATTRIBUTION_CAPACITE_MAX", 1)
+    assert (await medecin_le_moins_charge("cardio")).id == str(doc_a.id)
+    await assigner(str(patients[0].id), str(doc_a.id))
+    assert await medecin_le_moins_charge("cardio") is None
+
+
+@pytest.mark.asyncio
+async def test_initialisation_des_compteurs():
+    """Les médecins antérieurs au compteur reçoivent nb_patients = len(patient_ids)."""
+    await _init()
+    await Utilisateur.get_motor_collection().insert_one({
+        "email": "ancien@example.com", "username": "ancien", "mot_de_passe_hache": HASH,
+        "role": "medecin", "department_id": "cardio", "is_active": True, "patient_ids": ["a", "b"],
+    })
+    assert await initialiser_charges() == 1
+    doc = await Utilisateur.get_motor_collection().find_one({"username": "ancien"})
+    assert doc["nb_patients"] == 2
+    assert await initialiser_charges() == 0
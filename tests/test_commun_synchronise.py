@@ -0,0 +1,27 @@
+"""Les modules `services/commun` et `backend/utils` gardent leurs parties partagées identiques."""
+
+import importlib
+import inspect
+
+import pytest
+
+from benchmarks import pile  # noqa: F401  (chemins des services)
+
+PARTAGES = [
+    ("instrumentation", ["_documents_renvoyes", "exposition"]),
+    ("surveillance_boucle", ["_Metriques", "_metriques", "SurveillantBoucle"]),
+    ("profilage", ["ProfilageEnCours", "ProfilageIndisponible", "_libelle", "_pile", "_replier", "_echantillonner_mur",
+                   "_echantillonner_cpu", "profiler", "SuiviMemoire"]),
+    ("tracage", ["configurer", "arreter", "_traceur", "injecter", "extraire", "EcouteurTracesMongo"]),
+]
+
+
+@pytest.mark.parametrize("module,noms", PARTAGES, ids=[module for module, _ in PARTAGES])
+def test_parties_partagees_identiques(module, noms):
+    """Même source pour chaque fonction/classe partagée : toute correction s'applique des deux côtés."""
+    backend = importlib.import_module(f"backend.utils.{module}")
+    commun = importlib.import_module(f"commun.{module}")
+    for nom in noms:
+        assert inspect.getsource(getattr(backend, nom)) == inspect.getsource(getattr(commun, nom)), (
+            f"{nom} diffère entre backend/utils/{module}.py et services/commun/{module}.py"
+        )
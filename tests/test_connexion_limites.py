@@ -0,0 +1,87 @@
+"""Tests du point de connexion : limitation de débit, cache négatif, clés de connexion."""
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.ressources import ressources
+from backend.services import connexion
+from backend.utils.auth import hacher_mot_de_passe
+
+
+@pytest.mark.asyncio
+async def test_limitation_et_cache_negatif(monkeypatch):
+    """Échecs répétés → 429 ; identifiant inconnu mémorisé puis oublié à l'inscription."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    monkeypatch.setattr(connexion.limiteur_identifiant, "limite", 3)
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post(
+                    "/auth/register",
+                    json={"email": "Cible@Example.com", "username": "cible", "mot_de_passe": "pass123"},
+                )
+                # Email normalisé : la casse et les espaces n'empêchent pas la connexion
+                resp = await client.post(
+                    "/auth/login", json={"identifiant": " cible@example.com ", "mot_de_passe": "pass123"}
+                )
+                assert resp.status_code == 200
+
+                for _ in range(3):
+                    resp = await client.post("/auth/login", json={"identifiant": "cible", "mot_de_passe": "faux"})
+                    assert resp.status_code == 401
+                resp = await client.post("/auth/login", json={"identifiant": "cible", "mot_de_passe": "pass123"})
+                assert resp.status_code == 429
+                assert int(resp.headers["retry-after"]) >= 1
+
+                # Identifiant inconnu : 401, puis mémorisé dans le cache négatif
+                resp = await client.post("/auth/login", json={"identifiant": "fantome", "mot_de_passe": "x"})
+                assert resp.status_code == 401
+                assert await redis_client.exists(connexion.CLE_INCONNU.format("fantome"))
+
+                await client.post(
+                    "/auth/register",
+                    json={"email": "fantome@example.com", "username": "fantome", "mot_de_passe": "pass123"},
+                )
+                assert not await redis_client.exists(connexion.CLE_INCONNU.format("fantome"))
+                resp = await client.post("/auth/login", json={"identifiant": "fantome", "mot_de_passe": "pass123"})
+                assert resp.status_code == 200
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_compte_ancien_sans_login_keys():
+    """Un compte antérieur aux clés de connexion se connecte et est complété."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    await Utilisateur.get_motor_collection().insert_one({
+        "email": "ancien@example.com",
+        "username": "ancien_compte",
+        "mot_de_passe_hache": hacher_mot_de_passe("pass123"),
+        "role": "patient",
+    })
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/auth/login", json={"identifiant": "ancien_compte", "mot_de_passe": "pass123"})
+            assert resp.status_code == 200
+
+    doc = await Utilisateur.get_motor_collection().find_one({"username": "ancien_compte"})
+    assert doc["login_keys"] == ["ancien@example.com", "ancien_compte"]
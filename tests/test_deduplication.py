@@ -0,0 +1,137 @@
+"""Tests de la déduplication des mesures (Idempotency-Key, appareil + date)."""
+
+from datetime import datetime
+
+import pytest
+import fakeredis.aioredis
+from bson import ObjectId
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.ressources import ressources
+from backend.services import migrations, taches  # noqa: F401  (enregistre les tâches)
+from backend.services.deduplication import preparer_index_mesures
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+DATE = datetime(2025, 3, 1, 8, 30)
+
+
+async def _contexte(nom: str):
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {"Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': nom})}"}
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    return mock_client, db, patient, entetes, redis_client
+
+
+def _mesure(**champs) -> dict:
+    return {"frequence_cardiaque": 80, "taux_oxygene": 97, "date": DATE.isoformat(), **champs}
+
+
+@pytest.mark.asyncio
+async def test_renvois_rejoues_depuis_le_cache():
+    """Même clé, ou même appareil et même date : une seule insertion, réponse d'origine rejouée."""
+    mock_client, _, patient, entetes, _ = await _contexte("dedup_cache")
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                cle = {**entetes, "Idempotency-Key": "passerelle-1:42"}
+                premiere = await client.post("/data", json=_mesure(), headers=cle)
+                renvoi = await client.post("/data", json=_mesure(), headers=cle)
+                appareil = await client.post("/data", json=_mesure(device_id="bracelet-7"), headers=entetes)
+                renvoi_appareil = await client.post("/data", json=_mesure(device_id="bracelet-7"), headers=entetes)
+                # Saisie manuelle sans clé : jamais dédupliquée
+                manuelles = [await client.post("/data", json=_mesure(), headers=entetes) for _ in range(2)]
+
+        assert premiere.status_code == 201 and "idempotent-replayed" not in premiere.headers
+        assert renvoi.status_code == 200 and renvoi.headers["idempotent-replayed"] == "true"
+        assert renvoi.json()["id"] == premiere.json()["id"]
+        assert renvoi_appareil.status_code == 200 and renvoi_appareil.json()["id"] == appareil.json()["id"]
+        assert [r.status_code for r in manuelles] == [201, 201]
+        assert await Donnee.find(Donnee.user_id == str(patient.id)).count() == 4
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_index_unique_apres_nettoyage_des_doublons():
+    """Le démarrage ne supprime rien ; après la tâche de nettoyage explicite, l'index renvoie l'original."""
+    mock_client, db, patient, entetes, redis_client = await _contexte("dedup_index")
+    user_id = str(patient.id)
+    ids = [ObjectId() for _ in range(3)]
+    await db["donnees"].insert_many([
+        {"_id": i, "user_id": user_id, "device_id": "bracelet-1", "date": DATE, "cle_idempotence": f"ancienne-{n}"}
+        for n, i in enumerate(ids)
+    ])
+    await db["alertes"].insert_many([{"user_id": user_id, "donnee_id": str(i), "message": "Tachycardie détectée"} for i in ids])
+    try:
+        await preparer_index_mesures(db)
+        assert await db["donnees"].count_documents({}) == 3
+        assert await db["alertes"].count_documents({}) == 3
+        index = set(await db["donnees"].index_information())
+        assert "cle_idempotence_unique" in index and "mesure_appareil_unique" not in index
+
+        await taches.executer(db, "donnees_doublons")
+        await preparer_index_mesures(db)
+        assert [d["_id"] async for d in db["donnees"].find({})] == [ids[0]]
+        assert [a["donnee_id"] async for a in db["alertes"].find({})] == [str(ids[0])]
+        assert {"mesure_appareil_unique", "cle_idempotence_unique"} <= set(await db["donnees"].index_information())
+
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                cle = {**entetes, "Idempotency-Key": "passerelle-2:1"}
+                premiere = await client.post("/data", json=_mesure(device_id="bracelet-2"), headers=cle)
+                await redis_client.flushall()
+                renvoi = await client.post("/data", json=_mesure(device_id="bracelet-2"), headers=cle)
+                await redis_client.flushall()
+                ancienne = await client.post(
+                    "/data", json=_mesure(device_id="bracelet-1"), headers={**entetes, "Idempotency-Key": "nouvelle"},
+                )
+        assert premiere.status_code == 201
+        assert renvoi.status_code == 200 and renvoi.json()["id"] == premiere.json()["id"]
+        assert ancienne.status_code == 200 and ancienne.json()["id"] == str(ids[0])
+        assert await db["donnees"].count_documents({}) == 2
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_appareil_d_un_autre_patient_en_conflit():
+    """Le couple (appareil, date) d'un autre patient n'est jamais rejoué : 409, sans fuite de sa mesure."""
+    mock_client, db, patient, entetes, redis_client = await _contexte("dedup_proprietaire")
+    autre = Utilisateur(email="dedup_autre@example.com", username="dedup_autre", mot_de_passe_hache=HASH, role=Role.patient)
+    await autre.insert()
+    entetes_autre = {"Authorization": f"Bearer {creer_jwt({'sub': str(autre.id), 'role': autre.role, 'username': 'dedup_autre'})}"}
+    try:
+        await preparer_index_mesures(db)
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                premiere = await client.post("/data", json=_mesure(device_id="bracelet-9", taux_oxygene=85), headers=entetes)
+                # Réponse du premier patient encore en cache, puis expirée
+                intrus = await client.post("/data", json=_mesure(device_id="bracelet-9"), headers=entetes_autre)
+                await redis_client.flushall()
+                intrus_hors_cache = await client.post("/data", json=_mesure(device_id="bracelet-9"), headers=entetes_autre)
+
+        assert premiere.status_code == 201
+        for reponse in (intrus, intrus_hors_cache):
+            assert reponse.status_code == 409
+            assert "idempotent-replayed" not in reponse.headers
+            assert str(patient.id) not in reponse.text
+        assert await db["donnees"].count_documents({"device_id": "bracelet-9"}) == 1
+    finally:
+        ressources.definir_redis(None)
@@ -0,0 +1,93 @@
+"""Tests de la file d'orientations par département (ordre, prise en charge, métriques)."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur, Department, Referral  # type: ignore
+from backend.models.utilisateur import Role
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+def _entete(user: Utilisateur) -> dict:
+    token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_file_par_priorite_et_prise_en_charge():
+    """Ordre priorité/ancienneté, prises concurrentes distinctes, 409 sur orientation détenue."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(
+        database=mock_client["sante_test"],
+        document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur, Department, Referral],
+    )
+    departement = Department(name="Cardiologie", code="CARDIO")
+    await departement.insert()
+    dept_id = str(departement.id)
+    docs = []
+    for nom in ("doc_a", "doc_b"):
+        doc = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH,
+                          role=Role.medecin, department_id=dept_id)
+        await doc.insert()
+        docs.append(doc)
+    debut = datetime.utcnow() - timedelta(hours=1)
+    for i, (prio, dept) in enumerate([(1, dept_id), (3, dept_id), (1, dept_id), (2, "autre")]):
+        patient = Utilisateur(email=f"p{i}@example.com", username=f"patient{i}", mot_de_passe_hache=HASH,
+                              role=Role.patient)
+        await patient.insert()
+        await Referral(patient_id=str(patient.id), proposed_department_id=dept, priorite=prio,
+                       created_at=debut + timedelta(minutes=i)).insert()
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.get("/referrals/queue", headers=_entete(docs[0]))
+            assert resp.status_code == 200
+            file = resp.json()
+            assert [r["priorite"] for r in file] == [3, 1, 1]
+            assert file[1]["created_at"] < file[2]["created_at"]
+            assert file[0]["patient_name"] == "patient1" and file[0]["department_name"] == "Cardiologie"
+
+            reponses = await asyncio.gather(
+                client.post("/referrals/queue/claim", headers=_entete(docs[0])),
+                client.post("/referrals/queue/claim", headers=_entete(docs[1])),
+            )
+            assert [r.status_code for r in reponses] == [200, 200]
+            prises = {r.json()["id"] for r in reponses}
+            assert len(prises) == 2
+            assert file[0]["id"] in prises
+
+            detenue = next(r.json() for r in reponses if r.json()["claimed_by"] == str(docs[0].id))
+            resp = await client.post(f"/referrals/{detenue['id']}/claim", headers=_entete(docs[1]))
+            assert resp.status_code == 409
+            resp = await client.patch(f"/referrals/{detenue['id']}", json={"status": "rejected"}, headers=_entete(docs[1]))
+            assert resp.status_code == 409
+
+            resp = await client.get("/referrals/queue/metrics", headers=_entete(docs[0]))
+            assert resp.status_code == 200
+            (metriques,) = resp.json()
+            assert metriques["en_attente"] == 1 and metriques["prises_en_charge"] == 2
+            assert 3400 <= metriques["attente_max_s"] < 3600  # restante : créée à +2 min
+
+            # Orientation libre traitée par deux médecins à la fois : un seul traitement
+            libre = next(r for r in file if r["id"] not in prises)
+            reponses = await asyncio.gather(
+                client.patch(f"/referrals/{libre['id']}", json={"status": "rejected"}, headers=_entete(docs[0])),
+                client.patch(f"/referrals/{libre['id']}", json={"status": "accepted"}, headers=_entete(docs[1])),
+            )
+            assert sorted(r.status_code for r in reponses) == [200, 409]
+            gagnante = next(r.json() for r in reponses if r.status_code == 200)
+            assert (await Referral.get(libre["id"])).status == gagnante["status"]
+            resp = await client.patch(f"/referrals/{libre['id']}", json={"status": "accepted"}, headers=_entete(docs[0]))
+            assert resp.status_code == 409
+
@@ -0,0 +1,93 @@
+"""Tests de la boîte de réception médecin (/medecin/inbox)."""
+
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from fakeredis.aioredis import FakeRedis
+from unittest.mock import patch
+
+from backend.db import MONGO_DB_NAME
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.ressources import ressources
+from backend.routers import medecin as routeur_medecin
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+from backend.utils.cache_http import incrementer_versions
+
+
+@pytest.mark.asyncio
+async def test_inbox_compteurs_top_n_et_etag():
+    """Compteurs par statut, top-N par catégorie, puis 304 sans agrégation tant que rien ne change."""
+    ressources.definir_redis(FakeRedis(decode_responses=True))
+    try:
+        await _scenario_inbox()
+    finally:
+        ressources.definir_redis(None)
+
+
+async def _scenario_inbox():
+    mock_client = AsyncMongoMockClient()
+    db = mock_client[MONGO_DB_NAME]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        medecin = Utilisateur(email="dr_inbox@example.com", username="dr_inbox",
+                              mot_de_passe_hache=hacher_mot_de_passe("pass123"), role=Role.medecin)
+        await medecin.insert()
+        patient = Utilisateur(email="pat_inbox@example.com", username="pat_inbox",
+                              mot_de_passe_hache=hacher_mot_de_passe("pass123"),
+                              medecin_ids=[str(medecin.id)])
+        await patient.insert()
+        # Alerte d'un patient non assigné : ne doit pas apparaître
+        await Alerte(user_id="autre", message="Hors périmètre", niveau="critical").insert()
+        for heure in range(3):
+            await Alerte(user_id=str(patient.id), message=f"Alerte {heure}", niveau="warning",
+                         date=datetime(2025, 7, 7, heure)).insert()
+        await Alerte(user_id=str(patient.id), message="Hypoxie", niveau="critical",
+                     priorite_medicale="critique", date=datetime(2025, 7, 7, 5)).insert()
+        await Alerte(user_id=str(patient.id), message="Ancienne", niveau="normal", statut="vue").insert()
+        await Recommandation(user_id=str(patient.id), titre="Hydratation").insert()
+
+        token = creer_jwt({"sub": str(medecin.id), "role": medecin.role, "username": medecin.username})
+        headers = {"Authorization": f"Bearer {token}"}
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.get("/medecin/inbox?limite=2", headers=headers)
+            assert resp.status_code == 200
+            corps = resp.json()
+            assert corps["patients"]["total"] == 1
+            assert corps["alertes"]["compteurs"] == {"nouvelle": 4, "vue": 1}
+            assert [a["message"] for a in corps["alertes"]["nouvelles"]] == ["Hypoxie", "Alerte 2"]
+            assert corps["alertes"]["nb_critiques"] == 1
+            assert corps["alertes"]["critiques"][0]["patient_nom"] == "pat_inbox"
+            assert corps["recommandations"]["nouvelles"][0]["titre"] == "Hydratation"
+
+            etag = resp.headers["etag"]
+            with patch.object(routeur_medecin, "_pipeline_inbox", wraps=routeur_medecin._pipeline_inbox) as pipeline:
+                resp = await client.get("/medecin/inbox?limite=2", headers={**headers, "If-None-Match": etag})
+            assert resp.status_code == 304
+            assert pipeline.call_count == 0
+
+            await Recommandation(user_id=str(patient.id), titre="Marche").insert()
+            await incrementer_versions("recommandations", str(patient.id))
+            resp = await client.get("/medecin/inbox?limite=2", headers={**headers, "If-None-Match": etag})
+            assert resp.status_code == 200
+            assert resp.json()["recommandations"]["compteurs"] == {"nouvelle": 2}
+            etag = resp.headers["etag"]
+
+            # Alerte d'un patient non assigné : l'ETag reste valide
+            await incrementer_versions("alertes", "autre")
+            resp = await client.get("/medecin/inbox?limite=2", headers={**headers, "If-None-Match": etag})
+            assert resp.status_code == 304
+
+            await Alerte(user_id=str(patient.id), message="Bradycardie", niveau="warning").insert()
+            await incrementer_versions("alertes", str(patient.id))
+            resp = await client.get("/medecin/inbox?limite=2", headers={**headers, "If-None-Match": etag})
+            assert resp.status_code == 200
+            assert resp.json()["alertes"]["compteurs"]["nouvelle"] == 5
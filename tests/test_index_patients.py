@@ -0,0 +1,158 @@
+"""Tests de l'index médecin → patients (Redis et repli local).
+
+Vérifie que les tableaux de bord médecin et les contrôles d'accès suivent
+immédiatement les assignations et désassignations.
+"""
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.db import MONGO_DB_NAME
+from backend.models.utilisateur import Role
+from backend.ressources import ressources
+from backend.services.patients_medecin import CLE_PATIENTS, index_patients
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+
+async def _utilisateur(nom: str, role: Role) -> Utilisateur:
+    user = Utilisateur(
+        email=f"{nom}@example.com",
+        username=nom,
+        mot_de_passe_hache=hacher_mot_de_passe("pass123"),
+        role=role,
+    )
+    await user.insert()
+    return user
+
+
+def _entete(user: Utilisateur) -> dict:
+    token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("avec_redis", [True, False])
+async def test_index_suit_les_assignations(avec_redis):
+    """Assignation puis désassignation : listes et accès à jour sans délai."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client[MONGO_DB_NAME]  # les routes médecin lisent la base configurée
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True) if avec_redis else None
+    ressources.definir_redis(redis_client)
+    if not avec_redis:
+        ressources.signaler_echec_redis(RuntimeError("test sans Redis"))
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            medecin = await _utilisateur(f"dr_index_{avec_redis}", Role.medecin)
+            patient = await _utilisateur(f"pat_index_{avec_redis}", Role.patient)
+            admin = await _utilisateur(f"adm_index_{avec_redis}", Role.admin)
+            await Alerte(user_id=str(patient.id), message="Hypoxie", niveau="critical").insert()
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.get("/medecin/patients", headers=_entete(medecin))
+                assert resp.json() == []
+                resp = await client.get(f"/patients/{patient.id}/summary", headers=_entete(medecin))
+                assert resp.status_code == 403
+
+                resp = await client.post(
+                    "/assignation/accepter-patient",
+                    json={"patient_id": str(patient.id)},
+                    headers=_entete(medecin),
+                )
+                assert resp.status_code == 200
+
+                resp = await client.get("/medecin/patients", headers=_entete(medecin))
+                assert [p["username"] for p in resp.json()] == [patient.username]
+                resp = await client.get("/medecin/alertes", headers=_entete(medecin))
+                assert resp.json()[0]["patient_nom"] == patient.username
+                resp = await client.get(f"/patients/{patient.id}/summary", headers=_entete(medecin))
+                assert resp.status_code == 200
+                if avec_redis:
+                    assert await redis_client.hexists(CLE_PATIENTS.format(medecin.id), str(patient.id))
+
+                resp = await client.delete(
+                    f"/assignation/supprimer/{patient.id}/{medecin.id}", headers=_entete(admin)
+                )
+                assert resp.status_code == 200
+                assert not await index_patients.est_patient(str(medecin.id), str(patient.id))
+                resp = await client.get(f"/patients/{patient.id}/summary", headers=_entete(medecin))
+                assert resp.status_code == 403
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_invalidation_sans_redis_ne_laisse_pas_d_acces():
+    """Désassignation pendant une panne Redis : ni l'entrée Redis restée en place ni le LRU ne rouvrent l'accès."""
+    from backend.services.patients_medecin import IndexPatientsMedecin
+
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    medecin = await _utilisateur("dr_panne", Role.medecin)
+    patient = await _utilisateur("pat_panne", Role.patient)
+    patient.medecin_ids = [str(medecin.id)]
+    await patient.save()
+    autre_worker = IndexPatientsMedecin()
+
+    try:
+        assert await index_patients.est_patient(str(medecin.id), str(patient.id))
+        ressources.signaler_echec_redis(RuntimeError("redis hors service"))
+        assert await autre_worker.est_patient(str(medecin.id), str(patient.id))  # LRU local rempli
+
+        patient.medecin_ids = []
+        await patient.save()
+        await index_patients.invalider(str(medecin.id))
+        # L'entrée Redis n'a pas pu être supprimée
+        assert await redis_client.hexists(CLE_PATIENTS.format(medecin.id), str(patient.id))
+
+        assert not await autre_worker.est_patient(str(medecin.id), str(patient.id))
+        ressources.definir_redis(redis_client)
+        assert not await index_patients.est_patient(str(medecin.id), str(patient.id))
+        assert await index_patients.patients(str(medecin.id)) == {}
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_medecin_hors_borne_une_seule_lecture(monkeypatch):
+    """Au-delà de la borne : pas de cache, et la liste déjà lue n'est pas relue."""
+    from backend.services import patients_medecin
+    from backend.services.assignation import assigner
+
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client[MONGO_DB_NAME], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    monkeypatch.setattr(patients_medecin, "INDEX_PATIENTS_MAX_PAR_MEDECIN", 1)
+    try:
+        medecin = await _utilisateur("dr_borne", Role.medecin)
+        for nom in ("pat_borne1", "pat_borne2"):
+            await assigner(str((await _utilisateur(nom, Role.patient)).id), str(medecin.id))
+
+        collection = Utilisateur.get_motor_collection()
+        lectures = []
+        chercher = collection.find
+
+        def compter(filtre, *args, **kwargs):
+            if filtre.get("medecin_ids") == str(medecin.id):
+                lectures.append(filtre)
+            return chercher(filtre, *args, **kwargs)
+
+        monkeypatch.setattr(collection, "find", compter)
+        assert len(await index_patients.patients(str(medecin.id))) == 2
+        assert len(lectures) == 1
+        assert not await redis_client.exists(CLE_PATIENTS.format(str(medecin.id)))
+    finally:
+        ressources.definir_redis(None)
@@ -0,0 +1,216 @@
+"""Tests de l'ingestion asynchrone (202, flux Redis, écriture différée par lots)."""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.ressources import ressources
+from backend.services import ingestion
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+def _mesure(fc: float = 72) -> dict:
+    return {"frequence_cardiaque": fc, "taux_oxygene": 97, "pression_arterielle": "120/80",
+            "date": datetime.utcnow().isoformat()}
+
+
+async def _evenements(pubsub) -> list:
+    recus = []
+    for _ in range(20):
+        message = await pubsub.get_message(timeout=0.01)
+        if message and message["type"] == "message":
+            recus.append(json.loads(message["data"]))
+    return recus
+
+
+@pytest.mark.asyncio
+async def test_ingestion_202_puis_ecriture_par_lots(monkeypatch):
+    """Reçu 202 immédiat, écriture par lots, reprise sans doublon avec republication de l'événement."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="ingest@example.com", username="ingest", mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {"Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': patient.username})}"}
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    pubsub = redis_client.pubsub()
+    await pubsub.subscribe("nouvelle_donnee")
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                recus = []
+                for fc in (70, 71, 72, 73, 74):
+                    reponse = await client.post("/data", json=_mesure(fc), headers={**entetes, "Prefer": "respond-async"})
+                    assert reponse.status_code == 202
+                    assert reponse.headers["preference-applied"] == "respond-async"
+                    recus.append(reponse.json()["id"])
+                # Sans l'en-tête : écriture synchrone habituelle
+                synchrone = await client.post("/data", json=_mesure(), headers=entetes)
+                assert synchrone.status_code == 201
+
+        assert await Donnee.find(Donnee.user_id == str(patient.id)).count() == 1
+        assert await redis_client.xlen(ingestion.INGESTION_FLUX) == 5
+
+        # Lot borné en taille, puis le reste
+        videur = ingestion.VideurIngestion(taille_lot=3, fenetre_ms=20, consommateur="test")
+        assert await videur.vider_lot() == 3
+        assert await videur.vider_lot() == 2
+        assert await videur.vider_lot() == 0
+        assert await redis_client.xlen(ingestion.INGESTION_FLUX) == 0
+        for recu in recus:
+            doc = await Donnee.get(recu)
+            assert doc is not None and doc.user_id == str(patient.id)
+        evenements = [e["donnee_id"] for e in await _evenements(pubsub)]
+        assert sorted(evenements) == sorted(recus + [synchrone.json()["id"]])
+
+        # Reprise : une entrée lue mais non acquittée (worker tué) n'est pas réécrite ; son
+        # événement, peut-être perdu avec le worker, est republié
+        doc = await Donnee.get(recus[0])
+        await redis_client.xadd(ingestion.INGESTION_FLUX, {"donnee": doc.model_dump_json()})
+        await redis_client.xreadgroup(ingestion.INGESTION_GROUPE, "arrete", {ingestion.INGESTION_FLUX: ">"})
+        monkeypatch.setattr(ingestion, "INGESTION_REPRISE_MS", 0)
+        assert await videur.vider_lot() == 0
+        assert await redis_client.xpending(ingestion.INGESTION_FLUX, ingestion.INGESTION_GROUPE) == {
+            "pending": 0, "min": None, "max": None, "consumers": [],
+        }
+        assert await Donnee.find(Donnee.user_id == str(patient.id)).count() == 6
+        assert [e["donnee_id"] for e in await _evenements(pubsub)] == [recus[0]]
+    finally:
+        await pubsub.aclose()
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_repli_synchrone_sans_redis(monkeypatch):
+    """Redis indisponible : la mesure est écrite directement (201)."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="repli@example.com", username="repli", mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {"Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': patient.username})}"}
+    monkeypatch.setattr(ingestion, "INGESTION_ASYNCHRONE", True)
+    monkeypatch.setattr(ressources, "redis", lambda: None)
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            reponse = await client.post("/data", json=_mesure(), headers=entetes)
+
+    assert reponse.status_code == 201
+    assert await Donnee.get(reponse.json()["id"]) is not None
+
+
+@pytest.mark.asyncio
+async def test_flux_plein_repli_synchrone(monkeypatch):
+    """Flux plein : écriture synchrone (201), aucune entrée acceptée n'est tronquée."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="plein@example.com", username="plein", mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {
+        "Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': patient.username})}",
+        "Prefer": "respond-async",
+    }
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    monkeypatch.setattr(ingestion, "INGESTION_FLUX_MAX", 2)
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                codes = [
+                    (await client.post("/data", json=_mesure(fc), headers=entetes)).status_code
+                    for fc in (70, 71, 72)
+                ]
+
+        assert codes == [202, 202, 201]
+        assert await redis_client.xlen(ingestion.INGESTION_FLUX) == 2
+        videur = ingestion.VideurIngestion(fenetre_ms=20, consommateur="test")
+        assert await videur.vider_lot() == 2
+        assert await Donnee.find(Donnee.user_id == str(patient.id)).count() == 3
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_doublon_differe_et_arret_en_fin_de_lot():
+    """Reçu d'une mesure déjà enregistrée remplacé par l'original ; l'arrêt termine le lot en cours."""
+    from backend.services import deduplication
+
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="ingest_dup@example.com", username="ingest_dup", mot_de_passe_hache=HASH, role=Role.patient)
+    await patient.insert()
+    entetes = {
+        "Authorization": f"Bearer {creer_jwt({'sub': str(patient.id), 'role': patient.role, 'username': patient.username})}",
+        "Prefer": "respond-async",
+    }
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    await deduplication.preparer_index_mesures(db)
+    mesure = {**_mesure(), "device_id": "bracelet-3"}
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                original = await client.post("/data", json=mesure, headers={k: v for k, v in entetes.items() if k != "Prefer"})
+                # Cache expiré : le renvoi est accepté en 202, puis refusé par l'index au drainage
+                await redis_client.flushall()
+                recu = await client.post("/data", json=mesure, headers=entetes)
+                assert recu.status_code == 202
+
+                videur = ingestion.VideurIngestion(fenetre_ms=20, consommateur="test")
+                videur.demarrer()
+                for _ in range(100):
+                    if not await redis_client.xlen(ingestion.INGESTION_FLUX):
+                        break
+                    await asyncio.sleep(0.01)
+                await videur.arreter(delai=1)
+                assert videur._tache is None
+
+                renvoi = await client.post("/data", json=mesure, headers=entetes)
+
+        assert await db["donnees"].count_documents({"device_id": "bracelet-3"}) == 1
+        assert renvoi.status_code == 200 and renvoi.headers["idempotent-replayed"] == "true"
+        assert renvoi.json()["id"] == original.json()["id"] != recu.json()["id"]
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_arret_attend_le_lot_en_cours(monkeypatch):
+    """`arreter` laisse le lot en cours se terminer au lieu de l'annuler en pleine écriture."""
+    etapes = []
+    commence = asyncio.Event()
+
+    async def vider_lot(self):
+        etapes.append("debut")
+        commence.set()
+        await asyncio.sleep(0.05)
+        etapes.append("fin")
+        return 0
+
+    monkeypatch.setattr(ingestion.VideurIngestion, "vider_lot", vider_lot)
+    videur = ingestion.VideurIngestion()
+    videur.demarrer()
+    await commence.wait()
+    await videur.arreter(delai=1)
+    assert etapes == ["debut", "fin"]
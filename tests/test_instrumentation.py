@@ -0,0 +1,72 @@
+"""Tests de l'instrumentation : latence par gabarit de route et commandes MongoDB."""
+
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from prometheus_client import REGISTRY
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+from backend.utils.instrumentation import EcouteurCommandesMongo, _ContexteRequete, _requete
+
+
+def _valeur(nom: str, **etiquettes) -> float:
+    return REGISTRY.get_sample_value(nom, etiquettes) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_metriques_par_gabarit_de_route():
+    """Les URL concrètes sont regroupées sous le gabarit de la route."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    patient = Utilisateur(email="instr@example.com", username="instr", mot_de_passe_hache=hacher_mot_de_passe("pass123"), role=Role.patient)
+    await patient.insert()
+    token = creer_jwt({"sub": str(patient.id), "role": patient.role, "username": patient.username})
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        etiquettes = {"route": "/patients/{patient_id}/summary", "methode": "GET", "statut": "200"}
+        avant = _valeur("http_requetes_total", **etiquettes)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            for _ in range(2):
+                reponse = await client.get(f"/patients/{patient.id}/summary", headers={"Authorization": f"Bearer {token}"})
+                assert reponse.status_code == 200
+            await client.get("/nexiste/pas")
+            metriques = await client.get("/metrics")
+
+    assert metriques.status_code == 200
+    assert metriques.headers["content-type"].startswith("text/plain")
+    assert _valeur("http_requetes_total", **etiquettes) == avant + 2
+    assert 'route="/nexiste/pas"' not in metriques.text
+    assert 'route="inconnue"' in metriques.text
+    assert _valeur("http_requetes_en_cours", route="/patients/{patient_id}/summary", methode="GET") == 0
+
+
+def test_commandes_mongo_attribuees_a_la_route():
+    """Durée, nombre et documents renvoyés sont rattachés à la requête en cours."""
+    ecouteur = EcouteurCommandesMongo()
+    contexte = _ContexteRequete("/medecin/patients")
+    jeton = _requete.set(contexte)
+    etiquettes = {"route": "/medecin/patients", "commande": "find", "collection": "utilisateurs"}
+    avant = _valeur("mongo_documents_renvoyes_total", **etiquettes)
+    try:
+        for request_id in (1, 2, 3):
+            debut = SimpleNamespace(command_name="find", command={"find": "utilisateurs"}, connection_id=("h", 1), request_id=request_id)
+            ecouteur.started(debut)
+            ecouteur.succeeded(SimpleNamespace(
+                command_name="find", connection_id=("h", 1), request_id=request_id, duration_micros=1500,
+                reply={"cursor": {"firstBatch": [{}, {}], "id": 0}},
+            ))
+    finally:
+        _requete.reset(jeton)
+
+    assert contexte.commandes == 3
+    assert _valeur("mongo_documents_renvoyes_total", **etiquettes) == avant + 6
+    assert _valeur("mongo_duree_secondes_count", **etiquettes) >= 3
+    assert not ecouteur._collections
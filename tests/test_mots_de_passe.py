@@ -0,0 +1,56 @@
+"""Tests du service de mots de passe (bcrypt hors boucle asyncio, rehash à la connexion)."""
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from passlib.context import CryptContext
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.utils.auth import BCRYPT_ROUNDS, mots_de_passe
+
+
+@pytest.mark.asyncio
+async def test_hachage_ne_bloque_pas_la_boucle():
+    """La boucle continue de servir d'autres tâches pendant un hash bcrypt."""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    tache = asyncio.create_task(ticker())
+    hash_ = await mots_de_passe.hacher("motdepasse")
+    tache.cancel()
+
+    assert ticks > 5
+    assert await mots_de_passe.verifier("motdepasse", hash_)
+    assert not await mots_de_passe.verifier("autre", hash_)
+
+
+@pytest.mark.asyncio
+async def test_rehash_si_cout_obsolete():
+    """Un hash stocké avec un coût différent est recalculé à la connexion."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+
+    ancien_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("pass123")
+    await Utilisateur(email="ancien@example.com", username="ancien", mot_de_passe_hache=ancien_hash).insert()
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/auth/login", json={"identifiant": "ancien", "mot_de_passe": "pass123"})
+            assert resp.status_code == 200
+
+    user = await Utilisateur.find_one({"username": "ancien"})
+    assert user.mot_de_passe_hache != ancien_hash
+    assert user.mot_de_passe_hache.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
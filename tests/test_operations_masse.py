@@ -0,0 +1,126 @@
+"""Tests des opérations admin en masse (tâches de fond et progression)."""
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur, TacheAdmin  # type: ignore
+from backend.models.utilisateur import Role, StatutUtilisateur
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+async def _utilisateur(nom: str, role: Role, **champs) -> Utilisateur:
+    user = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH, role=role, **champs)
+    await user.insert()
+    return user
+
+
+async def _attendre(client: AsyncClient, entetes: dict, reponse) -> dict:
+    assert reponse.status_code == 202, reponse.text
+    tache_id = reponse.json()["tache_id"]
+    for _ in range(200):
+        etat = (await client.get(f"/admin/operations/{tache_id}", headers=entetes)).json()
+        if etat["statut"] in ("terminee", "echouee"):
+            return etat
+        await asyncio.sleep(0.02)
+    raise AssertionError("tâche non terminée")
+
+
+@pytest.mark.asyncio
+async def test_operations_en_masse():
+    """Approbation, assignation et import CSV : progression et erreurs par élément."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(
+        database=mock_client["sante_test"],
+        document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur, TacheAdmin],
+    )
+    admin = await _utilisateur("admin", Role.admin)
+    medecins = [await _utilisateur(f"doc{i}", Role.medecin, statut=StatutUtilisateur.en_attente) for i in range(3)]
+    patients = [await _utilisateur(f"pat{i}", Role.patient) for i in range(2)]
+    token = creer_jwt({"sub": str(admin.id), "role": admin.role, "username": admin.username})
+    entetes = {"Authorization": f"Bearer {token}"}
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            ids = [str(m.id) for m in medecins] + [str(patients[0].id), "pas-un-id"]
+            etat = await _attendre(client, entetes, await client.post(
+                "/admin/operations/medecins/approuver", json={"ids": ids}, headers=entetes))
+            assert etat["statut"] == "terminee"
+            assert (etat["total"], etat["traites"], etat["reussis"], etat["nb_erreurs"]) == (5, 5, 3, 2)
+            actifs = (await client.get("/admin/medecins-actifs", headers=entetes)).json()
+            assert len(actifs) == 3 and actifs[0]["nb_patients"] == 0
+
+            couples = [
+                {"patient_id": str(p.id), "medecin_id": str(medecins[0].id)} for p in patients
+            ] + [{"patient_id": str(medecins[1].id), "medecin_id": str(medecins[0].id)}]
+            etat = await _attendre(client, entetes, await client.post(
+                "/admin/operations/assignations", json={"assignations": couples * 2}, headers=entetes))
+            assert (etat["reussis"], etat["nb_erreurs"]) == (2, 1)
+            doc = await Utilisateur.get(medecins[0].id)
+            assert sorted(doc.patient_ids) == sorted(str(p.id) for p in patients)
+            assert doc.nb_patients == 2
+
+            csv = (
+                "email;username;mot_de_passe;role;department_id\n"
+                "nouveau@example.com;nouveau;secret123;patient;\n"
+                "pat0@example.com;autre;secret123;patient;\n"
+                "x@example.com;x;secret123;admin;\n"
+                "interne@example.com;interne;secret123;medecin;dep1\n"
+            )
+            etat = await _attendre(client, entetes, await client.post(
+                "/admin/operations/utilisateurs/import",
+                files={"fichier": ("comptes.csv", csv.encode(), "text/csv")}, headers=entetes))
+            assert (etat["traites"], etat["reussis"], etat["nb_erreurs"]) == (4, 2, 2)
+            assert {e["ligne"] for e in etat["erreurs"]} == {3, 4}
+            importe = await Utilisateur.find_one({"login_keys": "interne"})
+            assert importe.role == Role.medecin and importe.department_id == "dep1"
+
+            resp = await client.post(
+                "/admin/operations/utilisateurs/import",
+                files={"fichier": ("comptes.csv", b"email,username\n", "text/csv")}, headers=entetes)
+            assert resp.status_code == 400
+
+            resp = await client.get("/admin/operations", headers=entetes)
+            assert [t["type"] for t in resp.json()][:3] == ["importer_utilisateurs", "assigner_patients", "approuver_medecins"]
+
+
+@pytest.mark.asyncio
+async def test_transitions_de_statut_conditionnelles():
+    """Chaque transition n'écrit que le statut, et seulement depuis le statut attendu."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(
+        database=mock_client["sante_test"],
+        document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur, TacheAdmin],
+    )
+    admin = await _utilisateur("admin_statut", Role.admin)
+    medecin = await _utilisateur("doc_statut", Role.medecin, statut=StatutUtilisateur.en_attente)
+    token = creer_jwt({"sub": str(admin.id), "role": admin.role, "username": admin.username})
+    entetes = {"Authorization": f"Bearer {token}"}
+    # Écriture concurrente d'un autre champ, absente de l'instance chargée par la route
+    await Utilisateur.get_motor_collection().update_one({"_id": medecin.id}, {"$set": {"nb_patients": 7}})
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            resp = await client.patch(f"/admin/medecins/{medecin.id}/approuver", headers=entetes)
+            assert resp.status_code == 200
+            assert (await client.patch(f"/admin/medecins/{medecin.id}/rejeter", headers=entetes)).status_code == 404
+            assert (await client.patch(f"/admin/medecins/{medecin.id}/suspendre", headers=entetes)).status_code == 200
+            assert (await client.patch(f"/admin/medecins/{medecin.id}/suspendre", headers=entetes)).status_code == 404
+            assert (await client.patch(f"/admin/medecins/{medecin.id}/reactiver", headers=entetes)).status_code == 200
+            assert (await client.patch("/admin/medecins/pas-un-id/reactiver", headers=entetes)).status_code == 400
+
+    doc = await Utilisateur.get_motor_collection().find_one({"_id": medecin.id})
+    assert doc["statut"] == StatutUtilisateur.actif.value
+    assert doc["nb_patients"] == 7
+    assert doc["updated_at"] > medecin.updated_at
@@ -0,0 +1,30 @@
+"""Tests de l'unicité des orientations en attente."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from backend.services.orientations import annuler_doublons_en_attente
+
+
+@pytest.mark.asyncio
+async def test_annulation_des_doublons_en_attente():
+    """La plus ancienne orientation pending est conservée, les autres annulées."""
+    db = AsyncMongoMockClient()["sante_test"]
+    debut = datetime.utcnow()
+    await db["referrals"].insert_many([
+        {"patient_id": "p1", "proposed_department_id": "d1", "status": "pending", "created_at": debut + timedelta(seconds=i)}
+        for i in range(3)
+    ] + [
+        {"patient_id": "p1", "proposed_department_id": "d2", "status": "pending", "created_at": debut},
+        {"patient_id": "p2", "proposed_department_id": "d1", "status": "accepted", "created_at": debut},
+        {"patient_id": "p2", "proposed_department_id": "d1", "status": "accepted", "created_at": debut},
+    ])
+
+    assert await annuler_doublons_en_attente(db) == 2
+    restantes = await db["referrals"].find({"status": "pending"}).to_list(None)
+    assert len(restantes) == 2
+    conservee = next(r for r in restantes if r["proposed_department_id"] == "d1")
+    assert conservee["created_at"] == debut.replace(microsecond=debut.microsecond // 1000 * 1000)
+    assert await annuler_doublons_en_attente(db) == 0
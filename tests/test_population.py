@@ -0,0 +1,62 @@
+"""Tests du générateur de population synthétique (reproductibilité, graphe)."""
+
+from datetime import datetime
+
+import mongomock
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from backend.models import Utilisateur
+from backend.utils.auth import hacher_mot_de_passe
+from benchmarks.ingestion_alertes import population_existante
+from benchmarks.population import Parametres, comptes, donnees_patient, generer
+
+HASH = hacher_mot_de_passe("population")
+PARAMS = Parametres(departements=3, medecins=6, patients=40, jours=5, intervalle_min=30,
+                    taux_anomalies=0.5, fin=datetime(2026, 1, 1))
+
+
+def test_population_reproductible():
+    """Même graine : mêmes identifiants, mêmes séries, mêmes alertes."""
+    assert comptes(PARAMS, HASH) == comptes(PARAMS, HASH)
+    for index in (0, 17):
+        _, mesures_a, alertes_a = donnees_patient(PARAMS, index)
+        _, mesures_b, alertes_b = donnees_patient(PARAMS, index)
+        assert list(mesures_a) == list(mesures_b)
+        assert alertes_a == alertes_b
+
+
+def test_generation_par_lots():
+    """Graphe cohérent dans les deux sens et volumes attendus."""
+    db = mongomock.MongoClient()["sante_population"]
+    totaux = generer(db, PARAMS, HASH, taille_lot=100, rapport=lambda message: None)
+
+    assert totaux["donnees"] == PARAMS.patients * PARAMS.mesures_par_patient
+    assert db["donnees"].count_documents({}) == totaux["donnees"]
+    assert db["alertes"].count_documents({}) == totaux["alertes"] > 0
+    medecins = {str(m["_id"]): m for m in db["utilisateurs"].find({"role": "medecin"})}
+    for patient in db["utilisateurs"].find({"role": "patient"}):
+        assert 1 <= len(patient["medecin_ids"]) <= 2
+        for medecin_id in patient["medecin_ids"]:
+            assert str(patient["_id"]) in medecins[medecin_id]["patient_ids"]
+    assert sum(m["nb_patients"] for m in medecins.values()) >= PARAMS.patients
+    # Valeurs physiologiquement plausibles
+    for mesure in db["donnees"].find({}, {"frequence_cardiaque": 1, "taux_oxygene": 1}).limit(500):
+        assert 30 < mesure["frequence_cardiaque"] < 200
+        assert 70 < mesure["taux_oxygene"] <= 100
+
+
+@pytest.mark.asyncio
+async def test_banc_sur_population_existante():
+    """Le banc d'essai retrouve le médecin le plus chargé et ses patients."""
+    db = AsyncMongoMockClient()["sante_population"]
+    await init_beanie(database=db, document_models=[Utilisateur])
+    _, medecins, patients = comptes(PARAMS, HASH)
+    await db["utilisateurs"].insert_many(medecins + patients)
+
+    population = await population_existante(db, 5)
+    medecin = population["medecins"][0]
+    assert medecin.nb_patients == max(m["nb_patients"] for m in medecins)
+    assert len(population["patients"]) == 5
+    assert all(str(medecin.id) in p.medecin_ids for p in population["patients"])
@@ -0,0 +1,136 @@
+"""Tests de l'identité issue du jeton : révocation et jetons de rafraîchissement."""
+
+import pytest
+import fakeredis.aioredis
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role, StatutUtilisateur
+from backend.ressources import ressources
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+def _jeton(user: Utilisateur) -> dict:
+    token = creer_jwt({"sub": str(user.id), "role": user.role, "username": user.username})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_suspension_revoque_les_jetons():
+    """Un médecin suspendu perd l'accès aux routes lisant les claims du jeton."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    ressources.definir_redis(fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+    admin = Utilisateur(email="admin@example.com", username="admin", mot_de_passe_hache=HASH, role=Role.admin)
+    medecin = Utilisateur(
+        email="doc@example.com", username="doc", mot_de_passe_hache=HASH,
+        role=Role.medecin, statut=StatutUtilisateur.actif,
+    )
+    await admin.insert()
+    await medecin.insert()
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                entetes = _jeton(medecin)
+                resp = await client.get("/alerts", headers=entetes)
+                assert resp.status_code == 200
+
+                resp = await client.patch(f"/admin/medecins/{medecin.id}/suspendre", headers=_jeton(admin))
+                assert resp.status_code == 200
+
+                resp = await client.get("/alerts", headers=entetes)
+                assert resp.status_code == 401
+
+                # Redis indisponible : repli sur la base, le statut suspendu reste refusé
+                ressources.signaler_echec_redis(RuntimeError("redis hors service"))
+                resp = await client.get("/alerts", headers=_jeton(medecin))
+                assert resp.status_code == 401
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_jeton_de_rafraichissement():
+    """Le login émet un refresh token, échangeable mais refusé comme jeton d'accès."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    ressources.definir_redis(fakeredis.aioredis.FakeRedis(decode_responses=True))
+    await Utilisateur(
+        email="pat@example.com", username="patient1",
+        mot_de_passe_hache=HASH, role=Role.patient,
+    ).insert()
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post("/auth/login", json={"identifiant": "patient1", "mot_de_passe": "pass123"})
+                assert resp.status_code == 200
+                refresh = resp.json()["refresh_token"]
+                assert refresh
+
+                resp = await client.get("/alerts", headers={"Authorization": f"Bearer {refresh}"})
+                assert resp.status_code == 401
+
+                resp = await client.post("/auth/refresh", json={"refresh_token": refresh})
+                assert resp.status_code == 200
+                acces = resp.json()["access_token"]
+                resp = await client.get("/alerts", headers={"Authorization": f"Bearer {acces}"})
+                assert resp.status_code == 200
+
+                resp = await client.post("/auth/refresh", json={"refresh_token": acces})
+                assert resp.status_code == 401
+    finally:
+        ressources.definir_redis(None)
+
+
+@pytest.mark.asyncio
+async def test_revocation_pendant_une_panne_redis():
+    """Révocation enregistrée en base pendant la panne, refusée en repli puis recopiée dans Redis."""
+    from backend.services.revocation import propager_en_attente
+
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    ressources.definir_redis(redis_client)
+    admin = Utilisateur(email="admin2@example.com", username="admin2", mot_de_passe_hache=HASH, role=Role.admin)
+    medecin = Utilisateur(email="doc2@example.com", username="doc2", mot_de_passe_hache=HASH, role=Role.medecin)
+    await admin.insert()
+    await medecin.insert()
+    ancien = _jeton(medecin)
+
+    try:
+        with patch("backend.db.get_client", return_value=mock_client):
+            from backend.main import app  # import différé après patch
+
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                ressources.signaler_echec_redis(RuntimeError("redis hors service"))
+                resp = await client.patch(f"/users/{medecin.id}/role", json={"role": "patient"}, headers=_jeton(admin))
+                assert resp.status_code == 200
+                assert await db["revocations_jetons"].count_documents({"propage": False}) == 1
+                # Repli en base : le rôle retiré n'est plus accordé
+                assert (await client.get("/medecin/patients", headers=ancien)).status_code == 401
+
+                # Redis revenu : la révocation est recopiée, le chemin rapide refuse l'ancien jeton
+                ressources.definir_redis(redis_client)
+                assert await propager_en_attente() == 1
+                assert await db["revocations_jetons"].count_documents({"propage": False}) == 0
+                assert (await client.get("/medecin/patients", headers=ancien)).status_code == 401
+    finally:
+        ressources.definir_redis(None)
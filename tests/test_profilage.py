@@ -0,0 +1,96 @@
+"""Tests du profilage à la demande (piles repliées, tracemalloc)."""
+
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.models.utilisateur import Role
+from backend.utils import profilage
+from backend.utils.auth import creer_jwt, hacher_mot_de_passe
+
+HASH = hacher_mot_de_passe("pass123")
+
+
+async def _calcul_intensif(duree: float) -> None:
+    """Occupe la boucle par tranches de 20 ms."""
+    fin = time.monotonic() + duree
+    while time.monotonic() < fin:
+        limite = time.monotonic() + 0.02
+        while time.monotonic() < limite:
+            sum(i * i for i in range(200))
+        await asyncio.sleep(0)
+
+
+def _piles_contenant(piles: str, fonction: str) -> int:
+    return sum(int(ligne.rsplit(" ", 1)[1]) for ligne in piles.splitlines() if fonction in ligne)
+
+
+@pytest.mark.asyncio
+async def test_profil_mur_reserve_admin():
+    """Le profil mur est réservé aux admins et désigne la coroutine qui occupe la boucle."""
+    mock_client = AsyncMongoMockClient()
+    await init_beanie(database=mock_client["sante_test"], document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+    entetes = {}
+    for nom, role in (("admin", Role.admin), ("patient", Role.patient)):
+        user = Utilisateur(email=f"{nom}@example.com", username=nom, mot_de_passe_hache=HASH, role=role)
+        await user.insert()
+        entetes[nom] = {"Authorization": f"Bearer {creer_jwt({'sub': str(user.id), 'role': role, 'username': nom})}"}
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            refus = await client.post("/admin/profilage?duree=0.1", headers=entetes["patient"])
+            assert refus.status_code == 403
+            reponse, _ = await asyncio.gather(
+                client.post("/admin/profilage?duree=0.5&frequence=200", headers=entetes["admin"]),
+                _calcul_intensif(0.5),
+            )
+            memoire = await client.get("/admin/profilage/memoire", headers=entetes["admin"])
+
+    assert reponse.status_code == 200
+    assert reponse.headers["content-type"].startswith("text/plain")
+    lignes = reponse.text.splitlines()
+    assert lignes and all(ligne.rsplit(" ", 1)[1].isdigit() for ligne in lignes)
+    assert _piles_contenant(reponse.text, "_calcul_intensif (tests/test_profilage.py:") > 10
+    # Suivi mémoire désactivé par défaut (TRACEMALLOC_CADRES=0)
+    assert memoire.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_profil_cpu_et_exclusivite():
+    """Le mode cpu échantillonne le thread principal ; un seul profil à la fois."""
+    profil = asyncio.ensure_future(profilage.profiler(0.5, "cpu", frequence=200))
+    await asyncio.sleep(0)
+    with pytest.raises(profilage.ProfilageEnCours):
+        await profilage.profiler(0.1)
+    await _calcul_intensif(0.5)
+    piles = await profil
+    assert _piles_contenant(piles, "_calcul_intensif") > 10
+    assert all(ligne.startswith("MainThread;") for ligne in piles.splitlines())
+    with pytest.raises(ValueError):
+        await profilage.profiler(0.1, "inconnu")
+
+
+def test_croissance_memoire():
+    """La différence d'instantanés désigne l'allocation qui grossit."""
+    suivi = profilage.SuiviMemoire(cadres=5)
+    suivi.demarrer()
+    try:
+        conserves = [bytearray(10_000) for _ in range(100)]
+        resultat = suivi.comparer(limite=5, reinitialiser=True)
+        assert resultat["croissance"][0]["ecart_octets"] >= 1_000_000
+        assert any("test_profilage.py" in cadre for cadre in resultat["croissance"][0]["pile"])
+        # Nouvelle référence : plus de croissance notable
+        assert suivi.comparer(limite=1)["croissance"][0]["ecart_octets"] < 100_000
+    finally:
+        suivi.arreter()
+    del conserves
+    with pytest.raises(profilage.ProfilageIndisponible):
+        suivi.comparer()
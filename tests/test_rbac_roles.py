@@ -68,9 +68,9 @@ async def test_rbac_roles_access():
             token_tech = resp.json()["access_token"]
             headers_tech = {"Authorization": f"Bearer {token_tech}"}
 
-            # 4. patient (token initial) accède désormais à /devices car rôle changé -> 200
+            # 4. token initial révoqué par le changement de rôle (même sans Redis) -> 401
             resp = await client.get("/devices", headers=headers_patient)
-            assert resp.status_code == 200
+            assert resp.status_code == 401
 
             # 5. technicien (après promotion) peut accéder à /devices -> 200
             resp = await client.get("/devices", headers=headers_tech)
@@ -0,0 +1,44 @@
+"""Tests du gestionnaire de ressources (pools MongoDB/Redis uniques par worker).
+Tous les commentaires et la documentation sont rédigés en français.
+"""
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from backend.db import get_client, get_database
+from backend.main import app
+from backend.ressources import ressources
+
+
+def test_client_mongo_unique():
+    """Tous les accès Mongo partagent le même client (donc le même pool)."""
+    assert get_client() is get_client()
+    assert get_client() is ressources.mongo
+    assert get_database().client is ressources.mongo
+
+
+@pytest.mark.asyncio
+async def test_metriques_pools():
+    """L'endpoint /health/pools expose l'occupation des deux pools."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/health/pools")
+    assert response.status_code == 200
+    corps = response.json()
+    assert corps["mongo"]["max_pool_size"] > 0
+    assert "connexions_en_usage" in corps["mongo"]
+    assert "max_connexions" in corps["redis"]
+
+
+def test_pool_des_abonnements_distinct():
+    """Les abonnements SSE ont leur propre pool : ils n'épuisent pas le pool partagé."""
+    from backend import settings
+    from backend.ressources import GestionnaireRessources
+
+    gestionnaire = GestionnaireRessources()
+    partage = gestionnaire.redis()
+    abonnements = gestionnaire.redis_abonnements()
+    assert abonnements is gestionnaire.redis_abonnements()
+    assert abonnements.connection_pool is not partage.connection_pool
+    assert abonnements.connection_pool.max_connections == settings.REDIS_MAX_ABONNEMENTS
+    assert partage.connection_pool.max_connections == settings.REDIS_MAX_CONNEXIONS
@@ -0,0 +1,68 @@
+"""Tests du chemin rapide de sérialisation (projection Mongo + orjson).
+
+Vérifie que /alerts et /data renvoient la même forme JSON qu'auparavant
+(mêmes champs, dates ISO 8601) alors que la validation Pydantic est contournée.
+"""
+
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+from unittest.mock import patch
+
+from backend.models import Device, Donnee, Alerte, Recommandation, Utilisateur  # type: ignore
+from backend.utils.serialisation import encoder_json
+
+
+def test_encoder_json_types_bson():
+    """ObjectId en str, datetime au même format que Pydantic."""
+    from bson import ObjectId
+
+    oid = ObjectId()
+    corps = encoder_json({"_id": oid, "date": datetime(2025, 7, 7, 1, 2, 3)})
+    assert corps == f'{{"_id":"{oid}","date":"2025-07-07T01:02:03"}}'.encode()
+
+
+@pytest.mark.asyncio
+async def test_alertes_et_donnees_chemin_rapide():
+    """Les listes /alerts et /data conservent leur forme de réponse."""
+    mock_client = AsyncMongoMockClient()
+    db = mock_client["sante_test"]
+    await init_beanie(database=db, document_models=[Device, Donnee, Alerte, Recommandation, Utilisateur])
+
+    with patch("backend.db.get_client", return_value=mock_client):
+        from backend.main import app  # import différé après patch
+
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post(
+                "/auth/register",
+                json={"email": "rapide@example.com", "username": "rapide", "mot_de_passe": "pass123"},
+            )
+            headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+            patient = await Utilisateur.find_one({"username": "rapide"})
+
+            await Alerte(user_id=str(patient.id), message="Tachycardie détectée", niveau="warning",
+                         date=datetime(2025, 7, 7, 8, 30)).insert()
+            resp = await client.post(
+                "/data",
+                json={"frequence_cardiaque": 72, "taux_oxygene": 98, "date": "2025-07-07T00:00:00"},
+                headers=headers,
+            )
+            assert resp.status_code == 201
+
+            resp = await client.get("/alerts", headers=headers)
+            assert resp.status_code == 200
+            (alerte,) = resp.json()
+            assert set(alerte) == {"id", "user_id", "message", "niveau", "date"}
+            assert alerte["date"] == "2025-07-07T08:30:00"
+
+            resp = await client.get("/data", headers=headers)
+            assert resp.status_code == 200
+            (donnee,) = resp.json()
+            assert donnee["patient_nom"] == "rapide"
+            assert donnee["source"] == "saisie_manuelle"
+            assert donnee["date"] == "2025-07-07T00:00:00"
+            assert donnee["device_nom"] is None
@@ -0,0 +1,52 @@
+"""Tests du surveillant de boucle asyncio : retard et appels bloquants."""
+
+import asyncio
+import logging
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from backend.utils.surveillance_boucle import SurveillantBoucle
+
+
+def _hacher_de_facon_bloquante() -> None:
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_blocage_detecte_avec_pile(caplog):
+    """Un appel synchrone long est signalé une fois, avec la ligne fautive dans la pile."""
+    avant = REGISTRY.get_sample_value("boucle_blocages_total") or 0.0
+    surveillance = SurveillantBoucle(intervalle=0.02, seuil=0.1)
+    with caplog.at_level(logging.WARNING, logger="surveillance_boucle"):
+        surveillance.demarrer()
+        try:
+            await asyncio.sleep(0.1)
+            _hacher_de_facon_bloquante()
+            await asyncio.sleep(0.1)
+        finally:
+            await surveillance.arreter()
+
+    assert surveillance.blocages == 1
+    assert REGISTRY.get_sample_value("boucle_blocages_total") == avant + 1
+    messages = [r.getMessage() for r in caplog.records]
+    assert any("bloquée" in m and "_hacher_de_facon_bloquante" in m for m in messages)
+    assert any("débloquée" in m for m in messages)
+    assert REGISTRY.get_sample_value("boucle_retard_secondes_count") > 0
+
+
+@pytest.mark.asyncio
+async def test_boucle_fluide_et_mode_debug():
+    """Sans blocage rien n'est signalé ; le mode debug règle le seuil des callbacks lents."""
+    surveillance = SurveillantBoucle(intervalle=0.01, seuil=0.2, debug=True)
+    boucle = asyncio.get_running_loop()
+    surveillance.demarrer()
+    try:
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        assert boucle.get_debug() and boucle.slow_callback_duration == 0.2
+    finally:
+        await surveillance.arreter()
+        boucle.set_debug(False)
+    assert surveillance.blocages == 0
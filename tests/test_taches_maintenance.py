@@ -0,0 +1,76 @@
+"""Tests de l'exécuteur de tâches de maintenance (lots, reprise, paramètres)."""
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from backend.services import migrations  # noqa: F401  (enregistre les tâches)
+from backend.services.taches import ParametreManquant, etat, executer
+
+
+class _Coupure(Exception):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_reprise_apres_interruption():
+    """Une exécution coupée après un lot reprend au point de reprise."""
+    db = AsyncMongoMockClient()["sante_test"]
+    await db["alertes"].insert_many(
+        [{"message": f"a{i}", "statut": None} for i in range(5)] + [{"message": "ok", "statut": "lue"}]
+    )
+
+    def couper(point):
+        raise _Coupure
+
+    with pytest.raises(_Coupure):
+        await executer(db, "alertes_statut_manquant", taille_lot=2, rapport=couper)
+    point = await etat(db, "alertes_statut_manquant")
+    assert point["statut"] == "interrompue"
+    assert point["traites"] == 2
+    assert await db["alertes"].count_documents({"statut": "nouvelle"}) == 2
+
+    lots = []
+    point = await executer(db, "alertes_statut_manquant", taille_lot=2, rapport=lambda p: lots.append(p["traites"]))
+    assert point["statut"] == "terminee"
+    assert lots == [4, 5]
+    assert point["modifies"] == 5
+    assert await db["alertes"].count_documents({"statut": "nouvelle"}) == 5
+    assert await db["alertes"].count_documents({"statut": "lue"}) == 1
+
+    # Tâche terminée : une nouvelle exécution repart du début (et ne trouve rien)
+    point = await executer(db, "alertes_statut_manquant")
+    assert point["traites"] == 0
+
+
+@pytest.mark.asyncio
+async def test_parametre_obligatoire():
+    db = AsyncMongoMockClient()["sante_test"]
+    await db["donnees"].insert_many([{"valeur": 1}, {"valeur": 2, "user_id": "u0"}])
+
+    with pytest.raises(ParametreManquant):
+        await executer(db, "donnees_user_id_manquant")
+
+    point = await executer(db, "donnees_user_id_manquant", params={"user_id": "u1"})
+    assert point["modifies"] == 1
+    assert sorted(await db["donnees"].distinct("user_id")) == ["u0", "u1"]
+
+
+@pytest.mark.asyncio
+async def test_alertes_orphelines():
+    """Seules les alertes des patients sans donnée de santé sont supprimées."""
+    db = AsyncMongoMockClient()["sante_test"]
+    await db["donnees"].insert_one({"user_id": "p1", "frequence_cardiaque": 80})
+    await db["alertes"].insert_many(
+        [{"user_id": "p1"}, {"user_id": "p2"}, {"user_id": "p2"}, {"user_id": "p3"}, {"message": "sans patient"}]
+    )
+
+    point = await executer(db, "alertes_orphelines", params={"user_id": "p2"}, taille_lot=1)
+    assert point["supprimes"] == 2
+    # Portée globale : jamais implicite
+    with pytest.raises(ParametreManquant):
+        await executer(db, "alertes_orphelines")
+    point = await executer(db, "alertes_orphelines", params={"tous": "1"})
+    assert point["supprimes"] == 1
+    assert await db["alertes"].distinct("user_id") == ["p1"]
+    # L'alerte sans user_id n'est pas supprimée
+    assert await db["alertes"].count_documents({"user_id": {"$exists": False}}) == 1
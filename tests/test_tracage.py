@@ -0,0 +1,97 @@
+"""Tests du traçage distribué : une trace de la requête HTTP jusqu'aux notifications."""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from backend.utils import tracage
+
+EXPORTEUR = InMemorySpanExporter()
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    """Fournisseur en mémoire (installé une fois par processus) et traçage actif dans les trois services."""
+    from benchmarks import pile  # noqa: F401  (chemins des services)
+    from commun import tracage as tracage_services
+
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        fournisseur = TracerProvider()
+        fournisseur.add_span_processor(SimpleSpanProcessor(EXPORTEUR))
+        trace.set_tracer_provider(fournisseur)
+    for module in (tracage, tracage_services):
+        monkeypatch.setattr(module, "_actif", True)
+    EXPORTEUR.clear()
+    yield EXPORTEUR
+    EXPORTEUR.clear()
+
+
+@pytest.mark.asyncio
+async def test_trace_de_bout_en_bout(traces):
+    """Le traceparent entrant suit la donnée jusqu'à l'IA puis aux notifications."""
+    from benchmarks import ingestion_alertes, pile
+    from ia_service.main import FC_MAX
+
+    recues = []
+    async with pile.demarrer() as banc:
+        population = await ingestion_alertes.peupler(banc.db, 1, 1, 0, graine=1)
+        banc.sur_alerte.append(lambda payload, _: recues.append(payload))
+        entetes = {
+            **ingestion_alertes._entete(population["patients"][0]),
+            "traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01",
+        }
+        reponse = await banc.client.post("/data", headers=entetes, json={
+            "frequence_cardiaque": FC_MAX + 30, "taux_oxygene": 97, "pression_arterielle": "120/80",
+            "date": datetime.utcnow().isoformat(),
+        })
+        assert reponse.status_code == 201
+        for _ in range(200):
+            if recues:
+                break
+            await asyncio.sleep(0.01)
+
+    assert recues and recues[0]["traceparent"].split("-")[1] == TRACE_ID
+    spans = {span.name: span for span in traces.get_finished_spans()}
+    # Mesure hors seuils : voie prioritaire
+    for nom in ("POST /data", "publier nouvelle_donnee:haute", "traiter nouvelle_donnee:haute", "traiter notify"):
+        assert format(spans[nom].context.trace_id, "032x") == TRACE_ID, nom
+    assert spans["POST /data"].attributes["http.response.status_code"] == 201
+    # Chaîne parent → enfant : requête → publication → IA → notification
+    assert spans["publier nouvelle_donnee:haute"].parent.span_id == spans["POST /data"].context.span_id
+    assert spans["traiter nouvelle_donnee:haute"].parent.span_id == spans["publier nouvelle_donnee:haute"].context.span_id
+    assert spans["traiter notify"].parent.span_id == spans["traiter nouvelle_donnee:haute"].context.span_id
+
+
+def test_spans_mongo_enfants_du_span_courant(traces):
+    """Chaque commande MongoDB ouvre un span client, en échec si la commande échoue."""
+    ecouteur = tracage.EcouteurTracesMongo()
+    with trace.get_tracer("test").start_as_current_span("requete") as parent:
+        for request_id, issue in ((1, "succeeded"), (2, "failed")):
+            ecouteur.started(SimpleNamespace(
+                command_name="find", command={"find": "donnees"}, database_name="sante_db",
+                connection_id=("h", 1), request_id=request_id,
+            ))
+            getattr(ecouteur, issue)(SimpleNamespace(connection_id=("h", 1), request_id=request_id, failure={"errmsg": "x"}))
+
+    commandes = [s for s in traces.get_finished_spans() if s.name == "mongo find"]
+    assert len(commandes) == 2 and not ecouteur._spans
+    assert all(s.parent.span_id == parent.get_span_context().span_id for s in commandes)
+    assert commandes[0].attributes["db.collection.name"] == "donnees"
+    assert commandes[0].status.is_ok and not commandes[1].status.is_ok
+
+
+def test_tracage_inactif_sans_effet(monkeypatch):
+    """Sans exporteur configuré, les payloads ne sont pas modifiés."""
+    monkeypatch.setattr(tracage, "_actif", False)
+    payload = {"donnee_id": "1"}
+    with tracage.span_publication("nouvelle_donnee"):
+        assert tracage.injecter(payload) is payload
+    assert tracage.extraire({"traceparent": "x"}) is None
+    assert tracage.configurer("backend", exporteur="") is False